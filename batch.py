@@ -0,0 +1,184 @@
+"""Processamento em lote de XMLs via linha de comando (sem interface Streamlit).
+
+Exemplos:
+    uv run python batch.py data/samples
+    uv run python batch.py "/backfill/2024-*/**/*.xml" --workers 16
+    uv run python batch.py data/samples --provider groq --api-key SUA_CHAVE
+"""
+
+import argparse
+import glob
+import logging
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from tqdm import tqdm
+
+from config.configuration import BATCH_WORKERS, DEFAULT_LLM_PROVIDER, LLMProvider
+from logs.logger import agent_logger, app_logger, parser_logger
+from src.agents.nf_agent import NFAgentIntelligent
+from src.database.connection import enable_wal_mode, init_db
+
+# =====================================================
+# WORKER (um agente por processo)
+# =====================================================
+
+_agent: NFAgentIntelligent | None = None
+
+
+_forcar_reprocessamento = False
+
+
+def _init_worker(llm_provider: str, api_key: str, log_level: str, forcar_reprocessamento: bool = False) -> None:
+    """Cria o agente uma única vez por processo (o grafo é compilado aqui)."""
+    global _agent, _forcar_reprocessamento
+    _forcar_reprocessamento = forcar_reprocessamento
+    for logger in (app_logger, parser_logger, agent_logger):
+        logger.setLevel(getattr(logging, log_level.upper()))
+    _agent = NFAgentIntelligent(llm_provider=llm_provider, api_key=api_key)
+
+
+def _processar_arquivo(path: str) -> dict:
+    """Processa um arquivo no worker e retorna um resumo com a latência."""
+    inicio = time.perf_counter()
+    try:
+        if path.lower().endswith(".zip"):
+            # O paralelismo já vem do pool de processos: membros em sequência
+            results = _agent.processar_zip(path, max_workers=1, forcar_reprocessamento=_forcar_reprocessamento)
+        else:
+            results = [_agent.processar(path, forcar_reprocessamento=_forcar_reprocessamento)]
+        notas = [nf for result in results for nf in result["notas_processadas"]]
+        return {
+            "arquivo": path,
+            "latencia": time.perf_counter() - inicio,
+            "notas": len(notas),
+            "autorizadas": sum(1 for nf in notas if nf.get("status") == "Autorizado"),
+            "reaproveitados": sum(1 for result in results if result.get("cache_hit")),
+            "erros": [erro for result in results for erro in result["erros"]],
+            "falha": None,
+        }
+    except Exception as e:
+        return {
+            "arquivo": path,
+            "latencia": time.perf_counter() - inicio,
+            "notas": 0,
+            "autorizadas": 0,
+            "reaproveitados": 0,
+            "erros": [],
+            "falha": str(e),
+        }
+
+
+# =====================================================
+# ENTRADA E MÉTRICAS
+# =====================================================
+
+def coletar_arquivos(entradas: list[str]) -> list[str]:
+    """
+    Expande diretórios (recursivamente) e padrões glob em uma lista de XMLs e ZIPs.
+
+    Args:
+        entradas: Diretórios, arquivos ou padrões glob
+
+    Returns:
+        Caminhos únicos, ordenados
+    """
+    arquivos = set()
+    for entrada in entradas:
+        path = Path(entrada)
+        if path.is_dir():
+            arquivos.update(str(p) for p in path.rglob("*") if p.suffix.lower() in (".xml", ".zip"))
+        elif path.is_file():
+            arquivos.add(str(path))
+        else:
+            arquivos.update(p for p in glob.glob(entrada, recursive=True) if Path(p).is_file())
+    return sorted(arquivos)
+
+
+def percentil(valores_ordenados: list[float], p: float) -> float:
+    """Percentil pelo método nearest-rank (valores já ordenados)."""
+    if not valores_ordenados:
+        return 0.0
+    k = max(0, min(len(valores_ordenados) - 1, math.ceil(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[k]
+
+
+def imprimir_resumo(resultados: list[dict], tempo_total: float) -> None:
+    """Imprime vazão e latência por arquivo (p50/p95) ao final do lote."""
+    latencias = sorted(r["latencia"] for r in resultados)
+    total_notas = sum(r["notas"] for r in resultados)
+    autorizadas = sum(r["autorizadas"] for r in resultados)
+    falhas = [r for r in resultados if r["falha"]]
+    com_erros = sum(1 for r in resultados if r["erros"])
+
+    print()
+    print("=" * 60)
+    print(f"📁 Arquivos processados: {len(resultados)} ({len(falhas)} com falha, {com_erros} com erros de validação)")
+    print(f"📄 Notas processadas:    {total_notas} ({autorizadas} autorizadas)")
+    print(f"♻️  XMLs reaproveitados:  {sum(r['reaproveitados'] for r in resultados)} (conteúdo idêntico já processado)")
+    print(f"⏱️  Tempo total:          {tempo_total:.2f}s")
+    if tempo_total > 0:
+        print(f"🚀 Vazão:                {len(resultados) / tempo_total:.1f} arquivos/s | {total_notas / tempo_total:.1f} notas/s")
+    print(f"📊 Latência por arquivo: p50 {percentil(latencias, 50) * 1000:.1f} ms | p95 {percentil(latencias, 95) * 1000:.1f} ms")
+    print("=" * 60)
+
+    for r in falhas[:20]:
+        print(f"❌ {r['arquivo']}: {r['falha']}")
+    if len(falhas) > 20:
+        print(f"... e mais {len(falhas) - 20} falhas")
+
+
+# =====================================================
+# CLI
+# =====================================================
+
+def main(argv: list[str] | None = None) -> int:
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Processa XMLs de NFe/RPS em lote com um pool de processos."
+    )
+    parser.add_argument("entradas", nargs="+", help="Diretórios, arquivos (XML/ZIP) ou padrões glob (ex.: 'dados/**/*.xml')")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help=f"Processos em paralelo (padrão: {BATCH_WORKERS})")
+    parser.add_argument("--provider", default=DEFAULT_LLM_PROVIDER.value, choices=[p.value for p in LLMProvider])
+    parser.add_argument("--api-key", default="", help="API Key do LLM (sem chave, processa sem validação LLM)")
+    parser.add_argument("--force", action="store_true", help="Reprocessa mesmo XMLs idênticos a um já processado")
+    parser.add_argument("--log-level", default="WARNING", help="Nível de log dos workers (padrão: WARNING)")
+    args = parser.parse_args(argv)
+
+    arquivos = coletar_arquivos(args.entradas)
+    if not arquivos:
+        print("⚠️  Nenhum arquivo XML ou ZIP encontrado")
+        return 1
+
+    init_db()
+    enable_wal_mode()
+
+    workers = max(1, min(args.workers, len(arquivos)))
+    # Lotes de arquivos por envio reduzem o custo de IPC em execuções com muitos arquivos
+    chunksize = max(1, min(64, len(arquivos) // (workers * 8)))
+    app_logger.info(f"📦 Processando {len(arquivos)} arquivos com {workers} workers")
+
+    resultados = []
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(args.provider, args.api_key, args.log_level, args.force),
+    ) as executor:
+        for resultado in tqdm(
+            executor.map(_processar_arquivo, arquivos, chunksize=chunksize),
+            total=len(arquivos),
+            unit="arq",
+        ):
+            resultados.append(resultado)
+
+    imprimir_resumo(resultados, time.perf_counter() - inicio)
+    return 1 if any(r["falha"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
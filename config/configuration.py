@@ -229,6 +229,53 @@ PROCESSING_TIMEOUT = int(os.getenv("PROCESSING_TIMEOUT", "300"))
 # Habilitar validação rigorosa
 STRICT_VALIDATION = os.getenv("STRICT_VALIDATION", "True").lower() == "true"
 
+# Arquivos XML acima deste tamanho (em MB) são lidos em modo streaming (iterparse)
+XML_STREAMING_THRESHOLD_MB = int(os.getenv("XML_STREAMING_THRESHOLD_MB", "20"))
+
+# Bytes lidos do início do XML para identificar o tipo de documento
+XML_SNIFF_BYTES = int(os.getenv("XML_SNIFF_BYTES", "8192"))
+
+# Número de processos do processamento em lote via linha de comando (batch.py)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+# Número de membros de um ZIP processados em paralelo (threads)
+ZIP_WORKERS = int(os.getenv("ZIP_WORKERS", "4"))
+
+# Reaproveitar o resultado de XMLs idênticos (índice SHA-256 no banco)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "True").lower() == "true"
+
+# Quantidade de resultados mantidos em memória por processo
+RESULT_CACHE_MEMO_SIZE = int(os.getenv("RESULT_CACHE_MEMO_SIZE", "1024"))
+
+# Quantidade de CPFs/CNPJs com resultado da validação mantido em memória por processo
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "8192"))
+
+# Quantidade de assinaturas de item (CFOP, regime, CSTs) com resultado das regras mantido em memória por processo
+ITEM_SIGNATURE_CACHE_SIZE = int(os.getenv("ITEM_SIGNATURE_CACHE_SIZE", "4096"))
+
+# Diferença máxima aceita (em centavos) na conciliação dos totais da nota com os itens
+RECONCILIATION_TOLERANCE_CENTS = int(os.getenv("RECONCILIATION_TOLERANCE_CENTS", "1"))
+
+# Tabela NCM/TIPI (JSON exportado do Portal Único Siscomex, com os códigos de 8 dígitos e,
+# opcionalmente, a alíquota de IPI). Sem ela o NCM do item é conferido só no formato
+NCM_TABLE_PATH = Path(os.getenv("NCM_TABLE_PATH")) if os.getenv("NCM_TABLE_PATH") else None
+
+# Tabela versionada de alíquotas de ICMS por UF (internas, FCP, matriz interestadual e importados)
+UF_RATE_TABLE_PATH = Path(os.getenv("UF_RATE_TABLE_PATH", str(SRC_DIR / "validators" / "aliquotas" / "aliquotas_icms_uf.json")))
+
+# Tabela versionada de MVA do ICMS-ST por CEST/NCM e par de UFs
+MVA_TABLE_PATH = Path(os.getenv("MVA_TABLE_PATH", str(SRC_DIR / "validators" / "aliquotas" / "mva_st.json")))
+
+# Tabela versionada de IBS/CBS (alíquotas por vigência, CST e cClassTrib)
+IBS_CBS_TABLE_PATH = Path(os.getenv("IBS_CBS_TABLE_PATH", str(SRC_DIR / "validators" / "aliquotas" / "ibs_cbs.json")))
+
+# Tabela de ISS por município (IBGE) e item da LC 116: alíquota, retenção e local de incidência.
+# O padrão traz municípios de referência; aponte para a tabela completa dos municípios
+ISS_TABLE_PATH = Path(os.getenv("ISS_TABLE_PATH", str(SRC_DIR / "validators" / "iss" / "iss_aliquotas.json")))
+
+# Pacote compilado das regras CST/CSOSN (recriado quando os JSONs de origem mudam)
+CST_RULES_BUNDLE_PATH = Path(os.getenv("CST_RULES_BUNDLE_PATH", str(DATA_PROCESSED_DIR / "cst_rules.json")))
+
 
 # =====================================================
 # Configurações de Streamlit
@@ -346,6 +393,9 @@ def validate_config() -> dict:
     if BATCH_SIZE <= 0:
         issues.append("BATCH_SIZE deve ser positivo")
     
+    if BATCH_WORKERS <= 0:
+        issues.append("BATCH_WORKERS deve ser positivo")
+    
     # Validar LLM Provider padrão
     if DEFAULT_LLM_PROVIDER not in LLMProvider:
         issues.append(f"Provider padrão inválido: {DEFAULT_LLM_PROVIDER}")
@@ -1,7 +1,6 @@
 """Interface Streamlit para NFe Processor Agent."""
 
 import streamlit as st
-from pathlib import Path
 import pandas as pd
 import plotly.express as px
 
@@ -14,6 +13,7 @@ from config.configuration import (
 from src.agents.nf_agent import NFAgentIntelligent
 from src.agents.chat_agent import ChatAssistant
 from src.database.connection import get_all_notas, get_connection, init_db
+from src.parsers.zip_reader import is_zip
 from logs.logger import app_logger
 
 
@@ -160,10 +160,18 @@ with tab1:
     with col1:
         st.subheader("Upload de Arquivos")
         uploaded_files = st.file_uploader(
-            "Selecione arquivos XML",
-            type=["xml"],
+            "Selecione arquivos XML ou ZIP",
+            type=["xml", "zip"],
             accept_multiple_files=True,
-            help="Você pode selecionar múltiplos arquivos"
+            help="Você pode selecionar múltiplos arquivos; ZIPs são processados sem extração em disco"
+        )
+    
+    with col2:
+        st.subheader("Opções")
+        forcar_reprocessamento = st.checkbox(
+            "Forçar reprocessamento",
+            value=False,
+            help="Arquivos idênticos a um já processado reutilizam o resultado salvo; marque para processar de novo"
         )
     
     if uploaded_files:
@@ -182,33 +190,46 @@ with tab1:
                 progress_bar.progress(progress)
                 status_text.text(f"Processando {uploaded_file.name}...")
                 
-                # Salvar arquivo temporariamente
-                temp_path = Path("data/temp") / uploaded_file.name
-                temp_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
+                # ZIP: membros processados em paralelo, progresso por membro
+                if is_zip(uploaded_file, uploaded_file.name):
+                    def progresso_zip(concluidos, total, membro, _resultado, nome_zip=uploaded_file.name):
+                        status_text.text(f"Processando {nome_zip}: {concluidos}/{total} ({membro})")
+                    
+                    try:
+                        resultados.extend(st.session_state.agent.processar_zip(
+                            uploaded_file,
+                            llm_provider=st.session_state.llm_provider,
+                            api_key=st.session_state.llm_api_key,
+                            progress_callback=progresso_zip,
+                            forcar_reprocessamento=forcar_reprocessamento
+                        ))
+                    except Exception as e:
+                        st.error(f"❌ Erro ao processar {uploaded_file.name}: {e}")
+                    continue
                 
-                # Processar arquivo (sem passar model)
+                # Processar conteúdo em memória (sem arquivo temporário)
                 try:
                     result = st.session_state.agent.processar(
-                        str(temp_path),
+                        uploaded_file,
                         llm_provider=st.session_state.llm_provider,
-                        api_key=st.session_state.llm_api_key
+                        api_key=st.session_state.llm_api_key,
+                        nome_arquivo=uploaded_file.name,
+                        forcar_reprocessamento=forcar_reprocessamento
                     )
                     resultados.append(result)
                     
                 except Exception as e:
                     st.error(f"❌ Erro ao processar {uploaded_file.name}: {e}")
-                
-                # Limpar arquivo temporário
-                temp_path.unlink()
             
             # Mostrar resultados
             status_text.text("✅ Processamento concluído!")
             
             st.success(f"✅ {len(uploaded_files)} arquivo(s) processado(s)")
             
+            reaproveitados = sum(1 for r in resultados if r.get('cache_hit'))
+            if reaproveitados:
+                st.info(f"♻️ {reaproveitados} arquivo(s) já processado(s) anteriormente: resultado reaproveitado")
+            
             print("Resultados do processamento: ", resultados)
             
             # Resumo
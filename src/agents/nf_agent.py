@@ -1,19 +1,29 @@
 """Agente LangGraph para validação de NFe para homologação SEFAZ."""
 
+import sqlite3
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import TypedDict
 
 from langgraph.graph import StateGraph, END
 
-from config.configuration import DEFAULT_MODELS, LLMProvider
+from config.configuration import DEFAULT_MODELS, ZIP_WORKERS, LLMProvider
+from src.constants import DocumentType
 from src.parsers.xml_parser_llm import XMLParserLLM
 from src.parsers.rps_parser import RPSParser
+from src.parsers.zip_reader import list_xml_members, open_zip, read_member
+from src.parsers.document_sniffer import detect_document_type, sniff_document_type
+from src.parsers.xml_document import XMLDocument, XMLSource, is_large_xml, source_name
 from src.validators.calculators.tax_calculator import calcular_impostos
 from src.api.simulation_sefaz import SefazSimulator
 from src.database.connection import insert_nota_fiscal, get_connection
-from src.validators.cfops.cfop_validator import validar_cfops_nota
-from src.validators.ncm.ncm_validator import validar_ncm_itens
-from src.validators.cpf_cnpj.document_validator import validar_document_dest
-from src.validators.csts.cst_validator import validar_cst_nfe
+from src.database.duplicate_index import (
+    DuplicateIndex, eh_duplicada, violacao_chave_gravada, violacao_gravada_por_outro
+)
+from src.database.result_cache import ResultCache, content_hash
+from src.validators.csts.rule_bundle import get_rule_bundle
+from src.validators.engine.base import SEVERITY_ERROR
+from src.validators.engine.rule_engine import validar_nota
 from logs.logger import agent_logger
 
 
@@ -23,13 +33,16 @@ from logs.logger import agent_logger
 
 class AgentState(TypedDict):
     """Estado do agente de validação NFe."""
-    arquivo_path: str
+    arquivo_path: XMLSource
+    arquivo_nome: str
+    documento: XMLDocument | None
     tipo_documento: str
     llm_provider: str
     llm_api_key: str
     llm_model: str
     notas_processadas: list[dict]
     erros: list[str]
+    notas_salvas: int
     status: str
 
 
@@ -51,6 +64,11 @@ class NFAgentIntelligent:
         self.model = DEFAULT_MODELS[LLMProvider(llm_provider)].value
         
         self.graph = self._build_graph()
+        self.result_cache = ResultCache()
+        # Notas já vistas (histórico + lote): duplicidades e lacunas de numeração
+        self.duplicatas = DuplicateIndex()
+        # Regras CST compiladas carregadas uma vez, antes da primeira nota
+        get_rule_bundle()
         
         agent_logger.info(f"🤖 Agente NFe inicializado com {llm_provider}/{self.model}")
     
@@ -62,6 +80,7 @@ class NFAgentIntelligent:
         workflow.add_node("identificar_tipo", self.identificar_tipo)
         workflow.add_node("processar_nfe", self.processar_nfe)
         workflow.add_node("processar_rps", self.processar_rps)
+        workflow.add_node("tipo_nao_suportado", self.tipo_nao_suportado)
         workflow.add_node("calcular_imposto", self.calcular_impostos)
         workflow.add_node("validar_fiscal", self.validar_fiscal)
         workflow.add_node("simular_sefaz", self.simular_sefaz)
@@ -74,12 +93,15 @@ class NFAgentIntelligent:
             self.decidir_parser,
             {
                 "nfe": "processar_nfe",
+                "nfce": "processar_nfe",
                 "rps": "processar_rps",
+                "cte": "tipo_nao_suportado",
             }
         )
         
         workflow.add_edge("processar_nfe", "calcular_imposto")
         workflow.add_edge("processar_rps", "calcular_imposto")
+        workflow.add_edge("tipo_nao_suportado", END)
         workflow.add_edge("calcular_imposto", "validar_fiscal")
 
         workflow.add_conditional_edges(
@@ -100,16 +122,31 @@ class NFAgentIntelligent:
     # =====================================================
     
     def identificar_tipo(self, state: AgentState) -> AgentState:
-        """Identifica se é NFe ou RPS."""
+        """
+        Identifica NFe, NFC-e, CT-e ou RPS lendo apenas o início do XML.
+        
+        O parsing completo só acontece aqui quando o início do arquivo é
+        ambíguo; caso contrário fica para o parser escolhido (que decide
+        entre árvore completa e streaming).
+        """
         try:
-            import xml.etree.ElementTree as ET
-            tree = ET.parse(state["arquivo_path"])
-            root = tree.getroot()
-
-            if root.find('.//Nfse') is not None or root.find('.//CompNfse') is not None or 'ConsultarNfseRpsResposta' in root.tag:
+            tipo = sniff_document_type(state["arquivo_path"])
+            
+            if tipo is None and not is_large_xml(state["arquivo_path"]):
+                documento = XMLDocument.from_source(state["arquivo_path"], state["arquivo_nome"])
+                state["documento"] = documento
+                tipo = detect_document_type(documento.root)
+            
+            if tipo == DocumentType.RPS:
                 state["tipo_documento"] = "rps"
                 agent_logger.info("📋 Tipo identificado: RPS (Nota de Serviço)")
-            elif root.find('.//NFe') is not None or 'nfeProc' in root.tag:
+            elif tipo == DocumentType.NFC_E:
+                state["tipo_documento"] = "nfce"
+                agent_logger.info("📋 Tipo identificado: NFC-e (Nota de Consumidor, modelo 65)")
+            elif tipo == DocumentType.CT_E:
+                state["tipo_documento"] = "cte"
+                agent_logger.info("📋 Tipo identificado: CT-e (Conhecimento de Transporte)")
+            elif tipo == DocumentType.NFE:
                 state["tipo_documento"] = "nfe"
                 agent_logger.info("📋 Tipo identificado: NFe (Nota de Produto)")
             else:
@@ -127,6 +164,14 @@ class NFAgentIntelligent:
         """Decide qual parser usar."""
         return state["tipo_documento"]
     
+    def tipo_nao_suportado(self, state: AgentState) -> AgentState:
+        """Encerra o workflow para documentos reconhecidos mas ainda não processados (CT-e)."""
+        msg = f"Tipo de documento não suportado: {state['tipo_documento'].upper()} ({state['arquivo_nome']})"
+        state["erros"].append(msg)
+        state["status"] = "nao_suportado"
+        agent_logger.warning(f"⚠️  {msg}")
+        return state
+    
     def processar_nfe(self, state: AgentState) -> AgentState:
         """Processa NFe (Nota de Produto) com LLM."""
         try:
@@ -136,20 +181,29 @@ class NFAgentIntelligent:
                 api_key=state["llm_api_key"],
                 model=state["llm_model"],
                 use_llm_validation=True,
-                use_llm_enrichment=False
+                use_llm_enrichment=False,
+                document=state["documento"],
+                name=state["arquivo_nome"]
             )
-            nf_data = parser.parse()
+            notas = parser.parse_all()
             
-            # Log de validação LLM
-            if 'llm_validation' in nf_data:
-                val = nf_data['llm_validation']
-                agent_logger.info(
-                    f"🤖 Validação LLM: {val['validacao_geral']} "
-                    f"(confiança: {val.get('confianca', 0)}%)"
-                )
+            # Documento parseado pelo próprio parser (em streaming, sem os itens)
+            state["documento"] = parser.base_parser.document
+            
+            for nf_data in notas:
+                # Log de validação LLM
+                if 'llm_validation' in nf_data:
+                    val = nf_data['llm_validation']
+                    agent_logger.info(
+                        f"🤖 Validação LLM: {val['validacao_geral']} "
+                        f"(confiança: {val.get('confianca', 0)}%)"
+                    )
+                
+                state["notas_processadas"].append(nf_data)
+                agent_logger.info(f"✅ NFe parseada: {nf_data['numero_nf']}")
             
-            state["notas_processadas"].append(nf_data)
-            agent_logger.info(f"✅ NFe parseada: {nf_data['numero_nf']}")
+            if len(notas) > 1:
+                agent_logger.info(f"📦 Lote com {len(notas)} NFe no arquivo")
             
         except Exception as e:
             state["erros"].append(f"Erro ao processar NFe: {e}")
@@ -161,25 +215,35 @@ class NFAgentIntelligent:
         """Processa RPS (Nota de Serviço)."""
         try:
             # Usar parser de RPS
-            parser = RPSParser(state["arquivo_path"])
-            nf_data = parser.parse()
-
-            nf_data['llm_validation'] = {
-                'validacao_geral': 'APROVADO',
-                'score_confianca': 100,
-                'erros_criticos': [],
-                'avisos': [],
-                'validacoes_ok': ['RPS parseado com sucesso'],
-                'resumo_fiscal': {
-                    'iss_ok': True,
-                    'totalizadores_ok': True
-                },
-                'recomendacao_sefaz': 'APTO PARA PRODUÇÃO',
-                'justificativa': 'RPS processado sem LLM'
-            }
+            parser = RPSParser(state["arquivo_path"], document=state["documento"], name=state["arquivo_nome"])
+            total = 0
+            
+            for nf_data in parser.iter_notas():
+                nf_data['llm_validation'] = {
+                    'validacao_geral': 'APROVADO',
+                    'score_confianca': 100,
+                    'erros_criticos': [],
+                    'avisos': [],
+                    'validacoes_ok': ['RPS parseado com sucesso'],
+                    'resumo_fiscal': {
+                        'iss_ok': True,
+                        'totalizadores_ok': True
+                    },
+                    'recomendacao_sefaz': 'APTO PARA PRODUÇÃO',
+                    'justificativa': 'RPS processado sem LLM'
+                }
+                
+                state["notas_processadas"].append(nf_data)
+                agent_logger.info(f"✅ RPS parseado: {nf_data['numero_nf']}")
+                total += 1
+            
+            # Documento parseado pelo próprio parser, reaproveitado pelo simulador SEFAZ
+            state["documento"] = parser.document
             
-            state["notas_processadas"].append(nf_data)
-            agent_logger.info(f"✅ RPS parseado: {nf_data['numero_nf']}")
+            if total == 0:
+                raise ValueError("Estrutura RPS não reconhecida")
+            if total > 1:
+                agent_logger.info(f"📦 Lote com {total} NFS-e no arquivo")
             
         except Exception as e:
             state["erros"].append(f"Erro ao processar RPS: {e}")
@@ -188,50 +252,33 @@ class NFAgentIntelligent:
         return state
     
     def validar_fiscal(self, state: AgentState) -> AgentState:
-        """Valida dados fiscais com LLM (CFOP, CST, NCM, impostos)."""
+        """
+        Valida dados fiscais (CFOP, NCM, emitente, destinatário, totais, CST, IPI, PIS/COFINS).
+        
+        Todas as regras são avaliadas em uma passada pelos itens e a nota sai
+        com a lista completa de violações (não para no primeiro erro). A nota
+        também é conferida no índice de duplicidade (histórico e lote).
+        """
         
         for nf_data in state["notas_processadas"]:
             
-            cfop_validation = validar_cfops_nota(nf_data)
-            if not cfop_validation['valido']:
-                nf_data['status'] = 'Reprovado'
-                erros = cfop_validation.get('erros', [])
-                if erros:
-                    nf_data['mensagem_erro'] = "Validação CFOP reprovada: " + "; ".join(erros)
-                    state["erros"].extend([str(e) for e in erros])
-                    agent_logger.warning(f"❌ NF {nf_data['numero_nf']} REPROVADA")
-                    return state
+            validacao = validar_nota(nf_data)
+            origem = f"{state['arquivo_nome']}#{nf_data.get('indice_documento', 0)}"
+            for violacao in self.duplicatas.registrar(nf_data, origem):
+                if violacao.severity == SEVERITY_ERROR:
+                    validacao['erros'].append(violacao.to_dict())
+                    validacao['valido'] = False
+                else:
+                    validacao['avisos'].append(violacao.to_dict())
+            nf_data['violacoes'] = validacao['erros'] + validacao['avisos']
             
-            ncm_validation = validar_ncm_itens(nf_data)
-            if not ncm_validation['valido']:
+            if not validacao['valido']:
                 nf_data['status'] = 'Reprovado'
-                erros = ncm_validation.get('erros', [])
-                if erros:
-                    nf_data['mensagem_erro'] = "Validação NCM reprovada: " + "; ".join(erros)
-                    state["erros"].extend([str(e) for e in erros])
-                    agent_logger.warning(f"❌  NF {nf_data['numero_nf']} REPROVADA")
-                    return state
-                
-            document_validation = validar_document_dest(nf_data)
-            if not document_validation['valido']:
-                nf_data['status'] = 'Reprovado'
-                erros = document_validation.get('erros', [])
-                if erros:
-                    nf_data['mensagem_erro'] = "Validação reprovada: " + "; ".join(erros)
-                    state["erros"].extend([str(e) for e in erros])
-                    agent_logger.warning(f"❌ {state["erros"]}, nota número {nf_data['numero_nf']} REPROVADA")
-                    return state
-                
-            cst_validation = validar_cst_nfe(nf_data)
-            if not cst_validation['valido']:
-                nf_data['status'] = 'Reprovado'
-                erros = cst_validation.get('erros', [])
-                if erros:
-                    nf_data['mensagem_erro'] = "Validação CST reprovada: " + "; ".join([e['msg'] for e in erros])
-                    state["erros"].extend([e['msg'] for e in erros])
-                    agent_logger.warning(f"❌  NF {nf_data['numero_nf']} REPROVADA")
-                    return state                
-                
+                erros = [f"[{e['codigo']}] {e['msg']}" for e in validacao['erros']]
+                nf_data['mensagem_erro'] = "Validação fiscal reprovada: " + "; ".join(erros)
+                state["erros"].extend(erros)
+                agent_logger.warning(f"❌ NF {nf_data['numero_nf']} REPROVADA ({len(erros)} violações)")
+                continue
            
             nf_data['status'] = 'Aprovado'
             agent_logger.info(f"✅ NF {nf_data['numero_nf']} aprovada para SEFAZ")
@@ -239,15 +286,25 @@ class NFAgentIntelligent:
         return state
     
     def decidir_envio_sefaz(self, state: AgentState) -> str:
-        """Decide se envia para SEFAZ ou rejeita. Usa a validação LLM como fonte primária de rejeição."""
-
+        """
+        Decide se envia para SEFAZ ou rejeita. Usa a validação LLM como fonte primária de rejeição.
+        
+        Em lotes, as notas reprovadas não impedem o envio das aprovadas
+        (simular_sefaz só envia as notas com status aprovado).
+        """
+        aprovadas = 0
+        
         for nf in state["notas_processadas"]:
             numero_nf = nf.get('numero_nf', 'desconhecido')
             status_nf = str(nf.get('status', 'desconhecido')).upper().strip()
             
             if status_nf == 'REPROVADO':
                 agent_logger.warning(f"❌ NF {numero_nf} com status {status_nf}")
-                return "rejeitar"
+                continue
+            aprovadas += 1
+        
+        if aprovadas == 0:
+            return "rejeitar"
         
         agent_logger.info(f"🟢 DECISÃO FINAL: ENVIAR ao SEFAZ. Retornando 'enviar'.")
         return "enviar"
@@ -259,11 +316,15 @@ class NFAgentIntelligent:
         for nf_data in state["notas_processadas"]:
             if nf_data.get('skip_sefaz', False):
                 agent_logger.warning(f"⏭️  Pulando SEFAZ para NF {nf_data['numero_nf']} (reprovada)")
-                break
+                continue
             
             if nf_data.get('status') in ['Aprovado', 'Aprovado com ressalvas']:
                 try:
-                    result = simulator.simulate_submission(state["arquivo_path"])
+                    result = simulator.simulate_submission(
+                        state["arquivo_path"],
+                        document=state["documento"],
+                        indice_documento=nf_data.get('indice_documento', 0)
+                    )
                     
                     if result['status'] == 'sucesso':
                         nf_data['chave_nfe'] = result['chave_nfe']
@@ -293,51 +354,35 @@ class NFAgentIntelligent:
         
         for nf_data in state["notas_processadas"]:
             try:
+                if eh_duplicada(nf_data):
+                    # A primeira ocorrência já está no lote: não sobrescreve
+                    agent_logger.warning(f"⏭️  NF {nf_data.get('numero_nf')} duplicada no lote, não gravada")
+                    continue
+                
                 agent_logger.info(f"💾 Salvando NF {nf_data.get('numero_nf')}...")
                 
                 if nf_data.get('classificacao') == 'Servico' or nf_data.get('tipo_nf') == 'RPS':
                     if not nf_data.get('cliente_cpf'):
                         nf_data['cliente_cpf'] = nf_data.get('cliente_cnpj', '00000000000')
                         
-                nf_id = insert_nota_fiscal(nf_data, cursor)
+                try:
+                    nf_id = insert_nota_fiscal(nf_data, cursor, *self.duplicatas.ids_atualizaveis(nf_data))
+                except sqlite3.IntegrityError as e:
+                    if 'chave_nfe' not in str(e):
+                        raise
+                    self._reprovar_na_gravacao(state, nf_data, violacao_chave_gravada(nf_data))
+                    continue
+                if nf_id is None:
+                    # Outro worker do lote gravou a mesma nota depois do histórico lido
+                    self._reprovar_na_gravacao(state, nf_data, violacao_gravada_por_outro(nf_data))
+                    continue
+                self.duplicatas.confirmar_gravacao(nf_data, nf_id)
                 agent_logger.info(f"✅ Nota fiscal inserida com ID: {nf_id}")
-
-                itens_count = len(nf_data.get("itens", []))
-                agent_logger.info(f"📦 Inserindo {itens_count} itens...")
-                
-                for item in nf_data.get("itens", []):
-                    cursor.execute("""
-                        INSERT INTO itens_nota 
-                        (nf_id, codigo_item, descricao, quantidade, valor_unitario, valor_total, tipo, ncm)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        nf_id, 
-                        item.get('codigo_item', ''),
-                        item.get('descricao', ''),
-                        item.get('quantidade', 0),
-                        item.get('valor_unitario', 0),
-                        item.get('valor_total', 0),
-                        item.get('tipo', ''),
-                        item.get('ncm')
-                    ))
-                
-                impostos_count = len(nf_data.get("impostos", []))
-                agent_logger.info(f"💰 Inserindo {impostos_count} impostos...")
                 
-                for imposto in nf_data.get("impostos", []):
-                    cursor.execute("""
-                        INSERT INTO impostos 
-                        (nf_id, tipo_imposto, aliquota, valor_base, valor_imposto)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        nf_id,
-                        imposto.get('tipo_imposto', ''),
-                        imposto.get('aliquota', 0),
-                        imposto.get('valor_base', 0),
-                        imposto.get('valor_imposto', 0)
-                    ))
+                self._gravar_itens_impostos(cursor, nf_id, nf_data)
                 
                 conn.commit()
+                state["notas_salvas"] = state.get("notas_salvas", 0) + 1
                 agent_logger.info(f"✅ NF {nf_data['numero_nf']} salva no banco (ID: {nf_id})")
                 
             except Exception as e:
@@ -351,7 +396,58 @@ class NFAgentIntelligent:
         state["status"] = "completo"
         agent_logger.info("✅ Salvamento concluído")
         return state
-    
+
+    @staticmethod
+    def _gravar_itens_impostos(cursor, nf_id: int, nf_data: dict) -> None:
+        """Grava itens e impostos da nota (reprocessamento substitui os anteriores em vez de duplicá-los)."""
+        cursor.execute("DELETE FROM itens_nota WHERE nf_id = ?", (nf_id,))
+        cursor.execute("DELETE FROM impostos WHERE nf_id = ?", (nf_id,))
+
+        itens_count = len(nf_data.get("itens", []))
+        agent_logger.info(f"📦 Inserindo {itens_count} itens...")
+        
+        for item in nf_data.get("itens", []):
+            cursor.execute("""
+                INSERT INTO itens_nota 
+                (nf_id, codigo_item, descricao, quantidade, valor_unitario, valor_total, tipo, ncm)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                nf_id, 
+                item.get('codigo_item', ''),
+                item.get('descricao', ''),
+                item.get('quantidade', 0),
+                item.get('valor_unitario', 0),
+                item.get('valor_total', 0),
+                item.get('tipo', ''),
+                item.get('ncm')
+            ))
+        
+        impostos_count = len(nf_data.get("impostos", []))
+        agent_logger.info(f"💰 Inserindo {impostos_count} impostos...")
+        
+        for imposto in nf_data.get("impostos", []):
+            cursor.execute("""
+                INSERT INTO impostos 
+                (nf_id, tipo_imposto, aliquota, valor_base, valor_imposto)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                nf_id,
+                imposto.get('tipo_imposto', ''),
+                imposto.get('aliquota', 0),
+                imposto.get('valor_base', 0),
+                imposto.get('valor_imposto', 0)
+            ))
+
+    @staticmethod
+    def _reprovar_na_gravacao(state: AgentState, nf_data: dict, violacao) -> None:
+        """Reprova a nota por duplicidade detectada pelo banco (gravada por outro processo do lote)."""
+        erro = f"[{violacao.codigo}] {violacao.msg}"
+        nf_data['violacoes'] = (nf_data.get('violacoes') or []) + [violacao.to_dict()]
+        nf_data['status'] = 'Reprovado'
+        nf_data['mensagem_erro'] = "; ".join(filter(None, [nf_data.get('mensagem_erro'), erro]))
+        state["erros"].append(erro)
+        agent_logger.warning(f"⏭️  NF {nf_data.get('numero_nf')} não gravada: {violacao.msg}")
+
     def calcular_impostos(self, state: AgentState) -> AgentState:
         """Calcula impostos para cada nota processada."""
         agent_logger.info(f"💰 Iniciando cálculo de impostos para {len(state['notas_processadas'])} notas")
@@ -382,14 +478,29 @@ class NFAgentIntelligent:
     # MÉTODO PRINCIPAL
     # =====================================================
     
-    def processar(self, arquivo_path: str, llm_provider: str = None, api_key: str = None) -> dict:
+    def processar(
+        self,
+        arquivo_path: XMLSource,
+        llm_provider: str = None,
+        api_key: str = None,
+        nome_arquivo: str = "",
+        forcar_reprocessamento: bool = False
+    ) -> dict:
         """
         Processa arquivo XML e retorna resultado.
         
+        Conteúdos já processados (mesmo SHA-256) com o mesmo provider/modelo
+        retornam o resultado armazenado, sem executar o workflow (LLM, SEFAZ e
+        banco), com 'cache_hit' = True. Só são armazenadas as execuções sem
+        erros e com todas as notas gravadas no banco.
+        
         Args:
-            arquivo_path: Caminho do arquivo XML
+            arquivo_path: Caminho do arquivo XML ou conteúdo em memória
+                (bytes/buffer, ex.: upload do Streamlit, sem gravar em disco)
             llm_provider: Provider LLM
             api_key: API Key
+            nome_arquivo: Nome exibido nos logs (útil para conteúdo em memória)
+            forcar_reprocessamento: Ignora o resultado armazenado e reprocessa
         
         Returns:
             dict com resultado do processamento
@@ -402,14 +513,105 @@ class NFAgentIntelligent:
         
         initial_state: AgentState = {
             "arquivo_path": arquivo_path,
+            "arquivo_nome": source_name(arquivo_path, nome_arquivo),
+            "documento": None,
             "tipo_documento": "",
             "llm_provider": provider,
             "llm_api_key": key,
             "llm_model": model,
             "notas_processadas": [],
             "erros": [],
+            "notas_salvas": 0,
             "status": "processando",
         }
         
-        result = self.graph.invoke(initial_state)
+        sha256 = content_hash(arquivo_path) if self.result_cache.enabled else None
+        
+        if sha256 and not forcar_reprocessamento:
+            cached = self.result_cache.get(sha256)
+            # Resultado de outro provider/modelo não é reaproveitado
+            if cached is not None and (cached.get("llm_provider"), cached.get("llm_model")) == (provider, model):
+                agent_logger.info(f"♻️  {initial_state['arquivo_nome']} já processado (sha256 {sha256[:12]}), resultado reaproveitado")
+                return {**initial_state, **cached, "cache_hit": True}
+        
+        # Notas do arquivo formam um lote no índice de duplicidade (ou o do ZIP, se aninhado)
+        with self.duplicatas.lote():
+            result = self.graph.invoke(initial_state)
+        
+        if sha256 and self._resultado_reaproveitavel(result):
+            self.result_cache.put(sha256, result["arquivo_nome"], result)
+        
+        result["cache_hit"] = False
         return result
+    
+    @staticmethod
+    def _resultado_reaproveitavel(result: dict) -> bool:
+        """Execução completa, sem erros (banco, LLM, SEFAZ, parsing) e com todas as notas gravadas."""
+        return (
+            result.get("status") == "completo"
+            and not result.get("erros")
+            and result.get("notas_salvas", 0) == len(result.get("notas_processadas") or [])
+        )
+    
+    def processar_zip(
+        self,
+        arquivo_zip: XMLSource,
+        llm_provider: str = None,
+        api_key: str = None,
+        max_workers: int | None = None,
+        progress_callback: Callable[[int, int, str, dict], None] | None = None,
+        forcar_reprocessamento: bool = False
+    ) -> list[dict]:
+        """
+        Processa todos os XMLs de um ZIP sem extraí-lo em disco.
+        
+        Cada membro é descompactado direto para memória dentro da thread que o
+        processa (no máximo `max_workers` membros em memória ao mesmo tempo)
+        e segue o mesmo workflow de processar(). Os membros formam um único
+        lote no índice de duplicidade (nota repetida em dois membros é DUP001).
+        
+        Args:
+            arquivo_zip: Caminho do ZIP ou conteúdo em memória (bytes/buffer)
+            llm_provider: Provider LLM
+            api_key: API Key
+            max_workers: Membros processados em paralelo (padrão: ZIP_WORKERS)
+            progress_callback: Chamado a cada membro concluído com
+                (concluidos, total, nome_membro, resultado)
+            forcar_reprocessamento: Ignora resultados armazenados (ver processar)
+        
+        Returns:
+            Lista de resultados, na ordem dos membros no ZIP
+        """
+        with open_zip(arquivo_zip) as zf, self.duplicatas.lote():
+            membros = list_xml_members(zf)
+            total = len(membros)
+            agent_logger.info(f"🗜️  ZIP com {total} XMLs: {source_name(arquivo_zip)}")
+            
+            def processar_membro(info) -> dict:
+                try:
+                    conteudo = read_member(zf, info)
+                    return self.processar(
+                        conteudo, llm_provider, api_key,
+                        nome_arquivo=info.filename,
+                        forcar_reprocessamento=forcar_reprocessamento
+                    )
+                except Exception as e:
+                    agent_logger.error(f"❌ Erro no membro {info.filename}: {e}")
+                    return {
+                        "arquivo_nome": info.filename,
+                        "notas_processadas": [],
+                        "erros": [f"Erro ao processar {info.filename}: {e}"],
+                        "status": "erro",
+                    }
+            
+            resultados = [None] * total
+            with ThreadPoolExecutor(max_workers=max_workers or ZIP_WORKERS) as executor:
+                futures = {executor.submit(processar_membro, info): i for i, info in enumerate(membros)}
+                for concluidos, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    resultados[i] = future.result()
+                    if progress_callback:
+                        progress_callback(concluidos, total, membros[i].filename, resultados[i])
+        
+        agent_logger.info(f"✅ ZIP processado: {total} XMLs")
+        return resultados
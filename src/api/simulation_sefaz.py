@@ -3,8 +3,8 @@
 import random
 import datetime
 import xml.etree.ElementTree as ET
-from pathlib import Path
 
+from src.parsers.xml_document import NFE_NODE_TAGS, XMLDocument, XMLSource, chave_do_id, source_name
 from logs.logger import agent_logger
 
 
@@ -15,19 +15,23 @@ class SefazSimulator:
         """Inicializa simulador."""
         agent_logger.info("🏢 Simulador SEFAZ inicializado")
     
-    def _generate_nfe_key(self, xml_content: str) -> str:
+    def _generate_nfe_key(self, root: ET.Element) -> str:
         """
-        Gera chave NFe fictícia de 44 dígitos.
+        Chave NFe da nota: a do Id do infNFe ou, sem ela, uma fictícia de 44 dígitos.
         Estrutura: cUF(2) + AAMM(4) + CNPJ(14) + mod(2) + serie(3) + nNF(9) + tpEmis(1) + cNF(8) + DV(1)
         
         Args:
-            xml_content: Conteúdo XML da NFe
+            root: Elemento raiz do XML da NFe (já parseado)
         
         Returns:
             Chave de 44 dígitos
         """
         try:
-            root = ET.fromstring(xml_content)
+            inf_nfe = root.find('.//{*}infNFe')
+            chave_xml = chave_do_id(inf_nfe.get('Id') if inf_nfe is not None else None)
+            if chave_xml:
+                return chave_xml
+            
             namespaces = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
             
             # Extrair cUF (código UF)
@@ -114,24 +118,32 @@ class SefazSimulator:
         except:
             return str(random.randint(0, 9))
     
-    def simulate_submission(self, xml_path: str | Path) -> dict:
+    def simulate_submission(
+        self,
+        xml_path: XMLSource,
+        document: XMLDocument | None = None,
+        indice_documento: int = 0
+    ) -> dict:
         """
         Simula submissão ao SEFAZ de homologação.
         
         Args:
-            xml_path: Caminho do arquivo XML validado
+            xml_path: Caminho do arquivo XML validado (ou conteúdo em memória)
+            document: Documento já parseado pelo workflow (evita reler o arquivo)
+            indice_documento: Posição da nota no arquivo (lotes com várias NFe)
         
         Returns:
             dict com resposta da simulação
         """
         try:
-            # Ler XML
-            with open(xml_path, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
+            if document is None:
+                document = XMLDocument.from_source(xml_path)
             
-            agent_logger.info(f"📤 Simulando envio ao SEFAZ: {Path(xml_path).name}")
+            agent_logger.info(f"📤 Simulando envio ao SEFAZ: {document.source_name or source_name(xml_path)}")
             
-            chave_nfe = self._generate_nfe_key(xml_content)
+            nodes = document.nodes(NFE_NODE_TAGS)
+            node = nodes[indice_documento] if indice_documento < len(nodes) else document.root
+            chave_nfe = self._generate_nfe_key(node)
             
             nrec = ''.join(random.choices('0123456789', k=15))
             
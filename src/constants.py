@@ -137,6 +137,8 @@ class TaxType(str, Enum):
     IRPJ = "IRPJ"  # Imposto de Renda Pessoa Jurídica
     CSLL = "CSLL"  # Contribuição Social sobre o Lucro Líquido
     INSS = "INSS"  # Instituto Nacional do Seguro Social
+    IBS = "IBS"    # Imposto sobre Bens e Serviços (reforma tributária: UF + município)
+    CBS = "CBS"    # Contribuição sobre Bens e Serviços (reforma tributária)
 
 
 # Tipos de ICMS
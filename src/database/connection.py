@@ -15,6 +15,53 @@ def get_connection() -> sqlite3.Connection:
     return conn
 
 
+def enable_wal_mode() -> None:
+    """
+    Ativa o journal WAL no banco (persistente no arquivo).
+    
+    Com WAL, leitores não bloqueiam o escritor e vários processos podem
+    gravar em sequência sem erros de "database is locked" (processamento em lote).
+    """
+    conn = get_connection()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    app_logger.info("✅ Banco de dados em modo WAL")
+
+
+# Chave natural da nota: o mesmo número/série pode existir em emitentes e modelos diferentes
+NOTA_KEY_COLS = ('fornecedor_cnpj', 'tipo_nf', 'serie', 'numero_nf')
+
+
+def normalizar_numero_nf(valor) -> str:
+    """Número da nota sem zeros à esquerda ('000123' e '123' são a mesma nota)."""
+    numero = "" if valor is None else str(valor).strip()
+    return (numero.lstrip("0") or "0") if numero.isdigit() else numero
+
+
+def _migrar_chave_notas(cursor) -> None:
+    """
+    Recria notas_fiscais de bancos antigos, com UNIQUE(numero_nf, serie).
+
+    O SQLite não altera restrições: a tabela é copiada para uma nova com a
+    chave (emitente, modelo, série, número) e renomeada. Os ids são mantidos,
+    então itens e impostos continuam associados.
+    """
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notas_fiscais'"
+    ).fetchone()
+    if row is None or "UNIQUE(numero_nf, serie)" not in row[0]:
+        return
+
+    novo_sql = row[0].replace(
+        "UNIQUE(numero_nf, serie)", f"UNIQUE({', '.join(NOTA_KEY_COLS)})"
+    ).replace("CREATE TABLE notas_fiscais", "CREATE TABLE notas_fiscais_nova", 1)
+    cursor.execute(novo_sql)
+    cursor.execute("INSERT INTO notas_fiscais_nova SELECT * FROM notas_fiscais")
+    cursor.execute("DROP TABLE notas_fiscais")
+    cursor.execute("ALTER TABLE notas_fiscais_nova RENAME TO notas_fiscais")
+    app_logger.info("🔧 notas_fiscais migrada para a chave (emitente, modelo, série, número)")
+
+
 def init_db() -> None:
     """Inicializa banco de dados e cria tabelas."""
     conn = get_connection()
@@ -43,9 +90,10 @@ def init_db() -> None:
             protocolo_sefaz TEXT,
             mensagem_erro TEXT,
             data_autorizacao TIMESTAMP,
-            UNIQUE(numero_nf, serie)
+            UNIQUE(fornecedor_cnpj, tipo_nf, serie, numero_nf)
         )
     """)
+    _migrar_chave_notas(cursor)
     
     # Tabela de itens
     cursor.execute("""
@@ -76,6 +124,16 @@ def init_db() -> None:
         )
     """)
     
+    # Índice de conteúdo: resultado por SHA-256 do XML (evita reprocessar duplicados)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS processamentos (
+            sha256 TEXT PRIMARY KEY,
+            arquivo_nome TEXT,
+            resultado TEXT NOT NULL,
+            data_processamento TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
     # Índices para performance
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_nf_numero ON notas_fiscais(numero_nf)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_nf_data ON notas_fiscais(data_emissao)")
@@ -87,8 +145,21 @@ def init_db() -> None:
     app_logger.info(f"✅ Banco de dados inicializado em {DATABASE_PATH}")
 
 
-def insert_nota_fiscal(nf_data: dict, cursor) -> int:
-    """Insere ou atualiza nota fiscal usando cursor existente e retorna ID."""
+def insert_nota_fiscal(
+    nf_data: dict,
+    cursor,
+    ultimo_id_historico: int | None = None,
+    id_gravado: int | None = None
+) -> int | None:
+    """
+    Insere ou atualiza nota fiscal usando cursor existente e retorna ID.
+    
+    Com `ultimo_id_historico`, só atualiza registros do histórico (ID até ele)
+    ou o `id_gravado` pelo próprio processo: nota já gravada por outro processo
+    do lote não é sobrescrita e o retorno é None.
+    
+    O número é gravado sem zeros à esquerda, como no índice de duplicidade.
+    """
     
     # Colunas a serem inseridas/atualizadas
     cols = (
@@ -99,33 +170,40 @@ def insert_nota_fiscal(nf_data: dict, cursor) -> int:
     
     update_fields = [
         f"{col}=EXCLUDED.{col}" 
-        for col in cols if col not in ['numero_nf', 'serie'] # Não atualiza a chave
+        for col in cols if col not in NOTA_KEY_COLS # Não atualiza a chave
     ]
     update_clause = ", ".join(update_fields)
     
     placeholders = ", ".join(["?"] * len(cols))
+    
+    condicao = ""
+    if ultimo_id_historico is not None:
+        condicao = "WHERE notas_fiscais.id <= ? OR notas_fiscais.id = ?"
 
     sql = f"""
         INSERT INTO notas_fiscais ({", ".join(cols)})
         VALUES ({placeholders})
-        ON CONFLICT (numero_nf, serie) DO UPDATE SET
+        ON CONFLICT ({", ".join(NOTA_KEY_COLS)}) DO UPDATE SET
             {update_clause}
+        {condicao}
     """
 
     values = (
-        nf_data['numero_nf'], nf_data['serie'], nf_data['tipo_nf'], nf_data['data_emissao'], 
+        normalizar_numero_nf(nf_data['numero_nf']), nf_data['serie'], nf_data['tipo_nf'], nf_data['data_emissao'], 
         nf_data['classificacao'], nf_data['cfop'], nf_data['natop'], nf_data['sct'],
-        nf_data['valor_total'], nf_data['fornecedor_cnpj'], nf_data['cliente_cnpj'], 
+        nf_data['valor_total'], nf_data['fornecedor_cnpj'] or '', nf_data['cliente_cnpj'], 
         nf_data['cliente_cpf'], nf_data.get('status', 'Pendente'), nf_data.get('justificativa'),
         nf_data.get('chave_nfe'), nf_data.get('protocolo_sefaz'), nf_data.get('data_autorizacao'),
         nf_data.get('mensagem_erro')
     )
 
-    cursor.execute(sql, values)
+    cursor.execute(sql, values + ((ultimo_id_historico, id_gravado) if condicao else ()))
+    if cursor.rowcount == 0:
+        return None
     
     cursor.execute(
-        "SELECT id FROM notas_fiscais WHERE numero_nf = ? AND serie = ?",
-        (nf_data['numero_nf'], nf_data['serie'])
+        "SELECT id FROM notas_fiscais WHERE " + " AND ".join(f"{col} = ?" for col in NOTA_KEY_COLS),
+        tuple(values[cols.index(col)] for col in NOTA_KEY_COLS)
     )
     nf_id = cursor.fetchone()[0]
     
@@ -0,0 +1,327 @@
+"""
+Índice em memória de notas já vistas: duplicidades e lacunas de numeração.
+
+A nota é identificada por (emitente, modelo, série, número) e, quando
+disponível, pela chave de acesso. O histórico do banco é carregado uma vez
+(na primeira nota) e as notas do lote são registradas à medida que são
+validadas, então cada verificação custa uma consulta a dicionário.
+
+O lote é uma chamada de processar/processar_zip (ver DuplicateIndex.lote):
+ao final, as notas gravadas passam ao histórico e as demais são descartadas,
+então uma nota reprovada pode ser reenviada corrigida na mesma sessão.
+
+A numeração de cada série (notas gravadas) fica em uma lista ordenada com as
+lacunas mantidas a cada inserção (bisect): o relatório de lacunas não varre
+a tabela.
+
+O índice é do processo: entre processos (workers do batch.py) a duplicidade
+é detectada na gravação, pela chave única do banco (ver ids_atualizaveis).
+"""
+
+import sqlite3
+import threading
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from logs.logger import app_logger
+from src.database.connection import get_connection, normalizar_numero_nf
+from src.validators.engine.base import SEVERITY_ERROR, SEVERITY_WARN, Violacao
+
+CODIGOS_DUPLICIDADE = ("DUP001", "DUP002")
+
+
+class ChaveNota(NamedTuple):
+    """Identificação da nota na numeração do emitente."""
+    emitente: str
+    modelo: str
+    serie: str
+    numero: str
+
+
+class Registro(NamedTuple):
+    """Ocorrência registrada no índice."""
+    origem: str             # "ID n" (banco) ou "arquivo#indice" (lote)
+    historico: bool         # veio do banco (processamento anterior)
+    chave_acesso: str
+
+
+def _texto(valor) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+def chave_da_nota(nf_data: dict) -> ChaveNota:
+    """(emitente, modelo, série, número) da nota; o modelo é o tipo do documento (NFe, NFCe, RPS)."""
+    return ChaveNota(
+        _texto(nf_data.get("fornecedor_cnpj")),
+        _texto(nf_data.get("tipo_nf")),
+        _texto(nf_data.get("serie")) or "1",
+        normalizar_numero_nf(nf_data.get("numero_nf")),
+    )
+
+
+def _descricao(chave: ChaveNota) -> str:
+    return f"{chave.modelo} {chave.numero} série {chave.serie} do emitente {chave.emitente or '(sem CNPJ)'}"
+
+
+def violacao_gravada_por_outro(nf_data: dict) -> Violacao:
+    """DUP001 da nota já gravada por outro processamento em andamento (outro worker do lote)."""
+    return Violacao(
+        "DUP001", f"Nota duplicada: {_descricao(chave_da_nota(nf_data))} já gravada por outro processamento do lote",
+        "numero_nf", SEVERITY_ERROR,
+    )
+
+
+def violacao_chave_gravada(nf_data: dict) -> Violacao:
+    """DUP002 da chave de acesso já gravada no banco para outra nota."""
+    return Violacao(
+        "DUP002", f"Chave de acesso {_texto(nf_data.get('chave_nfe'))} já gravada para outra nota",
+        "chave_nfe", SEVERITY_ERROR,
+    )
+
+
+def eh_duplicada(nf_data: dict) -> bool:
+    """A nota foi reprovada por duplicidade (não deve sobrescrever a original no banco)."""
+    return any(
+        v.get("codigo") in CODIGOS_DUPLICIDADE and v.get("severity") == SEVERITY_ERROR
+        for v in nf_data.get("violacoes") or []
+    )
+
+
+# =====================================================
+# NUMERAÇÃO POR SÉRIE
+# =====================================================
+
+class SerieNumeracao:
+    """Números de uma série em ordem, com as lacunas atualizadas a cada inserção."""
+
+    __slots__ = ("numeros", "_lacunas", "faltantes")
+
+    def __init__(self):
+        self.numeros: list[int] = []
+        self._lacunas: dict[int, int] = {}     # início -> fim (inclusive)
+        self.faltantes = 0
+
+    def _abrir(self, inicio: int, fim: int) -> None:
+        if inicio <= fim:
+            self._lacunas[inicio] = fim
+            self.faltantes += fim - inicio + 1
+
+    def adicionar(self, numero: int) -> bool:
+        """Insere o número (O(log n) + deslocamento da lista); False se já existia."""
+        numeros = self.numeros
+        pos = bisect_left(numeros, numero)
+        if pos < len(numeros) and numeros[pos] == numero:
+            return False
+
+        anterior = numeros[pos - 1] if pos > 0 else None
+        proximo = numeros[pos] if pos < len(numeros) else None
+
+        if anterior is not None and proximo is not None:
+            # O número cai dentro da lacuna (anterior, proximo): divide em duas
+            del self._lacunas[anterior + 1]
+            self.faltantes -= proximo - anterior - 1
+            self._abrir(anterior + 1, numero - 1)
+            self._abrir(numero + 1, proximo - 1)
+        elif anterior is not None:
+            self._abrir(anterior + 1, numero - 1)
+        elif proximo is not None:
+            self._abrir(numero + 1, proximo - 1)
+
+        numeros.insert(pos, numero)
+        return True
+
+    def lacunas(self) -> list[tuple[int, int]]:
+        """Faixas (início, fim) de números ausentes entre o menor e o maior registrado."""
+        return sorted(self._lacunas.items())
+
+
+# =====================================================
+# ÍNDICE
+# =====================================================
+
+class DuplicateIndex:
+    """
+    Notas indexadas por (emitente, modelo, série, número) e por chave de acesso.
+
+    Nota já registrada por outra origem do mesmo lote é duplicidade (DUP001);
+    chave de acesso já usada por outra nota também (DUP002). Nota que só existe
+    no histórico (do banco ou gravada em um lote anterior) é reprocessamento:
+    vira aviso (DUP003) e a gravação atualiza o registro existente.
+    """
+
+    def __init__(self, carregar_historico: bool = True):
+        """Inicializa índice (o histórico é lido do banco na primeira consulta)."""
+        self._notas: dict[ChaveNota, Registro] = {}
+        self._chaves_acesso: dict[str, ChaveNota] = {}
+        self._series: dict[tuple[str, str, str], SerieNumeracao] = {}
+        self._gravadas: dict[ChaveNota, int] = {}
+        self._ultimo_id_historico: int | None = None
+        self._historico_pendente = carregar_historico
+        # Notas registradas no lote aberto -> registro que substituíram (histórico)
+        self._lote: dict[ChaveNota, Registro | None] = {}
+        self._lotes_abertos = 0
+        self._lock = threading.Lock()
+
+    def _inserir(self, chave: ChaveNota, registro: Registro) -> None:
+        self._notas[chave] = registro
+        if registro.chave_acesso:
+            self._chaves_acesso.setdefault(registro.chave_acesso, chave)
+        if registro.historico and chave.numero.isdigit():
+            serie = self._series.get(chave[:3])
+            if serie is None:
+                serie = self._series[chave[:3]] = SerieNumeracao()
+            serie.adicionar(int(chave.numero))
+
+    def _carregar_historico(self) -> None:
+        """Lê as notas já gravadas (uma vez por índice)."""
+        self._historico_pendente = False
+        try:
+            conn = get_connection()
+            rows = conn.execute(
+                "SELECT id, fornecedor_cnpj, tipo_nf, serie, numero_nf, chave_nfe FROM notas_fiscais"
+            ).fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            app_logger.warning(f"⚠️  Histórico de notas indisponível para o índice de duplicidade: {e}")
+            return
+
+        self._ultimo_id_historico = 0
+        for row in rows:
+            row = dict(row)
+            self._inserir(chave_da_nota(row), Registro(f"ID {row['id']}", True, _texto(row['chave_nfe'])))
+            self._ultimo_id_historico = max(self._ultimo_id_historico, row['id'])
+        app_logger.info(f"📇 Índice de duplicidade: {len(rows)} notas do histórico")
+
+    def registrar(self, nf_data: dict, origem: str) -> list[Violacao]:
+        """
+        Verifica a nota contra o histórico e o lote e a registra no índice.
+
+        Args:
+            nf_data: Dados da nota fiscal
+            origem: Identificação da nota no lote (ex.: "arquivo.xml#0");
+                registrar de novo a mesma origem não é duplicidade
+
+        Returns:
+            Violações de duplicidade (vazio se a nota é inédita)
+        """
+        chave = chave_da_nota(nf_data)
+        chave_acesso = _texto(nf_data.get("chave_nfe"))
+        descricao = _descricao(chave)
+        violacoes = []
+
+        with self._lock:
+            if self._historico_pendente:
+                self._carregar_historico()
+
+            existente = self._notas.get(chave)
+            if existente is not None and existente.origem != origem:
+                if existente.historico:
+                    violacoes.append(Violacao(
+                        "DUP003", f"{descricao} já registrada ({existente.origem}); o registro será atualizado",
+                        "numero_nf", SEVERITY_WARN,
+                    ))
+                else:
+                    violacoes.append(Violacao(
+                        "DUP001", f"Nota duplicada: {descricao} já consta no lote ({existente.origem})",
+                        "numero_nf", SEVERITY_ERROR,
+                    ))
+
+            outra = self._chaves_acesso.get(chave_acesso) if chave_acesso else None
+            if outra is not None and outra != chave:
+                violacoes.append(Violacao(
+                    "DUP002", f"Chave de acesso {chave_acesso} já usada por {outra.modelo} {outra.numero} série {outra.serie}",
+                    "chave_nfe", SEVERITY_ERROR,
+                ))
+
+            # Duplicata do lote não substitui a primeira ocorrência
+            if not any(v.severity == SEVERITY_ERROR for v in violacoes):
+                if chave not in self._lote:
+                    self._lote[chave] = existente if existente is not None and existente.historico else None
+                self._inserir(chave, Registro(origem, False, chave_acesso))
+
+        return violacoes
+
+    @contextmanager
+    def lote(self) -> Iterator[None]:
+        """
+        Delimita um lote (chamadas aninhadas pertencem ao lote mais externo).
+
+        Ao sair, as notas registradas no lote e gravadas no banco passam ao
+        histórico (reenvio vira DUP003); as não gravadas saem do índice,
+        restaurando o registro do histórico que tenham substituído.
+        """
+        with self._lock:
+            self._lotes_abertos += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._lotes_abertos -= 1
+                if not self._lotes_abertos:
+                    self._encerrar_lote()
+
+    def _encerrar_lote(self) -> None:
+        for chave, anterior in self._lote.items():
+            registro = self._notas.pop(chave)
+            if registro.chave_acesso and self._chaves_acesso.get(registro.chave_acesso) == chave:
+                del self._chaves_acesso[registro.chave_acesso]
+
+            nf_id = self._gravadas.get(chave)
+            if nf_id is not None:
+                self._inserir(chave, Registro(f"ID {nf_id}", True, registro.chave_acesso))
+            elif anterior is not None:
+                self._inserir(chave, anterior)
+        self._lote.clear()
+
+    def ids_atualizaveis(self, nf_data: dict) -> tuple[int | None, int | None]:
+        """
+        Registros do banco que a gravação da nota pode atualizar.
+
+        Returns:
+            (último ID do histórico lido, ID já gravado por este índice para a nota);
+            registro mais novo que o histórico e não gravado aqui veio de outro
+            processo do lote: é duplicidade. (None, None) sem histórico carregado.
+        """
+        with self._lock:
+            return self._ultimo_id_historico, self._gravadas.get(chave_da_nota(nf_data))
+
+    def confirmar_gravacao(self, nf_data: dict, nf_id: int) -> None:
+        """Registra o ID gravado para a nota (reprocessamento no mesmo índice atualiza o registro)."""
+        chave = chave_da_nota(nf_data)
+        chave_acesso = _texto(nf_data.get("chave_nfe"))
+        with self._lock:
+            self._gravadas[chave] = nf_id
+            # Chave de acesso obtida depois da validação (SEFAZ) passa a valer no índice
+            registro = self._notas.get(chave)
+            if registro is not None and chave_acesso and not registro.chave_acesso:
+                self._inserir(chave, registro._replace(chave_acesso=chave_acesso))
+
+    def lacunas(self, emitente: str, modelo: str, serie: str) -> list[tuple[int, int]]:
+        """Faixas de números ausentes da série."""
+        with self._lock:
+            if self._historico_pendente:
+                self._carregar_historico()
+            serie_numeracao = self._series.get((_texto(emitente), _texto(modelo), _texto(serie)))
+            return serie_numeracao.lacunas() if serie_numeracao else []
+
+    def relatorio_lacunas(self) -> list[dict]:
+        """Lacunas de todas as séries com números ausentes."""
+        with self._lock:
+            if self._historico_pendente:
+                self._carregar_historico()
+            relatorio = []
+            for (emitente, modelo, serie), numeracao in sorted(self._series.items()):
+                if not numeracao.faltantes:
+                    continue
+                relatorio.append({
+                    "emitente": emitente,
+                    "modelo": modelo,
+                    "serie": serie,
+                    "primeiro": numeracao.numeros[0],
+                    "ultimo": numeracao.numeros[-1],
+                    "faltantes": numeracao.faltantes,
+                    "lacunas": numeracao.lacunas(),
+                })
+            return relatorio
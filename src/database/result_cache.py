@@ -0,0 +1,110 @@
+"""Índice de conteúdo (SHA-256) para não reprocessar XMLs idênticos."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from config.configuration import RESULT_CACHE_ENABLED, RESULT_CACHE_MEMO_SIZE
+from logs.logger import app_logger
+from src.database.connection import get_connection
+from src.parsers.records import to_plain
+from src.parsers.xml_document import XMLSource, open_source
+
+# Campos do resultado do workflow que são persistidos (provider/modelo conferidos na leitura)
+CACHED_FIELDS = ('tipo_documento', 'notas_processadas', 'erros', 'status', 'llm_provider', 'llm_model')
+
+
+def content_hash(source: XMLSource) -> str:
+    """SHA-256 do conteúdo (caminho, bytes ou buffer)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    if hasattr(source, 'getbuffer'):
+        return hashlib.sha256(source.getbuffer()).hexdigest()
+    with open_source(source) as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+class ResultCache:
+    """
+    Resultados de processamento indexados pelo SHA-256 do conteúdo.
+
+    Consulta primeiro um memo em memória (LRU, por processo) e depois a tabela
+    `processamentos` do SQLite, compartilhada entre processos e sessões.
+    Datas são persistidas em formato ISO (texto). O memo guarda o JSON e cada
+    get devolve uma cópia nova: alterações do chamador não afetam os próximos
+    acertos.
+    """
+
+    def __init__(self, memo_size: int = RESULT_CACHE_MEMO_SIZE, enabled: bool = RESULT_CACHE_ENABLED):
+        """Inicializa cache."""
+        self.enabled = enabled
+        self.memo_size = memo_size
+        self._memo: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sha256: str) -> dict | None:
+        """Retorna o resultado armazenado para o hash (ou None)."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            payload = self._memo.get(sha256)
+            if payload is not None:
+                self._memo.move_to_end(sha256)
+        if payload is not None:
+            return json.loads(payload)
+
+        try:
+            conn = get_connection()
+            row = conn.execute(
+                "SELECT resultado FROM processamentos WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            conn.close()
+        except sqlite3.Error as e:
+            app_logger.warning(f"⚠️  Índice de conteúdo indisponível: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        self._remember(sha256, row['resultado'])
+        return json.loads(row['resultado'])
+
+    def put(self, sha256: str, arquivo_nome: str, result: dict) -> None:
+        """Armazena o resultado do workflow (somente os campos de CACHED_FIELDS)."""
+        if not self.enabled:
+            return
+
+        stored = {field: to_plain(result.get(field)) for field in CACHED_FIELDS}
+        payload = json.dumps(stored, ensure_ascii=False, default=str)
+
+        try:
+            conn = get_connection()
+            conn.execute(
+                """
+                INSERT INTO processamentos (sha256, arquivo_nome, resultado)
+                VALUES (?, ?, ?)
+                ON CONFLICT (sha256) DO UPDATE SET
+                    arquivo_nome=EXCLUDED.arquivo_nome,
+                    resultado=EXCLUDED.resultado,
+                    data_processamento=CURRENT_TIMESTAMP
+                """,
+                (sha256, arquivo_nome, payload)
+            )
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            app_logger.warning(f"⚠️  Falha ao gravar no índice de conteúdo: {e}")
+            return
+
+        self._remember(sha256, payload)
+
+    def _remember(self, sha256: str, payload: str) -> None:
+        """Guarda o JSON no memo em memória, descartando o menos usado."""
+        with self._lock:
+            self._memo[sha256] = payload
+            self._memo.move_to_end(sha256)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
@@ -0,0 +1,109 @@
+"""Identificação do tipo de documento fiscal lendo apenas o início do XML."""
+
+import xml.etree.ElementTree as ET
+
+from config.configuration import XML_SNIFF_BYTES
+from src.constants import DocumentType
+from src.parsers.xml_document import XMLSource, local_tag, open_source
+
+# Namespaces oficiais dos leiautes
+NS_NFE = 'http://www.portalfiscal.inf.br/nfe'
+NS_CTE = 'http://www.portalfiscal.inf.br/cte'
+NS_ABRASF = 'http://www.abrasf.org.br/nfse.xsd'
+
+# Tags que identificam cada leiaute
+TAGS_NFSE = frozenset({
+    'CompNfse', 'Nfse', 'InfNfse', 'ListaNfse', 'Rps', 'InfRps',
+    'ConsultarNfseRpsResposta', 'ConsultarLoteRpsResposta', 'ConsultarNfseResposta',
+    'EnviarLoteRpsEnvio', 'GerarNfseEnvio', 'GerarNfseResposta',
+})
+TAGS_CTE = frozenset({'cteProc', 'CTe', 'infCte', 'enviCTe', 'CTeOS', 'cteOSProc'})
+TAGS_NFE = frozenset({'nfeProc', 'NFe', 'infNFe', 'enviNFe'})
+
+# Modelo 65 = NFC-e (mesmo leiaute da NF-e modelo 55)
+MODELO_NFCE = '65'
+
+_CHUNK_SIZE = 4096
+
+
+def _classify(tags: set[str], namespace: str, mod: str | None, complete: bool) -> DocumentType | None:
+    """
+    Decide o tipo a partir das tags vistas até agora.
+
+    Args:
+        tags: Tags (sem namespace) já encontradas
+        namespace: Namespace do elemento raiz
+        mod: Conteúdo de ide/mod, se já lido
+        complete: Se o documento inteiro já foi visto (não há mais o que esperar)
+
+    Returns:
+        DocumentType ou None enquanto for ambíguo
+    """
+    if tags & TAGS_NFSE or namespace == NS_ABRASF:
+        return DocumentType.RPS
+    if tags & TAGS_CTE or namespace == NS_CTE:
+        return DocumentType.CT_E
+    if tags & TAGS_NFE or namespace == NS_NFE:
+        if mod is not None:
+            return DocumentType.NFC_E if mod == MODELO_NFCE else DocumentType.NFE
+        if complete:
+            return DocumentType.NFE
+    return None
+
+
+def sniff_document_type(source: XMLSource, max_bytes: int = XML_SNIFF_BYTES) -> DocumentType | None:
+    """
+    Identifica NF-e, NFC-e, CT-e ou NFS-e/RPS lendo só os primeiros KB do XML.
+
+    O conteúdo é entregue aos poucos a um XMLPullParser, que para assim que a
+    raiz, o namespace e os primeiros elementos (incluindo ide/mod, que separa
+    NF-e de NFC-e) bastam para decidir. Nenhuma árvore completa é montada.
+
+    Args:
+        source: Caminho do arquivo XML ou conteúdo em memória
+        max_bytes: Limite de leitura
+
+    Returns:
+        DocumentType, ou None quando o início do arquivo não é suficiente
+        (o chamador deve recorrer ao parsing completo)
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    tags: set[str] = set()
+    namespace = ''
+    mod = None
+    lidos = 0
+
+    try:
+        with open_source(source) as f:
+            while lidos < max_bytes:
+                chunk = f.read(min(_CHUNK_SIZE, max_bytes - lidos))
+                if not chunk:
+                    parser.close()
+                    return _classify(tags, namespace, mod, complete=True)
+                lidos += len(chunk)
+                parser.feed(chunk)
+
+                for event, elem in parser.read_events():
+                    tag = local_tag(elem.tag)
+                    if event == 'start':
+                        if not tags and elem.tag.startswith('{'):
+                            namespace = elem.tag[1:].partition('}')[0]
+                        tags.add(tag)
+                    elif tag == 'mod' and mod is None:
+                        mod = (elem.text or '').strip()
+
+                tipo = _classify(tags, namespace, mod, complete=False)
+                if tipo is not None:
+                    return tipo
+    except ET.ParseError:
+        return None
+
+    return None
+
+
+def detect_document_type(root: ET.Element) -> DocumentType | None:
+    """Identifica o tipo a partir de um documento já parseado (fallback do sniffer)."""
+    tags = {local_tag(elem.tag) for elem in root.iter()}
+    namespace = root.tag[1:].partition('}')[0] if root.tag.startswith('{') else ''
+    mod = root.findtext('.//{*}ide/{*}mod')
+    return _classify(tags, namespace, mod.strip() if mod else None, complete=True)
@@ -0,0 +1,159 @@
+"""Registros compactos (__slots__) para notas e itens extraídos pelos parsers.
+
+Notas com milhares de itens custavam vários MB só em overhead de dicts
+(um dict de ~25 chaves por item). Os registros guardam os campos conhecidos
+em slots e se comportam como um dict mutável (get, [], in, items, update...),
+então validadores, calculadora e banco seguem funcionando sem alteração.
+Campos fora da lista conhecida vão para um dict auxiliar, criado só quando
+necessário. A conversão para dict puro (to_dict/to_plain) fica nas bordas:
+JSON, DataFrames e cache. Campos de TRANSIENT (ex.: o cálculo vetorial da
+nota) são acessados por chave, mas não são iterados nem serializados.
+"""
+
+from collections.abc import Iterator, MutableMapping
+from typing import Any
+
+
+class Record(MutableMapping):
+    """Base dos registros: slots para os campos conhecidos + dict auxiliar opcional."""
+
+    __slots__ = ('_extra',)
+    FIELDS: tuple[str, ...] = ()
+    TRANSIENT: tuple[str, ...] = ()
+    _FIELD_SET: frozenset[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS + cls.TRANSIENT)
+
+    def __init__(self, data: dict | None = None, **fields):
+        """Cria o registro a partir de um dict e/ou argumentos nomeados."""
+        self._extra = None
+        field_set = self._FIELD_SET
+        for source in (data, fields):
+            if not source:
+                continue
+            for key, value in source.items():
+                if key in field_set:
+                    setattr(self, key, value)
+                else:
+                    self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """dict.get sem passar por exceções no caminho comum (campos em slots)."""
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        """Converte para dict puro (recursivamente para listas de registros)."""
+        return {key: to_plain(value) for key, value in self.items()}
+
+
+class Item(Record):
+    """Item de nota (produto da NFe ou serviço do RPS)."""
+
+    FIELDS = (
+        'nItem', 'codigo_item', 'descricao', 'quantidade', 'valor_unitario', 'valor_total',
+        'tipo', 'ncm', 'cfop', 'cest', 'item_lista_servico',
+        'vFrete', 'vSeg', 'vOutro', 'vDesc',
+        # ICMS
+        'cst_csosn', 'aliq_icms', 'vBC_icms', 'vICMS', 'origem', 'aliq_fcp', 'vFCP',
+        # ICMS-ST
+        'mod_bc_st', 'aliq_mva_st', 'aliq_red_bc_st', 'vBC_st', 'aliq_icms_st', 'vICMS_st',
+        'aliq_fcp_st', 'vFCP_st',
+        # DIFAL (partilha com a UF de destino)
+        'vBC_uf_dest', 'aliq_fcp_uf_dest', 'aliq_icms_uf_dest', 'aliq_icms_inter',
+        'vFCP_uf_dest', 'vICMS_uf_dest', 'vICMS_uf_remet',
+        # IPI, PIS e COFINS
+        'cst_ipi', 'vBC_ipi', 'vIPI', 'aliq_ipi',
+        'cst_pis', 'vBC_pis', 'aliq_pis', 'vPIS',
+        'cst_cofins', 'vBC_cofins', 'aliq_cofins', 'vCOFINS',
+        # IBS/CBS (reforma tributária)
+        'cst_ibs_cbs', 'c_class_trib', 'vBC_ibs_cbs', 'aliq_ibs_uf', 'aliq_ibs_mun', 'aliq_cbs',
+        'aliq_red_ibs', 'aliq_red_cbs', 'vIBS_uf', 'vIBS_mun', 'vIBS', 'vCBS',
+        # Serviço (RPS): ISS e retenções
+        'vBC_iss', 'aliq_iss', 'vISS', 'vINSS', 'vIR', 'vCSLL',
+    )
+    __slots__ = FIELDS
+
+
+class Nota(Record):
+    """Nota fiscal extraída (NFe, NFC-e ou RPS) com seus itens e impostos."""
+
+    FIELDS = (
+        'numero_nf', 'serie', 'tipo_nf', 'data_emissao', 'classificacao', 'cfop', 'natop',
+        'sct', 'crt', 'valor_total', 'fornecedor_cnpj', 'cliente_cnpj', 'cliente_cpf',
+        'itens', 'impostos', 'totais', 'status', 'indice_documento',
+        # UFs e indicadores da operação
+        'uf_emitente', 'uf_destinatario', 'id_dest', 'ind_final', 'ind_ie_dest',
+        # RPS
+        'codigo_verificacao', 'item_lista_servico', 'codigo_municipio',
+        'municipio_prestador', 'municipio_tomador', 'municipio_incidencia', 'iss_retido',
+        # Resultado do workflow
+        'llm_validation', 'llm_enrichment', 'violacoes', 'mensagem_erro', 'justificativa',
+        'total_impostos_calculados', 'chave_nfe', 'protocolo_sefaz', 'data_autorizacao',
+    )
+    # ResultadoImpostos do nó calcular_imposto, reaproveitado pelas regras
+    TRANSIENT = ('resultado_impostos',)
+    __slots__ = FIELDS + TRANSIENT
+
+
+def to_plain(value: Any) -> Any:
+    """Converte registros (inclusive dentro de listas/dicts) para tipos puros."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    return value
@@ -1,146 +1,230 @@
 """Parser para RPS (Recibo Provisório de Serviços)."""
 
 import xml.etree.ElementTree as ET
+from collections.abc import Callable, Iterable, Iterator
 from datetime import datetime
 from pathlib import Path
 
 from src.constants import DocumentType, ClassificationType
+from src.parsers.records import Item, Nota
+from src.parsers.xml_document import NFSE_NODE_TAGS, XMLDocument, XMLSource, local_tag, source_name
 from logs.logger import parser_logger
 
 
+# =====================================================
+# MAPA DECLARATIVO DE CAMPOS DA NFS-e
+# =====================================================
+
+# Caminho relativo ao InfNfse -> nome do campo -> conversor
+RPS_FIELD_MAP = (
+    ('Numero', 'numero', str),
+    ('CodigoVerificacao', 'codigo_verificacao', str),
+    ('DataEmissao', 'data_emissao', str),
+    ('NaturezaOperacao', 'natureza_operacao', str),
+    ('IdentificacaoRps/Serie', 'serie', str),
+    ('Servico/Valores/ValorServicos', 'valor_servicos', float),
+    ('Servico/Valores/ValorIss', 'valor_iss', float),
+    ('Servico/Valores/Aliquota', 'aliquota', float),
+    ('Servico/Valores/BaseCalculo', 'base_calculo', float),
+    ('Servico/Valores/ValorPis', 'valor_pis', float),
+    ('Servico/Valores/ValorCofins', 'valor_cofins', float),
+    ('Servico/Valores/ValorInss', 'valor_inss', float),
+    ('Servico/Valores/ValorIr', 'valor_ir', float),
+    ('Servico/Valores/ValorCsll', 'valor_csll', float),
+    ('Servico/Valores/IssRetido', 'iss_retido', str),
+    ('Servico/ItemListaServico', 'item_lista_servico', str),
+    ('Servico/Discriminacao', 'discriminacao', str),
+    ('Servico/CodigoMunicipio', 'codigo_municipio', str),
+    ('Servico/MunicipioIncidencia', 'municipio_incidencia', str),
+    ('PrestadorServico/IdentificacaoPrestador/Cnpj', 'cnpj_prestador', str),
+    ('PrestadorServico/Endereco/CodigoMunicipio', 'municipio_prestador', str),
+    ('TomadorServico/IdentificacaoTomador/CpfCnpj/Cnpj', 'cnpj_tomador', str),
+    ('TomadorServico/IdentificacaoTomador/CpfCnpj/Cpf', 'cpf_tomador', str),
+    ('TomadorServico/Endereco/CodigoMunicipio', 'municipio_tomador', str),
+)
+
+NATUREZA_OPERACAO_RPS = {
+    '1': 'Tributação no município',
+    '2': 'Tributação fora do município',
+    '3': 'Isenção',
+    '4': 'Imune',
+    '5': 'Exigibilidade suspensa',
+    '6': 'Exportação de serviço'
+}
+
+
+def compile_field_map(field_map: tuple) -> Callable[[ET.Element], dict]:
+    """
+    Pré-compila o mapa de campos e retorna a função de extração.
+    
+    Os campos ficam em tuplas (tag, nome, conversor) agrupadas pelo elemento
+    pai (ex.: Servico/Valores): cada pai é localizado uma única vez por nota
+    e cada campo é um findtext de uma tag só, que não passa pelo ElementPath.
+    As tags são qualificadas com o namespace do próprio InfNfse (os arquivos
+    ABRASF costumam vir com namespace), uma vez por namespace. Campos
+    ausentes ficam com o valor padrão do conversor (str() -> '', float() -> 0.0).
+    
+    Args:
+        field_map: Tuplas (caminho, nome, conversor)
+    
+    Returns:
+        Função que recebe o elemento base e retorna o dict de campos
+    """
+    grupos: dict[tuple[str, ...], list[tuple[str, str, Callable]]] = {}
+    for path, name, converter in field_map:
+        *parents, leaf = path.split('/')
+        grupos.setdefault(tuple(parents), []).append((leaf, name, converter))
+    defaults = {name: converter() for _, name, converter in field_map}
+    por_namespace: dict[str, tuple] = {}
+    
+    def qualificar(ns: str) -> tuple:
+        return tuple(
+            (tuple(ns + tag for tag in parents), tuple((ns + leaf, name, converter) for leaf, name, converter in campos))
+            for parents, campos in grupos.items()
+        )
+    
+    def extract(inf_nfse: ET.Element) -> dict:
+        ns = inf_nfse.tag[:inf_nfse.tag.find('}') + 1]
+        compilado = por_namespace.get(ns)
+        if compilado is None:
+            compilado = por_namespace[ns] = qualificar(ns)
+        
+        valores = dict(defaults)
+        for parents, campos in compilado:
+            elem = inf_nfse
+            for tag in parents:
+                elem = elem.find(tag)
+                if elem is None:
+                    break
+            else:
+                for tag, name, converter in campos:
+                    texto = elem.findtext(tag)
+                    if texto:
+                        valores[name] = converter(texto)
+        return valores
+    
+    return extract
+
+
+def _locate_inf_nfse(node: ET.Element) -> ET.Element | None:
+    """Localiza o InfNfse a partir de um CompNfse, Nfse ou do próprio InfNfse (pelo nome local)."""
+    tag = local_tag(node.tag)
+    if tag == 'InfNfse':
+        return node
+    nfse = node if tag == 'Nfse' else node.find('{*}Nfse')
+    inf_nfse = nfse.find('{*}InfNfse') if nfse is not None else None
+    return inf_nfse if inf_nfse is not None else node.find('.//{*}InfNfse')
+
+
+# Pré-compilado uma única vez na importação do módulo
+_extract_campos_rps = compile_field_map(RPS_FIELD_MAP)
+
+
 class RPSParser:
     """Parser para RPS/NFSe (Nota de Serviço)."""
     
-    def __init__(self, file_path: str | Path):
-        """Inicializa parser."""
-        self.file_path = Path(file_path)
+    def __init__(self, file_path: XMLSource, document: XMLDocument | None = None, name: str = ''):
+        """Inicializa parser (caminho, bytes ou buffer; reaproveita o documento já parseado)."""
+        self.source = file_path
+        self.file_path = Path(source_name(file_path, name))
+        self.document = document
         self.data = None
         
     def parse(self) -> dict:
-        """Faz parsing do arquivo XML RPS."""
+        """Faz parsing do arquivo XML RPS e retorna a primeira nota (ver iter_notas)."""
         try:
-            tree = ET.parse(self.file_path)
-            root = tree.getroot()
-            
-            parser_logger.info(f"✅ Arquivo RPS lido: {self.file_path.name}")
-            return self._extract_data(root)
+            for nf_data in self.iter_notas():
+                return nf_data
+            raise ValueError("Estrutura RPS não reconhecida")
             
         except Exception as e:
             parser_logger.error(f"❌ Erro ao ler RPS: {e}")
             raise
     
-    def _extract_data(self, root: ET.Element) -> dict:
-        """Extrai dados do RPS."""
-        try:
-            # Navegar na estrutura RPS
-            nfse = root.find('.//Nfse')
-            if nfse is None:
-                nfse = root.find('.//CompNfse/Nfse')
-            
-            if nfse is None:
-                raise ValueError("Estrutura RPS não reconhecida")
-            
-            inf_nfse = nfse.find('InfNfse')
-            
-            # Identificação
-            numero = inf_nfse.find('Numero').text if inf_nfse.find('Numero') is not None else ''
-            codigo_verificacao = inf_nfse.find('CodigoVerificacao').text if inf_nfse.find('CodigoVerificacao') is not None else ''
-            data_emissao = inf_nfse.find('DataEmissao').text if inf_nfse.find('DataEmissao') is not None else ''
-            
-            # RPS
-            ident_rps = inf_nfse.find('IdentificacaoRps')
-            serie = '1'
-            if ident_rps is not None:
-                serie_elem = ident_rps.find('Serie')
-                if serie_elem is not None:
-                    serie = serie_elem.text
-            
-            # Serviço
-            servico = inf_nfse.find('Servico')
-            valores = servico.find('Valores') if servico is not None else None
-            
-            # Valores
-            valor_servicos = float(valores.find('ValorServicos').text) if valores is not None and valores.find('ValorServicos') is not None else 0.0
-            valor_iss = float(valores.find('ValorIss').text) if valores is not None and valores.find('ValorIss') is not None else 0.0
-            aliquota = float(valores.find('Aliquota').text) if valores is not None and valores.find('Aliquota') is not None else 0.0
-            base_calculo = float(valores.find('BaseCalculo').text) if valores is not None and valores.find('BaseCalculo') is not None else 0.0
-            
-            valor_pis = float(valores.find('ValorPis').text) if valores is not None and valores.find('ValorPis') is not None else 0.0
-            valor_cofins = float(valores.find('ValorCofins').text) if valores is not None and valores.find('ValorCofins') is not None else 0.0
-            valor_inss = float(valores.find('ValorInss').text) if valores is not None and valores.find('ValorInss') is not None else 0.0
-            valor_ir = float(valores.find('ValorIr').text) if valores is not None and valores.find('ValorIr') is not None else 0.0
-            valor_csll = float(valores.find('ValorCsll').text) if valores is not None and valores.find('ValorCsll') is not None else 0.0
-            
-            # Item de serviço
-            item_lista_servico = servico.find('ItemListaServico').text if servico is not None and servico.find('ItemListaServico') is not None else ''
-            discriminacao = servico.find('Discriminacao').text if servico is not None and servico.find('Discriminacao') is not None else ''
-            codigo_municipio = servico.find('CodigoMunicipio').text if servico is not None and servico.find('CodigoMunicipio') is not None else ''
-            
-            # Prestador
-            prestador = inf_nfse.find('PrestadorServico')
-            ident_prestador = prestador.find('IdentificacaoPrestador') if prestador is not None else None
-            cnpj_prestador = ident_prestador.find('Cnpj').text if ident_prestador is not None and ident_prestador.find('Cnpj') is not None else ''
-            
-            # Tomador
-            tomador = inf_nfse.find('TomadorServico')
-            ident_tomador = tomador.find('IdentificacaoTomador') if tomador is not None else None
-            cpf_cnpj_tomador = ''
-            if ident_tomador is not None:
-                cpf_cnpj = ident_tomador.find('CpfCnpj')
-                if cpf_cnpj is not None:
-                    cnpj_elem = cpf_cnpj.find('Cnpj')
-                    cpf_elem = cpf_cnpj.find('Cpf')
-                    cpf_cnpj_tomador = cnpj_elem.text if cnpj_elem is not None else (cpf_elem.text if cpf_elem is not None else '')
-            
-            # Natureza da operação
-            natureza_op = inf_nfse.find('NaturezaOperacao')
-            natop = ''
-            if natureza_op is not None:
-                nat_code = natureza_op.text
-                natop_map = {
-                    '1': 'Tributação no município',
-                    '2': 'Tributação fora do município',
-                    '3': 'Isenção',
-                    '4': 'Imune',
-                    '5': 'Exigibilidade suspensa',
-                    '6': 'Exportação de serviço'
-                }
-                natop = natop_map.get(nat_code, f'Natureza {nat_code}')
-            
-            cfop = '5933' if natureza_op.text == '1' else '6933'
-
-            nf_data = {
-                'numero_nf': numero,
-                'serie': serie,
-                'tipo_nf': DocumentType.RPS.value,
-                'data_emissao': self._parse_datetime(data_emissao),
-                'classificacao': ClassificationType.SERVICO.value,
-                'cfop': cfop,
-                'natop': natop,
-                'sct': 'N',
-                'valor_total': valor_servicos,
-                'fornecedor_cnpj': cnpj_prestador,
-                'cliente_cnpj': cpf_cnpj_tomador,
-                'codigo_verificacao': codigo_verificacao,
-                'item_lista_servico': item_lista_servico,
-                'codigo_municipio': codigo_municipio,
-                'itens': self._extract_itens(discriminacao, valor_servicos, item_lista_servico),
-                'impostos': self._extract_impostos(
-                    valor_iss, aliquota, base_calculo,
-                    valor_pis, valor_cofins, valor_inss, valor_ir, valor_csll
-                ),
-            }
-            
+    def iter_notas(self) -> Iterator[dict]:
+        """
+        Emite cada NFS-e do arquivo (ConsultarNfseRpsResposta, ConsultarLoteRpsResposta,
+        ConsultarNfseResposta ou Nfse avulsa).
+        
+        Yields:
+            dict com os dados de cada nota (com 'indice_documento')
+        """
+        if self.document is None:
+            self.document = XMLDocument.from_source(self.source, self.file_path.name)
+            parser_logger.info(f"✅ Arquivo RPS lido: {self.file_path.name}")
+        
+        nodes = self.document.nodes(NFSE_NODE_TAGS)
+        for indice, nf_data in enumerate(self._iter_extract(nodes)):
+            nf_data['indice_documento'] = indice
             parser_logger.info(f"✅ Dados extraídos do RPS {nf_data['numero_nf']}")
-            return nf_data
-            
-        except Exception as e:
-            parser_logger.error(f"❌ Erro ao extrair dados do RPS: {e}")
-            raise
+            yield nf_data
+    
+    def extract_batch(self, nodes: Iterable[ET.Element]) -> list[dict]:
+        """
+        Extrai várias notas de uma vez (ex.: todos os CompNfse de um dump municipal).
+        
+        Args:
+            nodes: Elementos CompNfse, Nfse ou InfNfse
+        
+        Returns:
+            Lista com os dados de cada nota
+        """
+        notas = list(self._iter_extract(nodes))
+        parser_logger.info(f"✅ {len(notas)} notas de serviço extraídas em lote")
+        return notas
+    
+    def _iter_extract(self, nodes: Iterable[ET.Element]) -> Iterator[dict]:
+        """Extrai cada nó com o mapa compilado (ValueError se algum não tem InfNfse)."""
+        for node in nodes:
+            inf_nfse = _locate_inf_nfse(node)
+            if inf_nfse is None:
+                raise ValueError(f"{local_tag(node.tag)} sem InfNfse em {self.file_path.name}")
+            yield self._extract_nota(inf_nfse)
+    
+    def _extract_nota(self, inf_nfse: ET.Element) -> dict:
+        """Extrai uma nota a partir do InfNfse usando o mapa de campos compilado."""
+        campos = _extract_campos_rps(inf_nfse)
+        
+        # Natureza da operação
+        nat_code = campos['natureza_operacao']
+        natop = NATUREZA_OPERACAO_RPS.get(nat_code, f'Natureza {nat_code}') if nat_code else ''
+        cfop = '5933' if nat_code == '1' else '6933'
+        
+        valor_servicos = campos['valor_servicos']
+        item_lista_servico = campos['item_lista_servico']
+        
+        return Nota({
+            'numero_nf': campos['numero'],
+            'serie': campos['serie'] or '1',
+            'tipo_nf': DocumentType.RPS.value,
+            'data_emissao': self._parse_datetime(campos['data_emissao']),
+            'classificacao': ClassificationType.SERVICO.value,
+            'cfop': cfop,
+            'natop': natop,
+            'sct': 'N',
+            'valor_total': valor_servicos,
+            'fornecedor_cnpj': campos['cnpj_prestador'],
+            'cliente_cnpj': campos['cnpj_tomador'],
+            'cliente_cpf': campos['cpf_tomador'],
+            'codigo_verificacao': campos['codigo_verificacao'],
+            'item_lista_servico': item_lista_servico,
+            'codigo_municipio': campos['codigo_municipio'],
+            # Local de incidência do ISS (tabela por município e item da LC 116)
+            'municipio_prestador': campos['municipio_prestador'],
+            'municipio_tomador': campos['municipio_tomador'],
+            'municipio_incidencia': campos['municipio_incidencia'],
+            'iss_retido': campos['iss_retido'],
+            'itens': self._extract_itens(campos['discriminacao'], valor_servicos, item_lista_servico, campos),
+            'impostos': self._extract_impostos(
+                campos['valor_iss'], campos['aliquota'], campos['base_calculo'],
+                campos['valor_pis'], campos['valor_cofins'], campos['valor_inss'],
+                campos['valor_ir'], campos['valor_csll']
+            ),
+        })
     
-    def _extract_itens(self, discriminacao: str, valor_total: float, item_lista: str) -> list[dict]:
-        """Extrai itens do serviço."""
-        item_data = {
+    def _extract_itens(self, discriminacao: str, valor_total: float, item_lista: str, campos: dict) -> list[dict]:
+        """Extrai itens do serviço (com o ISS e as retenções declarados, para a calculadora)."""
+        item_data = Item({
             'codigo_item': item_lista or '001',
             'descricao': discriminacao[:500] if discriminacao else 'Serviço prestado',
             'quantidade': 1.0,
@@ -149,7 +233,15 @@ class RPSParser:
             'tipo': ClassificationType.SERVICO.value,
             'ncm': None,  # Serviço não tem NCM
             'item_lista_servico': item_lista,
-        }
+            'vBC_iss': campos['base_calculo'],
+            'aliq_iss': campos['aliquota'] * 100,  # Converter para percentual
+            'vISS': campos['valor_iss'],
+            'vPIS': campos['valor_pis'],
+            'vCOFINS': campos['valor_cofins'],
+            'vINSS': campos['valor_inss'],
+            'vIR': campos['valor_ir'],
+            'vCSLL': campos['valor_csll'],
+        })
         
         return [item_data]
     
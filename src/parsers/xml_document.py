@@ -0,0 +1,224 @@
+"""Documento XML parseado uma única vez e compartilhado pelo workflow."""
+
+import io
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+from config.configuration import XML_STREAMING_THRESHOLD_MB
+from logs.logger import parser_logger
+
+# Nós que delimitam uma nota dentro de um arquivo (lotes podem ter vários)
+NFE_NODE_TAGS = ('nfeProc', 'NFe')
+NFSE_NODE_TAGS = ('CompNfse', 'Nfse')
+
+# Origem de um XML: caminho em disco ou conteúdo em memória (uploads)
+XMLSource = str | Path | bytes | bytearray | memoryview | BinaryIO
+
+
+# =====================================================
+# ORIGEM DO XML (ARQUIVO OU MEMÓRIA)
+# =====================================================
+
+@contextmanager
+def open_source(source: XMLSource) -> Iterator[BinaryIO]:
+    """
+    Abre a origem do XML para leitura binária.
+
+    Caminhos são abertos (e fechados ao final); bytes são lidos via BytesIO;
+    buffers (ex.: UploadedFile do Streamlit) são rebobinados e não são fechados,
+    podendo ser lidos de novo pelas etapas seguintes do workflow.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        yield source
+
+
+def source_name(source: XMLSource, name: str = '') -> str:
+    """Nome para logs/UI: o informado, o do arquivo ou o atributo name do buffer."""
+    if name:
+        return name
+    if isinstance(source, (str, Path)):
+        return Path(source).name
+    return Path(getattr(source, 'name', '') or 'memoria.xml').name
+
+
+def source_size(source: XMLSource) -> int:
+    """Tamanho em bytes da origem (0 se não for possível determinar)."""
+    try:
+        if isinstance(source, (str, Path)):
+            return Path(source).stat().st_size
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return len(source)
+        if hasattr(source, 'getbuffer'):
+            return source.getbuffer().nbytes
+        return source.seek(0, io.SEEK_END)
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def is_large_xml(source: XMLSource) -> bool:
+    """Indica se o arquivo passa do limite para parsing em modo streaming."""
+    return source_size(source) > XML_STREAMING_THRESHOLD_MB * 1024 * 1024
+
+
+def local_tag(tag: str) -> str:
+    """Remove o namespace de uma tag ElementTree ('{ns}NFe' -> 'NFe')."""
+    return tag.rpartition('}')[2]
+
+
+def chave_do_id(id_nfe: str | None) -> str:
+    """Chave de acesso do atributo Id do infNFe ('NFe3524...' -> 44 dígitos; '' se inválido)."""
+    chave = str(id_nfe or '').strip().removeprefix('NFe')
+    return chave if len(chave) == 44 and chave.isdigit() else ''
+
+
+def iter_outermost(root: ET.Element, tags: tuple[str, ...]):
+    """
+    Percorre a árvore emitindo os elementos mais externos com a tag informada.
+
+    Ao encontrar um elemento com tag em `tags` ele é emitido e seus filhos não
+    são visitados (ex.: o NFe dentro de um nfeProc não é emitido de novo).
+
+    Args:
+        root: Elemento a partir do qual buscar (inclusive)
+        tags: Tags sem namespace (ex.: NFE_NODE_TAGS)
+
+    Yields:
+        Elementos na ordem do documento
+    """
+    pending = [root]
+    while pending:
+        elem = pending.pop()
+        if local_tag(elem.tag) in tags:
+            yield elem
+        else:
+            pending.extend(reversed(elem))
+
+
+def esqueleto_nota(node: ET.Element) -> ET.Element:
+    """
+    Cópia reduzida de um nó nfeProc/NFe com o necessário para a chave SEFAZ.
+
+    Mantém a tag do nó e um infNFe (com o atributo Id) contendo apenas ide e
+    emit; o restante (itens, totais, protocolo, assinatura) fica de fora.
+    """
+    esqueleto = ET.Element(node.tag, node.attrib)
+    inf_nfe = node.find('.//{*}infNFe')
+    if inf_nfe is not None:
+        copia = ET.SubElement(esqueleto, inf_nfe.tag, inf_nfe.attrib)
+        copia.extend(e for e in inf_nfe if local_tag(e.tag) in ('ide', 'emit'))
+    return esqueleto
+
+
+def substituir_filho(parent: ET.Element, antigo: ET.Element, novo: ET.Element) -> None:
+    """
+    Troca um filho de `parent` por outro na mesma posição.
+
+    A busca começa pelo fim: no iterparse o elemento recém-fechado está entre
+    os últimos filhos (o parser pode já ter lido alguns irmãos seguintes).
+    """
+    for i in range(len(parent) - 1, -1, -1):
+        if parent[i] is antigo:
+            parent[i] = novo
+            return
+
+
+def element_to_dict(elem: ET.Element):
+    """
+    Converte um elemento ElementTree na mesma estrutura gerada pelo xmltodict.
+
+    Atributos viram chaves '@attr', texto de elementos com atributos vira
+    '#text', filhos repetidos viram listas e namespaces são descartados.
+
+    Args:
+        elem: Elemento a converter
+
+    Returns:
+        dict, str ou None (elemento vazio)
+    """
+    children = list(elem)
+    text = elem.text.strip() if elem.text and elem.text.strip() else None
+
+    if not children and not elem.attrib:
+        return text
+
+    node = {f"@{local_tag(k)}": v for k, v in elem.attrib.items()}
+
+    for child in children:
+        key = local_tag(child.tag)
+        value = element_to_dict(child)
+        if key in node:
+            if not isinstance(node[key], list):
+                node[key] = [node[key]]
+            node[key].append(value)
+        else:
+            node[key] = value
+
+    if text is not None:
+        node['#text'] = text
+
+    return node
+
+
+class XMLDocument:
+    """XML parseado uma vez; detecção, extração e geração de chave leem daqui."""
+
+    def __init__(self, root: ET.Element, source_name: str = ''):
+        """Inicializa documento a partir do elemento raiz já parseado."""
+        self.root = root
+        self.source_name = source_name
+        self._dict = None
+        self._nodes = {}
+
+    @classmethod
+    def from_path(cls, file_path: str | Path) -> "XMLDocument":
+        """Faz o parsing do arquivo XML."""
+        file_path = Path(file_path)
+        root = ET.parse(file_path).getroot()
+        parser_logger.info(f"✅ Arquivo XML parseado: {file_path.name}")
+        return cls(root, file_path.name)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | bytearray | memoryview, name: str = '') -> "XMLDocument":
+        """Faz o parsing de um XML em memória (ex.: upload), sem gravar em disco."""
+        root = ET.parse(io.BytesIO(data)).getroot()
+        parser_logger.info(f"✅ XML em memória parseado: {name or 'sem nome'}")
+        return cls(root, name)
+
+    @classmethod
+    def from_source(cls, source: XMLSource, name: str = '') -> "XMLDocument":
+        """Faz o parsing de um caminho, bytes ou buffer."""
+        if isinstance(source, (str, Path)):
+            return cls.from_path(source)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return cls.from_bytes(source, source_name(source, name))
+        with open_source(source) as f:
+            root = ET.parse(f).getroot()
+        name = source_name(source, name)
+        parser_logger.info(f"✅ XML em memória parseado: {name}")
+        return cls(root, name)
+
+    @property
+    def root_tag(self) -> str:
+        """Tag da raiz sem namespace."""
+        return local_tag(self.root.tag)
+
+    def as_dict(self) -> dict:
+        """Retorna o documento no formato do xmltodict (calculado uma única vez)."""
+        if self._dict is None:
+            self._dict = {self.root_tag: element_to_dict(self.root)}
+        return self._dict
+
+    def nodes(self, tags: tuple[str, ...]) -> list[ET.Element]:
+        """Notas contidas no documento (ver iter_outermost), calculadas uma única vez."""
+        if tags not in self._nodes:
+            self._nodes[tags] = list(iter_outermost(self.root, tags))
+        return self._nodes[tags]
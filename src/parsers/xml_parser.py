@@ -1,41 +1,172 @@
 """Parser para arquivos XML de NFe."""
 
 import xml.etree.ElementTree as ET
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
 
-import xmltodict
-
 from src.constants import DocumentType, ClassificationType
+from src.parsers.records import Item, Nota
+from src.parsers.xml_document import (
+    NFE_NODE_TAGS, XMLDocument, XMLSource, chave_do_id, element_to_dict, esqueleto_nota, is_large_xml,
+    local_tag, open_source, source_name, substituir_filho
+)
 from logs.logger import parser_logger
 
 
 class XMLParser:
     """Parser para NFe XML."""
     
-    def __init__(self, file_path: str | Path):
-        """Inicializa parser."""
-        self.file_path = Path(file_path)
+    def __init__(
+        self,
+        file_path: XMLSource,
+        document: XMLDocument | None = None,
+        streaming: bool | None = None,
+        name: str = ''
+    ):
+        """
+        Inicializa parser.
+        
+        Args:
+            file_path: Caminho do arquivo XML ou conteúdo em memória (bytes/buffer)
+            document: Documento já parseado pelo workflow (evita novo parsing)
+            streaming: Força (True) ou desliga (False) o modo incremental;
+                se None, decide pelo tamanho do arquivo
+            name: Nome do arquivo para logs (uploads em memória)
+        """
+        self.source = file_path
+        self.file_path = Path(source_name(file_path, name))
+        self.document = document
         self.data = None
         
+        if streaming is None:
+            streaming = document is None and is_large_xml(self.source)
+        self.streaming = streaming
+        
     def parse(self) -> dict:
-        """Faz parsing do arquivo XML."""
+        """Faz parsing do arquivo XML e retorna a primeira nota (ver parse_all)."""
+        return self.parse_all()[0]
+    
+    def parse_all(self) -> list[dict]:
+        """Faz parsing do arquivo XML e retorna todas as notas (nfeProc/NFe) contidas."""
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.data = xmltodict.parse(f.read())
-            
-            parser_logger.info(f"✅ Arquivo XML lido: {self.file_path.name}")
-            return self._extract_data()
+            notas = list(self.iter_notas())
+            modo = " em modo streaming" if self.streaming else ""
+            parser_logger.info(f"✅ Arquivo XML lido{modo}: {self.file_path.name} ({len(notas)} notas)")
+            return notas
             
         except Exception as e:
             parser_logger.error(f"❌ Erro ao ler XML: {e}")
             raise
     
-    def _extract_data(self) -> dict:
-        """Extrai dados da NFe."""
+    def iter_notas(self) -> Iterator[dict]:
+        """
+        Emite cada nota do arquivo (nfeProc avulso, enviNFe, lotes com vários nfeProc).
+        
+        Cada nota recebe 'indice_documento', sua posição no arquivo, usado para
+        localizar o nó correspondente no documento (ex.: geração da chave SEFAZ).
+        
+        Yields:
+            dict com os dados de cada nota
+        """
+        if self.streaming:
+            yield from self._iter_notas_streaming()
+            return
+        
+        if self.document is None:
+            self.document = XMLDocument.from_source(self.source, self.file_path.name)
+        
+        nodes = self.document.nodes(NFE_NODE_TAGS)
+        if not nodes:
+            # Estrutura não reconhecida: mantém o comportamento de nota vazia
+            yield self._extract_data({}, indice=0)
+            return
+        
+        for indice, node in enumerate(nodes):
+            yield self._extract_data(self._node_to_proc(node), indice=indice)
+    
+    def _iter_notas_streaming(self) -> Iterator[dict]:
+        """Versão incremental de iter_notas: itens de cada nota liberados ao serem lidos."""
+        itens = []
+        indice = 0
+        
+        for kind, value in self._iterparse():
+            if kind == 'det':
+                itens.append(self._extract_item(element_to_dict(value)))
+            else:
+                yield self._extract_data(self._node_to_proc(value), itens, indice=indice)
+                itens = []
+                indice += 1
+        
+        if indice == 0:
+            yield self._extract_data({}, itens, indice=0)
+    
+    def iter_itens(self) -> Iterator[dict]:
+        """
+        Percorre o XML com iterparse emitindo um item (<det>) por vez.
+        
+        Cada <det> é convertido, entregue e removido da árvore logo em seguida,
+        então o pico de memória não cresce com a quantidade de itens. Ao final,
+        self.document contém apenas o esqueleto de cada nota (Id do infNFe,
+        ide e emit), usado para a chave SEFAZ.
+        
+        Yields:
+            dict com os dados de cada item
+        """
+        for kind, value in self._iterparse():
+            if kind == 'det':
+                yield self._extract_item(element_to_dict(value))
+    
+    def _iterparse(self) -> Iterator[tuple[str, ET.Element]]:
+        """
+        Eventos do parsing incremental: ('det', elem) para cada item e
+        ('nota', elem) ao fechar cada nfeProc/NFe (já sem os <det>).
+        
+        O <det> só é removido da árvore depois de consumido pelo chamador; a
+        nota, depois de consumida, é trocada pelo seu esqueleto, então a árvore
+        não guarda cabeçalho, totais e protocolo das notas já emitidas.
+        """
+        root = None
+        stack = []
+        
+        with open_source(self.source) as f:
+            for event, elem in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    stack.append(elem)
+                    continue
+                
+                stack.pop()
+                tag = local_tag(elem.tag)
+                if tag == 'det':
+                    yield 'det', elem
+                    elem.clear()
+                    stack[-1].remove(elem)
+                elif tag in NFE_NODE_TAGS and not any(local_tag(e.tag) in NFE_NODE_TAGS for e in stack):
+                    yield 'nota', elem
+                    esqueleto = esqueleto_nota(elem)
+                    elem.clear()
+                    if stack:
+                        substituir_filho(stack[-1], elem, esqueleto)
+                    else:
+                        root = esqueleto
+        
+        self.document = XMLDocument(root, self.file_path.name)
+    
+    def _node_to_proc(self, node: ET.Element) -> dict:
+        """Converte um nó nfeProc/NFe para o formato do conteúdo de um nfeProc."""
+        if local_tag(node.tag) == 'NFe':
+            return {'NFe': element_to_dict(node)}
+        if self.document is not None and node is self.document.root:
+            # Nota única na raiz: reaproveita o dict já calculado do documento
+            return self.document.as_dict()[self.document.root_tag]
+        return element_to_dict(node)
+    
+    def _extract_data(self, nfe_proc: dict, itens: list[dict] | None = None, indice: int = 0) -> dict:
+        """Extrai dados de uma NFe (itens já extraídos quando em modo streaming)."""
         try:
             # Navegar na estrutura XML da NFe
-            nfe_proc = self.data.get('nfeProc', {}) # Novo nó raiz
             nfe = nfe_proc.get('NFe', {})
             inf_nfe = nfe.get('infNFe', {})
             
@@ -50,15 +181,14 @@ class XMLParser:
             total = inf_nfe.get('total', {}).get('ICMSTot', {})
             
             # Itens
-            det = inf_nfe.get('det', [])
-            if not isinstance(det, list):
-                det = [det]
+            if itens is None:
+                itens = self._extract_itens(inf_nfe.get('det', []))
                 
             main_cfop = ''
             find_cfops = set()
-            if det:
-                for item in det:
-                    cfop_item = item.get('prod', {}).get('CFOP', '')
+            if itens:
+                for item in itens:
+                    cfop_item = item.get('cfop', '')
                     if cfop_item:
                         find_cfops.add(cfop_item)
                         if not main_cfop:
@@ -68,14 +198,14 @@ class XMLParser:
                 main_cfop = list(find_cfops)[0]
 
             # Montar dicionário (Adicionar campos do Protocolo)
-            classificacao = self._determinar_classificacao(det)
+            classificacao = self._determinar_classificacao(itens)
             
-            nf_data = {
+            nf_data = Nota({
                 'numero_nf': ide.get('nNF', ''),
                 'serie': ide.get('serie', '1'),
                 'numero_nf': ide.get('nNF', ''),
                 'serie': ide.get('serie', '1'),
-                'tipo_nf': DocumentType.NFE.value,
+                'tipo_nf': DocumentType.NFC_E.value if ide.get('mod') == '65' else DocumentType.NFE.value,
                 'data_emissao': self._parse_datetime(ide.get('dhEmi', '')),
                 'classificacao': classificacao.value,
                 'cfop': main_cfop,
@@ -86,16 +216,22 @@ class XMLParser:
                 'fornecedor_cnpj': emit.get('CNPJ', ''),
                 'cliente_cnpj': dest.get('CNPJ', ''),
                 'cliente_cpf': dest.get('CPF', ''),
-                'itens': self._extract_itens(det),
+                # UFs e indicadores da operação (alíquota interestadual e DIFAL)
+                'uf_emitente': (emit.get('enderEmit') or {}).get('UF', ''),
+                'uf_destinatario': (dest.get('enderDest') or {}).get('UF', ''),
+                'id_dest': ide.get('idDest', ''),
+                'ind_final': ide.get('indFinal', ''),
+                'ind_ie_dest': dest.get('indIEDest', ''),
+                'itens': itens,
                 'impostos': self._extract_impostos(total, inf_nfe),
+                # Totais declarados (texto do XML), conciliados com os itens na validação
+                'totais': {campo: valor for campo, valor in total.items() if isinstance(valor, str)},
                 'status': inf_prot.get('cStat', '999'),
-                'impostos': self._extract_impostos(total, inf_nfe)
-            }
-            
-            # Ajuste: A chave de acesso também pode ser obtida do infNFe
-            #if not nf_data['chave_nfe']:
-                # Pega a chave da tag 'chNFe' que vem no protNFe
-            #    nf_data['chave_nfe'] = prot_nfe.get('chNFe', '') 
+                'impostos': self._extract_impostos(total, inf_nfe),
+                # Chave de acesso: a do protocolo ou, sem protocolo, a do Id do infNFe
+                'chave_nfe': str(inf_prot.get('chNFe') or '').strip() or chave_do_id(inf_nfe.get('@Id')),
+                'indice_documento': indice,
+            })
 
             # Correção no Status para o Banco
             # Se for Autorizado (100), define como 'Autorizado' no BD
@@ -117,9 +253,8 @@ class XMLParser:
         has_servico = False
         
         for item in itens:
-            prod = item.get('prod', {})
             # Se tem NCM, é produto
-            if prod.get('NCM'):
+            if item.get('ncm'):
                 has_produto = True
             # Se não tem NCM, é serviço
             else:
@@ -141,94 +276,154 @@ class XMLParser:
             det = [det]
 
         for item in det:
-            prod = item.get('prod', {})
-            imposto = item.get('imposto', {})
-            
-            # --- Lógica de Extração Robusta do ICMS (CST/CSOSN, etc.) ---
-            icms_data = imposto.get('ICMS', {})
-            icms_detalhe = {}
-            cst_csosn_valor = ''
-            
-            if icms_data:
-                for key, value in icms_data.items():
-                    if isinstance(value, dict) and key not in ['vICMSDeson', 'infAdProd']:
-                        # 1. Corrigido: icms_detalhe armazena o DICIONÁRIO da tag de imposto (Ex: ICMSSN102)
-                        icms_detalhe = value
-                        # 2. Armazena o valor do CST/CSOSN separadamente
-                        cst_csosn_valor = value.get('CST', value.get('CSOSN', '')) 
-                        break
+            itens.append(self._extract_item(item))
+        
+        return itens
+    
+    def _extract_item(self, item: dict) -> dict:
+        """Extrai um item (<det>) já convertido para dict."""
+        prod = item.get('prod', {})
+        imposto = item.get('imposto', {})
+        
+        # --- Lógica de Extração Robusta do ICMS (CST/CSOSN, etc.) ---
+        icms_data = imposto.get('ICMS', {})
+        icms_detalhe = {}
+        cst_csosn_valor = ''
+        
+        if icms_data:
+            for key, value in icms_data.items():
+                if isinstance(value, dict) and key not in ['vICMSDeson', 'infAdProd']:
+                    # 1. Corrigido: icms_detalhe armazena o DICIONÁRIO da tag de imposto (Ex: ICMSSN102)
+                    icms_detalhe = value
+                    # 2. Armazena o valor do CST/CSOSN separadamente
+                    cst_csosn_valor = value.get('CST', value.get('CSOSN', '')) 
+                    break
+
+        # --- Lógica de Extração Robusta de IPI ---
+        ipi_data = imposto.get('IPI', {})
+        ipi_detalhe = {}
+        cst_ipi = ''
+        if ipi_data:
+            for key, value in ipi_data.items():
+                if isinstance(value, dict):
+                    ipi_detalhe = value
+                    cst_ipi = value.get('CST', '') 
+                    break
+                    
+        # --- Lógica de Extração Robusta de PIS ---
+        pis_data = imposto.get('PIS', {})
+        pis_detalhe = {}
+        cst_pis = ''
+        if pis_data:
+            for key, value in pis_data.items():
+                if isinstance(value, dict):
+                    pis_detalhe = value
+                    cst_pis = value.get('CST', '') 
+                    break
 
-            # --- Lógica de Extração Robusta de IPI ---
-            ipi_data = imposto.get('IPI', {})
-            ipi_detalhe = {}
-            cst_ipi = ''
-            if ipi_data:
-                for key, value in ipi_data.items():
-                    if isinstance(value, dict):
-                        ipi_detalhe = value
-                        cst_ipi = value.get('CST', '') 
-                        break
-                        
-            # --- Lógica de Extração Robusta de PIS ---
-            pis_data = imposto.get('PIS', {})
-            pis_detalhe = {}
-            cst_pis = ''
-            if pis_data:
-                for key, value in pis_data.items():
-                    if isinstance(value, dict):
-                        pis_detalhe = value
-                        cst_pis = value.get('CST', '') 
-                        break
+        # --- Lógica de Extração Robusta de COFINS ---
+        cofins_data = imposto.get('COFINS', {})
+        cofins_detalhe = {}
+        cst_cofins = ''
+        if cofins_data:
+            for key, value in cofins_data.items():
+                if isinstance(value, dict):
+                    cofins_detalhe = value
+                    cst_cofins = value.get('CST', '') 
+                    break
 
-            # --- Lógica de Extração Robusta de COFINS ---
-            cofins_data = imposto.get('COFINS', {})
-            cofins_detalhe = {}
-            cst_cofins = ''
-            if cofins_data:
-                for key, value in cofins_data.items():
-                    if isinstance(value, dict):
-                        cofins_detalhe = value
-                        cst_cofins = value.get('CST', '') 
-                        break
+        # Partilha do ICMS com a UF de destino (DIFAL para consumidor final não contribuinte)
+        icms_uf_dest = imposto.get('ICMSUFDest') or {}
 
-            # --- Mapeamento dos Dados ---
-            ncm_valor = prod.get('NCM', '')
-            # Certifique-se de que ClassificationType está definido ou use strings diretas
-            tipo = 'SERVICO' if ncm_valor in ('00', '00000000') else 'PRODUTO' 
+        # IBS/CBS da reforma tributária (grupo IBSCBS, a partir de 2026)
+        ibs_cbs = imposto.get('IBSCBS') or {}
+        g_ibs_cbs = ibs_cbs.get('gIBSCBS') or {}
+        g_ibs_uf = g_ibs_cbs.get('gIBSUF') or {}
+        g_ibs_mun = g_ibs_cbs.get('gIBSMun') or {}
+        g_cbs = g_ibs_cbs.get('gCBS') or {}
+
+        # --- Mapeamento dos Dados ---
+        ncm_valor = prod.get('NCM', '')
+        # Certifique-se de que ClassificationType está definido ou use strings diretas
+        tipo = 'SERVICO' if ncm_valor in ('00', '00000000') else 'PRODUTO' 
+        
+        item_data = Item({
+            'nItem': item.get('@nItem', ''),
+            'codigo_item': prod.get('cProd', ''),
+            'descricao': prod.get('xProd', ''),
+            'quantidade': float(prod.get('qCom', 0)),
+            'valor_unitario': float(prod.get('vUnCom', 0)),
+            'valor_total': float(prod.get('vProd', 0)),
+            'tipo': tipo,
+            'ncm': ncm_valor,
+            'cfop': prod.get('CFOP', ''),
+            'cest': prod.get('CEST', ''),
+            # Compõem a base do ICMS-ST
+            'vFrete': float(prod.get('vFrete', 0)),
+            'vSeg': float(prod.get('vSeg', 0)),
+            'vOutro': float(prod.get('vOutro', 0)),
+            'vDesc': float(prod.get('vDesc', 0)),
+                            
+            # Detalhes do ICMS
+            'cst_csosn': cst_csosn_valor, # Usa a string corrigida
+            'aliq_icms': float(icms_detalhe.get('pICMS', 0)),
+            'vBC_icms': float(icms_detalhe.get('vBC', 0)),
+            'vICMS': float(icms_detalhe.get('vICMS', 0)),
+            'origem': icms_detalhe.get('orig', ''),
+            'aliq_fcp': float(icms_detalhe.get('pFCP', 0)),
+            'vFCP': float(icms_detalhe.get('vFCP', 0)),
             
-            item_data = {
-                'nItem': item.get('@nItem', ''),
-                'codigo_item': prod.get('cProd', ''),
-                'descricao': prod.get('xProd', ''),
-                'quantidade': float(prod.get('qCom', 0)),
-                'valor_unitario': float(prod.get('vUnCom', 0)),
-                'valor_total': float(prod.get('vProd', 0)),
-                'tipo': tipo,
-                'ncm': ncm_valor,
-                'cfop': prod.get('CFOP', ''),
-                                
-                # Detalhes do ICMS
-                'cst_csosn': cst_csosn_valor, # Usa a string corrigida
-                'aliq_icms': float(icms_detalhe.get('pICMS', 0)),
-                'vBC_icms': float(icms_detalhe.get('vBC', 0)),
-                'vICMS': float(icms_detalhe.get('vICMS', 0)),
-                'origem': icms_detalhe.get('orig', ''),
-                
-                # 🌟 Novos detalhes de IPI, PIS e COFINS
-                'cst_ipi': cst_ipi,
-                'vIPI': float(ipi_detalhe.get('vIPI', 0)),
-                'aliq_ipi': float(ipi_detalhe.get('pIPI', 0)),
-                
-                'cst_pis': cst_pis,
-                'vPIS': float(pis_detalhe.get('vPIS', 0)),
-                
-                'cst_cofins': cst_cofins,
-                'vCOFINS': float(cofins_detalhe.get('vCOFINS', 0)),
-            }
+            # ICMS-ST
+            'mod_bc_st': icms_detalhe.get('modBCST', ''),
+            'aliq_mva_st': float(icms_detalhe.get('pMVAST', 0)),
+            'aliq_red_bc_st': float(icms_detalhe.get('pRedBCST', 0)),
+            'vBC_st': float(icms_detalhe.get('vBCST', 0)),
+            'aliq_icms_st': float(icms_detalhe.get('pICMSST', 0)),
+            'vICMS_st': float(icms_detalhe.get('vICMSST', 0)),
+            'aliq_fcp_st': float(icms_detalhe.get('pFCPST', 0)),
+            'vFCP_st': float(icms_detalhe.get('vFCPST', 0)),
+            
+            # DIFAL (grupo ICMSUFDest)
+            'vBC_uf_dest': float(icms_uf_dest.get('vBCUFDest', 0)),
+            'aliq_fcp_uf_dest': float(icms_uf_dest.get('pFCPUFDest', 0)),
+            'aliq_icms_uf_dest': float(icms_uf_dest.get('pICMSUFDest', 0)),
+            'aliq_icms_inter': float(icms_uf_dest.get('pICMSInter', 0)),
+            'vFCP_uf_dest': float(icms_uf_dest.get('vFCPUFDest', 0)),
+            'vICMS_uf_dest': float(icms_uf_dest.get('vICMSUFDest', 0)),
+            'vICMS_uf_remet': float(icms_uf_dest.get('vICMSUFRemet', 0)),
             
-            itens.append(item_data)
+            # 🌟 Novos detalhes de IPI, PIS e COFINS
+            'cst_ipi': cst_ipi,
+            'vBC_ipi': float(ipi_detalhe.get('vBC', 0)),
+            'vIPI': float(ipi_detalhe.get('vIPI', 0)),
+            'aliq_ipi': float(ipi_detalhe.get('pIPI', 0)),
+            
+            'cst_pis': cst_pis,
+            'vBC_pis': float(pis_detalhe.get('vBC', 0)),
+            'aliq_pis': float(pis_detalhe.get('pPIS', 0)),
+            'vPIS': float(pis_detalhe.get('vPIS', 0)),
+            
+            'cst_cofins': cst_cofins,
+            'vBC_cofins': float(cofins_detalhe.get('vBC', 0)),
+            'aliq_cofins': float(cofins_detalhe.get('pCOFINS', 0)),
+            'vCOFINS': float(cofins_detalhe.get('vCOFINS', 0)),
+            
+            # IBS/CBS (redução de alíquota no gRed de cada esfera)
+            'cst_ibs_cbs': ibs_cbs.get('CST', ''),
+            'c_class_trib': ibs_cbs.get('cClassTrib', ''),
+            'vBC_ibs_cbs': float(g_ibs_cbs.get('vBC', 0)),
+            'aliq_ibs_uf': float(g_ibs_uf.get('pIBSUF', 0)),
+            'aliq_ibs_mun': float(g_ibs_mun.get('pIBSMun', 0)),
+            'aliq_cbs': float(g_cbs.get('pCBS', 0)),
+            'aliq_red_ibs': float((g_ibs_uf.get('gRed') or {}).get('pRedAliq', 0)),
+            'aliq_red_cbs': float((g_cbs.get('gRed') or {}).get('pRedAliq', 0)),
+            'vIBS_uf': float(g_ibs_uf.get('vIBSUF', 0)),
+            'vIBS_mun': float(g_ibs_mun.get('vIBSMun', 0)),
+            'vIBS': float(g_ibs_cbs.get('vIBS', 0)),
+            'vCBS': float(g_cbs.get('vCBS', 0)),
+        })
         
-        return itens
+        return item_data
     
     def _extract_impostos(self, total: dict, inf_nfe: dict) -> list[dict]:
         """Extrai impostos da nota."""
@@ -294,6 +489,19 @@ class XMLParser:
                 'aliquota': 0.0,
             })
         
+        # IBS e CBS (totais do grupo IBSCBSTot)
+        ibs_cbs_tot = inf_nfe.get('total', {}).get('IBSCBSTot') or {}
+        v_bc_ibs_cbs = float(ibs_cbs_tot.get('vBCIBSCBS', 0))
+        for tipo, grupo, campo in (('IBS', 'gIBS', 'vIBS'), ('CBS', 'gCBS', 'vCBS')):
+            v_imposto = float((ibs_cbs_tot.get(grupo) or {}).get(campo, 0))
+            if v_imposto > 0:
+                impostos.append({
+                    'tipo_imposto': tipo,
+                    'valor_imposto': v_imposto,
+                    'valor_base': v_bc_ibs_cbs,
+                    'aliquota': round((v_imposto / v_bc_ibs_cbs) * 100, 2) if v_bc_ibs_cbs > 0 else 0.0,
+                })
+        
         return impostos
     
     def _parse_datetime(self, dt_str: str) -> datetime:
@@ -1,6 +1,5 @@
 """Parser XML melhorado com validação semântica via LLM."""
 
-from pathlib import Path
 from typing import Optional
 import json
 
@@ -10,6 +9,7 @@ from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from src.parsers.xml_parser import XMLParser
+from src.parsers.xml_document import XMLDocument, XMLSource
 from logs.logger import parser_logger
 from src.prompts.xml_extractor_prompt import VALIDATION_PROMPT, ENRICHMENT_PROMPT
 
@@ -19,16 +19,18 @@ class XMLParserLLM:
     
     def __init__(
         self,
-        file_path: str | Path,
+        file_path: XMLSource,
         llm_provider: str = "groq",
         api_key: str = "",
         model: str = "mixtral-8x7b-32768",
         use_llm_validation: bool = True,
-        use_llm_enrichment: bool = True
+        use_llm_enrichment: bool = True,
+        document: XMLDocument | None = None,
+        name: str = ""
     ):
-        """Inicializa parser."""
-        self.file_path = Path(file_path)
-        self.base_parser = XMLParser(file_path)
+        """Inicializa parser (file_path pode ser caminho, bytes ou buffer)."""
+        self.base_parser = XMLParser(file_path, document=document, name=name)
+        self.file_path = self.base_parser.file_path
         self.llm = None
         self.use_llm_validation = use_llm_validation and api_key
         self.use_llm_enrichment = use_llm_enrichment and api_key
@@ -55,34 +57,44 @@ class XMLParserLLM:
             raise ValueError(f"Provider não suportado: {provider}")
     
     def parse(self) -> dict:
-        """Faz parsing completo com validações LLM."""
+        """Faz parsing completo com validações LLM (primeira nota do arquivo)."""
         try:
-            nf_data = self.base_parser.parse()
-            parser_logger.info(f"✅ XML parseado: NF {nf_data['numero_nf']}")
-
-            if self.use_llm_validation and self.llm:
-                validation_result = self._validate_with_llm(nf_data)
-                nf_data['llm_validation'] = validation_result
-                
-                if validation_result['validacao_geral'] == 'Reprovado':
-                    parser_logger.warning(f"⚠️  Validação LLM: REPROVADO")
-                    nf_data['status'] = 'Erro'
-                    nf_data['mensagem_erro'] = "; ".join(validation_result['problemas_criticos'])
-
-            if self.use_llm_enrichment and self.llm:
-                enrichment_result = self._enrich_with_llm(nf_data)
-                nf_data['llm_enrichment'] = enrichment_result
-                
-                if enrichment_result.get('natop_sugerido') and not nf_data.get('natop'):
-                    nf_data['natop'] = enrichment_result['natop_sugerido']
-                    parser_logger.info(f"💡 NATOP enriquecido: {enrichment_result['natop_sugerido']}")
-            
-            return nf_data
-            
+            return self._apply_llm(self.base_parser.parse())
         except Exception as e:
             parser_logger.error(f"❌ Erro ao parsear XML com LLM: {e}")
             raise
     
+    def parse_all(self) -> list[dict]:
+        """Faz parsing de todas as notas do arquivo (lotes) com validações LLM."""
+        try:
+            return [self._apply_llm(nf_data) for nf_data in self.base_parser.parse_all()]
+        except Exception as e:
+            parser_logger.error(f"❌ Erro ao parsear XML com LLM: {e}")
+            raise
+    
+    def _apply_llm(self, nf_data: dict) -> dict:
+        """Aplica validação e enriquecimento LLM a uma nota já extraída."""
+        parser_logger.info(f"✅ XML parseado: NF {nf_data['numero_nf']}")
+
+        if self.use_llm_validation and self.llm:
+            validation_result = self._validate_with_llm(nf_data)
+            nf_data['llm_validation'] = validation_result
+            
+            if validation_result['validacao_geral'] == 'Reprovado':
+                parser_logger.warning(f"⚠️  Validação LLM: REPROVADO")
+                nf_data['status'] = 'Erro'
+                nf_data['mensagem_erro'] = "; ".join(validation_result['problemas_criticos'])
+
+        if self.use_llm_enrichment and self.llm:
+            enrichment_result = self._enrich_with_llm(nf_data)
+            nf_data['llm_enrichment'] = enrichment_result
+            
+            if enrichment_result.get('natop_sugerido') and not nf_data.get('natop'):
+                nf_data['natop'] = enrichment_result['natop_sugerido']
+                parser_logger.info(f"💡 NATOP enriquecido: {enrichment_result['natop_sugerido']}")
+        
+        return nf_data
+    
     def _validate_with_llm(self, nf_data: dict) -> dict:
         """Valida dados com LLM."""
         try:
@@ -96,11 +108,11 @@ class XMLParserLLM:
                     'valor': item.get('valor_total', 0)
                 })
             
+            # Aritmética fica com a conciliação determinística (regra TOT001), fora do prompt
             prompt = VALIDATION_PROMPT.format(
                 cfop=nf_data.get('cfop', ''),
                 natop=nf_data.get('natop', ''),
                 itens_resumo=json.dumps(itens_resumo, ensure_ascii=False),
-                valor_total=nf_data.get('valor_total', 0),
                 fornecedor_cnpj=nf_data.get('fornecedor_cnpj', ''),
                 cliente_cnpj=nf_data.get('cliente_cnpj', ''),
                 cliente_cpf=nf_data.get('cliente_cpf', '')
@@ -177,7 +189,7 @@ class XMLParserLLM:
 
 
 def parse_xml_with_llm(
-    file_path: str | Path,
+    file_path: XMLSource,
     llm_provider: str = "groq",
     api_key: str = "",
     model: str = "mixtral-8x7b-32768",
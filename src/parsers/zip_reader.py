@@ -0,0 +1,50 @@
+"""Leitura de arquivos ZIP com XMLs de notas, membro a membro e sem extrair em disco."""
+
+import zipfile
+from pathlib import Path
+
+from src.parsers.xml_document import XMLSource, open_source
+
+
+def is_zip(source: XMLSource, name: str = '') -> bool:
+    """Indica se a origem é um ZIP (pela extensão do nome ou pela assinatura)."""
+    if name.lower().endswith('.zip'):
+        return True
+    if isinstance(source, (str, Path)):
+        return str(source).lower().endswith('.zip') or zipfile.is_zipfile(source)
+    try:
+        with open_source(source) as f:
+            return f.read(4) == b'PK\x03\x04'
+    except (OSError, AttributeError, ValueError):
+        return False
+
+
+def open_zip(source: XMLSource) -> zipfile.ZipFile:
+    """Abre o ZIP a partir de caminho, bytes ou buffer (o conteúdo não é extraído)."""
+    if isinstance(source, (str, Path)):
+        return zipfile.ZipFile(source)
+    with open_source(source) as f:
+        return zipfile.ZipFile(f)
+
+
+def list_xml_members(zf: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """
+    Lista os membros XML do ZIP, na ordem do arquivo.
+
+    Diretórios, metadados do macOS (__MACOSX/) e arquivos ocultos são ignorados.
+    """
+    membros = []
+    for info in zf.infolist():
+        nome = Path(info.filename)
+        if info.is_dir() or nome.suffix.lower() != '.xml':
+            continue
+        if nome.parts[0] == '__MACOSX' or nome.name.startswith('.'):
+            continue
+        membros.append(info)
+    return membros
+
+
+def read_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    """Descompacta um membro direto para memória."""
+    with zf.open(info) as f:
+        return f.read()
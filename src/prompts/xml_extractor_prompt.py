@@ -13,7 +13,8 @@ Analise os dados extraídos de uma NFe e verifique:
    - Itens: {itens_resumo}
 
 3. **Valores e Impostos**
-   - O valor total R$ {valor_total} é coerente com a soma dos itens?
+   - A conciliação dos totais com os itens já é conferida pelo sistema
+   - NÃO refaça somas ou contas
    - Os impostos fazem sentido para a operação?
 
 4. **Consistência dos CNPJs**
@@ -0,0 +1,87 @@
+"""
+Recursos carregados uma vez por processo (tabelas, índices e pacotes de regras).
+
+carregar_uma_vez envolve a função de carga: a primeira chamada carrega sob
+lock (double-checked) e as seguintes devolvem o mesmo objeto sem lock.
+
+LockProcesso é o lock usado por ela e pelos caches com recarga própria: no
+processo filho (fork) ele é recriado, porque pode ter sido copiado travado
+por outra thread do pai. O valor já carregado é herdado pelo filho.
+"""
+
+import functools
+import os
+import threading
+import weakref
+from collections.abc import Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class LockProcesso:
+    """threading.Lock recriado no processo filho após fork."""
+
+    __slots__ = ("_lock", "__weakref__")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        _locks.add(self)
+
+    def __enter__(self) -> bool:
+        return self._lock.acquire()
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
+
+    def _recriar(self) -> None:
+        self._lock = threading.Lock()
+
+
+_locks: "weakref.WeakSet[LockProcesso]" = weakref.WeakSet()
+
+
+def _recriar_locks_apos_fork() -> None:
+    """No processo filho os locks podem ter sido copiados travados: recria todos."""
+    for lock in list(_locks):
+        lock._recriar()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_recriar_locks_apos_fork)
+
+
+def carregar_uma_vez(fn: Callable[[], T]) -> Callable[[], T]:
+    """
+    Decorator: executa fn na primeira chamada e reaproveita o resultado no processo.
+
+    Só uma thread carrega; as demais esperam o mesmo resultado. Se fn falhar,
+    a chamada seguinte tenta de novo. A função retornada tem .limpar(), que
+    descarta o valor (a próxima chamada recarrega).
+
+    Args:
+        fn: Função de carga, sem argumentos
+
+    Returns:
+        Função que devolve o valor carregado
+    """
+    lock = LockProcesso()
+    vazio = object()
+    valor = vazio
+
+    @functools.wraps(fn)
+    def obter() -> T:
+        nonlocal valor
+        if valor is vazio:
+            with lock:
+                if valor is vazio:
+                    valor = fn()
+        return valor
+
+    def limpar() -> None:
+        nonlocal valor
+        with lock:
+            valor = vazio
+
+    obter.limpar = limpar
+    return obter
@@ -0,0 +1,148 @@
+"""
+Tabela do IBS/CBS (reforma tributária): alíquotas por vigência e efeito dos CST.
+
+Os dados vêm de um JSON versionado (IBS_CBS_TABLE_PATH): períodos de vigência
+com as alíquotas de CBS, IBS estadual e IBS municipal (2026: fase de teste,
+CBS 0,9% e IBS 0,1%), o efeito de cada CST de IBS/CBS no cálculo e,
+opcionalmente, o percentual de redução por classificação tributária
+(cClassTrib, cujos 3 primeiros dígitos são o CST).
+
+Efeitos do CST:
+- tributado: alíquota da tabela;
+- reduzido: alíquota da tabela com a redução da classificação (ou a
+  declarada no item, pRedAliq);
+- sem_imposto: alíquota zero (isenção, imunidade, suspensão...);
+- declarado: não calculado (alíquota fixa, diferimento, monofásica...):
+  vale o valor declarado.
+
+As alíquotas de um lote saem por data de emissão com uma busca binária
+(np.searchsorted) sobre os inícios dos períodos.
+"""
+
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from config.configuration import IBS_CBS_TABLE_PATH
+from logs.logger import app_logger
+from src.utils.lazy import carregar_uma_vez
+
+# Incrementar quando o formato do JSON mudar
+FORMATO_VERSAO = 1
+
+EFEITO_TRIBUTADO = "tributado"
+EFEITO_REDUZIDO = "reduzido"
+EFEITO_SEM_IMPOSTO = "sem_imposto"
+EFEITO_DECLARADO = "declarado"
+EFEITOS = (EFEITO_TRIBUTADO, EFEITO_REDUZIDO, EFEITO_SEM_IMPOSTO, EFEITO_DECLARADO)
+
+
+class AliquotasIBSCBS(NamedTuple):
+    """Alíquotas (%) vigentes; NaN fora dos períodos da tabela."""
+    cbs: np.ndarray
+    ibs_uf: np.ndarray
+    ibs_mun: np.ndarray
+
+
+class ClassificacaoTributaria(NamedTuple):
+    """Classificação tributária (cClassTrib) do IBS/CBS."""
+    cst: str
+    reducao: float      # % de redução das alíquotas
+    descricao: str
+
+
+def data_aaaammdd(valor) -> int:
+    """datetime/date/'AAAA-MM-DD...' -> AAAAMMDD (0 se ausente ou inválida)."""
+    if isinstance(valor, (datetime, date)):
+        return valor.year * 10000 + valor.month * 100 + valor.day
+    try:
+        return data_aaaammdd(date.fromisoformat(str(valor or "").strip()[:10]))
+    except ValueError:
+        return 0
+
+
+class TabelaIBSCBS:
+    """Períodos de alíquotas em arrays ordenados + efeito dos CST e classificações."""
+
+    def __init__(self, dados: dict):
+        """Monta os arrays dos períodos e os dicionários de CST/cClassTrib (ValueError se inválida)."""
+        if dados.get("formato") != FORMATO_VERSAO:
+            raise ValueError(f"Formato da tabela de IBS/CBS não suportado: {dados.get('formato')}")
+
+        self.versao = str(dados.get("versao", ""))
+        periodos = sorted(dados.get("periodos", []), key=lambda p: p["inicio"])
+        self.inicios = np.array([data_aaaammdd(p["inicio"]) for p in periodos], dtype=np.int64)
+        self.fins = np.array([data_aaaammdd(p["fim"]) for p in periodos], dtype=np.int64)
+        if np.any(self.inicios[1:] <= self.fins[:-1]):
+            raise ValueError("Períodos da tabela de IBS/CBS sobrepostos")
+        # Última posição: fora de vigência (NaN)
+        self._cbs = np.array([p["cbs"] for p in periodos] + [np.nan], dtype=float)
+        self._ibs_uf = np.array([p["ibs_uf"] for p in periodos] + [np.nan], dtype=float)
+        self._ibs_mun = np.array([p["ibs_mun"] for p in periodos] + [np.nan], dtype=float)
+
+        self.csts: dict[str, str] = {}
+        self.descricoes: dict[str, str] = {}
+        for cst, entrada in dados.get("cst", {}).items():
+            if entrada["efeito"] not in EFEITOS:
+                raise ValueError(f"Efeito desconhecido para o CST {cst} de IBS/CBS: {entrada['efeito']}")
+            self.csts[cst] = entrada["efeito"]
+            self.descricoes[cst] = entrada.get("descricao", "")
+
+        self.classificacoes = {
+            codigo: ClassificacaoTributaria(codigo[:3], float(entrada.get("reducao", 0.0)), entrada.get("descricao", ""))
+            for codigo, entrada in dados.get("classificacoes", {}).items()
+        }
+
+    def _periodos(self, datas: np.ndarray) -> np.ndarray:
+        """Posição do período vigente de cada data (len(periodos) se nenhum)."""
+        if not len(self.inicios):
+            return np.zeros(len(datas), dtype=np.int64)
+        pos = np.searchsorted(self.inicios, datas, side="right") - 1
+        vigente = (pos >= 0) & (datas <= self.fins[np.maximum(pos, 0)])
+        return np.where(vigente, pos, len(self.inicios))
+
+    def aliquotas(self, datas) -> AliquotasIBSCBS:
+        """Alíquotas vigentes em cada data (array de AAAAMMDD)."""
+        posicoes = self._periodos(np.asarray(datas, dtype=np.int64))
+        return AliquotasIBSCBS(self._cbs[posicoes], self._ibs_uf[posicoes], self._ibs_mun[posicoes])
+
+    def efeito(self, cst: str) -> str | None:
+        """Efeito do CST no cálculo (None se o CST não existe)."""
+        return self.csts.get(str(cst or "").strip())
+
+    def efeitos(self, csts: np.ndarray) -> np.ndarray:
+        """Efeito de cada CST do array ('' se ausente/desconhecido), resolvido por CST distinto."""
+        codigos, unicos = pd.factorize(pd.Series(csts, dtype=object), use_na_sentinel=False)
+        efeitos = np.array([self.efeito(c) or "" for c in unicos], dtype=object)
+        return efeitos[codigos] if len(unicos) else np.array([], dtype=object)
+
+    def reducoes(self, classificacoes: np.ndarray) -> np.ndarray:
+        """% de redução de cada cClassTrib do array (NaN se não consta da tabela)."""
+        codigos, unicos = pd.factorize(pd.Series(classificacoes, dtype=object), use_na_sentinel=False)
+        reducoes = np.array([
+            c.reducao if (c := self.classificacoes.get(str(v or "").strip())) is not None else np.nan
+            for v in unicos
+        ], dtype=float)
+        return reducoes[codigos] if len(unicos) else np.array([], dtype=float)
+
+
+# =====================================================
+# TABELA DO PROCESSO
+# =====================================================
+
+def carregar_tabela_ibs_cbs(path: Path = IBS_CBS_TABLE_PATH) -> TabelaIBSCBS:
+    """Lê o JSON da tabela de IBS/CBS."""
+    with open(path, encoding="utf-8") as f:
+        tabela = TabelaIBSCBS(json.load(f))
+    app_logger.info(f"📊 Tabela de IBS/CBS carregada (versão {tabela.versao})")
+    return tabela
+
+
+@carregar_uma_vez
+def get_tabela_ibs_cbs() -> TabelaIBSCBS:
+    """Tabela de IBS/CBS do processo (carregada na primeira consulta)."""
+    return carregar_tabela_ibs_cbs()
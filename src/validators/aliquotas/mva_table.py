@@ -0,0 +1,129 @@
+"""
+Índice da MVA (margem de valor agregado) do ICMS-ST por CEST/NCM e par de UFs.
+
+As regras vêm de um JSON versionado (MVA_TABLE_PATH): CEST e/ou NCM (código
+completo ou prefixo), MVA original, UFs de origem e de destino ("*" = todas)
+e, opcionalmente, a alíquota interna específica do produto no destino.
+Regras posteriores prevalecem sobre as anteriores para a mesma chave, então
+exceções por UF vêm depois da regra geral. Regra sem UFs de destino definidas
+("*") é genérica: a MVA de cada UF vem do convênio/protocolo que ela assina,
+então a da tabela é só referência.
+
+Na carga, as UFs são expandidas e cada regra vira entradas em dicionários
+por (UF origem, UF destino, CEST) e (UF origem, UF destino, NCM/prefixo): a
+consulta é o CEST e, sem regra para ele, o NCM do mais longo ao mais curto
+prefixo — um número fixo de consultas a dicionário.
+"""
+
+import json
+from pathlib import Path
+from typing import NamedTuple
+
+from config.configuration import MVA_TABLE_PATH
+from logs.logger import app_logger
+from src.utils.lazy import carregar_uma_vez
+from src.validators.aliquotas.rate_table import get_tabela_aliquotas
+
+# Incrementar quando o formato do JSON mudar
+FORMATO_VERSAO = 1
+
+# Prefixos do NCM consultados (item completo, subitem, subposição, posição, capítulo)
+TAMANHOS_NCM = (8, 7, 6, 5, 4, 2)
+
+
+class RegraMVA(NamedTuple):
+    """MVA original do produto para o par de UFs."""
+    mva: float                  # %
+    aliquota: float | None      # alíquota interna específica no destino (%), se houver
+    descricao: str
+    generica: bool = False      # sem UFs de destino definidas: MVA de referência
+
+
+def _digitos(valor) -> str:
+    return "".join(ch for ch in str(valor or "") if ch.isdigit())
+
+
+class TabelaMVA:
+    """Regras de MVA indexadas por (UF origem, UF destino, CEST) e (UF origem, UF destino, NCM)."""
+
+    def __init__(self, dados: dict, ufs: tuple[str, ...]):
+        """Expande as UFs das regras e monta os índices (ValueError se o formato não for suportado)."""
+        if dados.get("formato") != FORMATO_VERSAO:
+            raise ValueError(f"Formato da tabela de MVA não suportado: {dados.get('formato')}")
+
+        self.versao = str(dados.get("versao", ""))
+        self.por_cest: dict[tuple[str, str, str], RegraMVA] = {}
+        self.por_ncm: dict[tuple[str, str, str], RegraMVA] = {}
+
+        def expandir(valor) -> tuple[str, ...]:
+            if valor in (None, "*", ["*"]):
+                return ufs
+            return tuple(str(uf).strip().upper() for uf in valor)
+
+        for entrada in dados.get("regras", []):
+            aliquota = entrada.get("aliquota")
+            regra = RegraMVA(
+                float(entrada["mva"]),
+                float(aliquota) if aliquota is not None else None,
+                entrada.get("descricao", ""),
+                entrada.get("ufs_destino") in (None, "*", ["*"]),
+            )
+            cest = _digitos(entrada.get("cest"))
+            ncm = _digitos(entrada.get("ncm"))
+            if not cest and not ncm:
+                raise ValueError(f"Regra de MVA sem CEST nem NCM: {entrada}")
+            for uf_origem in expandir(entrada.get("ufs_origem")):
+                for uf_destino in expandir(entrada.get("ufs_destino")):
+                    if cest:
+                        self.por_cest[(uf_origem, uf_destino, cest)] = regra
+                    if ncm:
+                        self.por_ncm[(uf_origem, uf_destino, ncm)] = regra
+
+    def consultar(self, uf_origem: str, uf_destino: str, cest: str = "", ncm: str = "") -> RegraMVA | None:
+        """
+        Regra de MVA do produto na operação.
+
+        Args:
+            uf_origem: UF do emitente
+            uf_destino: UF do destinatário
+            cest: CEST do item (tem precedência sobre o NCM)
+            ncm: NCM do item
+
+        Returns:
+            RegraMVA ou None se não houver regra para o produto e o par de UFs
+        """
+        uf_origem = str(uf_origem or "").strip().upper()
+        uf_destino = str(uf_destino or "").strip().upper()
+        cest = _digitos(cest)
+        if cest:
+            regra = self.por_cest.get((uf_origem, uf_destino, cest))
+            if regra is not None:
+                return regra
+        ncm = _digitos(ncm)
+        for tamanho in TAMANHOS_NCM:
+            if len(ncm) >= tamanho:
+                regra = self.por_ncm.get((uf_origem, uf_destino, ncm[:tamanho]))
+                if regra is not None:
+                    return regra
+        return None
+
+
+# =====================================================
+# TABELA DO PROCESSO
+# =====================================================
+
+def carregar_tabela_mva(path: Path = MVA_TABLE_PATH) -> TabelaMVA:
+    """Lê o JSON das regras de MVA."""
+    with open(path, encoding="utf-8") as f:
+        tabela = TabelaMVA(json.load(f), get_tabela_aliquotas().ufs)
+    app_logger.info(
+        f"📊 Tabela de MVA (ICMS-ST) carregada (versão {tabela.versao}, "
+        f"{len(tabela.por_cest) + len(tabela.por_ncm)} entradas)"
+    )
+    return tabela
+
+
+@carregar_uma_vez
+def get_tabela_mva() -> TabelaMVA:
+    """Tabela de MVA do processo (carregada na primeira consulta)."""
+    return carregar_tabela_mva()
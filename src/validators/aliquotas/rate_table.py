@@ -0,0 +1,172 @@
+"""
+Tabela de alíquotas de ICMS por UF: internas, FCP e matriz interestadual.
+
+Os dados vêm de um JSON versionado (UF_RATE_TABLE_PATH, campo "versao"):
+alíquota interna modal e FCP padrão de cada UF, a matriz 27×27 das
+alíquotas interestaduais (7%/12%) e a regra dos importados (4% para as
+origens da mercadoria listadas em "importados").
+
+Na carga tudo vira arrays numpy indexados pela posição da UF, com uma
+posição extra para UF ausente/desconhecida (NaN): a consulta de um item é
+uma indexação O(1) e a de um lote inteiro é uma indexação vetorial.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.configuration import UF_RATE_TABLE_PATH
+from logs.logger import app_logger
+from src.utils.lazy import carregar_uma_vez
+
+# Incrementar quando o formato do JSON mudar
+FORMATO_VERSAO = 1
+
+# Código IBGE da UF (cUF da chave de acesso) -> sigla
+CODIGOS_UF = {
+    "11": "RO", "12": "AC", "13": "AM", "14": "RR", "15": "PA", "16": "AP", "17": "TO",
+    "21": "MA", "22": "PI", "23": "CE", "24": "RN", "25": "PB", "26": "PE", "27": "AL",
+    "28": "SE", "29": "BA", "31": "MG", "32": "ES", "33": "RJ", "35": "SP", "41": "PR",
+    "42": "SC", "43": "RS", "50": "MS", "51": "MT", "52": "GO", "53": "DF",
+}
+
+# Origem da mercadoria: um dígito (0-8); posição 10 = ausente/inválida
+_ORIGEM_AUSENTE = 10
+
+
+def _uf(valor) -> str:
+    return "" if valor is None else str(valor).strip().upper()
+
+
+class TabelaAliquotasUF:
+    """Alíquotas de ICMS por UF em arrays (posição da UF; última posição = UF desconhecida)."""
+
+    def __init__(self, dados: dict):
+        """Monta os arrays a partir do JSON da tabela (ValueError se incompleto)."""
+        if dados.get("formato") != FORMATO_VERSAO:
+            raise ValueError(f"Formato da tabela de alíquotas não suportado: {dados.get('formato')}")
+
+        self.versao = str(dados.get("versao", ""))
+        self.ufs: tuple[str, ...] = tuple(dados["ufs"])
+        self.indice = {uf: pos for pos, uf in enumerate(self.ufs)}
+        n = len(self.ufs)
+        self.desconhecida = n
+
+        faltantes = [
+            f"{secao}/{uf}"
+            for secao in ("internas", "fcp", "interestaduais")
+            for uf in self.ufs if uf not in dados[secao]
+        ]
+        if faltantes:
+            raise ValueError(f"Tabela de alíquotas incompleta: {', '.join(faltantes)}")
+
+        self.internas = np.full(n + 1, np.nan)
+        self.internas[:n] = [dados["internas"][uf] for uf in self.ufs]
+        self.fcp = np.full(n + 1, np.nan)
+        self.fcp[:n] = [dados["fcp"][uf] for uf in self.ufs]
+
+        # Linha = UF de origem, coluna = UF de destino; None (mesma UF) vira NaN
+        self.interestaduais = np.full((n + 1, n + 1), np.nan)
+        for pos, uf in enumerate(self.ufs):
+            linha = dados["interestaduais"][uf]
+            if len(linha) != n:
+                raise ValueError(f"Linha interestadual de {uf} com {len(linha)} UFs (esperado {n})")
+            self.interestaduais[pos, :n] = np.array(linha, dtype=float)
+
+        importados = dados.get("importados", {})
+        self.aliquota_importados = float(importados.get("aliquota", 4.0))
+        self.origens_importadas = frozenset(str(o) for o in importados.get("origens", ()))
+        self.importado = np.zeros(_ORIGEM_AUSENTE + 1, dtype=bool)
+        for origem in self.origens_importadas:
+            self.importado[int(origem)] = True
+
+    # =====================================================
+    # CONSULTAS UNITÁRIAS
+    # =====================================================
+
+    def posicao(self, uf) -> int:
+        """Posição da UF nos arrays (UF desconhecida/ausente -> última posição)."""
+        return self.indice.get(_uf(uf), self.desconhecida)
+
+    def aliquota_interna(self, uf) -> float | None:
+        """Alíquota interna modal da UF (%)."""
+        aliquota = self.internas[self.posicao(uf)]
+        return None if np.isnan(aliquota) else float(aliquota)
+
+    def aliquota_fcp(self, uf) -> float | None:
+        """FCP padrão da UF (%)."""
+        aliquota = self.fcp[self.posicao(uf)]
+        return None if np.isnan(aliquota) else float(aliquota)
+
+    def aliquota_interestadual(self, uf_origem, uf_destino, origem_mercadoria="0") -> float | None:
+        """
+        Alíquota interestadual (%) da operação.
+
+        Args:
+            uf_origem: UF do emitente
+            uf_destino: UF do destinatário
+            origem_mercadoria: Origem da mercadoria (orig do ICMS, 0-8)
+
+        Returns:
+            4% para mercadoria importada, senão 7% ou 12% pela matriz;
+            None para a mesma UF ou UF desconhecida
+        """
+        aliquota = self.interestaduais[self.posicao(uf_origem), self.posicao(uf_destino)]
+        if np.isnan(aliquota):
+            return None
+        if str(origem_mercadoria or "").strip() in self.origens_importadas:
+            return self.aliquota_importados
+        return float(aliquota)
+
+    # =====================================================
+    # CONSULTAS VETORIAIS
+    # =====================================================
+
+    def posicoes(self, ufs) -> np.ndarray:
+        """Posições de um array de UFs, resolvidas uma vez por UF distinta."""
+        codigos, unicos = pd.factorize(pd.Series(ufs, dtype=object), use_na_sentinel=False)
+        posicoes = np.array([self.posicao(uf) for uf in unicos], dtype=np.intp)
+        return posicoes[codigos] if len(unicos) else np.zeros(0, dtype=np.intp)
+
+    def origens(self, origens) -> np.ndarray:
+        """Origem da mercadoria de cada item como posição 0-9 (ausente/inválida = 10)."""
+        codigos, unicos = pd.factorize(pd.Series(origens, dtype=object), use_na_sentinel=False)
+        valores = np.array([
+            int(o) if (o := str(v or "").strip()).isdigit() and len(o) == 1 else _ORIGEM_AUSENTE
+            for v in unicos
+        ], dtype=np.intp)
+        return valores[codigos] if len(unicos) else np.zeros(0, dtype=np.intp)
+
+    def aliquotas_interestaduais(self, ufs_origem, ufs_destino, origens) -> np.ndarray:
+        """aliquota_interestadual para arrays de itens (NaN onde não se aplica)."""
+        aliquotas = self.interestaduais[self.posicoes(ufs_origem), self.posicoes(ufs_destino)]
+        importado = self.importado[self.origens(origens)] & ~np.isnan(aliquotas)
+        return np.where(importado, self.aliquota_importados, aliquotas)
+
+    def aliquotas_internas(self, ufs) -> np.ndarray:
+        """Alíquota interna de cada UF do array (NaN se desconhecida)."""
+        return self.internas[self.posicoes(ufs)]
+
+    def aliquotas_fcp(self, ufs) -> np.ndarray:
+        """FCP padrão de cada UF do array (NaN se desconhecida)."""
+        return self.fcp[self.posicoes(ufs)]
+
+
+# =====================================================
+# TABELA DO PROCESSO
+# =====================================================
+
+def carregar_tabela(path: Path = UF_RATE_TABLE_PATH) -> TabelaAliquotasUF:
+    """Lê o JSON da tabela de alíquotas por UF."""
+    with open(path, encoding="utf-8") as f:
+        tabela = TabelaAliquotasUF(json.load(f))
+    app_logger.info(f"📊 Tabela de alíquotas ICMS por UF carregada (versão {tabela.versao})")
+    return tabela
+
+
+@carregar_uma_vez
+def get_tabela_aliquotas() -> TabelaAliquotasUF:
+    """Tabela de alíquotas por UF do processo (carregada na primeira consulta)."""
+    return carregar_tabela()
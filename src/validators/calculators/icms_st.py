@@ -0,0 +1,236 @@
+"""
+Cálculo do ICMS-ST (substituição tributária) item a item, em lote.
+
+Para os itens com ST na operação (CST 10/30/70, CSOSN 201/202/203 e CST
+90/900 com ST informado), a MVA original vem da tabela por CEST/NCM e par de
+UFs (aliquotas.mva_table). Em operação interestadual com alíquota menor que a
+interna do destino a MVA é ajustada:
+
+    MVA ajustada = [(1 + MVA original) × (1 - ALQ inter) / (1 - ALQ intra)] - 1
+
+A base do ST é o valor da operação (produto + IPI + frete + seguro + outras
+despesas - desconto) acrescido da MVA e reduzido por pRedBCST; o ICMS-ST é
+a base × alíquota interna do destino menos o ICMS próprio. Itens sem regra na
+tabela usam a MVA declarada (confere só a aritmética), assim como os de regra
+genérica (sem UFs de destino definidas) com MVA declarada; modalidades por
+pauta ou preço tabelado não são calculadas.
+
+Os itens de muitas notas são calculados de uma vez, nos arrays de
+tax_calculator.itens_para_arrays; as diferenças para os valores declarados
+(vBCST, pMVAST, vICMSST, vFCPST) saem de ResultadoST.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.validators.aliquotas.mva_table import get_tabela_mva
+from src.validators.aliquotas.rate_table import get_tabela_aliquotas
+from src.validators.calculators.tax_calculator import (
+    ESCALA_ALIQUOTA,
+    TIPOS_SERVICO,
+    em_centavos,
+    itens_para_arrays,
+    pertence,
+)
+
+# CST/CSOSN com ST obrigatório na operação
+CST_COM_ST = ("10", "30", "70", "201", "202", "203")
+# CST/CSOSN com ST quando informado
+CST_ST_OPCIONAL = ("90", "900")
+# CSOSN do Simples Nacional com ST: o ICMS próprio deduzido é o da alíquota da operação
+CSOSN_SIMPLES_ST = ("201", "202", "203")
+
+# modBCST: 4 = margem de valor agregado (MVA); 6 = valor da operação. Ausente = MVA
+MODALIDADES_CALCULADAS = ("4", "6", "")
+MODALIDADE_VALOR_OPERACAO = "6"
+
+CAMPOS_ST_TEXTO = ("ncm", "cest", "origem", "cst_csosn", "mod_bc_st")
+CAMPOS_ST_NUMERICOS = (
+    "valor_total", "vFrete", "vSeg", "vOutro", "vDesc", "vIPI", "vBC_icms", "vICMS",
+    "aliq_mva_st", "aliq_red_bc_st", "vBC_st", "aliq_icms_st", "vICMS_st", "aliq_fcp_st", "vFCP_st",
+)
+
+# Tolerância na comparação da MVA declarada com a da tabela (0,01 ponto percentual)
+TOLERANCIA_MVA = ESCALA_ALIQUOTA // 100
+
+
+class ResultadoST(NamedTuple):
+    """ICMS-ST por item: alíquotas/MVA em % × ESCALA_ALIQUOTA, valores em centavos."""
+    nota: np.ndarray
+    item: np.ndarray
+    cst: np.ndarray
+    exigido: np.ndarray             # CST/CSOSN com ST obrigatório
+    calculavel: np.ndarray          # ST na operação, modalidade por MVA/valor da operação e MVA conhecida
+    mva_tabela: np.ndarray          # MVA veio da tabela (senão, da declarada)
+    mva: np.ndarray                 # aplicada (ajustada em operação interestadual)
+    aliquota: np.ndarray            # interna do destino
+    base: np.ndarray
+    valor: np.ndarray
+    fcp: np.ndarray
+    informado: np.ndarray           # vBCST/vICMSST informados no item
+    mva_declarada: np.ndarray
+    base_declarada: np.ndarray
+    valor_declarado: np.ndarray
+    fcp_declarado: np.ndarray
+    mva_generica: np.ndarray        # regra da tabela sem UFs de destino definidas (MVA de referência)
+    mva_referencia: np.ndarray      # MVA da tabela (ajustada) das regras genéricas; 0 nas demais
+
+    def por_item(self) -> list[dict]:
+        """Uma linha por item com ST exigido ou informado (valores em reais)."""
+        linhas = np.flatnonzero(self.exigido | self.informado)
+        return [
+            {
+                'nota': int(self.nota[i]),
+                'item': int(self.item[i]),
+                'cst': self.cst[i],
+                'exigido': bool(self.exigido[i]),
+                'calculavel': bool(self.calculavel[i]),
+                'informado': bool(self.informado[i]),
+                'mva_tabela': bool(self.mva_tabela[i]),
+                'mva_generica': bool(self.mva_generica[i]),
+                'mva': int(self.mva[i]) / ESCALA_ALIQUOTA,
+                'aliquota': int(self.aliquota[i]) / ESCALA_ALIQUOTA,
+                'valor_base': int(self.base[i]) / 100,
+                'valor_st': int(self.valor[i]) / 100,
+                'valor_fcp': int(self.fcp[i]) / 100,
+                'mva_declarada': int(self.mva_declarada[i]) / ESCALA_ALIQUOTA if self.informado[i] else None,
+                'base_declarada': int(self.base_declarada[i]) / 100 if self.informado[i] else None,
+                'st_declarado': int(self.valor_declarado[i]) / 100 if self.informado[i] else None,
+                'fcp_declarado': int(self.fcp_declarado[i]) / 100 if self.informado[i] else None,
+            }
+            for i in linhas.tolist()
+        ]
+
+    def totais(self, n_notas: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(base, ICMS-ST, FCP-ST) calculados, somados por nota, em centavos."""
+        if n_notas is None:
+            n_notas = int(self.nota.max()) + 1 if len(self.nota) else 0
+        return tuple(
+            np.rint(np.bincount(self.nota, weights=valores, minlength=n_notas)).astype(np.int64)
+            for valores in (self.base, self.valor, self.fcp)
+        )
+
+
+def _regras_mva(arrays: dict[str, np.ndarray], posicoes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(MVA original, alíquota específica, regra genérica) da tabela para os itens em posicoes (NaN sem regra)."""
+    mva = np.full(len(arrays["nota"]), np.nan)
+    aliquota = np.full(len(arrays["nota"]), np.nan)
+    generica = np.zeros(len(arrays["nota"]), dtype=bool)
+    if not len(posicoes):
+        return mva, aliquota, generica
+
+    tabela = get_tabela_mva()
+    chaves = pd.Series(list(zip(
+        arrays["uf_emitente"][posicoes], arrays["uf_destinatario"][posicoes],
+        arrays["cest"][posicoes], arrays["ncm"][posicoes], strict=True,
+    )), dtype=object)
+    # Uma consulta por combinação distinta de UFs, CEST e NCM
+    codigos, unicos = pd.factorize(chaves)
+    regras = [tabela.consultar(*chave) for chave in unicos]
+    mva[posicoes] = np.array([np.nan if r is None else r.mva for r in regras], dtype=float)[codigos]
+    aliquota[posicoes] = np.array(
+        [np.nan if r is None or r.aliquota is None else r.aliquota for r in regras], dtype=float,
+    )[codigos]
+    generica[posicoes] = np.array([r is not None and r.generica for r in regras], dtype=bool)[codigos]
+    return mva, aliquota, generica
+
+
+def calcular_st(arrays: dict[str, np.ndarray]) -> ResultadoST:
+    """
+    Calcula MVA aplicada, base, ICMS-ST e FCP-ST de todos os itens.
+
+    Args:
+        arrays: Arrays por campo dos itens com CAMPOS_ST_TEXTO e
+            CAMPOS_ST_NUMERICOS (ver calcular_st_lote)
+
+    Returns:
+        ResultadoST
+    """
+    tabela_uf = get_tabela_aliquotas()
+    produto = ~pertence(arrays["tipo"], TIPOS_SERVICO)
+    cst = arrays["cst_csosn"]
+
+    informado = produto & ((np.nan_to_num(arrays["vBC_st"]) > 0) | (np.nan_to_num(arrays["vICMS_st"]) > 0))
+    exigido = produto & pertence(cst, CST_COM_ST)
+    com_st = exigido | (informado & pertence(cst, CST_ST_OPCIONAL))
+
+    mva_original, aliquota_especifica, mva_generica = _regras_mva(arrays, np.flatnonzero(com_st))
+    mva_tabela = ~np.isnan(mva_original)
+
+    # Alíquota interna do destino: específica da tabela, senão a declarada, senão a da UF
+    aliq_declarada = np.nan_to_num(arrays["aliq_icms_st"])
+    aliquota = np.where(
+        ~np.isnan(aliquota_especifica), aliquota_especifica,
+        np.where(aliq_declarada > 0, aliq_declarada, tabela_uf.aliquotas_internas(arrays["uf_destinatario"])),
+    )
+
+    # MVA ajustada quando a alíquota interestadual é menor que a interna do destino
+    interestadual = tabela_uf.aliquotas_interestaduais(arrays["uf_emitente"], arrays["uf_destinatario"], arrays["origem"])
+    ajustar = mva_tabela & ~np.isnan(interestadual) & (interestadual < aliquota)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mva_ajustada = np.round(
+            ((1 + mva_original / 100) * (1 - interestadual / 100) / (1 - aliquota / 100) - 1) * 100, 2,
+        )
+    mva_da_tabela = np.where(ajustar, mva_ajustada, mva_original)
+    mva_declarada = np.nan_to_num(arrays["aliq_mva_st"])
+    # Regra genérica com MVA declarada: vale a declarada (a da tabela é referência)
+    mva_tabela &= ~(mva_generica & (mva_declarada > 0))
+    mva = np.where(mva_tabela, mva_da_tabela, mva_declarada)
+
+    valor_operacao = pertence(arrays["mod_bc_st"], (MODALIDADE_VALOR_OPERACAO,))
+    mva = np.where(valor_operacao, 0.0, mva)
+    calculavel = (
+        com_st
+        & pertence(arrays["mod_bc_st"], MODALIDADES_CALCULADAS)
+        & (mva_tabela | (mva_declarada > 0) | valor_operacao)
+        & ~np.isnan(aliquota)
+    )
+
+    # Base: valor da operação + MVA, com redução (centavos, half-up)
+    operacao = (
+        em_centavos(arrays["valor_total"]) + em_centavos(arrays["vIPI"]) + em_centavos(arrays["vFrete"])
+        + em_centavos(arrays["vSeg"]) + em_centavos(arrays["vOutro"]) - em_centavos(arrays["vDesc"])
+    )
+    reducao = np.nan_to_num(arrays["aliq_red_bc_st"])
+    base = np.floor(operacao * (1 + mva / 100) * (1 - reducao / 100) + 0.5)
+    base = np.where(calculavel, np.nan_to_num(base), 0).astype(np.int64)
+
+    # ICMS próprio deduzido: o destacado; no Simples Nacional, o da alíquota da operação
+    icms_proprio = em_centavos(arrays["vICMS"])
+    simples = pertence(cst, CSOSN_SIMPLES_ST) & (icms_proprio == 0)
+    if simples.any():
+        aliq_operacao = np.where(
+            np.isnan(interestadual), tabela_uf.aliquotas_internas(arrays["uf_emitente"]), interestadual,
+        )
+        base_propria = operacao - em_centavos(arrays["vIPI"])
+        hipotetico = np.floor(base_propria * np.nan_to_num(aliq_operacao) / 100 + 0.5).astype(np.int64)
+        icms_proprio = np.where(simples, hipotetico, icms_proprio)
+
+    aliquota_escala = np.where(calculavel, np.rint(np.nan_to_num(aliquota) * ESCALA_ALIQUOTA), 0).astype(np.int64)
+    divisor = 100 * ESCALA_ALIQUOTA
+    valor = np.maximum((base * aliquota_escala + divisor // 2) // divisor - icms_proprio, 0)
+    valor = np.where(calculavel, valor, 0)
+
+    # FCP-ST: alíquota declarada (produto com FCP) ou a padrão da UF de destino
+    fcp_declarado = np.nan_to_num(arrays["aliq_fcp_st"])
+    aliq_fcp = np.where(fcp_declarado > 0, fcp_declarado, np.nan_to_num(tabela_uf.aliquotas_fcp(arrays["uf_destinatario"])))
+    fcp = (base * np.rint(aliq_fcp * ESCALA_ALIQUOTA).astype(np.int64) + divisor // 2) // divisor
+
+    return ResultadoST(
+        arrays["nota"], arrays["item"], cst, exigido, calculavel, mva_tabela & calculavel,
+        np.where(calculavel, np.rint(mva * ESCALA_ALIQUOTA), 0).astype(np.int64),
+        aliquota_escala, base, valor, fcp, informado,
+        np.rint(mva_declarada * ESCALA_ALIQUOTA).astype(np.int64),
+        np.where(informado, em_centavos(arrays["vBC_st"]), 0),
+        np.where(informado, em_centavos(arrays["vICMS_st"]), 0),
+        np.where(informado, em_centavos(arrays["vFCP_st"]), 0),
+        mva_generica & calculavel,
+        np.where(mva_generica & calculavel, np.rint(np.nan_to_num(mva_da_tabela) * ESCALA_ALIQUOTA), 0).astype(np.int64),
+    )
+
+
+def calcular_st_lote(notas: list[dict]) -> ResultadoST:
+    """Calcula o ICMS-ST dos itens de muitas notas em uma única passada vetorial."""
+    return calcular_st(itens_para_arrays(notas, CAMPOS_ST_NUMERICOS, CAMPOS_ST_TEXTO))
@@ -1,22 +1,382 @@
-"""Calculadora de impostos para Produtos e Serviços."""
+"""
+Calculadora de impostos para Produtos e Serviços, item a item.
 
-from typing import Optional
+Os itens são convertidos em arrays por campo e todos os impostos são
+calculados de uma vez, em matrizes (itens × impostos):
 
-from src.constants import TaxType, ClassificationType
+- a alíquota de cada item é resolvida pelo CST/CSOSN, CFOP, NCM e regime:
+  imposto informado no documento (grupo com CST) usa a alíquota declarada,
+  CST sem tributação zera, e item sem o imposto informado usa a alíquota
+  padrão (TIPI do NCM para IPI; para ICMS, alíquota interna da UF do
+  emitente ou interestadual da tabela por UF em CFOP 6xxx; para ISS, a do
+  município em que o imposto é devido e do item da LC 116, etc.);
+- base e valor são calculados em centavos inteiros, com a alíquota em
+  décimos de milésimo de ponto percentual e arredondamento half-up, então
+  o valor calculado confere com o do XML quando base e alíquota conferem.
+
+Os resultados saem por item (ResultadoImpostos.por_item) e agregados por
+nota (ResultadoImpostos.por_nota), no formato da tabela `impostos`.
+
+IBS e CBS (reforma tributária) entram como colunas da mesma matriz: para
+os itens com o grupo IBSCBS, a alíquota vem da tabela vigente na data de
+emissão (aliquotas.ibs_cbs_table), conforme o efeito do CST e a redução da
+classificação tributária (cClassTrib); CST com tributação não calculada
+(diferimento, alíquota fixa...) repassam o valor declarado.
+
+O DIFAL (partilha do ICMS com a UF de destino em venda interestadual a
+consumidor final não contribuinte) e o FCP de destino são calculados para um
+lote inteiro de notas com calcular_difal_lote, na mesma estrutura de arrays.
+"""
+
+from collections.abc import Iterable
+from operator import attrgetter
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.constants import ClassificationType, TaxType
+from src.validators.aliquotas.ibs_cbs_table import (
+    EFEITO_REDUZIDO,
+    EFEITO_SEM_IMPOSTO,
+    EFEITO_TRIBUTADO,
+    data_aaaammdd,
+    get_tabela_ibs_cbs,
+)
+from src.validators.aliquotas.rate_table import get_tabela_aliquotas
+from src.validators.iss.iss_index import get_iss_index
+from src.validators.ncm.ncm_index import aliquota_ipi
 from logs.logger import app_logger
 
 
+# Ordem das colunas das matrizes de resultado
+IMPOSTOS = (
+    TaxType.ICMS, TaxType.IPI, TaxType.PIS, TaxType.COFINS,
+    TaxType.ISS, TaxType.INSS, TaxType.IRPJ, TaxType.CSLL,
+    TaxType.IBS, TaxType.CBS,
+)
+
+# Campos declarados no item: imposto -> (base, alíquota, valor)
+CAMPOS_DECLARADOS = {
+    TaxType.ICMS: ("vBC_icms", "aliq_icms", "vICMS"),
+    TaxType.IPI: ("vBC_ipi", "aliq_ipi", "vIPI"),
+    TaxType.PIS: ("vBC_pis", "aliq_pis", "vPIS"),
+    TaxType.COFINS: ("vBC_cofins", "aliq_cofins", "vCOFINS"),
+    TaxType.ISS: ("vBC_iss", "aliq_iss", "vISS"),
+    TaxType.INSS: (None, None, "vINSS"),
+    TaxType.IRPJ: (None, None, "vIR"),
+    TaxType.CSLL: (None, None, "vCSLL"),
+    # Alíquota do IBS = estadual + municipal (ver _aliquota_reforma)
+    TaxType.IBS: ("vBC_ibs_cbs", None, "vIBS"),
+    TaxType.CBS: ("vBC_ibs_cbs", "aliq_cbs", "vCBS"),
+}
+
+# Impostos com grupo/CST no item da NF-e: informado quando o CST está preenchido
+# (nos itens de serviço, quando o valor foi declarado)
+CAMPOS_CST = {
+    TaxType.ICMS: "cst_csosn",
+    TaxType.IPI: "cst_ipi",
+    TaxType.PIS: "cst_pis",
+    TaxType.COFINS: "cst_cofins",
+    TaxType.IBS: "cst_ibs_cbs",
+    TaxType.CBS: "cst_ibs_cbs",
+}
+
+# CST/CSOSN sem imposto próprio destacado no item
+CST_SEM_IMPOSTO = {
+    TaxType.ICMS: ("30", "40", "41", "50", "60", "102", "103", "202", "203", "300", "400", "500"),
+    TaxType.IPI: ("01", "02", "03", "04", "05", "51", "52", "53", "54", "55"),
+    TaxType.PIS: ("04", "05", "06", "07", "08", "09", "70", "71", "72", "73", "74", "75"),
+    TaxType.COFINS: ("04", "05", "06", "07", "08", "09", "70", "71", "72", "73", "74", "75"),
+}
+
+IMPOSTOS_PRODUTO = frozenset({TaxType.ICMS, TaxType.IPI})
+IMPOSTOS_SERVICO = frozenset({TaxType.ISS, TaxType.INSS, TaxType.IRPJ, TaxType.CSLL})
+TIPOS_SERVICO = ("SERVICO", ClassificationType.SERVICO.value)
+CAMPOS_SERVICO = frozenset({"vBC_iss", "aliq_iss", "vISS", "vINSS", "vIR", "vCSLL", "item_lista_servico"})
+
+# IBS/CBS: alíquota pela tabela de vigência e pelo efeito do CST (sem alíquota padrão)
+IMPOSTOS_REFORMA = frozenset({TaxType.IBS, TaxType.CBS})
+# Campos do grupo IBSCBS, lidos só dos itens com o grupo (CST preenchido)
+CAMPOS_REFORMA = frozenset({
+    "c_class_trib", "vBC_ibs_cbs", "aliq_ibs_uf", "aliq_ibs_mun", "aliq_cbs",
+    "aliq_red_ibs", "aliq_red_cbs", "vIBS", "vCBS",
+})
+
+# Grupo ICMSUFDest do item (DIFAL)
+CAMPOS_DIFAL = (
+    "vBC_uf_dest", "aliq_icms_uf_dest", "aliq_fcp_uf_dest", "aliq_icms_inter",
+    "vICMS_uf_dest", "vFCP_uf_dest",
+)
+
+# CST/CSOSN sem DIFAL: isenta, não tributada, imune ou ICMS já retido por ST
+CST_SEM_DIFAL = ("40", "41", "60", "300", "400", "500")
+
+CAMPOS_NUMERICOS = tuple(sorted({
+    campo for campos in CAMPOS_DECLARADOS.values() for campo in campos if campo
+} | {"valor_total"} | (CAMPOS_REFORMA - {"c_class_trib"})))
+CAMPOS_TEXTO = tuple(dict.fromkeys((
+    "cfop", "ncm", "tipo", "origem", *CAMPOS_CST.values(), "c_class_trib", "item_lista_servico",
+)))
+# Campos da nota repetidos em cada item
+CAMPOS_NOTA = (
+    "crt", "uf_emitente", "uf_destinatario", "ind_final", "ind_ie_dest",
+    "codigo_municipio", "municipio_prestador", "municipio_tomador",
+)
+
+# Alíquota em % × ESCALA_ALIQUOTA (inteiro): 4 casas decimais, como no XML
+ESCALA_ALIQUOTA = 10_000
+
+
+class ResultadoImpostos(NamedTuple):
+    """Impostos calculados: matrizes (itens × IMPOSTOS) em inteiros."""
+    nota: np.ndarray            # posição da nota de cada item
+    item: np.ndarray            # posição do item na nota (1..n)
+    base: np.ndarray            # centavos
+    aliquota: np.ndarray        # % × ESCALA_ALIQUOTA
+    valor: np.ndarray           # centavos
+    declarado: np.ndarray       # centavos (valor informado no documento; 0 se ausente)
+    informado: np.ndarray       # imposto informado no documento
+
+    @property
+    def diferenca(self) -> np.ndarray:
+        """Calculado - declarado (centavos), só onde o imposto foi informado."""
+        return np.where(self.informado, self.valor - self.declarado, 0)
+
+    def por_item(self) -> list[dict]:
+        """Uma linha por item e imposto com base ou valor (valores em reais)."""
+        linhas, colunas = np.nonzero((self.base > 0) | (self.valor > 0) | (self.declarado > 0))
+        diferenca = self.diferenca
+        return [
+            {
+                'nota': int(self.nota[i]),
+                'item': int(self.item[i]),
+                'tipo_imposto': IMPOSTOS[j].value,
+                'aliquota': int(self.aliquota[i, j]) / ESCALA_ALIQUOTA,
+                'valor_base': int(self.base[i, j]) / 100,
+                'valor_imposto': int(self.valor[i, j]) / 100,
+                'valor_declarado': int(self.declarado[i, j]) / 100 if self.informado[i, j] else None,
+                'diferenca': int(diferenca[i, j]) / 100,
+            }
+            for i, j in zip(linhas.tolist(), colunas.tolist(), strict=True)
+        ]
+
+    def totais(self, n_notas: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(base, valor) somados por nota: matrizes (notas × IMPOSTOS) em centavos."""
+        if n_notas is None:
+            n_notas = int(self.nota.max()) + 1 if len(self.nota) else 0
+        base = np.zeros((n_notas, len(IMPOSTOS)), dtype=np.int64)
+        valor = np.zeros_like(base)
+        if not len(self.nota):
+            return base, valor
+
+        # Itens agrupados por nota (itens_para_arrays já gera em ordem): soma por fatia
+        ordem = np.argsort(self.nota, kind="stable")
+        notas = self.nota[ordem]
+        inicios = np.flatnonzero(np.r_[True, notas[1:] != notas[:-1]])
+        base[notas[inicios]] = np.add.reduceat(self.base[ordem], inicios, axis=0)
+        valor[notas[inicios]] = np.add.reduceat(self.valor[ordem], inicios, axis=0)
+        return base, valor
+
+    def por_nota(self, n_notas: int | None = None) -> list[list[dict]]:
+        """Impostos de cada nota no formato da tabela `impostos` (alíquota efetiva)."""
+        base, valor = self.totais(n_notas)
+        notas = []
+        for base_nota, valor_nota in zip(base.tolist(), valor.tolist(), strict=True):
+            impostos = []
+            for tipo, b, v in zip(IMPOSTOS, base_nota, valor_nota, strict=True):
+                if b == 0 and v == 0:
+                    continue
+                impostos.append({
+                    'tipo_imposto': tipo.value,
+                    'aliquota': round(v * 100 / b, 2) if b else 0.0,
+                    'valor_base': b / 100,
+                    'valor_imposto': v / 100,
+                })
+            notas.append(impostos)
+        return notas
+
+
+class ResultadoDifal(NamedTuple):
+    """DIFAL e FCP de destino por item: alíquotas em % × ESCALA_ALIQUOTA, valores em centavos."""
+    nota: np.ndarray
+    item: np.ndarray
+    aplicavel: np.ndarray           # interestadual, consumidor final não contribuinte, com ICMS
+    base: np.ndarray
+    aliquota_interestadual: np.ndarray
+    aliquota_interna: np.ndarray    # UF de destino
+    aliquota_fcp: np.ndarray        # UF de destino
+    difal: np.ndarray
+    fcp: np.ndarray
+    informado: np.ndarray           # grupo ICMSUFDest presente no item
+    difal_declarado: np.ndarray
+    fcp_declarado: np.ndarray
+
+    def por_item(self) -> list[dict]:
+        """Uma linha por item com DIFAL aplicável ou partilha informada (valores em reais)."""
+        linhas = np.flatnonzero(self.aplicavel | self.informado)
+        return [
+            {
+                'nota': int(self.nota[i]),
+                'item': int(self.item[i]),
+                'aplicavel': bool(self.aplicavel[i]),
+                'informado': bool(self.informado[i]),
+                'valor_base': int(self.base[i]) / 100,
+                'aliquota_interestadual': int(self.aliquota_interestadual[i]) / ESCALA_ALIQUOTA,
+                'aliquota_interna': int(self.aliquota_interna[i]) / ESCALA_ALIQUOTA,
+                'aliquota_fcp': int(self.aliquota_fcp[i]) / ESCALA_ALIQUOTA,
+                'valor_difal': int(self.difal[i]) / 100,
+                'valor_fcp': int(self.fcp[i]) / 100,
+                'difal_declarado': int(self.difal_declarado[i]) / 100 if self.informado[i] else None,
+                'fcp_declarado': int(self.fcp_declarado[i]) / 100 if self.informado[i] else None,
+            }
+            for i in linhas.tolist()
+        ]
+
+    def totais(self, n_notas: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(DIFAL, FCP) somados por nota, em centavos."""
+        if n_notas is None:
+            n_notas = int(self.nota.max()) + 1 if len(self.nota) else 0
+        difal = np.bincount(self.nota, weights=self.difal, minlength=n_notas)
+        fcp = np.bincount(self.nota, weights=self.fcp, minlength=n_notas)
+        return np.rint(difal).astype(np.int64), np.rint(fcp).astype(np.int64)
+
+
+# =====================================================
+# ARRAYS DOS ITENS
+# =====================================================
+
+def itens_para_arrays(
+    notas: Iterable[dict],
+    campos_numericos: Iterable[str] = CAMPOS_NUMERICOS,
+    campos_texto: Iterable[str] = CAMPOS_TEXTO,
+) -> dict[str, np.ndarray]:
+    """
+    Achata os itens das notas em arrays por campo.
+
+    Args:
+        notas: Notas com seus itens
+        campos_numericos: Campos numéricos a extrair (o DIFAL usa valor_total, vBC_icms e CAMPOS_DIFAL)
+        campos_texto: Campos de texto a extrair ("tipo" é sempre extraído)
+
+    Returns:
+        dict com "nota", "item", "data_emissao" (AAAAMMDD), CAMPOS_NOTA e os
+        campos de texto ('' se ausente) e numéricos (float, NaN se ausente)
+    """
+    nota, item, datas, itens = [], [], [], []
+    campos_nota = {campo: [] for campo in CAMPOS_NOTA}
+    for pos, nf_data in enumerate(notas):
+        itens_nota = nf_data.get("itens", []) or []
+        nota.extend([pos] * len(itens_nota))
+        item.extend(range(1, len(itens_nota) + 1))
+        datas.extend([data_aaaammdd(nf_data.get("data_emissao"))] * len(itens_nota))
+        for campo, valores in campos_nota.items():
+            valores.extend([str(nf_data.get(campo) or "").strip().upper()] * len(itens_nota))
+        itens.extend(itens_nota)
+
+    arrays = {
+        "nota": np.array(nota, dtype=np.intp),
+        "item": np.array(item, dtype=np.intp),
+        "data_emissao": np.array(datas, dtype=np.int64),
+    }
+    for campo, valores in campos_nota.items():
+        arrays[campo] = np.array(valores, dtype=object)
+    _extrair_campos(arrays, itens, campos_numericos, campos_texto)
+    return arrays
+
+
+def _extrair_campos(
+    arrays: dict[str, np.ndarray], itens: list, campos_numericos: Iterable[str], campos_texto: Iterable[str],
+) -> None:
+    """Acrescenta a arrays os campos de texto e numéricos dos itens (ver itens_para_arrays)."""
+    for campo in dict.fromkeys(("tipo", *campos_texto)):
+        if campo not in CAMPOS_SERVICO and campo not in CAMPOS_REFORMA:
+            arrays[campo] = _texto(_valores(itens, campo))
+
+    # Campos de serviço só existem nos itens de serviço e os do IBS/CBS nos
+    # itens com o grupo IBSCBS (não percorre os demais)
+    servico = np.flatnonzero(pertence(arrays["tipo"], TIPOS_SERVICO))
+    reforma = np.flatnonzero(arrays["cst_ibs_cbs"] != "") if "cst_ibs_cbs" in arrays else np.array([], dtype=np.intp)
+    parciais = (
+        (CAMPOS_SERVICO, servico, [itens[i] for i in servico.tolist()]),
+        (CAMPOS_REFORMA, reforma, [itens[i] for i in reforma.tolist()]),
+    )
+    for campo in campos_texto:
+        for campos, posicoes, itens_parciais in parciais:
+            if campo in campos:
+                arrays[campo] = np.full(len(itens), "", dtype=object)
+                arrays[campo][posicoes] = _texto(_valores(itens_parciais, campo))
+    for campo in campos_numericos:
+        for campos, posicoes, itens_parciais in parciais:
+            if campo in campos:
+                arrays[campo] = np.full(len(itens), np.nan)
+                arrays[campo][posicoes] = _numeros(_valores(itens_parciais, campo))
+                break
+        else:
+            arrays[campo] = _numeros(_valores(itens, campo))
+
+
+def _valores(itens: list, campo: str) -> list:
+    """Valores do campo em todos os itens (None se ausente)."""
+    try:
+        # Registros do parser com o campo preenchido: leitura direta dos slots
+        return list(map(attrgetter(campo), itens))
+    except AttributeError:
+        return [it.get(campo) for it in itens]
+
+
+def _numeros(valores: list) -> np.ndarray:
+    try:
+        return np.array(valores, dtype=float)     # None -> NaN
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+
+def _texto(valores: list) -> np.ndarray:
+    """Texto sem espaços nas pontas ('' se ausente), normalizado por valor distinto."""
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+    normalizados = np.array(
+        ["" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v).strip() for v in unicos],
+        dtype=object,
+    )
+    return normalizados[codigos] if len(normalizados) else np.array([], dtype=object)
+
+
+def pertence(textos: np.ndarray, valores) -> np.ndarray:
+    """Pertinência (a uma coleção ou a um predicado) calculada uma vez por valor distinto."""
+    codigos, unicos = pd.factorize(textos)
+    teste = valores if callable(valores) else frozenset(valores).__contains__
+    return np.array([teste(v) for v in unicos], dtype=bool)[codigos] if len(unicos) else np.zeros(len(textos), dtype=bool)
+
+
+def em_centavos(valores: np.ndarray) -> np.ndarray:
+    """Valores em reais (NaN = 0) -> centavos inteiros."""
+    return np.rint(np.nan_to_num(valores) * 100).astype(np.int64)
+
+
+def _aliquotas_ipi_ncm(ncm: np.ndarray) -> np.ndarray:
+    """Alíquota TIPI de cada item (NaN se a tabela não informar), consultada por NCM distinto."""
+    unicos, inverso = np.unique(ncm, return_inverse=True)
+    # aliquota_ipi devolve None quando a tabela não informa: vira NaN
+    aliquotas = np.array([aliquota_ipi(n) for n in unicos], dtype=float)
+    return aliquotas[inverso]
+
+
+# =====================================================
+# CALCULADORA
+# =====================================================
+
 class TaxCalculator:
     """Calculadora de impostos para NFe e RPS."""
-    
-    # Alíquotas padrão para PRODUTOS
+
+    # Alíquotas padrão para PRODUTOS (itens sem o imposto informado)
     ALIQUOTAS_PRODUTO = {
         TaxType.ICMS: 18.0,
         TaxType.IPI: 10.0,
         TaxType.PIS: 1.65,
         TaxType.COFINS: 7.6,
     }
-    
+
     # Alíquotas padrão para SERVIÇOS
     ALIQUOTAS_SERVICO = {
         TaxType.ISS: 5.0,
@@ -26,180 +386,261 @@ class TaxCalculator:
         TaxType.IRPJ: 1.5,
         TaxType.CSLL: 1.0,
     }
-    
+
+    # ICMS padrão em operação interestadual (CFOP 6xxx) quando as UFs não constam na tabela
+    ALIQUOTA_ICMS_INTERESTADUAL = 12.0
+
     def __init__(self, nf_data: dict):
         """Inicializa calculadora."""
         self.nf_data = nf_data
         self.valor_total = nf_data.get('valor_total', 0)
         self.classificacao = nf_data.get('classificacao', '')
+        self.resultado: ResultadoImpostos | None = None
         self.impostos_calculados = []
-    
+
     def calcular_todos(self) -> list[dict]:
-        """Calcula todos os impostos baseado na classificação."""
-        self.impostos_calculados = []
-        
-        # Determinar se é produto ou serviço
-        is_produto = self.classificacao in [
-            ClassificationType.PRODUTO.value,
-            ClassificationType.AMBOS.value
-        ]
-        
-        is_servico = self.classificacao in [
-            ClassificationType.SERVICO.value,
-            ClassificationType.AMBOS.value
-        ]
-        
-        # Impostos de PRODUTO
-        if is_produto:
-            self._calcular_icms()
-            self._calcular_ipi()
-        
-        # Impostos de SERVIÇO
-        if is_servico:
-            self._calcular_iss()
-            self._calcular_inss()
-            self._calcular_irpj()
-            self._calcular_csll()
-        
-        # Impostos COMUNS (PIS/COFINS)
-        self._calcular_pis(is_produto)
-        self._calcular_cofins(is_produto)
-        
+        """Calcula os impostos de todos os itens e retorna os totais da nota."""
+        self.resultado = self.calcular(itens_para_arrays([self.nf_data]))
+        self.impostos_calculados = self.resultado.por_nota(1)[0]
+
         app_logger.info(f"✅ {len(self.impostos_calculados)} impostos calculados")
         return self.impostos_calculados
-    
-    # =====================================================
-    # IMPOSTOS DE PRODUTO
-    # =====================================================
-    
-    def _calcular_icms(self):
-        """Calcula ICMS (Imposto sobre Circulação de Mercadorias)."""
-        aliquota = self.ALIQUOTAS_PRODUTO[TaxType.ICMS]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.ICMS.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
-    def _calcular_ipi(self):
-        """Calcula IPI (Imposto sobre Produtos Industrializados)."""
-        aliquota = self.ALIQUOTAS_PRODUTO[TaxType.IPI]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.IPI.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
-    # =====================================================
-    # IMPOSTOS DE SERVIÇO
-    # =====================================================
-    
-    def _calcular_iss(self):
-        """Calcula ISS (Imposto sobre Serviços)."""
-        aliquota = self.ALIQUOTAS_SERVICO[TaxType.ISS]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.ISS.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
-    def _calcular_inss(self):
-        """Calcula INSS (para serviços)."""
-        aliquota = self.ALIQUOTAS_SERVICO[TaxType.INSS]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.INSS.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
-    def _calcular_irpj(self):
-        """Calcula IRPJ (Imposto de Renda Pessoa Jurídica)."""
-        aliquota = self.ALIQUOTAS_SERVICO[TaxType.IRPJ]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.IRPJ.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
-    def _calcular_csll(self):
-        """Calcula CSLL (Contribuição Social sobre o Lucro)."""
-        aliquota = self.ALIQUOTAS_SERVICO[TaxType.CSLL]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.CSLL.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
+
+    def calcular_itens(self) -> list[dict]:
+        """Impostos de cada item (calcula a nota se ainda não calculada)."""
+        if self.resultado is None:
+            self.calcular_todos()
+        return self.resultado.por_item()
+
     # =====================================================
-    # IMPOSTOS COMUNS (PIS/COFINS)
+    # CÁLCULO VETORIAL
     # =====================================================
-    
-    def _calcular_pis(self, is_produto: bool = True):
-        """Calcula PIS."""
-        # Alíquota diferente para produto vs serviço
-        aliquota = self.ALIQUOTAS_PRODUTO[TaxType.PIS] if is_produto else self.ALIQUOTAS_SERVICO[TaxType.PIS]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.PIS.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
-    def _calcular_cofins(self, is_produto: bool = True):
-        """Calcula COFINS."""
-        # Alíquota diferente para produto vs serviço
-        aliquota = self.ALIQUOTAS_PRODUTO[TaxType.COFINS] if is_produto else self.ALIQUOTAS_SERVICO[TaxType.COFINS]
-        valor_base = self.valor_total
-        valor_imposto = valor_base * (aliquota / 100)
-        
-        self.impostos_calculados.append({
-            'tipo_imposto': TaxType.COFINS.value,
-            'aliquota': aliquota,
-            'valor_base': valor_base,
-            'valor_imposto': round(valor_imposto, 2),
-        })
-    
+
+    @classmethod
+    def calcular(cls, arrays: dict[str, np.ndarray]) -> ResultadoImpostos:
+        """
+        Calcula base, alíquota e valor de todos os impostos para todos os itens.
+
+        Args:
+            arrays: Arrays por campo dos itens (ver itens_para_arrays)
+
+        Returns:
+            ResultadoImpostos
+        """
+        n = len(arrays["nota"])
+        servico = pertence(arrays["tipo"], TIPOS_SERVICO)
+        simples = pertence(arrays["crt"], ("1", "2"))
+        interestadual = pertence(arrays["cfop"], lambda cfop: cfop.startswith("6"))
+        exterior = pertence(arrays["cfop"], lambda cfop: cfop.startswith("7"))
+        valor_item = em_centavos(arrays["valor_total"])
+
+        base = np.zeros((n, len(IMPOSTOS)), dtype=np.int64)
+        aliquota = np.zeros((n, len(IMPOSTOS)), dtype=float)
+        declarado = np.zeros_like(base)
+        informado = np.zeros((n, len(IMPOSTOS)), dtype=bool)
+        repassado = np.zeros((n, len(IMPOSTOS)), dtype=bool)
+
+        for j, imposto in enumerate(IMPOSTOS):
+            campo_base, campo_aliquota, campo_valor = CAMPOS_DECLARADOS[imposto]
+            base_declarada = arrays[campo_base] if campo_base else np.full(n, np.nan)
+            aliq_declarada = np.nan_to_num(arrays[campo_aliquota]) if campo_aliquota else np.zeros(n)
+            valor_declarado = arrays[campo_valor]
+
+            if imposto in IMPOSTOS_PRODUTO:
+                aplicavel = ~servico
+            elif imposto in IMPOSTOS_SERVICO:
+                aplicavel = servico
+            else:
+                aplicavel = np.ones(n, dtype=bool)
+
+            if imposto in CAMPOS_CST:
+                # NF-e: grupo do imposto presente (CST); serviço (RPS): valor declarado
+                cst = arrays[CAMPOS_CST[imposto]]
+                informado[:, j] = np.where(servico, ~np.isnan(valor_declarado), cst != "")
+                sem_imposto = pertence(cst, CST_SEM_IMPOSTO.get(imposto, ()))
+            else:
+                informado[:, j] = ~np.isnan(valor_declarado)
+                sem_imposto = np.zeros(n, dtype=bool)
+            informado[:, j] &= aplicavel
+
+            # Informado: alíquota declarada (padrão se só o valor veio); senão, padrão resolvido
+            padrao = cls._aliquota_padrao(imposto, arrays, servico, simples, interestadual, exterior)
+            aliq = np.where(
+                informado[:, j],
+                np.where(aliq_declarada > 0, aliq_declarada, np.where(np.nan_to_num(valor_declarado) > 0, padrao, 0.0)),
+                padrao,
+            )
+            if imposto in IMPOSTOS_REFORMA and informado[:, j].any():
+                aliq_reforma, repassa = cls._aliquota_reforma(imposto, arrays)
+                aliq = np.where(informado[:, j], aliq_reforma, aliq)
+                repassado[:, j] = repassa & informado[:, j]
+            aliq[sem_imposto | ~aplicavel] = 0.0
+
+            aliquota[:, j] = aliq
+            base[:, j] = np.where(np.nan_to_num(base_declarada) > 0, em_centavos(base_declarada), valor_item)
+            declarado[:, j] = np.where(informado[:, j], em_centavos(valor_declarado), 0)
+
+        aliquota = np.rint(aliquota * ESCALA_ALIQUOTA).astype(np.int64)
+        base[aliquota == 0] = 0
+        # Valor = base × alíquota, arredondado half-up para o centavo (inteiros)
+        divisor = 100 * ESCALA_ALIQUOTA
+        valor = (base * aliquota + divisor // 2) // divisor
+        valor = np.where(repassado, declarado, valor)
+
+        return ResultadoImpostos(arrays["nota"], arrays["item"], base, aliquota, valor, declarado, informado)
+
+    @classmethod
+    def _aliquota_padrao(
+        cls, imposto: TaxType, arrays: dict[str, np.ndarray],
+        servico: np.ndarray, simples: np.ndarray, interestadual: np.ndarray, exterior: np.ndarray,
+    ) -> np.ndarray:
+        """Alíquota (%) para itens sem o imposto informado no documento."""
+        n = len(servico)
+        produto = cls.ALIQUOTAS_PRODUTO.get(imposto, 0.0)
+        padrao = np.where(servico, cls.ALIQUOTAS_SERVICO.get(imposto, 0.0), produto)
+
+        if imposto == TaxType.ICMS:
+            # Tabela por UF: interna do emitente; interestadual pela matriz (4% para importados)
+            tabela = get_tabela_aliquotas()
+            internas = tabela.aliquotas_internas(arrays["uf_emitente"])
+            interestaduais = tabela.aliquotas_interestaduais(
+                arrays["uf_emitente"], arrays["uf_destinatario"], arrays["origem"],
+            )
+            padrao = np.select(
+                [simples, exterior, interestadual],
+                [0.0, 0.0, np.where(np.isnan(interestaduais), cls.ALIQUOTA_ICMS_INTERESTADUAL, interestaduais)],
+                np.where(np.isnan(internas), produto, internas),
+            )
+        elif imposto == TaxType.IPI:
+            sem_cst = (arrays["cst_ipi"] == "") & ~servico
+            if sem_cst.any():
+                tipi = np.full(n, np.nan)
+                tipi[sem_cst] = _aliquotas_ipi_ncm(arrays["ncm"][sem_cst])
+                padrao = np.where(np.isnan(tipi), padrao, tipi)
+        elif imposto == TaxType.ISS:
+            # Tabela municipal por (município em que o ISS é devido, item da LC 116)
+            posicoes = np.flatnonzero(servico)
+            if len(posicoes):
+                municipal = np.full(n, np.nan)
+                municipal[posicoes] = get_iss_index().resolver_lote(
+                    arrays["codigo_municipio"][posicoes], arrays["municipio_prestador"][posicoes],
+                    arrays["municipio_tomador"][posicoes], arrays["item_lista_servico"][posicoes],
+                ).aliquota
+                padrao = np.where(np.isnan(municipal), padrao, municipal)
+        elif imposto in (TaxType.PIS, TaxType.COFINS):
+            # Simples Nacional recolhe PIS/COFINS no DAS
+            padrao = np.where(simples, 0.0, padrao)
+        return padrao
+
+    @classmethod
+    def _aliquota_reforma(cls, imposto: TaxType, arrays: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Alíquota (%) do IBS ou da CBS pela tabela vigente na emissão e pelo efeito do CST.
+
+        Returns:
+            (alíquota, repassado): repassado marca os itens cujo valor não é
+            calculado (CST sem cálculo, CST desconhecido ou data fora da
+            tabela) e vale o declarado
+        """
+        tabela = get_tabela_ibs_cbs()
+        efeito = tabela.efeitos(arrays["cst_ibs_cbs"])
+        vigentes = tabela.aliquotas(arrays["data_emissao"])
+        if imposto == TaxType.CBS:
+            nominal = vigentes.cbs
+            declarada = np.nan_to_num(arrays["aliq_cbs"])
+            reducao_declarada = np.nan_to_num(arrays["aliq_red_cbs"])
+        else:
+            nominal = vigentes.ibs_uf + vigentes.ibs_mun
+            declarada = np.nan_to_num(arrays["aliq_ibs_uf"]) + np.nan_to_num(arrays["aliq_ibs_mun"])
+            reducao_declarada = np.nan_to_num(arrays["aliq_red_ibs"])
+
+        # Redução da classificação tributária; sem a classificação na tabela, a declarada (pRedAliq)
+        reducao = tabela.reducoes(arrays["c_class_trib"])
+        reducao = np.where(np.isnan(reducao), reducao_declarada, reducao)
+
+        reduzido = efeito == EFEITO_REDUZIDO
+        sem_imposto = efeito == EFEITO_SEM_IMPOSTO
+        calculado = ((efeito == EFEITO_TRIBUTADO) | reduzido) & ~np.isnan(nominal)
+        aliq = np.select(
+            [sem_imposto, calculado & reduzido, calculado],
+            [0.0, nominal * (1 - reducao / 100), nominal],
+            declarada * (1 - reducao_declarada / 100),
+        )
+        return aliq, ~calculado & ~sem_imposto
+
+    @classmethod
+    def calcular_difal(cls, arrays: dict[str, np.ndarray]) -> ResultadoDifal:
+        """
+        Calcula o DIFAL e o FCP de destino (base única) de todos os itens.
+
+        Aplica-se a produtos com ICMS em operação entre UFs diferentes para
+        consumidor final não contribuinte (indFinal 1, indIEDest 9). A alíquota
+        interestadual vem sempre da tabela (fixada por resolução do Senado); a
+        interna e o FCP do destino usam as declaradas no item (alíquotas
+        específicas do produto) ou, na ausência, as padrão da UF.
+
+        Args:
+            arrays: Arrays por campo dos itens com valor_total, vBC_icms e CAMPOS_DIFAL (ver itens_para_arrays)
+
+        Returns:
+            ResultadoDifal
+        """
+        tabela = get_tabela_aliquotas()
+        interestadual = tabela.aliquotas_interestaduais(
+            arrays["uf_emitente"], arrays["uf_destinatario"], arrays["origem"],
+        )
+        aplicavel = (
+            ~np.isnan(interestadual)
+            & (arrays["ind_final"] == "1")
+            & (arrays["ind_ie_dest"] == "9")
+            & ~pertence(arrays["tipo"], TIPOS_SERVICO)
+            & ~pertence(arrays["cst_csosn"], CST_SEM_DIFAL)
+        )
+
+        interna_declarada = np.nan_to_num(arrays["aliq_icms_uf_dest"])
+        fcp_declarado = np.nan_to_num(arrays["aliq_fcp_uf_dest"])
+        interna = np.where(interna_declarada > 0, interna_declarada, tabela.aliquotas_internas(arrays["uf_destinatario"]))
+        fcp = np.where(fcp_declarado > 0, fcp_declarado, tabela.aliquotas_fcp(arrays["uf_destinatario"]))
+
+        def escala(aliquotas: np.ndarray) -> np.ndarray:
+            return np.where(aplicavel, np.rint(np.nan_to_num(aliquotas) * ESCALA_ALIQUOTA), 0).astype(np.int64)
+
+        aliq_interestadual, aliq_interna, aliq_fcp = escala(interestadual), escala(interna), escala(fcp)
+
+        # Base: a declarada no grupo ICMSUFDest, senão a do ICMS, senão o valor do item
+        base = np.select(
+            [np.nan_to_num(arrays["vBC_uf_dest"]) > 0, np.nan_to_num(arrays["vBC_icms"]) > 0],
+            [em_centavos(arrays["vBC_uf_dest"]), em_centavos(arrays["vBC_icms"])],
+            em_centavos(arrays["valor_total"]),
+        )
+        base = np.where(aplicavel, base, 0)
+
+        divisor = 100 * ESCALA_ALIQUOTA
+        difal = (base * np.maximum(aliq_interna - aliq_interestadual, 0) + divisor // 2) // divisor
+        valor_fcp = (base * aliq_fcp + divisor // 2) // divisor
+
+        informado = np.nan_to_num(arrays["aliq_icms_inter"]) > 0
+        return ResultadoDifal(
+            arrays["nota"], arrays["item"], aplicavel, base,
+            aliq_interestadual, aliq_interna, aliq_fcp, difal, valor_fcp, informado,
+            np.where(informado, em_centavos(arrays["vICMS_uf_dest"]), 0),
+            np.where(informado, em_centavos(arrays["vFCP_uf_dest"]), 0),
+        )
+
     # =====================================================
     # MÉTODOS AUXILIARES
     # =====================================================
-    
+
     def get_total_impostos(self) -> float:
         """Retorna total de impostos."""
         return sum(imp['valor_imposto'] for imp in self.impostos_calculados)
-    
+
     def get_carga_tributaria_percentual(self) -> float:
         """Retorna carga tributária em %."""
         if self.valor_total == 0:
             return 0.0
         return (self.get_total_impostos() / self.valor_total) * 100
-    
+
     def get_impostos_por_tipo(self) -> dict[str, float]:
         """Retorna dicionário com impostos por tipo."""
         impostos_dict = {}
@@ -209,6 +650,18 @@ class TaxCalculator:
 
 
 def calcular_impostos(nf_data: dict) -> list[dict]:
-    """Função auxiliar para calcular impostos."""
+    """Função auxiliar para calcular impostos (o ResultadoImpostos fica em nf_data['resultado_impostos'])."""
     calc = TaxCalculator(nf_data)
-    return calc.calcular_todos()
+    impostos = calc.calcular_todos()
+    nf_data['resultado_impostos'] = calc.resultado
+    return impostos
+
+
+def calcular_impostos_lote(notas: list[dict]) -> ResultadoImpostos:
+    """Calcula os impostos dos itens de muitas notas em uma única passada vetorial."""
+    return TaxCalculator.calcular(itens_para_arrays(notas))
+
+
+def calcular_difal_lote(notas: list[dict]) -> ResultadoDifal:
+    """Calcula DIFAL e FCP de destino dos itens de muitas notas em uma única passada vetorial."""
+    return TaxCalculator.calcular_difal(itens_para_arrays(notas, ("valor_total", "vBC_icms", *CAMPOS_DIFAL)))
@@ -1,11 +1,20 @@
 import json
 import os
+from collections.abc import Iterable, Mapping
+from types import MappingProxyType
 
 from logs.logger import app_logger
+from src.utils.lazy import LockProcesso
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 JSON_FILE_PATH = os.path.join(SCRIPT_DIR, 'cfop_natop.json')
 
+# Índice imutável da tabela CFOP, carregado uma vez por processo
+_NAO_CARREGADO = object()
+_cfop_index: Mapping[str, str] = MappingProxyType({})
+_cfop_index_mtime = _NAO_CARREGADO
+_cfop_index_lock = LockProcesso()
+
 def load_cfop_data(file_path: str) -> dict:
     """Carrega os dados dos CFOPs e suas descrições a partir do arquivo JSON."""
     
@@ -24,18 +33,46 @@ def load_cfop_data(file_path: str) -> dict:
         app_logger.error(f"Ocorreu um erro inesperado ao carregar o arquivo: {e}")
         return {}
     
-def validar_cfop(cfop: str) -> dict:
+def get_cfop_index() -> Mapping[str, str]:
+    """
+    Retorna o índice CFOP -> descrição (somente leitura).
+    
+    O JSON é lido uma única vez por processo e relido apenas quando o mtime
+    do arquivo muda. Leituras não usam lock; a recarga é serializada.
+    Processos filhos (fork) herdam o índice já carregado.
+    """
+    global _cfop_index, _cfop_index_mtime
+    
+    try:
+        mtime = os.stat(JSON_FILE_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    
+    if mtime == _cfop_index_mtime:
+        return _cfop_index
+    
+    with _cfop_index_lock:
+        if mtime != _cfop_index_mtime:
+            _cfop_index = MappingProxyType(load_cfop_data(JSON_FILE_PATH))
+            _cfop_index_mtime = mtime
+            app_logger.info(f"📚 Tabela CFOP carregada: {len(_cfop_index)} códigos")
+        return _cfop_index
+
+
+def validar_cfop(cfop: str, cfop_data: Mapping[str, str] | None = None) -> dict:
     """
     Valida CFOP contra tabela oficial.
     
     Args:
         cfop: Código CFOP (4 dígitos)
+        cfop_data: Índice CFOP já obtido (padrão: get_cfop_index())
     
     Returns:
         dict com resultado da validação
     """
     
-    cfop_data = load_cfop_data(JSON_FILE_PATH)
+    if cfop_data is None:
+        cfop_data = get_cfop_index()
     resultado = {
         "valido": False,
         "cfop": cfop,
@@ -61,6 +98,29 @@ def validar_cfop(cfop: str) -> dict:
     return resultado
 
 
+def validar_cfops(cfops: Iterable[str]) -> list[dict]:
+    """
+    Valida vários CFOPs de uma vez (um acesso ao índice; repetidos validados uma vez).
+    
+    Args:
+        cfops: Códigos CFOP
+    
+    Returns:
+        Lista de resultados na mesma ordem (mesmo formato de validar_cfop)
+    """
+    cfop_data = get_cfop_index()
+    vistos: dict[str, dict] = {}
+    resultados = []
+    
+    for cfop in cfops:
+        resultado = vistos.get(cfop)
+        if resultado is None:
+            resultado = vistos[cfop] = validar_cfop(cfop, cfop_data)
+        resultados.append({**resultado, "erros": list(resultado["erros"])})
+    
+    return resultados
+
+
 def validar_cfops_nota(nf_data: dict) -> dict:
     """
     Valida todos os CFOPs de uma nota fiscal.
@@ -74,17 +134,23 @@ def validar_cfops_nota(nf_data: dict) -> dict:
     erros = []
     avisos = []
     
+    cfop_data = get_cfop_index()
+    
     cfop_nota = nf_data.get('cfop', '')
     if cfop_nota:
-        resultado = validar_cfop(cfop_nota)
+        resultado = validar_cfop(cfop_nota, cfop_data)
         if not resultado["valido"]:
             erros.extend(resultado["erros"])
             app_logger.error(f"❌ CFOP da nota inválido: {cfop_nota}")
 
+    # Itens costumam repetir poucos CFOPs: cada código é validado uma vez
+    resultados_por_cfop: dict[str, dict] = {}
     for idx, item in enumerate(nf_data.get('itens', []), 1):
         cfop_item = item.get('cfop', '')
         if cfop_item:
-            resultado = validar_cfop(cfop_item)
+            resultado = resultados_por_cfop.get(cfop_item)
+            if resultado is None:
+                resultado = resultados_por_cfop[cfop_item] = validar_cfop(cfop_item, cfop_data)
             if not resultado["valido"]:
                 for erro in resultado["erros"]:
                     erros.append(f"Item {idx}: {erro}")
@@ -1,11 +1,39 @@
-import re
+"""
+Geração das regras CST/CSOSN por CFOP (src/validators/csts/cfop_rules_compact.json).
+
+A geração é incremental: o manifesto guarda o hash da descrição e do ajuste
+manual (cfop_rules_overrides.json) de cada CFOP, e só os CFOPs alterados
+passam de novo pelas heurísticas. Mudanças nas próprias heurísticas (listas,
+palavras-chave, código das funções de inferência) invalidam tudo.
+
+Uso (na raiz do projeto):
+    python -m src.validators.cfops.script            # incremental
+    python -m src.validators.cfops.script --full     # regera todos os CFOPs
+
+Os ajustes manuais são mesclados sobre a regra gerada, por exemplo:
+    {"5405": {"REGIME_NORMAL": {"icms": {"esperado": false}}}}
+"""
+
+import copy
+import hashlib
+import inspect
 import json
+import os
+import re
+import sys
 from pathlib import Path
 
+from src.validators.csts.rule_bundle import compactar_regras_gerais, expandir_regras_gerais
+
 # Configurações de Caminho
 SCRIPT_DIR = Path(__file__).resolve().parent
 CFOP_PATH = SCRIPT_DIR / "cfop_natop.json"
-OUTPUT_GENERATED = SCRIPT_DIR / "cfop_rules_optimized.json" # Novo nome para o arquivo otimizado
+OVERRIDES_PATH = SCRIPT_DIR / "cfop_rules_overrides.json"   # opcional
+MANIFEST_PATH = SCRIPT_DIR / "cfop_rules.manifest.json"
+OUTPUT_GENERATED = SCRIPT_DIR.parent / "csts" / "cfop_rules_compact.json"  # lido pelo rule_bundle
+
+# Incrementar quando a lógica de geração mudar de forma que o hash do código não capture
+GENERATOR_VERSION = 1
 
 # --- CSTs/CSOSNs Expandidos para Flexibilidade Fiscal ---
 # Estas listas são mais amplas e aceitam benefícios fiscais (Isenção, Alíquota Zero, etc.)
@@ -183,20 +211,84 @@ def structure_and_expand_rules(inferred_rules):
 
     return optimized_rules
 
-def generate():
-    with open(CFOP_PATH, encoding="utf-8") as f:
-        cfop_table = json.load(f)
+# =====================================================
+# HASHES (GERAÇÃO INCREMENTAL)
+# =====================================================
 
-    inferred_output = {}
-    
-    # 1. Inferir regras brutas
-    for code, desc in cfop_table.items():
-        inferred_output[code] = infer_from_description(desc, code)
+def _sha(*partes) -> str:
+    texto = json.dumps(partes, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
 
-    # 2. Estruturar e expandir as regras inferidas (aplicando a segregação de regime)
-    optimized_per_cfop = structure_and_expand_rules(inferred_output)
-    
-    # 3. Construir as regras de grupo (per_group)
+
+def generator_fingerprint() -> str:
+    """Hash das heurísticas: listas globais, palavras-chave e código da inferência."""
+    return _sha(
+        GENERATOR_VERSION,
+        ICMS_CST_NORMAL, ICMS_CSOSN_SN, IPI_CST_VALIDOS, PIS_COFINS_SAIDA, PIS_COFINS_ENTRADA,
+        KEYWORDS, SUGGESTIONS,
+        inspect.getsource(infer_from_description),
+        inspect.getsource(structure_and_expand_rules),
+    )
+
+
+def cfop_fingerprint(desc, override) -> str:
+    """Hash da descrição e do ajuste manual de um CFOP."""
+    return _sha(desc, override)
+
+
+def _file_sha(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    except FileNotFoundError:
+        return None
+
+
+def _read_json(path: Path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write_atomic(path: Path, texto: str) -> None:
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(tmp_path, path)
+
+
+def _merge(base: dict, ajuste: dict) -> dict:
+    """Mescla o ajuste manual sobre a regra gerada (dicts recursivamente; o resto substitui)."""
+    resultado = copy.deepcopy(base)
+    for chave, valor in ajuste.items():
+        if isinstance(valor, dict) and isinstance(resultado.get(chave), dict):
+            resultado[chave] = _merge(resultado[chave], valor)
+        else:
+            resultado[chave] = copy.deepcopy(valor)
+    return resultado
+
+
+def compact_json(dados: dict) -> str:
+    """JSON sem indentação, uma entrada de lista/dict de primeiro nível por linha (diffs legíveis)."""
+    def dumps(valor):
+        return json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+
+    blocos = []
+    for chave, valor in dados.items():
+        if isinstance(valor, list) and valor:
+            corpo = ",\n".join(dumps(v) for v in valor)
+            blocos.append(f"{dumps(chave)}:[\n{corpo}\n]")
+        elif isinstance(valor, dict) and valor:
+            corpo = ",\n".join(f"{dumps(k)}:{dumps(v)}" for k, v in valor.items())
+            blocos.append(f"{dumps(chave)}:{{\n{corpo}\n}}")
+        else:
+            blocos.append(f"{dumps(chave)}:{dumps(valor)}")
+    return "{\n" + ",\n".join(blocos) + "\n}\n"
+
+
+def build_groups(optimized_per_cfop: dict) -> dict:
+    """Regras de grupo ('X000') pela maioria simples dos CFOPs do grupo (Regime Normal)."""
     groups = {}
     for code, rules in optimized_per_cfop.items():
         group = code[0]
@@ -222,17 +314,81 @@ def generate():
             "ipi": {"esperado": ipi_expected},
             "pis_cofins": {"credito": pis_credito}
         }
+    return final_groups
 
-    # 4. Salvar o arquivo final
-    generated = {
-        "per_cfop": optimized_per_cfop,
-        "per_group": final_groups
-    }
-    with open(OUTPUT_GENERATED, "w", encoding="utf-8") as f:
-        json.dump(generated, f, indent=2, ensure_ascii=False)
-    print(f"Gerado: {OUTPUT_GENERATED}")
+
+def write_rules(per_cfop: dict, per_group: dict, output: Path = OUTPUT_GENERATED) -> str:
+    """Grava as regras no formato compacto e retorna o hash do arquivo gravado."""
+    texto = compact_json(compactar_regras_gerais({"per_cfop": per_cfop, "per_group": per_group}))
+    _write_atomic(output, texto)
+    return _file_sha(output)
+
+
+# =====================================================
+# GERAÇÃO
+# =====================================================
+
+def generate(full: bool = False) -> list[str]:
+    """
+    Gera (ou atualiza) as regras dos CFOPs.
+
+    Args:
+        full: Ignora o manifesto e regera todos os CFOPs
+
+    Returns:
+        CFOPs regerados (vazio se nada mudou)
+    """
+    with open(CFOP_PATH, encoding="utf-8") as f:
+        cfop_table = json.load(f)
+    overrides = _read_json(OVERRIDES_PATH, {})
+
+    gerador = generator_fingerprint()
+    manifesto = _read_json(MANIFEST_PATH, {})
+
+    # Regras anteriores só valem se o gerador e o arquivo de saída são os do manifesto
+    anteriores, hashes_anteriores = {}, {}
+    if (
+        not full
+        and manifesto.get("gerador") == gerador
+        and manifesto.get("saida") == _file_sha(OUTPUT_GENERATED)
+    ):
+        try:
+            anteriores = expandir_regras_gerais(_read_json(OUTPUT_GENERATED, {}))["per_cfop"]
+            hashes_anteriores = manifesto.get("cfops", {})
+        except (KeyError, ValueError) as e:
+            print(f"Regras anteriores ilegíveis, regerando todos os CFOPs: {e}")
+
+    codigos = list(cfop_table) + [code for code in overrides if code not in cfop_table]
+    hashes, optimized_per_cfop, alterados = {}, {}, []
+
+    for code in codigos:
+        desc, override = cfop_table.get(code), overrides.get(code)
+        hashes[code] = cfop_fingerprint(desc, override)
+        if hashes_anteriores.get(code) == hashes[code] and code in anteriores:
+            optimized_per_cfop[code] = anteriores[code]
+            continue
+
+        # 1. Inferir regras brutas; 2. estruturar e expandir (segregação de regime); ajuste manual por cima
+        inferred = {code: infer_from_description(desc, code)}
+        rules = structure_and_expand_rules(inferred)[code]
+        if override:
+            rules = _merge(rules, override)
+        optimized_per_cfop[code] = rules
+        alterados.append(code)
+
+    removidos = [code for code in hashes_anteriores if code not in hashes]
+    if not alterados and not removidos:
+        print(f"Sem alterações: {OUTPUT_GENERATED}")
+        return []
+
+    # 3. Construir as regras de grupo (per_group) e 4. salvar o arquivo final
+    saida = write_rules(optimized_per_cfop, build_groups(optimized_per_cfop), OUTPUT_GENERATED)
+    _write_atomic(
+        MANIFEST_PATH,
+        json.dumps({"gerador": gerador, "saida": saida, "cfops": hashes}, indent=0, ensure_ascii=False) + "\n",
+    )
+    print(f"Gerado: {OUTPUT_GENERATED} ({len(alterados)} CFOPs regerados, {len(removidos)} removidos)")
+    return alterados
 
 if __name__ == "__main__":
-    # Supondo que 'cfop_natop.json' exista no mesmo diretório
-    # Se 'cfop_natop.json' não existir, este script falhará, mas a lógica está correta.
-    generate()
+    generate(full="--full" in sys.argv[1:])
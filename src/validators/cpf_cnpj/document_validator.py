@@ -1,11 +1,49 @@
+"""
+Validação de CPF/CNPJ com dígitos verificadores (módulo 11).
+
+O CNPJ aceita o formato alfanumérico (IN RFB 2.229/2024): os 12 primeiros
+caracteres podem ser dígitos ou letras maiúsculas, com valor ord(c) - 48 no
+cálculo, e os 2 dígitos verificadores são sempre numéricos. Para o CNPJ
+numérico o cálculo é o tradicional.
+
+Os documentos se repetem muito (poucos milhares de clientes recorrentes):
+o resultado de cada documento fica em um cache LRU por processo. Para lotes,
+validate_documents confere arrays inteiros de uma vez.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from config.configuration import DOCUMENT_CACHE_SIZE
 from logs.logger import app_logger
 
+
+CPF_TAMANHO = 11
+CNPJ_TAMANHO = 14
+
+# Pesos do módulo 11
+PESOS_CPF_DV1 = np.arange(10, 1, -1)                                   # 10..2
+PESOS_CPF_DV2 = np.arange(11, 1, -1)                                   # 11..2
+PESOS_CNPJ_DV1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_CNPJ_DV2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+_DIGITOS = frozenset("0123456789")
+_ALFANUMERICOS = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+def _dv(valores: list[int], pesos: np.ndarray) -> int:
+    resto = sum(v * p for v, p in zip(valores, pesos.tolist(), strict=True)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
 def validar_dest(nf_data: dict) -> str:
-    
+
     # Validar cnpj da nota
     cnpj = nf_data.get('cliente_cnpj')
     cpf = nf_data.get('cliente_cpf')
-    
+
     if cnpj and not cpf:
         return "PJ"
     elif cpf and not cnpj:
@@ -14,78 +52,112 @@ def validar_dest(nf_data: dict) -> str:
         return "AUSENTE"
     else:
         return "INDEFINIDO"
-    
+
+
+# =====================================================
+# DOCUMENTO A DOCUMENTO (com cache)
+# =====================================================
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def _erro_cpf(cpf: str) -> str | None:
+    """Mensagem de erro do CPF (None se válido)."""
+    if not cpf or len(cpf) != CPF_TAMANHO:
+        return f"CPF '{cpf}' deve ter exatamente 11 dígitos"
+
+    if not set(cpf) <= _DIGITOS:
+        return f"CPF '{cpf}' deve conter apenas números"
+
+    valores = [int(c) for c in cpf]
+    # Sequências repetidas (000.000.000-00, 111...) passam no módulo 11, mas não existem
+    if len(set(valores)) == 1:
+        return f"CPF '{cpf}' com dígitos verificadores inválidos"
+
+    dv1 = _dv(valores[:9], PESOS_CPF_DV1)
+    dv2 = _dv(valores[:9] + [dv1], PESOS_CPF_DV2)
+    if valores[9:] != [dv1, dv2]:
+        return f"CPF '{cpf}' com dígitos verificadores inválidos"
+    return None
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def _erro_cnpj(cnpj: str) -> str | None:
+    """Mensagem de erro do CNPJ numérico ou alfanumérico (None se válido)."""
+    if not cnpj or len(cnpj) != CNPJ_TAMANHO:
+        return f"CNPJ '{cnpj}' deve ter exatamente 14 caracteres"
+
+    if not set(cnpj[:12]) <= _ALFANUMERICOS or not set(cnpj[12:]) <= _DIGITOS:
+        return f"CNPJ '{cnpj}' deve conter apenas letras maiúsculas e números (dígitos verificadores numéricos)"
+
+    valores = [ord(c) - 48 for c in cnpj]
+    if len(set(valores)) == 1:
+        return f"CNPJ '{cnpj}' com dígitos verificadores inválidos"
+
+    dv1 = _dv(valores[:12], PESOS_CNPJ_DV1)
+    dv2 = _dv(valores[:12] + [dv1], PESOS_CNPJ_DV2)
+    if valores[12:] != [dv1, dv2]:
+        return f"CNPJ '{cnpj}' com dígitos verificadores inválidos"
+    return None
+
 
 def validar_cpf(cpf: str) -> dict:
     """
-    Valida CPF contra tabela oficial.
-    
+    Valida formato e dígitos verificadores do CPF.
+
     Args:
-        cpf: Código CPF ( dígitos)
-    
+        cpf: CPF sem máscara (11 dígitos)
+
     Returns:
         dict com resultado da validação
     """
-
-    resultado = {
-        "valido": False,
+    erro = _erro_cpf(cpf if isinstance(cpf, str) else str(cpf or ""))
+    return {
+        "valido": erro is None,
         "cpf": cpf,
-        "erros": []
+        "erros": [erro] if erro else []
     }
-    
-    # Validar formato (11 dígitos)
-    if not cpf or len(cpf) != 11:
-        resultado["erros"].append(f"CPF '{cpf}' deve ter exatamente 11 dígitos")
-        return resultado
-    
-    if not cpf.isdigit():
-        resultado["erros"].append(f"CPF '{cpf}' deve conter apenas números")
-        return resultado
-    
-    # Tudo OK
-    resultado["valido"] = True
-    
-    return resultado
 
 
 def validar_cnpj(cnpj: str) -> dict:
     """
-    Valida CPF contra tabela oficial.
-    
+    Valida formato e dígitos verificadores do CNPJ (numérico ou alfanumérico).
+
     Args:
-        cpf: Código CPF ( dígitos)
-    
+        cnpj: CNPJ sem máscara (14 caracteres)
+
     Returns:
         dict com resultado da validação
     """
-
-    resultado = {
-        "valido": False,
+    erro = _erro_cnpj(cnpj if isinstance(cnpj, str) else str(cnpj or ""))
+    return {
+        "valido": erro is None,
         "cnpj": cnpj,
-        "erros": []
+        "erros": [erro] if erro else []
     }
-    
-    # Validar formato (14 dígitos)
-    if not cnpj or len(cnpj) != 14:
-        resultado["erros"].append(f"CNPJ '{cnpj}' deve ter exatamente 11 dígitos")
-        return resultado
-    
-    if not cnpj.isdigit():
-        resultado["erros"].append(f"CNPJ '{cnpj}' deve conter apenas números")
-        return resultado
-    
-    # Tudo OK
-    resultado["valido"] = True
-    
-    return resultado
 
 
+def validar_documento(documento: str) -> dict:
+    """Valida CPF (11 caracteres) ou CNPJ (demais tamanhos)."""
+    documento = documento if isinstance(documento, str) else str(documento or "")
+    if len(documento) == CPF_TAMANHO:
+        return validar_cpf(documento)
+    return validar_cnpj(documento)
+
+
+def cache_info():
+    """Estatísticas dos caches LRU de CPF e CNPJ."""
+    return {"cpf": _erro_cpf.cache_info(), "cnpj": _erro_cnpj.cache_info()}
+
+
+# =====================================================
+# VALIDADORES DA NOTA
+# =====================================================
+
 def validar_document_dest(nf_data: dict) -> dict:
     erros = []
     avisos = []
-    
+
     dest = validar_dest(nf_data)
-    
+
     if dest == "PJ":
         cnpj = nf_data['cliente_cnpj']
         resultado = validar_cnpj(cnpj)
@@ -103,9 +175,105 @@ def validar_document_dest(nf_data: dict) -> dict:
         erros.append("Ambos CNPJ ou CPF do destinatário não estão preenchidos")
         app_logger.error("❌ Ambos CNPJ ou CPF do destinatário não estão preenchidos")
 
-  
+
     return {
         "valido": len(erros) == 0,
         "erros": erros,
         "avisos": avisos
-    }
\ No newline at end of file
+    }
+
+
+def validar_document_emit(nf_data: dict) -> dict:
+    """
+    Valida o documento do emitente (NF-e) ou prestador (RPS) em fornecedor_cnpj.
+
+    Returns:
+        dict com "valido", "erros" e "avisos"
+    """
+    erros = []
+    documento = nf_data.get('fornecedor_cnpj')
+
+    if not documento:
+        erros.append("CNPJ do emitente/prestador está ausente")
+        app_logger.error("❌ CNPJ do emitente/prestador está ausente")
+    else:
+        resultado = validar_documento(documento)
+        if not resultado["valido"]:
+            erros.extend(f"Emitente: {msg}" for msg in resultado["erros"])
+
+    return {
+        "valido": len(erros) == 0,
+        "erros": erros,
+        "avisos": []
+    }
+
+
+# =====================================================
+# LOTE (vetorial)
+# =====================================================
+
+def _dv_vetorial(valores: np.ndarray, pesos: np.ndarray) -> np.ndarray:
+    resto = (valores * pesos).sum(axis=1) % 11
+    return np.where(resto < 2, 0, 11 - resto)
+
+
+def _matriz(documentos: np.ndarray, tamanho: int) -> np.ndarray:
+    """Documentos (já com o tamanho certo) -> matriz (n, tamanho) de ord(c) - 48."""
+    bytes_ = np.array([d.encode("ascii", "replace") for d in documentos], dtype=f"S{tamanho}")
+    return bytes_.view(np.uint8).reshape(len(documentos), tamanho).astype(np.int64) - 48
+
+
+def _cpfs_validos(documentos: np.ndarray) -> np.ndarray:
+    valores = _matriz(documentos, CPF_TAMANHO)
+    ok = ((valores >= 0) & (valores <= 9)).all(axis=1)
+    ok &= (valores != valores[:, :1]).any(axis=1)
+    valores = np.where(ok[:, None], valores, 0)
+    dv1 = _dv_vetorial(valores[:, :9], PESOS_CPF_DV1)
+    dv2 = _dv_vetorial(np.column_stack([valores[:, :9], dv1]), PESOS_CPF_DV2)
+    return ok & (valores[:, 9] == dv1) & (valores[:, 10] == dv2)
+
+
+def _cnpjs_validos(documentos: np.ndarray) -> np.ndarray:
+    valores = _matriz(documentos, CNPJ_TAMANHO)
+    base, dvs = valores[:, :12], valores[:, 12:]
+    ok = (((base >= 0) & (base <= 9)) | ((base >= 17) & (base <= 42))).all(axis=1)   # 0-9, A-Z
+    ok &= ((dvs >= 0) & (dvs <= 9)).all(axis=1)
+    ok &= (valores != valores[:, :1]).any(axis=1)
+    dv1 = _dv_vetorial(base, PESOS_CNPJ_DV1)
+    dv2 = _dv_vetorial(np.column_stack([base, dv1]), PESOS_CNPJ_DV2)
+    return ok & (dvs[:, 0] == dv1) & (dvs[:, 1] == dv2)
+
+
+def validate_documents(documentos, tipo: str | None = None) -> np.ndarray:
+    """
+    Valida um array de documentos de uma vez.
+
+    Os valores distintos são fatorados antes do cálculo, então lotes com
+    poucos documentos recorrentes custam proporcionalmente ao número de
+    documentos distintos.
+
+    Args:
+        documentos: Sequência/array/Series de CPFs e/ou CNPJs sem máscara
+        tipo: "cpf", "cnpj" ou None (pelo tamanho: 11 = CPF, 14 = CNPJ)
+
+    Returns:
+        Array booleano (True = documento válido); ausentes são inválidos
+    """
+    if tipo not in (None, "cpf", "cnpj"):
+        raise ValueError(f"Tipo de documento inválido: {tipo}")
+
+    codigos, unicos = pd.factorize(pd.Series(documentos, dtype=object), use_na_sentinel=True)
+    unicos = np.array([d if isinstance(d, str) else str(d) for d in unicos], dtype=object)
+    tamanhos = np.fromiter((len(d) for d in unicos), dtype=np.int64, count=len(unicos))
+
+    validos = np.zeros(len(unicos) + 1, dtype=bool)   # último = ausente (código -1)
+    if tipo in (None, "cpf"):
+        mask = tamanhos == CPF_TAMANHO
+        if mask.any():
+            validos[:-1][mask] = _cpfs_validos(unicos[mask])
+    if tipo in (None, "cnpj"):
+        mask = tamanhos == CNPJ_TAMANHO
+        if mask.any():
+            validos[:-1][mask] = _cnpjs_validos(unicos[mask])
+
+    return validos[codigos]
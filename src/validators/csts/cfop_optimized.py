@@ -1,5 +1,7 @@
 import json
-import os
+from pathlib import Path
+
+from src.validators.cfops.script import write_rules
 
 # --- 1. Regras de CST/CSOSN Expandidas para Flexibilizar a Validação ---
 
@@ -92,34 +94,44 @@ def optimize_cfop_rules(data):
     return optimized_data
 
 # --- 3. Execução e Salvamento ---
+# As regras usadas pela validação são geradas por src/validators/cfops/script.py
+# (incremental); este script grava a variante a partir de cfop_rules_generated.json
+# no mesmo formato compacto.
 
 INPUT_FILE = "cfop_rules_generated.json"
-OUTPUT_FILE = "cfop_rules_optimized.json"
+OUTPUT_FILE = "cfop_rules_compact.json"
 
-try:
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        original_data = json.load(f)
-    
-    print(f"Lendo dados de: {INPUT_FILE}")
+def main():
+    try:
+        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
+            original_data = json.load(f)
+        
+        print(f"Lendo dados de: {INPUT_FILE}")
 
-    optimized_rules = optimize_cfop_rules(original_data)
+        optimized_rules = optimize_cfop_rules(original_data)
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(optimized_rules, f, indent=2, ensure_ascii=False)
-        
-    print(f"Sucesso! Arquivo otimizado salvo como: {OUTPUT_FILE}")
-    print("\nVerifique a nova estrutura com a segregação por REGIME_NORMAL e SIMPLES_NACIONAL.")
-
-except FileNotFoundError:
-    print(f"Erro: O arquivo de entrada '{INPUT_FILE}' não foi encontrado. Verifique se ele está no mesmo diretório do script.")
-except json.JSONDecodeError:
-    print(f"Erro: O arquivo '{INPUT_FILE}' não é um JSON válido. Verifique a sintaxe.")
-except Exception as e:
-    print(f"Ocorreu um erro inesperado: {e}")
-
-# --- 4. Exemplo de Como Fica o CFOP 5102 ---
-# (Apenas para demonstração de como a estrutura é gerada)
-
-if '5102' in optimized_rules["per_cfop"]:
-    print("\n--- Exemplo de CFOP 5102 Otimizado ---")
-    print(json.dumps(optimized_rules["per_cfop"]["5102"], indent=2, ensure_ascii=False))
\ No newline at end of file
+        write_rules(optimized_rules["per_cfop"], optimized_rules["per_group"], Path(OUTPUT_FILE))
+            
+        print(f"Sucesso! Arquivo otimizado salvo como: {OUTPUT_FILE}")
+        print("\nVerifique a nova estrutura com a segregação por REGIME_NORMAL e SIMPLES_NACIONAL.")
+
+    except FileNotFoundError:
+        print(f"Erro: O arquivo de entrada '{INPUT_FILE}' não foi encontrado. Verifique se ele está no mesmo diretório do script.")
+        return
+    except json.JSONDecodeError:
+        print(f"Erro: O arquivo '{INPUT_FILE}' não é um JSON válido. Verifique a sintaxe.")
+        return
+    except Exception as e:
+        print(f"Ocorreu um erro inesperado: {e}")
+        return
+
+    # --- 4. Exemplo de Como Fica o CFOP 5102 ---
+    # (Apenas para demonstração de como a estrutura é gerada)
+
+    if '5102' in optimized_rules["per_cfop"]:
+        print("\n--- Exemplo de CFOP 5102 Otimizado ---")
+        print(json.dumps(optimized_rules["per_cfop"]["5102"], indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
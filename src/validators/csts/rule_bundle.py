@@ -0,0 +1,456 @@
+"""
+Pacote compilado das regras CST/CSOSN por CFOP e regime tributário.
+
+As regras gerais por CFOP são geradas por src/validators/cfops/script.py em
+formato compacto (cfop_rules_compact.json): as listas de CST/CSOSN e os
+blocos de regime repetidos nos 608 CFOPs são gravados uma vez e referenciados
+por índice (ver compactar_regras_gerais / expandir_regras_gerais).
+
+Os JSONs são compilados uma única vez em regras normalizadas, com as listas
+permitidas convertidas em frozensets compartilhados (listas iguais viram o
+mesmo objeto), e o resultado fica em cache no disco (JSON, sem código
+executável: os conjuntos e regras são reconstruídos na leitura). O cache é
+invalidado pelo SHA-256 dos arquivos de origem. Cada processo carrega o
+pacote uma só vez e o recarrega quando o mtime de alguma origem muda (o novo
+digest esvazia o memo de assinaturas do motor de regras).
+"""
+
+import hashlib
+import json
+import math
+import os
+from typing import NamedTuple
+
+from config.configuration import CST_RULES_BUNDLE_PATH
+from logs.logger import app_logger
+from src.utils.lazy import LockProcesso
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSOSN = os.path.join(SCRIPT_DIR, 'csosn.json')
+CST_ICMS = os.path.join(SCRIPT_DIR, 'cst_icms.json')
+CST_IPI = os.path.join(SCRIPT_DIR, 'cst_ipi.json')
+CST_PIS_COFINS = os.path.join(SCRIPT_DIR, 'cst_pis_cofins.json')
+ORIGEM = os.path.join(SCRIPT_DIR, 'origem.json')
+RULES_CFOP = os.path.join(SCRIPT_DIR, 'cfops_rules.json')
+GENERAL_RULES = os.path.join(SCRIPT_DIR, 'cfop_rules_compact.json')
+
+# Arquivos compilados no pacote (o hash de todos invalida o cache)
+SOURCE_FILES = {
+    "csosn": CSOSN,
+    "cst_icms": CST_ICMS,
+    "cst_ipi": CST_IPI,
+    "cst_pis_cofins": CST_PIS_COFINS,
+    "origem": ORIGEM,
+    "general_rules": GENERAL_RULES,
+}
+
+# Incrementar quando o formato compilado mudar
+BUNDLE_VERSION = 2
+
+# Formato compacto das regras gerais (listas e blocos de regime referenciados por índice)
+FORMATO_COMPACTO = "cfop_rules_compact"
+FORMATO_COMPACTO_VERSAO = 1
+CAMPOS_LISTA = ("cst_validos", "csosn_validos")
+
+REGIMES = ("REGIME_NORMAL", "SIMPLES_NACIONAL")
+
+# CST/CSOSN de isenção ou não tributação (destaque zero esperado)
+ICMS_DESONERADO = frozenset({"40", "41", "300", "400"})
+# CST/CSOSN tributados integralmente (destaque esperado)
+ICMS_TRIBUTADO_INTEGRALMENTE = frozenset({"00", "101"})
+
+
+def normalizar_crt(crt) -> str:
+    """CRT como código de um dígito: 1, 1.0 e '1' viram '1'; ausente (None/NaN) vira vazio."""
+    if crt is None or (isinstance(crt, float) and math.isnan(crt)):
+        return ''
+    texto = str(crt).strip()
+    try:
+        numero = float(texto)
+    except ValueError:
+        return texto
+    return str(int(numero)) if numero.is_integer() else texto
+
+
+def get_regime_key(emitente_crt) -> str:
+    """Mapeia o CRT do Emitente para a chave de regra no JSON."""
+    if normalizar_crt(emitente_crt) in ('1', '2'):
+        return "SIMPLES_NACIONAL"
+    return "REGIME_NORMAL"
+
+
+class RegraCST(NamedTuple):
+    """Regra já resolvida para um CFOP em um regime."""
+    icms_codigos: frozenset[str]        # CSOSN (Simples Nacional) ou CST (Regime Normal)
+    ipi_esperado: bool
+    ipi_csts: frozenset[str]
+    ipi_csts_msg: str                   # lista original, como aparece nas mensagens
+    pis_cofins_csts: frozenset[str]
+    pis_cofins_csts_msg: str
+
+
+class RuleBundle(NamedTuple):
+    """Regras compiladas e tabelas de códigos válidos."""
+    digest: str
+    per_cfop: dict[tuple[str, str], RegraCST]     # (regime, cfop) -> regra
+    per_group: dict[tuple[str, str], RegraCST]    # (regime, '5000') -> regra
+    tabelas: dict[str, frozenset[str]]            # códigos válidos: csosn, cst_icms...
+
+    def regra(self, cfop: str, regime_key: str) -> RegraCST | None:
+        """Regra do CFOP (ou do grupo 'X000') no regime; None se não houver."""
+        regra = self.per_cfop.get((regime_key, cfop))
+        if regra is None:
+            regra = self.per_group.get((regime_key, cfop[:1] + "000"))
+        return regra
+
+
+# =====================================================
+# FORMATO COMPACTO DAS REGRAS GERAIS
+# =====================================================
+
+def compactar_regras_gerais(regras: dict) -> dict:
+    """
+    {"per_cfop", "per_group"} -> formato compacto.
+
+    Cada lista distinta (CSTs, CSOSNs, observações) vai uma vez para "listas",
+    cada bloco de regime distinto (icms/ipi/pis_cofins) para "regimes" e cada
+    regra de CFOP distinta para "entradas"; os CFOPs guardam só o índice da
+    entrada.
+    """
+    listas: list[list] = []
+    indices_listas: dict[tuple, int] = {}
+    regimes: list[dict] = []
+    indices_regimes: dict[str, int] = {}
+
+    def ref_lista(valores) -> int:
+        chave = tuple(valores)
+        if chave not in indices_listas:
+            indices_listas[chave] = len(listas)
+            listas.append(list(valores))
+        return indices_listas[chave]
+
+    def ref_regime(bloco: dict) -> int:
+        compacto = {
+            imposto: {
+                campo: ref_lista(valor) if campo in CAMPOS_LISTA else valor
+                for campo, valor in regra.items()
+            } if isinstance(regra, dict) else regra
+            for imposto, regra in bloco.items()
+        }
+        chave = json.dumps(compacto, sort_keys=True)
+        if chave not in indices_regimes:
+            indices_regimes[chave] = len(regimes)
+            regimes.append(compacto)
+        return indices_regimes[chave]
+
+    entradas: list[dict] = []
+    indices_entradas: dict[str, int] = {}
+    per_cfop = {}
+    for cfop, regra in regras.get("per_cfop", {}).items():
+        entrada = {}
+        for campo, valor in regra.items():
+            if campo in REGIMES and isinstance(valor, dict):
+                entrada[campo] = ref_regime(valor)
+            elif campo == "observacoes":
+                entrada[campo] = ref_lista(valor)
+            else:
+                entrada[campo] = valor
+        chave = json.dumps(entrada, sort_keys=True)
+        if chave not in indices_entradas:
+            indices_entradas[chave] = len(entradas)
+            entradas.append(entrada)
+        per_cfop[cfop] = indices_entradas[chave]
+
+    return {
+        "formato": FORMATO_COMPACTO,
+        "versao": FORMATO_COMPACTO_VERSAO,
+        "listas": listas,
+        "regimes": regimes,
+        "entradas": entradas,
+        "per_cfop": per_cfop,
+        "per_group": regras.get("per_group", {}),
+    }
+
+
+def expandir_regras_gerais(dados: dict) -> dict:
+    """
+    Formato compacto -> {"per_cfop", "per_group"} (o formato expandido passa direto).
+
+    CFOPs com a mesma regra compartilham o mesmo objeto (assim como listas e
+    blocos de regime): não altere o resultado no lugar.
+    """
+    if dados.get("formato") != FORMATO_COMPACTO:
+        return dados
+    if dados.get("versao") != FORMATO_COMPACTO_VERSAO:
+        raise ValueError(f"Versão do formato compacto não suportada: {dados.get('versao')}")
+
+    listas = dados["listas"]
+    regimes = [
+        {
+            imposto: {
+                campo: listas[valor] if campo in CAMPOS_LISTA else valor
+                for campo, valor in regra.items()
+            } if isinstance(regra, dict) else regra
+            for imposto, regra in bloco.items()
+        }
+        for bloco in dados["regimes"]
+    ]
+
+    entradas = []
+    for entrada in dados["entradas"]:
+        regra = dict(entrada)
+        for campo in REGIMES:
+            if campo in regra:
+                regra[campo] = regimes[regra[campo]]
+        if "observacoes" in regra:
+            regra["observacoes"] = listas[regra["observacoes"]]
+        entradas.append(regra)
+
+    per_cfop = {cfop: entradas[indice] for cfop, indice in dados["per_cfop"].items()}
+
+    return {"per_cfop": per_cfop, "per_group": dados.get("per_group", {})}
+
+
+# =====================================================
+# COMPILAÇÃO
+# =====================================================
+
+class _Compilador:
+    """Compila as regras compartilhando frozensets e regras idênticas."""
+
+    def __init__(self):
+        self._conjuntos: dict[frozenset, frozenset] = {}
+        self._regras: dict[RegraCST, RegraCST] = {}
+
+    def conjunto(self, codigos) -> frozenset[str]:
+        valores = frozenset(codigos or ())
+        return self._conjuntos.setdefault(valores, valores)
+
+    def regra(self, regra_base: dict, regime_key: str) -> RegraCST:
+        """Resolve o regime com o mesmo fallback usado por validar_cst_nfe."""
+        regra_regime = regra_base.get(regime_key)
+        if not regra_regime and regime_key != "REGIME_NORMAL":
+            # Fallback para o Regime Normal se o SN não tiver regra explícita
+            regra_regime = regra_base.get("REGIME_NORMAL", regra_base)
+        if not regra_regime:
+            regra_regime = regra_base
+
+        icms_rule = regra_regime.get("icms", {})
+        ipi_rule = regra_regime.get("ipi", {})
+        pis_rule = regra_regime.get("pis_cofins", {})
+
+        campo_icms = "csosn_validos" if regime_key == "SIMPLES_NACIONAL" else "cst_validos"
+        allowed_ipi = ipi_rule.get("cst_validos", [])
+        allowed_pis = pis_rule.get("cst_validos", [])
+
+        regra = RegraCST(
+            icms_codigos=self.conjunto(icms_rule.get(campo_icms, [])),
+            ipi_esperado=bool(ipi_rule.get("esperado")),
+            ipi_csts=self.conjunto(allowed_ipi),
+            ipi_csts_msg=str(allowed_ipi),
+            pis_cofins_csts=self.conjunto(allowed_pis),
+            pis_cofins_csts_msg=str(allowed_pis),
+        )
+        return self._regras.setdefault(regra, regra)
+
+
+def compile_rules(tables: dict, digest: str = "") -> RuleBundle:
+    """
+    Compila as tabelas carregadas dos JSONs (mesmas chaves de SOURCE_FILES).
+
+    Args:
+        tables: Conteúdo dos JSONs
+        digest: Hash das origens, gravado no pacote
+
+    Returns:
+        RuleBundle
+    """
+    compilador = _Compilador()
+    rules_all = expandir_regras_gerais(tables["general_rules"])
+
+    def compilar_secao(secao: dict) -> dict[tuple[str, str], RegraCST]:
+        compiladas = {}
+        for codigo, regra_base in secao.items():
+            if not regra_base:
+                continue
+            for regime_key in REGIMES:
+                compiladas[(regime_key, codigo)] = compilador.regra(regra_base, regime_key)
+        return compiladas
+
+    tabelas = {
+        name: compilador.conjunto(tables[name])
+        for name in SOURCE_FILES
+        if name != "general_rules"
+    }
+
+    return RuleBundle(
+        digest=digest,
+        per_cfop=compilar_secao(rules_all.get("per_cfop", {})),
+        per_group=compilar_secao(rules_all.get("per_group", {})),
+        tabelas=tabelas,
+    )
+
+
+def _ler_origens() -> tuple[dict[str, bytes], str]:
+    """Lê os arquivos de origem e calcula o hash combinado."""
+    conteudos = {}
+    sha = hashlib.sha256(f"v{BUNDLE_VERSION}".encode())
+    for name, path in SOURCE_FILES.items():
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+        with open(path, "rb") as f:
+            conteudos[name] = f.read()
+        sha.update(name.encode())
+        sha.update(conteudos[name])
+    return conteudos, sha.hexdigest()
+
+
+def _serializar(bundle: RuleBundle) -> dict:
+    """RuleBundle -> dict JSON: conjuntos e regras distintos gravados uma vez, referenciados por índice."""
+    conjuntos: dict[frozenset, int] = {}
+    regras: dict[RegraCST, int] = {}
+
+    def ref_conjunto(valores: frozenset) -> int:
+        if valores not in conjuntos:
+            conjuntos[valores] = len(conjuntos)
+        return conjuntos[valores]
+
+    def ref_regra(regra: RegraCST) -> int:
+        if regra not in regras:
+            regras[regra] = len(regras)
+        return regras[regra]
+
+    def secao(compiladas: dict[tuple[str, str], RegraCST]) -> list:
+        return [[regime, codigo, ref_regra(regra)] for (regime, codigo), regra in compiladas.items()]
+
+    per_cfop, per_group = secao(bundle.per_cfop), secao(bundle.per_group)
+    tabelas = {name: ref_conjunto(codigos) for name, codigos in bundle.tabelas.items()}
+    lista_regras = [
+        [
+            ref_conjunto(r.icms_codigos), r.ipi_esperado, ref_conjunto(r.ipi_csts), r.ipi_csts_msg,
+            ref_conjunto(r.pis_cofins_csts), r.pis_cofins_csts_msg,
+        ]
+        for r in regras
+    ]
+    return {
+        "versao": BUNDLE_VERSION,
+        "digest": bundle.digest,
+        "conjuntos": [sorted(codigos) for codigos in conjuntos],
+        "regras": lista_regras,
+        "per_cfop": per_cfop,
+        "per_group": per_group,
+        "tabelas": tabelas,
+    }
+
+
+def _desserializar(dados: dict) -> RuleBundle:
+    """dict JSON (ver _serializar) -> RuleBundle, com conjuntos e regras compartilhados."""
+    conjuntos = [frozenset(codigos) for codigos in dados["conjuntos"]]
+    regras = [
+        RegraCST(conjuntos[icms], bool(ipi_esperado), conjuntos[ipi], ipi_msg, conjuntos[pis], pis_msg)
+        for icms, ipi_esperado, ipi, ipi_msg, pis, pis_msg in dados["regras"]
+    ]
+
+    def secao(linhas: list) -> dict[tuple[str, str], RegraCST]:
+        return {(regime, codigo): regras[indice] for regime, codigo, indice in linhas}
+
+    return RuleBundle(
+        digest=dados["digest"],
+        per_cfop=secao(dados["per_cfop"]),
+        per_group=secao(dados["per_group"]),
+        tabelas={name: conjuntos[indice] for name, indice in dados["tabelas"].items()},
+    )
+
+
+def _ler_cache(digest: str) -> RuleBundle | None:
+    """Carrega o pacote do disco se ele corresponder às origens atuais."""
+    try:
+        with open(CST_RULES_BUNDLE_PATH, "rb") as f:
+            dados = json.load(f)
+        if dados.get("versao") != BUNDLE_VERSION or dados.get("digest") != digest:
+            return None
+        return _desserializar(dados)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        app_logger.warning(f"⚠️  Cache de regras CST ilegível, recompilando: {e}")
+        return None
+
+
+def _gravar_cache(bundle: RuleBundle) -> None:
+    """Grava o pacote de forma atômica (outros processos podem estar lendo)."""
+    tmp_path = f"{CST_RULES_BUNDLE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_serializar(bundle), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, CST_RULES_BUNDLE_PATH)
+    except OSError as e:
+        app_logger.warning(f"⚠️  Não foi possível gravar o cache de regras CST: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def build_rule_bundle() -> RuleBundle:
+    """Retorna o pacote do cache em disco ou compila a partir dos JSONs."""
+    conteudos, digest = _ler_origens()
+
+    bundle = _ler_cache(digest)
+    if bundle is not None:
+        return bundle
+
+    tables = {}
+    for name, data in conteudos.items():
+        try:
+            tables[name] = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Erro ao ler {SOURCE_FILES[name]}: {e}") from e
+
+    bundle = compile_rules(tables, digest)
+    _gravar_cache(bundle)
+    app_logger.info(f"📦 Regras CST compiladas: {len(bundle.per_cfop) // len(REGIMES)} CFOPs")
+    return bundle
+
+
+# =====================================================
+# PACOTE DO PROCESSO
+# =====================================================
+
+# Pacote carregado uma vez por processo e recarregado quando as origens mudam
+_NAO_CARREGADO = object()
+_rule_bundle: RuleBundle | None = None
+_rule_bundle_mtimes = _NAO_CARREGADO
+_rule_bundle_lock = LockProcesso()
+
+
+def _mtimes_origens() -> tuple:
+    """mtime de cada arquivo de origem (None se ausente)."""
+    mtimes = []
+    for path in SOURCE_FILES.values():
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def get_rule_bundle() -> RuleBundle:
+    """
+    Pacote de regras do processo.
+
+    Carregado na primeira chamada e recarregado apenas quando o mtime de algum
+    arquivo de origem muda. Leituras não usam lock; a recarga é serializada.
+    Processos filhos (fork) herdam o pacote já carregado.
+    """
+    global _rule_bundle, _rule_bundle_mtimes
+
+    mtimes = _mtimes_origens()
+    if mtimes == _rule_bundle_mtimes:
+        return _rule_bundle
+
+    with _rule_bundle_lock:
+        if mtimes != _rule_bundle_mtimes:
+            _rule_bundle = build_rule_bundle()
+            _rule_bundle_mtimes = mtimes
+        return _rule_bundle
@@ -0,0 +1,292 @@
+"""
+Infraestrutura do motor de regras fiscais: registro declarativo e contexto.
+
+Cada regra é uma função geradora registrada com um código e um grupo
+(cfop, ncm, destinatario, cst). Regras de nota recebem o contexto da nota;
+regras de item recebem também o item já normalizado, preparado uma única vez
+e compartilhado por todas as regras. Cada ocorrência gerada (erro/aviso)
+vira uma Violacao com o código da regra.
+
+Regras de item que dependem só dos códigos do item (CFOP, regime e CSTs) são
+registradas com por_assinatura=True: o resultado fica em um memo LRU por
+assinatura do item e é reaproveitado pelos itens seguintes com os mesmos
+códigos. Regras que olham valores (destaques, alíquotas) rodam sempre.
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from config.configuration import ITEM_SIGNATURE_CACHE_SIZE
+from src.utils.lazy import LockProcesso
+from src.validators.aliquotas.rate_table import TabelaAliquotasUF, get_tabela_aliquotas
+from src.validators.calculators.icms_st import CAMPOS_ST_NUMERICOS, CAMPOS_ST_TEXTO
+from src.validators.calculators.tax_calculator import (
+    CAMPOS_DIFAL,
+    CAMPOS_NUMERICOS,
+    CAMPOS_TEXTO,
+    itens_para_arrays,
+)
+from src.validators.cfops.cfop_validator import get_cfop_index
+from src.validators.csts.rule_bundle import RegraCST, RuleBundle, get_regime_key, get_rule_bundle
+from src.validators.totais.totais_validator import SOMAS_ITENS
+
+SEVERITY_ERROR = "error"
+SEVERITY_WARN = "warn"
+
+
+class Ocorrencia(NamedTuple):
+    """Resultado de uma regra, antes de receber o código."""
+    msg: str
+    campo: str
+    severity: str
+
+
+def erro(msg: str, campo: str) -> Ocorrencia:
+    """Ocorrência que reprova a nota."""
+    return Ocorrencia(msg, campo, SEVERITY_ERROR)
+
+
+def aviso(msg: str, campo: str) -> Ocorrencia:
+    """Ocorrência apenas informativa."""
+    return Ocorrencia(msg, campo, SEVERITY_WARN)
+
+
+class Violacao(NamedTuple):
+    """Violação de uma regra fiscal."""
+    codigo: str
+    msg: str
+    campo: str
+    severity: str
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+# =====================================================
+# CONTEXTO
+# =====================================================
+
+def _to_float(valor: Any) -> float:
+    return float(valor or 0)
+
+
+# Campos dos arrays da nota (ContextoNota.arrays): calculadora, ICMS-ST, DIFAL e totais
+CAMPOS_ARRAYS_NUMERICOS = tuple(dict.fromkeys((
+    *CAMPOS_NUMERICOS, *CAMPOS_ST_NUMERICOS, *CAMPOS_DIFAL, *(campo for campo, _ in SOMAS_ITENS),
+)))
+CAMPOS_ARRAYS_TEXTO = tuple(dict.fromkeys((*CAMPOS_TEXTO, *CAMPOS_ST_TEXTO)))
+
+
+class ContextoNota:
+    """Dados da nota e tabelas consultadas pelas regras (resolvidos uma vez por nota)."""
+
+    __slots__ = (
+        'nf_data', 'itens', 'regime_key', 'bundle', 'cfop_index', 'cfops_validados',
+        'aliquotas_uf', 'uf_emitente', 'uf_destinatario', '_arrays',
+    )
+
+    def __init__(self, nf_data: dict):
+        self.nf_data = nf_data
+        self.itens = nf_data.get("itens", []) or []
+        self.regime_key = get_regime_key(nf_data.get("crt", ""))
+        self.bundle: RuleBundle = get_rule_bundle()
+        self.cfop_index = get_cfop_index()
+        # Notas repetem poucos CFOPs: resultado de validar_cfop por código
+        self.cfops_validados: dict[str, dict] = {}
+        self.aliquotas_uf: TabelaAliquotasUF = get_tabela_aliquotas()
+        self.uf_emitente = str(nf_data.get("uf_emitente") or "").strip().upper()
+        self.uf_destinatario = str(nf_data.get("uf_destinatario") or "").strip().upper()
+        self._arrays: dict[str, np.ndarray] | None = None
+
+    @property
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Arrays dos itens (ver itens_para_arrays), montados na primeira regra que os usa."""
+        if self._arrays is None:
+            self._arrays = itens_para_arrays([self.nf_data], CAMPOS_ARRAYS_NUMERICOS, CAMPOS_ARRAYS_TEXTO)
+        return self._arrays
+
+
+class ItemFiscal:
+    """Item normalizado uma vez (strings limpas, valores numéricos, regra CST do CFOP)."""
+
+    __slots__ = (
+        'idx', 'item', 'nItem', 'cfop', 'regra',
+        'cst_csosn', 'cst_ipi', 'cst_pis', 'cst_cofins', 'assinatura',
+        'aliq_icms', 'vICMS', 'aliq_ipi', 'vIPI',
+    )
+
+    def __init__(self, idx: int, item: dict, ctx: ContextoNota):
+        self.idx = idx
+        self.item = item
+        self.nItem = item.get("nItem")
+        self.cfop = str(item.get("cfop", "")).strip()
+        self.regra: RegraCST | None = ctx.bundle.regra(self.cfop, ctx.regime_key)
+
+        self.cst_csosn = str(item.get("cst_csosn", "")).strip()
+        self.cst_ipi = str(item.get("cst_ipi", "")).strip()
+        self.cst_pis = str(item.get("cst_pis", "")).strip()
+        self.cst_cofins = str(item.get("cst_cofins", "")).strip()
+        # Chave do memo das regras por assinatura
+        self.assinatura = (
+            self.cfop, ctx.regime_key, self.cst_csosn, self.cst_ipi, self.cst_pis, self.cst_cofins,
+        )
+
+        # Valores só são necessários quando há regra CST para o CFOP
+        if self.regra is not None:
+            self.aliq_icms = _to_float(item.get("aliq_icms", 0))
+            self.vICMS = _to_float(item.get("vICMS", 0))
+            self.aliq_ipi = _to_float(item.get("aliq_ipi", 0))
+            self.vIPI = _to_float(item.get("vIPI", 0))
+
+
+# =====================================================
+# REGISTRO
+# =====================================================
+
+RegraNota = Callable[[ContextoNota], Iterable[Ocorrencia]]
+RegraItem = Callable[[ContextoNota, ItemFiscal], Iterable[Ocorrencia]]
+
+
+class Regra(NamedTuple):
+    """Regra registrada no motor."""
+    codigo: str
+    grupo: str
+    descricao: str
+    funcao: Callable
+    por_assinatura: bool = False    # resultado depende só da assinatura do item (memo)
+
+
+REGRAS_NOTA: list[Regra] = []
+REGRAS_ITEM: list[Regra] = []
+
+
+def _registrar(destino: list[Regra], codigo: str, grupo: str, por_assinatura: bool = False) -> Callable:
+    def decorator(funcao: Callable) -> Callable:
+        if any(r.codigo == codigo for r in REGRAS_NOTA + REGRAS_ITEM):
+            raise ValueError(f"Código de regra duplicado: {codigo}")
+        descricao = (funcao.__doc__ or funcao.__name__).strip().splitlines()[0]
+        destino.append(Regra(codigo, grupo, descricao, funcao, por_assinatura))
+        return funcao
+    return decorator
+
+
+def regra_nota(codigo: str, grupo: str) -> Callable[[RegraNota], RegraNota]:
+    """Registra uma regra avaliada uma vez por nota (ordem de registro = ordem de execução)."""
+    return _registrar(REGRAS_NOTA, codigo, grupo)
+
+
+def regra_item(codigo: str, grupo: str, por_assinatura: bool = False) -> Callable[[RegraItem], RegraItem]:
+    """
+    Registra uma regra avaliada para cada item, na mesma passada dos itens.
+
+    Com por_assinatura=True a regra só pode depender de ctx.regime_key e dos
+    códigos do item (cfop, regra, cst_*): o resultado é memorizado pela
+    assinatura do item, as mensagens não citam o item e o campo vem sem o
+    número do item (o motor acrescenta "_{nItem}"). Logs da regra saem só
+    quando o resultado é calculado.
+    """
+    return _registrar(REGRAS_ITEM, codigo, grupo, por_assinatura)
+
+
+def selecionar_regras(grupos: Iterable[str] | None = None) -> tuple[tuple[Regra, ...], tuple[Regra, ...]]:
+    """Regras de nota e de item dos grupos informados (todas se None)."""
+    if grupos is None:
+        return tuple(REGRAS_NOTA), tuple(REGRAS_ITEM)
+    grupos = frozenset(grupos)
+    return (
+        tuple(r for r in REGRAS_NOTA if r.grupo in grupos),
+        tuple(r for r in REGRAS_ITEM if r.grupo in grupos),
+    )
+
+
+def aplicar(regras: Iterable[Regra], *args) -> Iterator[Violacao]:
+    """Executa as regras e atribui o código de cada uma às ocorrências."""
+    for regra in regras:
+        for ocorrencia in regra.funcao(*args):
+            yield Violacao(regra.codigo, *ocorrencia)
+
+
+# =====================================================
+# MEMO POR ASSINATURA DO ITEM
+# =====================================================
+
+class MemoAssinaturas:
+    """
+    Ocorrências das regras por assinatura (cfop, regime, cst_csosn, cst_ipi, cst_pis, cst_cofins).
+
+    LRU limitado; cada entrada guarda, por código de regra, as ocorrências
+    com o campo sem o número do item. O memo é esvaziado quando o digest do
+    pacote de regras muda.
+    """
+
+    def __init__(self, tamanho: int = ITEM_SIGNATURE_CACHE_SIZE):
+        """Inicializa memo."""
+        self.tamanho = tamanho
+        self.digest: str | None = None
+        # Contadores sem lock: sob concorrência são aproximados
+        self.hits = 0
+        self.misses = 0
+        self._memo: OrderedDict[tuple, dict[str, tuple[Ocorrencia, ...]]] = OrderedDict()
+        self._lock = LockProcesso()
+
+    def sincronizar(self, digest: str) -> None:
+        """Esvazia o memo se as regras compiladas mudaram."""
+        if digest != self.digest:
+            with self._lock:
+                if digest != self.digest:
+                    self._memo.clear()
+                    self.digest = digest
+
+    def entrada(self, assinatura: tuple) -> dict[str, tuple[Ocorrencia, ...]]:
+        """Resultados já calculados para a assinatura (cria a entrada, descartando a menos usada)."""
+        with self._lock:
+            resultados = self._memo.get(assinatura)
+            if resultados is None:
+                resultados = self._memo[assinatura] = {}
+                while len(self._memo) > self.tamanho:
+                    self._memo.popitem(last=False)
+            else:
+                self._memo.move_to_end(assinatura)
+            return resultados
+
+    def limpar(self) -> None:
+        """Esvazia o memo e zera os contadores."""
+        with self._lock:
+            self._memo.clear()
+            self.hits = self.misses = 0
+
+    def estatisticas(self) -> dict:
+        """hits, misses, assinaturas em memória e capacidade."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "assinaturas": len(self._memo),
+            "capacidade": self.tamanho,
+        }
+
+
+MEMO_ITENS = MemoAssinaturas()
+
+
+def aplicar_item(regras: Iterable[Regra], ctx: ContextoNota, it: ItemFiscal) -> Iterator[Violacao]:
+    """Executa as regras de item, usando o memo para as regras por assinatura."""
+    memo = None
+    for regra in regras:
+        if not regra.por_assinatura:
+            for ocorrencia in regra.funcao(ctx, it):
+                yield Violacao(regra.codigo, *ocorrencia)
+            continue
+
+        if memo is None:
+            memo = MEMO_ITENS.entrada(it.assinatura)
+        ocorrencias = memo.get(regra.codigo)
+        if ocorrencias is None:
+            MEMO_ITENS.misses += 1
+            ocorrencias = memo[regra.codigo] = tuple(regra.funcao(ctx, it))
+        else:
+            MEMO_ITENS.hits += 1
+        for msg, campo, severity in ocorrencias:
+            yield Violacao(regra.codigo, msg, f"{campo}_{it.nItem}", severity)
@@ -0,0 +1,341 @@
+"""
+Validação colunar (pandas/numpy) de itens de muitas notas de uma só vez.
+
+Para backfills com milhões de itens, as regras de CFOP do item e do grupo
+"cst" do motor de regras (CST/CSOSN, destaques de ICMS/IPI, CST de IPI,
+PIS e COFINS) são aplicadas como operações vetoriais sobre colunas. Consultas
+às tabelas (CFOP oficial, regras CST por CFOP/regime, listas permitidas) são
+feitas uma vez por combinação distinta de valores e espalhadas para as linhas.
+
+Os veredictos são os mesmos de validar_cst_nfe e da parte de itens de
+validar_cfops_nota; as mensagens e códigos são os do motor de regras.
+Valores ausentes (None/NaN) contam como campo vazio, valores numéricos
+inválidos como zero e o CRT é lido como código (1.0 = '1').
+"""
+
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from logs.logger import app_logger
+from src.validators.cfops.cfop_validator import get_cfop_index, validar_cfop
+from src.validators.csts.rule_bundle import (
+    ICMS_DESONERADO,
+    ICMS_TRIBUTADO_INTEGRALMENTE,
+    RegraCST,
+    RuleBundle,
+    get_regime_key,
+    get_rule_bundle,
+)
+from src.validators.engine.base import SEVERITY_ERROR, SEVERITY_WARN
+from src.validators.engine.rule_engine import listar_regras
+
+# Campos do item usados na validação (colunas do frame de entrada)
+ITEM_FIELDS = (
+    "nItem", "cfop", "cst_csosn", "cst_ipi", "cst_pis", "cst_cofins",
+    "aliq_icms", "vICMS", "aliq_ipi", "vIPI",
+)
+
+# Colunas do frame de violações
+VIOLATION_COLUMNS = ("nota_id", "item", "nItem", "codigo", "msg", "campo", "severity")
+
+REGIME_SN = "SIMPLES_NACIONAL"
+REGIME_RN = "REGIME_NORMAL"
+
+
+# =====================================================
+# MONTAGEM DO FRAME
+# =====================================================
+
+def itens_para_frame(notas: Iterable[dict], ids: Sequence[Hashable] | None = None) -> pd.DataFrame:
+    """
+    Achata notas (dicts/registros do parser) em um frame com uma linha por item.
+
+    Args:
+        notas: Notas com "crt" e "itens"
+        ids: Identificador de cada nota (padrão: posição)
+
+    Returns:
+        DataFrame com nota_id, item (posição 1..n na nota), crt e ITEM_FIELDS
+    """
+    colunas: dict[str, list] = {col: [] for col in ("nota_id", "item", "crt", *ITEM_FIELDS)}
+
+    for pos, nf_data in enumerate(notas):
+        nota_id = ids[pos] if ids is not None else pos
+        crt = nf_data.get("crt", "")
+        for idx, item in enumerate(nf_data.get("itens", []) or [], 1):
+            colunas["nota_id"].append(nota_id)
+            colunas["item"].append(idx)
+            colunas["crt"].append(crt)
+            colunas["nItem"].append(item.get("nItem"))
+            for campo in ITEM_FIELDS[1:]:
+                colunas[campo].append(item.get(campo, ""))
+
+    return pd.DataFrame(colunas)
+
+
+class _Coluna(NamedTuple):
+    """Coluna de texto fatorada: código por linha + valores distintos (já normalizados)."""
+    codigos: np.ndarray
+    valores: np.ndarray
+
+    def linhas(self, mask: np.ndarray | None = None) -> np.ndarray:
+        """Texto de cada linha (ou só das linhas da máscara)."""
+        codigos = self.codigos if mask is None else self.codigos[mask]
+        return self.valores[codigos]
+
+    def mapear(self, func: Callable, dtype=object) -> np.ndarray:
+        """func aplicada uma vez por valor distinto, espalhada para as linhas."""
+        return np.array([func(v) for v in self.valores], dtype=dtype)[self.codigos]
+
+
+def _coluna(df: pd.DataFrame, campo: str, strip: bool = True) -> _Coluna:
+    """Fatora a coluna de texto (ausente/None/NaN = vazio) e normaliza só os valores distintos."""
+    if campo not in df:
+        return _Coluna(np.zeros(len(df), dtype=np.intp), np.array([""], dtype=object))
+    codigos, unicos = pd.factorize(df[campo], use_na_sentinel=False, sort=False)
+    valores = np.empty(len(unicos), dtype=object)
+    for i, valor in enumerate(unicos):
+        texto = "" if valor is None or (isinstance(valor, float) and np.isnan(valor)) else str(valor)
+        valores[i] = texto.strip() if strip else texto
+    return _Coluna(np.asarray(codigos, dtype=np.intp), valores)
+
+
+def _numero(df: pd.DataFrame, campo: str) -> np.ndarray:
+    if campo not in df:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[campo], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def _pertence(regra_ids: np.ndarray, regras: list[RegraCST], coluna: _Coluna, atributo: str) -> np.ndarray:
+    """valor in getattr(regra, atributo), calculado por par distinto (regra, valor)."""
+    base = len(coluna.valores) + 1
+    chaves = regra_ids.astype(np.int64) * base + coluna.codigos
+    pares, inverso = np.unique(chaves, return_inverse=True)
+
+    resultado = np.zeros(len(pares), dtype=bool)
+    for i, chave in enumerate(pares):
+        regra_id, valor_id = divmod(int(chave), base)
+        if regra_id >= 0:
+            resultado[i] = coluna.valores[valor_id] in getattr(regras[regra_id], atributo)
+    return resultado[inverso]
+
+
+def _resolver_regras(bundle: RuleBundle, cfop: _Coluna, simples: np.ndarray) -> tuple[list[RegraCST], np.ndarray]:
+    """
+    Regra CST de cada linha, resolvida uma vez por par distinto (CFOP, regime).
+
+    Returns:
+        (regras distintas, índice da regra de cada linha; -1 = CFOP sem regra)
+    """
+    regras: list[RegraCST] = []
+    posicoes: dict[RegraCST, int] = {}
+    chaves = cfop.codigos.astype(np.int64) * 2 + simples
+    pares, inverso = np.unique(chaves, return_inverse=True)
+    ids_pares = np.full(len(pares), -1, dtype=np.int64)
+    for i, chave in enumerate(pares):
+        cfop_id, eh_simples = divmod(int(chave), 2)
+        regra = bundle.regra(cfop.valores[cfop_id], REGIME_SN if eh_simples else REGIME_RN)
+        if regra is None:
+            continue
+        if regra not in posicoes:
+            posicoes[regra] = len(regras)
+            regras.append(regra)
+        ids_pares[i] = posicoes[regra]
+    return regras, ids_pares[inverso]
+
+
+def _atributo(regras: list[RegraCST], regra_ids: np.ndarray, nome: str, padrao) -> np.ndarray:
+    """Atributo da regra de cada linha (padrao nas linhas sem regra)."""
+    valores = np.empty(len(regras) + 1, dtype=object)
+    for i, regra in enumerate(regras):
+        valores[i] = getattr(regra, nome)
+    valores[-1] = padrao
+    return valores[regra_ids]   # -1 -> padrão (último)
+
+
+def _registrar_notas_vazias(
+    colunas: dict[str, list[np.ndarray]], vazias: list[Hashable], posicao_nota: dict, ordem_regra: int,
+) -> None:
+    """Acrescenta a violação CST000 (NF sem itens) de cada nota vazia às colunas do resultado."""
+    if not vazias:
+        return
+    n = len(vazias)
+    colunas["nota_id"].append(np.array(vazias, dtype=object))
+    colunas["item"].append(np.zeros(n, dtype=np.int64))
+    colunas["nItem"].append(np.full(n, "", dtype=object))
+    colunas["codigo"].append(np.full(n, "CST000", dtype=object))
+    colunas["msg"].append(np.full(n, "NF sem itens para validar", dtype=object))
+    colunas["campo"].append(np.full(n, "itens", dtype=object))
+    colunas["severity"].append(np.full(n, SEVERITY_ERROR, dtype=object))
+    colunas["_nota"].append(np.array([posicao_nota[v] for v in vazias], dtype=np.int64))
+    colunas["_regra"].append(np.full(n, ordem_regra, dtype=np.int64))
+
+
+# =====================================================
+# VALIDAÇÃO
+# =====================================================
+
+def validate_batch(
+    itens: pd.DataFrame | Mapping[str, Sequence],
+    nota_ids: Iterable[Hashable] | None = None,
+) -> pd.DataFrame:
+    """
+    Valida itens de muitas notas em operações vetoriais.
+
+    Args:
+        itens: DataFrame (ou dict de colunas/arrays) com nota_id, crt e os
+            campos de ITEM_FIELDS; "item" (posição na nota) é calculado se ausente
+        nota_ids: Todas as notas do lote, na ordem. Notas sem nenhuma linha
+            em `itens` recebem a violação CST000 (NF sem itens)
+
+    Returns:
+        DataFrame de violações (VIOLATION_COLUMNS), na mesma ordem do motor
+        de regras: nota, depois item, depois ordem de registro da regra
+    """
+    df = pd.DataFrame(itens).reset_index(drop=True)
+    if "nota_id" not in df:
+        df["nota_id"] = 0
+    if "item" not in df:
+        df["item"] = df.groupby("nota_id", sort=False).cumcount() + 1
+
+    nota_codigos, notas_distintas = pd.factorize(df["nota_id"], sort=False)
+    item_pos = df["item"].to_numpy(dtype=np.int64)
+    # nItem só compõe o nome do campo: mesmo texto de f"{nItem}"
+    n_item = df["nItem"].astype(str).to_numpy(dtype=object) if "nItem" in df else np.full(len(df), "None", dtype=object)
+
+    cfop_bruto = _coluna(df, "cfop", strip=False)
+    cfop = _coluna(df, "cfop")
+    cst = _coluna(df, "cst_csosn")
+    cst_ipi = _coluna(df, "cst_ipi")
+    crt = _coluna(df, "crt")
+    aliq_icms, v_icms = _numero(df, "aliq_icms"), _numero(df, "vICMS")
+    aliq_ipi, v_ipi = _numero(df, "aliq_ipi"), _numero(df, "vIPI")
+
+    partes: list[tuple] = []
+
+    def registrar(codigo: str, severity: str, mask: np.ndarray, msg: np.ndarray, campo_prefixo: str) -> None:
+        if mask.any():
+            partes.append((codigo, severity, mask, msg, campo_prefixo + n_item[mask]))
+
+    # --- CFOP do item (formato e tabela oficial): todas as mensagens de validar_cfop ---
+    cfop_index = get_cfop_index()
+    erros_cfop = [validar_cfop(c, cfop_index)["erros"] if c else [] for c in cfop_bruto.valores]
+    for ordem in range(max(map(len, erros_cfop), default=0)):
+        erro_cfop = np.array([erros[ordem] if ordem < len(erros) else "" for erros in erros_cfop], dtype=object)
+        mask = (erro_cfop != "")[cfop_bruto.codigos]
+        registrar("CFOP002", SEVERITY_ERROR, mask,
+                  "Item " + item_pos[mask].astype(str).astype(object) + ": " + erro_cfop[cfop_bruto.codigos[mask]],
+                  "cfop_item_")
+
+    # --- Regra CST por (regime, CFOP) ---
+    bundle = get_rule_bundle()
+    simples = crt.mapear(lambda v: get_regime_key(v) == REGIME_SN, dtype=bool)
+    regime = np.where(simples, REGIME_SN, REGIME_RN).astype(object)
+
+    regras, regra_ids = _resolver_regras(bundle, cfop, simples)
+    tem_regra = regra_ids >= 0
+
+    mask = ~tem_regra
+    registrar("CST001", SEVERITY_ERROR, mask,
+              "CFOP " + cfop.linhas(mask) + " não tem regra definida.", "cfop_item_")
+
+    # --- CST/CSOSN do ICMS ---
+    cst_vazio = cst.mapear(lambda v: v == "", dtype=bool)
+    mask = tem_regra & ~cst_vazio & ~_pertence(regra_ids, regras, cst, "icms_codigos")
+    registrar("CST002", SEVERITY_ERROR, mask,
+              "CST/CSOSN " + cst.linhas(mask) + " incoerente com CFOP " + cfop.linhas(mask)
+              + " (Regime " + regime[mask] + ")",
+              "cst_csosn_item_")
+
+    # --- Destaque de ICMS ---
+    tributado = tem_regra & cst.mapear(lambda v: v in ICMS_TRIBUTADO_INTEGRALMENTE, dtype=bool)
+    mask = tributado & (v_icms == 0) & (aliq_icms == 0)
+    registrar("CST003", SEVERITY_ERROR, mask,
+              "CFOP " + cfop.linhas(mask) + " espera destaque de ICMS (CST " + cst.linhas(mask) + "), mas valores zerados.",
+              "icms_item_")
+    desonerado = tem_regra & cst.mapear(lambda v: v in ICMS_DESONERADO, dtype=bool)
+    mask = desonerado & ((v_icms > 0) | (aliq_icms > 0))
+    registrar("CST003", SEVERITY_WARN, mask,
+              "ICMS destacado (" + np.array([repr(v) for v in v_icms[mask].tolist()], dtype=object)
+              + ") em item com CST/CSOSN " + cst.linhas(mask) + " (Isenção/Não Trib.).",
+              "icms_item_")
+
+    # --- IPI ---
+    ipi_esperado = _atributo(regras, regra_ids, "ipi_esperado", False).astype(bool)
+    mask = tem_regra & ipi_esperado & (v_ipi == 0) & (aliq_ipi == 0)
+    registrar("IPI001", SEVERITY_ERROR, mask,
+              "CFOP " + cfop.linhas(mask) + " espera IPI, mas nenhum valor/alíquota informado", "ipi_item_")
+    mask = tem_regra & ~ipi_esperado & (v_ipi > 0)
+    registrar("IPI001", SEVERITY_WARN, mask,
+              "CFOP " + cfop.linhas(mask) + " em geral não espera IPI, mas valor informado", "ipi_item_")
+
+    ipi_lista = _atributo(regras, regra_ids, "ipi_csts", frozenset()).astype(bool)
+    mask = tem_regra & ipi_lista & ~_pertence(regra_ids, regras, cst_ipi, "ipi_csts")
+    registrar("IPI002", SEVERITY_ERROR, mask,
+              "CST IPI " + cst_ipi.linhas(mask) + " inválido para CFOP " + cfop.linhas(mask)
+              + ". Esperava " + _atributo(regras, regra_ids, "ipi_csts_msg", "")[mask],
+              "cst_ipi_item_")
+
+    # --- PIS/COFINS ---
+    pis_lista = _atributo(regras, regra_ids, "pis_cofins_csts", frozenset()).astype(bool)
+    pis_msg = _atributo(regras, regra_ids, "pis_cofins_csts_msg", "")
+    for codigo, nome, campo in (("PIS001", "PIS", "cst_pis"), ("COFINS001", "COFINS", "cst_cofins")):
+        coluna = _coluna(df, campo)
+        vazio = coluna.mapear(lambda v: v == "", dtype=bool)
+        mask = tem_regra & pis_lista & ~vazio & ~_pertence(regra_ids, regras, coluna, "pis_cofins_csts")
+        registrar(codigo, SEVERITY_ERROR, mask,
+                  f"CST {nome} " + coluna.linhas(mask) + " incoerente com CFOP " + cfop.linhas(mask)
+                  + " (Regime " + regime[mask] + "). Esperado " + pis_msg[mask],
+                  f"{campo}_item_")
+
+    # --- Montagem (ordem do motor: nota, item, regra) ---
+    ordem_notas = list(nota_ids) if nota_ids is not None else list(notas_distintas)
+    posicao_nota = {nota: i for i, nota in enumerate(ordem_notas)}
+    pos_por_codigo = np.array([posicao_nota.get(n, -1) for n in notas_distintas], dtype=np.int64)
+    nota_pos = pos_por_codigo[nota_codigos] if len(df) else np.zeros(0, dtype=np.int64)
+    ordem_regras = {regra.codigo: i for i, regra in enumerate(listar_regras())}
+
+    colunas: dict[str, list[np.ndarray]] = {c: [] for c in (*VIOLATION_COLUMNS, "_nota", "_regra")}
+    for codigo, severity, mask, msg, campo in partes:
+        n = int(mask.sum())
+        colunas["nota_id"].append(df["nota_id"].to_numpy()[mask])
+        colunas["item"].append(item_pos[mask])
+        colunas["nItem"].append(n_item[mask])
+        colunas["codigo"].append(np.full(n, codigo, dtype=object))
+        colunas["msg"].append(msg)
+        colunas["campo"].append(campo)
+        colunas["severity"].append(np.full(n, severity, dtype=object))
+        colunas["_nota"].append(nota_pos[mask])
+        colunas["_regra"].append(np.full(n, ordem_regras[codigo], dtype=np.int64))
+
+    # --- Notas sem itens ---
+    if nota_ids is not None:
+        com_itens = set(notas_distintas)
+        _registrar_notas_vazias(
+            colunas, [n for n in ordem_notas if n not in com_itens], posicao_nota, ordem_regras["CST000"],
+        )
+
+    if not colunas["codigo"]:
+        return pd.DataFrame({col: [] for col in VIOLATION_COLUMNS})
+
+    dados = {col: np.concatenate(partes_col) for col, partes_col in colunas.items()}
+    ordem = np.lexsort((dados.pop("_regra"), dados["item"], dados.pop("_nota")))
+    violacoes = pd.DataFrame({col: dados[col][ordem] for col in VIOLATION_COLUMNS})
+
+    app_logger.info(f"📊 Validação em lote: {len(df)} itens, {len(violacoes)} violações")
+    return violacoes
+
+
+def notas_validas(violacoes: pd.DataFrame, nota_ids: Iterable[Hashable]) -> pd.Series:
+    """Veredicto por nota (True = sem erros), a partir do frame de violações."""
+    reprovadas = set(violacoes.loc[violacoes["severity"] == SEVERITY_ERROR, "nota_id"])
+    ids = list(nota_ids)
+    return pd.Series([n not in reprovadas for n in ids], index=ids, name="valido")
+
+
+def validate_notas(notas: Sequence[dict]) -> pd.DataFrame:
+    """Atalho: achata as notas e valida o lote (ids = posição da nota)."""
+    return validate_batch(itens_para_frame(notas), nota_ids=range(len(notas)))
@@ -0,0 +1,359 @@
+"""
+Regras fiscais registradas no motor (CFOP, NCM, emitente, destinatário, totais,
+CST/IPI/PIS/COFINS, alíquotas de ICMS por UF/DIFAL, ICMS-ST, IBS/CBS e ISS).
+
+As mensagens são as mesmas dos validadores individuais, que continuam
+disponíveis para uso isolado; os grupos de regras correspondem a eles.
+A ordem de registro define a ordem das violações na saída. As regras de CST
+que só comparam códigos são por assinatura (memorizadas; campo sem o número
+do item); destaques de ICMS/IPI dependem dos valores e rodam para cada item.
+"""
+
+from collections.abc import Iterator
+
+import numpy as np
+
+from config.configuration import RECONCILIATION_TOLERANCE_CENTS
+from logs.logger import app_logger
+from src.constants import DocumentType, TaxType
+from src.validators.aliquotas.ibs_cbs_table import get_tabela_ibs_cbs
+from src.validators.calculators.icms_st import CST_COM_ST, TOLERANCIA_MVA, calcular_st
+from src.validators.calculators.tax_calculator import (
+    ESCALA_ALIQUOTA,
+    IMPOSTOS,
+    TaxCalculator,
+)
+from src.validators.cfops.cfop_validator import validar_cfop
+from src.validators.cpf_cnpj.document_validator import validar_document_dest, validar_document_emit
+from src.validators.csts.rule_bundle import ICMS_DESONERADO, ICMS_TRIBUTADO_INTEGRALMENTE
+from src.validators.engine.base import (
+    ContextoNota,
+    ItemFiscal,
+    Ocorrencia,
+    aviso,
+    erro,
+    regra_item,
+    regra_nota,
+)
+from src.validators.iss.iss_validator import validar_iss
+from src.validators.ncm.ncm_validator import ncm_do_item, validar_ncm
+from src.validators.totais.totais_validator import diferenca_item, reais, validar_totais
+
+# =====================================================
+# REGRAS DA NOTA
+# =====================================================
+
+@regra_nota("CFOP001", grupo="cfop")
+def cfop_da_nota(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """CFOP da nota deve existir na tabela oficial."""
+    cfop_nota = ctx.nf_data.get('cfop', '')
+    if cfop_nota:
+        resultado = validar_cfop(cfop_nota, ctx.cfop_index)
+        if not resultado["valido"]:
+            app_logger.error(f"❌ CFOP da nota inválido: {cfop_nota}")
+            for msg in resultado["erros"]:
+                yield erro(msg, "cfop")
+
+
+@regra_nota("EMIT001", grupo="emitente")
+def documento_emitente(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Emitente (NF-e) ou prestador (RPS) deve ter CNPJ/CPF com dígitos verificadores válidos."""
+    for msg in validar_document_emit(ctx.nf_data)["erros"]:
+        yield erro(msg, "emitente")
+
+
+@regra_nota("DEST001", grupo="destinatario")
+def documento_destinatario(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Destinatário/tomador deve ter exatamente um documento (CNPJ ou CPF) válido."""
+    for msg in validar_document_dest(ctx.nf_data)["erros"]:
+        yield erro(msg, "destinatario")
+
+
+@regra_nota("TOT001", grupo="totais")
+def totais_conciliados(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Totais do ICMSTot devem conciliar com a soma dos itens e compor o vNF."""
+    if not ctx.nf_data.get('totais'):
+        return
+    for msg in validar_totais(ctx.nf_data, arrays=ctx.arrays)["erros"]:
+        yield erro(msg, "totais")
+
+
+@regra_nota("DIFAL001", grupo="aliquotas")
+def difal_consumidor_final(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Venda interestadual a consumidor final não contribuinte deve informar a partilha (DIFAL/FCP)."""
+    if not ctx.uf_destinatario or ctx.uf_destinatario == ctx.uf_emitente:
+        return
+    difal = TaxCalculator.calcular_difal(ctx.arrays)
+    for i in np.flatnonzero(difal.aplicavel | difal.informado).tolist():
+        idx = int(difal.item[i])
+        campo = f"difal_item_{ctx.itens[idx - 1].get('nItem')}"
+        if not difal.informado[i]:
+            if difal.difal[i] or difal.fcp[i]:
+                yield erro(
+                    f"Item {idx}: venda interestadual a consumidor final não contribuinte sem partilha do ICMS "
+                    f"(ICMSUFDest); esperado DIFAL {reais(int(difal.difal[i]))} e FCP {reais(int(difal.fcp[i]))}",
+                    campo,
+                )
+        elif not difal.aplicavel[i]:
+            yield aviso(f"Item {idx}: partilha do ICMS (ICMSUFDest) informada em operação sem DIFAL", campo)
+        else:
+            # Estados com base dupla (LC 190/2022) calculam diferente da base única: apenas aviso
+            for nome, calculado, declarado in (
+                ("DIFAL", int(difal.difal[i]), int(difal.difal_declarado[i])),
+                ("FCP", int(difal.fcp[i]), int(difal.fcp_declarado[i])),
+            ):
+                if abs(declarado - calculado) > RECONCILIATION_TOLERANCE_CENTS:
+                    yield aviso(
+                        f"Item {idx}: {nome} declarado ({reais(declarado)}) difere do calculado "
+                        f"({reais(calculado)}) para {ctx.uf_emitente} -> {ctx.uf_destinatario}",
+                        campo,
+                    )
+
+
+@regra_nota("ST001", grupo="icms_st")
+def icms_st_conferido(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """ICMS-ST exigido pelo CST/CSOSN deve ser informado e conferir com a MVA da tabela, a base e o valor calculados."""
+    if not any(
+        str(item.get('cst_csosn') or '').strip() in CST_COM_ST or item.get('vICMS_st') or item.get('vBC_st')
+        for item in ctx.itens
+    ):
+        return
+    st = calcular_st(ctx.arrays)
+    for i in np.flatnonzero(st.exigido | st.informado).tolist():
+        idx = int(st.item[i])
+        campo = f"icms_st_item_{ctx.itens[idx - 1].get('nItem')}"
+        if not st.informado[i]:
+            esperado = f" (esperado {reais(int(st.valor[i]))})" if st.calculavel[i] else ""
+            yield erro(f"Item {idx}: CST/CSOSN {st.cst[i]} exige ICMS-ST, mas vBCST/vICMSST não informados{esperado}", campo)
+            continue
+        if not st.calculavel[i]:
+            continue
+
+        # Regra genérica (UFs "*"): a MVA da tabela é referência, a divergência é aviso
+        if st.mva_generica[i]:
+            ocorrencia, referencia, mva_tabela = aviso, "de referência da tabela", int(st.mva_referencia[i])
+        else:
+            ocorrencia, referencia, mva_tabela = erro, "da tabela", int(st.mva[i]) if st.mva_tabela[i] else None
+        if mva_tabela is not None and abs(int(st.mva_declarada[i]) - mva_tabela) > TOLERANCIA_MVA:
+            yield ocorrencia(
+                f"Item {idx}: MVA-ST declarada ({int(st.mva_declarada[i]) / ESCALA_ALIQUOTA:.2f}%) difere da MVA {referencia} "
+                f"({mva_tabela / ESCALA_ALIQUOTA:.2f}% para {ctx.uf_emitente} -> {ctx.uf_destinatario})",
+                campo,
+            )
+        # Base calculada com a MVA de referência (sem MVA declarada): também só aviso
+        ocorrencia = aviso if st.mva_generica[i] and st.mva_tabela[i] else erro
+        for nome, calculado, declarado in (
+            ("vBCST", int(st.base[i]), int(st.base_declarada[i])),
+            ("vICMSST", int(st.valor[i]), int(st.valor_declarado[i])),
+        ):
+            if abs(declarado - calculado) > RECONCILIATION_TOLERANCE_CENTS:
+                app_logger.warning(f"❌ Item {idx} - {nome} declarado {reais(declarado)}, calculado {reais(calculado)}")
+                yield ocorrencia(f"Item {idx}: {nome} declarado ({reais(declarado)}) difere do calculado ({reais(calculado)})", campo)
+        if abs(int(st.fcp_declarado[i]) - int(st.fcp[i])) > RECONCILIATION_TOLERANCE_CENTS:
+            yield aviso(
+                f"Item {idx}: vFCPST declarado ({reais(int(st.fcp_declarado[i]))}) difere do calculado ({reais(int(st.fcp[i]))})",
+                campo,
+            )
+
+
+@regra_nota("IBSCBS001", grupo="ibs_cbs")
+def ibs_cbs_conferido(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Grupo IBSCBS do item deve ter CST/cClassTrib válidos e IBS/CBS conferindo com a tabela vigente."""
+    if not any(str(item.get('cst_ibs_cbs') or '').strip() for item in ctx.itens):
+        return
+    tabela = get_tabela_ibs_cbs()
+    for idx, item in enumerate(ctx.itens, start=1):
+        cst = str(item.get('cst_ibs_cbs') or '').strip()
+        c_class_trib = str(item.get('c_class_trib') or '').strip()
+        campo = f"ibs_cbs_item_{item.get('nItem')}"
+        if cst and tabela.efeito(cst) is None:
+            yield erro(f"Item {idx}: CST {cst} de IBS/CBS inexistente", campo)
+        elif cst and c_class_trib and c_class_trib[:3] != cst:
+            yield erro(f"Item {idx}: cClassTrib {c_class_trib} não pertence ao CST {cst} de IBS/CBS", campo)
+
+    # Resultado do nó calcular_imposto; fora do workflow, calculado aqui
+    resultado = ctx.nf_data.get('resultado_impostos')
+    if resultado is None:
+        resultado = TaxCalculator.calcular(ctx.arrays)
+    diferenca = resultado.diferenca
+    for j in (IMPOSTOS.index(TaxType.IBS), IMPOSTOS.index(TaxType.CBS)):
+        for i in np.flatnonzero(np.abs(diferenca[:, j]) > RECONCILIATION_TOLERANCE_CENTS).tolist():
+            idx = int(resultado.item[i])
+            declarado, calculado = int(resultado.declarado[i, j]), int(resultado.valor[i, j])
+            app_logger.warning(f"❌ Item {idx} - {IMPOSTOS[j].value} declarado {reais(declarado)}, calculado {reais(calculado)}")
+            yield erro(
+                f"Item {idx}: {IMPOSTOS[j].value} declarado ({reais(declarado)}) difere do calculado "
+                f"({reais(calculado)} à alíquota de {int(resultado.aliquota[i, j]) / ESCALA_ALIQUOTA:.4f}%)",
+                f"ibs_cbs_item_{ctx.itens[idx - 1].get('nItem')}",
+            )
+
+
+@regra_nota("ISS001", grupo="iss")
+def iss_municipal(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Nota de serviço deve ter alíquota e retenção do ISS conforme a tabela do município e item da LC 116."""
+    if ctx.nf_data.get('tipo_nf') != DocumentType.RPS.value:
+        return
+    resultado = validar_iss(ctx.nf_data)
+    for msg in resultado["erros"]:
+        yield erro(msg, "iss")
+    for msg in resultado["avisos"]:
+        yield aviso(msg, "iss")
+
+
+@regra_nota("CST000", grupo="cst")
+def nota_com_itens(ctx: ContextoNota) -> Iterator[Ocorrencia]:
+    """Nota deve ter itens para validar."""
+    if not ctx.itens:
+        yield erro("NF sem itens para validar", "itens")
+
+
+# =====================================================
+# REGRAS DOS ITENS
+# =====================================================
+
+@regra_item("CFOP002", grupo="cfop")
+def cfop_do_item(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """CFOP do item deve existir na tabela oficial."""
+    cfop_item = it.item.get('cfop', '')
+    if cfop_item:
+        resultado = ctx.cfops_validados.get(cfop_item)
+        if resultado is None:
+            resultado = ctx.cfops_validados[cfop_item] = validar_cfop(cfop_item, ctx.cfop_index)
+        if not resultado["valido"]:
+            app_logger.error(f"❌ Item {it.idx} - CFOP inválido: {cfop_item}")
+            for msg in resultado["erros"]:
+                yield erro(f"Item {it.idx}: {msg}", f"cfop_item_{it.nItem}")
+
+
+@regra_item("NCM001", grupo="ncm")
+def ncm_do_item_valido(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """NCM do item deve ter 8 dígitos e, com a tabela NCM configurada, existir e estar vigente na emissão."""
+    ncm_item = ncm_do_item(it.item)
+    if ncm_item:
+        resultado = validar_ncm(ncm_item, ctx.nf_data.get('data_emissao'))
+        if not resultado["valido"]:
+            app_logger.error(f"❌ Item {it.idx} - NCM inválido: {ncm_item}")
+            for msg in resultado["erros"]:
+                yield erro(f"Item {it.idx}: {msg}", f"ncm_item_{it.nItem}")
+
+
+@regra_item("TOT002", grupo="totais")
+def valor_do_item(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """Valor do item deve ser quantidade × valor unitário."""
+    diferenca = diferenca_item(it.item)
+    if diferenca is not None:
+        yield erro(
+            f"Item {it.idx}: valor total difere de quantidade × valor unitário em {reais(diferenca)}",
+            f"valor_item_{it.nItem}",
+        )
+
+
+@regra_item("ALQ001", grupo="aliquotas")
+def aliquota_interestadual(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """Alíquota de ICMS em operação interestadual deve ser a da tabela por UF (7%/12%, 4% para importados)."""
+    if not it.cfop.startswith("6"):
+        return
+    aliq_icms = float(it.item.get('aliq_icms') or 0)
+    if aliq_icms <= 0:
+        return
+    origem = str(it.item.get('origem') or '').strip()
+    esperada = ctx.aliquotas_uf.aliquota_interestadual(ctx.uf_emitente, ctx.uf_destinatario, origem)
+    if esperada is not None and abs(aliq_icms - esperada) > 0.005:
+        app_logger.warning(f"❌ Item {it.idx} - alíquota interestadual {aliq_icms}% (esperado {esperada}%)")
+        yield erro(
+            f"Item {it.idx}: alíquota interestadual de ICMS {aliq_icms}% difere da tabela "
+            f"({esperada}% de {ctx.uf_emitente} para {ctx.uf_destinatario}, origem {origem or 'não informada'})",
+            f"icms_item_{it.nItem}",
+        )
+
+
+@regra_item("CST001", grupo="cst", por_assinatura=True)
+def cfop_com_regra(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """CFOP do item deve ter regra de CST definida (senão as demais regras CST são puladas)."""
+    if it.regra is None:
+        app_logger.warning(f"❌ CFOP {it.cfop} não tem regra definida.")
+        yield erro(f"CFOP {it.cfop} não tem regra definida.", "cfop_item")
+
+
+@regra_item("CST002", grupo="cst", por_assinatura=True)
+def cst_icms_coerente(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """CST (Regime Normal) ou CSOSN (Simples Nacional) do ICMS deve ser permitido para o CFOP."""
+    if it.regra is None or not it.cst_csosn:
+        return
+    if it.cst_csosn not in it.regra.icms_codigos:
+        app_logger.warning(f"❌ CST/CSOSN {it.cst_csosn} não condiz com CFOP {it.cfop}")
+        yield erro(
+            f"CST/CSOSN {it.cst_csosn} incoerente com CFOP {it.cfop} (Regime {ctx.regime_key})",
+            "cst_csosn_item",
+        )
+
+
+@regra_item("CST003", grupo="cst")
+def destaque_icms(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """Destaque de ICMS coerente com o CST/CSOSN (tributado integralmente x desonerado)."""
+    if it.regra is None:
+        return
+    if it.cst_csosn in ICMS_TRIBUTADO_INTEGRALMENTE and it.vICMS == 0 and it.aliq_icms == 0:
+        app_logger.warning(f"❌ CFOP {it.cfop} espera destaque de ICMS, mas aliq/ICMS zerados")
+        yield erro(
+            f"CFOP {it.cfop} espera destaque de ICMS (CST {it.cst_csosn}), mas valores zerados.",
+            f"icms_item_{it.nItem}",
+        )
+    elif it.cst_csosn in ICMS_DESONERADO and (it.vICMS > 0 or it.aliq_icms > 0):
+        yield aviso(
+            f"ICMS destacado ({it.vICMS}) em item com CST/CSOSN {it.cst_csosn} (Isenção/Não Trib.).",
+            f"icms_item_{it.nItem}",
+        )
+
+
+@regra_item("IPI001", grupo="cst")
+def destaque_ipi(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """Destaque de IPI coerente com o esperado para o CFOP."""
+    if it.regra is None:
+        return
+    if it.regra.ipi_esperado:
+        if it.vIPI == 0 and it.aliq_ipi == 0:
+            yield erro(f"CFOP {it.cfop} espera IPI, mas nenhum valor/alíquota informado", f"ipi_item_{it.nItem}")
+    elif it.vIPI > 0:
+        # Muito comum em revenda: apenas aviso
+        yield aviso(f"CFOP {it.cfop} em geral não espera IPI, mas valor informado", f"ipi_item_{it.nItem}")
+
+
+@regra_item("IPI002", grupo="cst", por_assinatura=True)
+def cst_ipi_permitido(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """CST do IPI deve ser permitido para o CFOP."""
+    if it.regra is None:
+        return
+    if it.regra.ipi_csts and it.cst_ipi not in it.regra.ipi_csts:
+        yield erro(
+            f"CST IPI {it.cst_ipi} inválido para CFOP {it.cfop}. Esperava {it.regra.ipi_csts_msg}",
+            "cst_ipi_item",
+        )
+
+
+@regra_item("PIS001", grupo="cst", por_assinatura=True)
+def cst_pis_permitido(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """CST do PIS deve ser permitido para o CFOP no regime do emitente."""
+    regra = it.regra
+    if regra is None or not it.cst_pis:
+        return
+    if regra.pis_cofins_csts and it.cst_pis not in regra.pis_cofins_csts:
+        app_logger.warning(f"❌ CST PIS {it.cst_pis} incoerente com CFOP {it.cfop}.")
+        yield erro(
+            f"CST PIS {it.cst_pis} incoerente com CFOP {it.cfop} (Regime {ctx.regime_key}). Esperado {regra.pis_cofins_csts_msg}",
+            "cst_pis_item",
+        )
+
+
+@regra_item("COFINS001", grupo="cst", por_assinatura=True)
+def cst_cofins_permitido(ctx: ContextoNota, it: ItemFiscal) -> Iterator[Ocorrencia]:
+    """CST da COFINS deve ser permitido para o CFOP no regime do emitente."""
+    regra = it.regra
+    if regra is None or not it.cst_cofins:
+        return
+    if regra.pis_cofins_csts and it.cst_cofins not in regra.pis_cofins_csts:
+        app_logger.warning(f"❌ CST COFINS {it.cst_cofins} incoerente com CFOP {it.cfop}.")
+        yield erro(
+            f"CST COFINS {it.cst_cofins} incoerente com CFOP {it.cfop} (Regime {ctx.regime_key}). Esperado {regra.pis_cofins_csts_msg}",
+            "cst_cofins_item",
+        )
@@ -0,0 +1,84 @@
+"""
+Motor de regras fiscais: avalia todas as regras registradas em uma passada por item.
+
+Substitui a sequência CFOP -> NCM -> destinatário -> CST, que percorria os
+itens quatro vezes e parava no primeiro validador reprovado. Aqui cada item é
+normalizado uma vez e passa por todas as regras, e a nota sai com a lista
+completa de violações (cada uma com o código da regra).
+
+As regras que dependem só dos códigos do item usam o memo por assinatura
+(base.MEMO_ITENS); estatisticas_memo() expõe os contadores de hits/misses.
+"""
+
+from collections.abc import Iterable
+
+from src.validators.engine import regras_fiscais  # noqa: F401  (registra as regras)
+from src.validators.engine.base import (
+    MEMO_ITENS,
+    SEVERITY_ERROR,
+    ContextoNota,
+    ItemFiscal,
+    Regra,
+    Violacao,
+    aplicar,
+    aplicar_item,
+    selecionar_regras,
+)
+
+
+def listar_regras(grupos: Iterable[str] | None = None) -> list[Regra]:
+    """Regras registradas (nota e item), na ordem de execução."""
+    regras_nota, regras_item = selecionar_regras(grupos)
+    return [*regras_nota, *regras_item]
+
+
+def avaliar_nota(nf_data: dict, grupos: Iterable[str] | None = None) -> list[Violacao]:
+    """
+    Avalia as regras de uma nota.
+
+    Args:
+        nf_data: Dados da nota fiscal
+        grupos: Grupos de regras a aplicar (padrão: todos)
+
+    Returns:
+        Violações (erros e avisos), na ordem: regras da nota, depois item a item
+    """
+    regras_nota, regras_item = selecionar_regras(grupos)
+    ctx = ContextoNota(nf_data)
+
+    violacoes = list(aplicar(regras_nota, ctx))
+    if regras_item:
+        MEMO_ITENS.sincronizar(ctx.bundle.digest)
+        for idx, item in enumerate(ctx.itens, 1):
+            violacoes.extend(aplicar_item(regras_item, ctx, ItemFiscal(idx, item, ctx)))
+    return violacoes
+
+
+def estatisticas_memo() -> dict:
+    """Contadores do memo por assinatura do item (hits, misses, assinaturas, capacidade)."""
+    return MEMO_ITENS.estatisticas()
+
+
+def validar_nota(nf_data: dict, grupos: Iterable[str] | None = None) -> dict:
+    """
+    Valida a nota com todas as regras fiscais em uma passada.
+
+    Args:
+        nf_data: Dados da nota fiscal
+        grupos: Grupos de regras a aplicar (padrão: todos)
+
+    Returns:
+        dict com "valido", "erros" e "avisos" (violações como dicts com
+        codigo, msg, campo e severity)
+    """
+    erros = []
+    avisos = []
+    for violacao in avaliar_nota(nf_data, grupos):
+        destino = erros if violacao.severity == SEVERITY_ERROR else avisos
+        destino.append(violacao.to_dict())
+
+    return {
+        "valido": len(erros) == 0,
+        "erros": erros,
+        "avisos": avisos
+    }
@@ -0,0 +1,302 @@
+"""
+Índice do ISS por (município IBGE, item da lista de serviços da LC 116).
+
+A tabela vem de um JSON (ISS_TABLE_PATH): por município, a alíquota e a
+retenção padrão e as regras próprias de cada item; o local de incidência
+segue o art. 3º da LC 116 (estabelecimento do prestador, salvo os itens
+listados como do local da prestação ou do domicílio do tomador) e pode ser
+sobrescrito na regra do item. O pacote traz alguns municípios de referência.
+
+Os registros são compilados em uma tabela hash de endereçamento aberto
+(sondagem linear, chave municipio × 10000 + item, item 0 = padrão do
+município) em um único array estruturado, gravado em .npy e invalidado pelo
+SHA-256 da tabela, como o índice NCM. O arquivo é aberto com mmap: a
+consulta lê só as posições sondadas (O(1)) e as páginas são compartilhadas
+entre os processos do lote, mesmo com a tabela completa dos municípios.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from config.configuration import DATA_PROCESSED_DIR, ISS_TABLE_PATH
+from logs.logger import app_logger
+from src.utils.lazy import carregar_uma_vez
+
+REGISTRO_DTYPE = np.dtype([
+    ("chave", "u8"),        # municipio × 10000 + item (0 = posição vazia)
+    ("aliquota", "f4"),     # %
+    ("retencao", "u1"),     # 1 = retido pelo tomador
+    ("incidencia", "u1"),   # INCIDENCIA_*
+])
+
+# Local de incidência do ISS (art. 3º da LC 116); 0 = sem regra
+INCIDENCIA_PRESTADOR = 1
+INCIDENCIA_PRESTACAO = 2
+INCIDENCIA_TOMADOR = 3
+INCIDENCIAS = {
+    "prestador": INCIDENCIA_PRESTADOR,
+    "prestacao": INCIDENCIA_PRESTACAO,
+    "tomador": INCIDENCIA_TOMADOR,
+}
+
+ITEM_PADRAO = 0
+# Constante do hash multiplicativo (Fibonacci) de 64 bits
+_MULTIPLICADOR = 0x9E3779B97F4A7C15
+_MASCARA_64 = (1 << 64) - 1
+
+# Incrementar quando o formato compilado mudar
+FORMATO_VERSAO = 1
+INDEX_VERSION = 1
+INDEX_PREFIX = "iss_index-"
+
+
+class RegraISS(NamedTuple):
+    """Regra do ISS para o município e o item de serviço."""
+    municipio: str
+    item: str                   # "XX.YY"
+    aliquota: float             # %
+    retencao: bool              # ISS retido pelo tomador
+    incidencia: int             # INCIDENCIA_*
+    especifica: bool            # regra do item (senão, padrão do município)
+
+
+class ConsultaISSLote(NamedTuple):
+    """Regras de um lote de itens: aliquota NaN e incidência 0 onde não há regra."""
+    municipio: np.ndarray       # município em que o ISS é devido
+    aliquota: np.ndarray
+    retencao: np.ndarray
+    incidencia: np.ndarray
+
+
+def codigo_item(item) -> int:
+    """Item da LC 116 ('1.07', '01.07', '0107', '107') -> 107 (0 se inválido)."""
+    texto = str(item or "").strip()
+    try:
+        if "." in texto:
+            grupo, subitem = texto.split(".", 1)
+            codigo = int(grupo) * 100 + int(subitem)
+        elif texto.isdigit() and len(texto) in (3, 4):
+            codigo = int(texto)
+        else:
+            return 0
+    except ValueError:
+        return 0
+    return codigo if 100 < codigo < 10000 and codigo % 100 else 0
+
+
+def formatar_item(codigo: int) -> str:
+    """107 -> '01.07'."""
+    return f"{codigo // 100:02d}.{codigo % 100:02d}"
+
+
+def codigo_municipio(municipio) -> int:
+    """Código IBGE de 7 dígitos -> int (0 se inválido)."""
+    texto = str(municipio or "").strip()
+    return int(texto) if len(texto) == 7 and texto.isdigit() and texto[0] != "0" else 0
+
+
+def _posicao(chave: int, bits: int) -> int:
+    return ((chave * _MULTIPLICADOR) & _MASCARA_64) >> (64 - bits)
+
+
+# =====================================================
+# ÍNDICE
+# =====================================================
+
+class ISSIndex:
+    """Consultas O(1) (hash de endereçamento aberto) sobre o array de registros."""
+
+    def __init__(self, registros: np.ndarray):
+        self.registros = registros
+        self.chaves = registros["chave"]
+        self._bits = max(len(registros) - 1, 1).bit_length()
+        self._mascara = len(registros) - 1
+
+    def _buscar(self, chave: int) -> tuple | None:
+        """Registro (chave, aliquota, retencao, incidencia) da chave, ou None."""
+        if not len(self.registros):
+            return None
+        pos = _posicao(chave, self._bits)
+        while True:
+            encontrada = int(self.chaves[pos])
+            if encontrada == chave:
+                return self.registros[pos].item()
+            if encontrada == 0:
+                return None
+            pos = (pos + 1) & self._mascara
+
+    def consultar(self, municipio, item) -> RegraISS | None:
+        """
+        Regra do ISS no município para o item (a do item ou a padrão do município).
+
+        Args:
+            municipio: Código IBGE do município
+            item: Item da lista de serviços da LC 116
+
+        Returns:
+            RegraISS ou None se o município não consta da tabela (ou códigos inválidos)
+        """
+        mun, cod = codigo_municipio(municipio), codigo_item(item)
+        if not mun or not cod:
+            return None
+        registro = self._buscar(mun * 10000 + cod)
+        especifica = registro is not None
+        if registro is None:
+            registro = self._buscar(mun * 10000 + ITEM_PADRAO)
+        if registro is None:
+            return None
+        _, aliquota, retencao, incidencia = registro
+        return RegraISS(str(mun), formatar_item(cod), round(float(aliquota), 4), bool(retencao), int(incidencia), especifica)
+
+    def resolver(self, municipio_prestacao, municipio_prestador, municipio_tomador, item) -> RegraISS | None:
+        """
+        Regra do município em que o ISS é devido.
+
+        Consulta o local da prestação; quando a incidência do item é o
+        estabelecimento do prestador ou o domicílio do tomador e esse
+        município foi informado, consulta a regra dele. Sem regra para o
+        local da prestação, vale a regra geral (prestador), se a tabela do
+        município do prestador confirmar a incidência.
+        """
+        regra = self.consultar(municipio_prestacao, item)
+        incidencia = regra.incidencia if regra is not None else INCIDENCIA_PRESTADOR
+        devido = {
+            INCIDENCIA_PRESTADOR: codigo_municipio(municipio_prestador),
+            INCIDENCIA_TOMADOR: codigo_municipio(municipio_tomador),
+        }.get(incidencia, 0)
+        if not devido or (regra is not None and str(devido) == regra.municipio):
+            return regra
+        outra = self.consultar(devido, item)
+        if regra is None and outra is not None and outra.incidencia != incidencia:
+            return None
+        return outra
+
+    def resolver_lote(
+        self, municipios_prestacao: np.ndarray, municipios_prestador: np.ndarray,
+        municipios_tomador: np.ndarray, itens: np.ndarray,
+    ) -> ConsultaISSLote:
+        """resolver() de cada item do lote, consultado por combinação distinta."""
+        chaves = pd.Series(
+            list(zip(municipios_prestacao, municipios_prestador, municipios_tomador, itens, strict=True)), dtype=object,
+        )
+        codigos, unicos = pd.factorize(chaves)
+        regras = [self.resolver(*chave) for chave in unicos]
+        return ConsultaISSLote(
+            np.array([r.municipio if r else "" for r in regras], dtype=object)[codigos],
+            np.array([r.aliquota if r else np.nan for r in regras], dtype=float)[codigos],
+            np.array([r.retencao if r else False for r in regras], dtype=bool)[codigos],
+            np.array([r.incidencia if r else 0 for r in regras], dtype=np.uint8)[codigos],
+        )
+
+
+# =====================================================
+# COMPILAÇÃO E CACHE
+# =====================================================
+
+def compile_iss_table(tabela: dict) -> np.ndarray:
+    """Converte o JSON do ISS na tabela hash de registros (REGISTRO_DTYPE)."""
+    if tabela.get("formato") != FORMATO_VERSAO:
+        raise ValueError(f"Formato da tabela de ISS não suportado: {tabela.get('formato')}")
+
+    # Local de incidência por item (art. 3º da LC 116); os demais, prestador
+    incidencia_item: dict[int, int] = {}
+    for local, itens in (tabela.get("incidencia") or {}).items():
+        for item in itens:
+            incidencia_item[codigo_item(item)] = INCIDENCIAS[local]
+
+    linhas: dict[int, tuple] = {}
+    for municipio, entrada in (tabela.get("municipios") or {}).items():
+        mun = codigo_municipio(municipio)
+        if not mun:
+            raise ValueError(f"Código de município inválido na tabela de ISS: {municipio}")
+        padrao = entrada.get("padrao")
+        if padrao is not None:
+            aliquota, retencao = float(padrao["aliquota"]), bool(padrao.get("retencao", False))
+            linhas[mun * 10000 + ITEM_PADRAO] = (aliquota, retencao, INCIDENCIA_PRESTADOR)
+            # Itens com incidência própria precisam de registro mesmo sem regra no município
+            for cod, incidencia in incidencia_item.items():
+                linhas[mun * 10000 + cod] = (aliquota, retencao, incidencia)
+        for item, regra in (entrada.get("itens") or {}).items():
+            cod = codigo_item(item)
+            if not cod:
+                raise ValueError(f"Item da LC 116 inválido na tabela de ISS: {municipio}/{item}")
+            base = padrao or {}
+            linhas[mun * 10000 + cod] = (
+                float(regra.get("aliquota", base.get("aliquota", 0.0))),
+                bool(regra.get("retencao", base.get("retencao", False))),
+                INCIDENCIAS[regra["incidencia"]] if "incidencia" in regra
+                else incidencia_item.get(cod, INCIDENCIA_PRESTADOR),
+            )
+
+    return _tabela_hash(linhas)
+
+
+def _tabela_hash(linhas: dict[int, tuple]) -> np.ndarray:
+    """Registros (REGISTRO_DTYPE) em endereçamento aberto, por chave município × item."""
+    # Potência de 2 com ocupação máxima de 50%: sondagens curtas e sempre há posição vazia
+    bits = max(2 * len(linhas) - 1, 1).bit_length()
+    mascara = (1 << bits) - 1
+    ocupadas = [0] * (1 << bits)
+    posicoes = []
+    for chave in linhas:
+        pos = _posicao(chave, bits)
+        while ocupadas[pos]:
+            pos = (pos + 1) & mascara
+        ocupadas[pos] = chave
+        posicoes.append(pos)
+
+    registros = np.zeros(1 << bits, dtype=REGISTRO_DTYPE)
+    registros[posicoes] = np.array(
+        [(chave, *valores) for chave, valores in linhas.items()], dtype=REGISTRO_DTYPE,
+    )
+    return registros
+
+
+def build_iss_index(table_path: Path = ISS_TABLE_PATH, cache_dir: Path = DATA_PROCESSED_DIR) -> ISSIndex:
+    """Abre o índice compilado (mmap) ou compila a tabela e grava o cache."""
+    with open(table_path, "rb") as f:
+        conteudo = f.read()
+    digest = hashlib.sha256(f"v{INDEX_VERSION}".encode() + conteudo).hexdigest()[:16]
+    cache_path = Path(cache_dir) / f"{INDEX_PREFIX}{digest}.npy"
+
+    try:
+        return ISSIndex(np.load(cache_path, mmap_mode="r"))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        app_logger.warning(f"⚠️  Índice ISS ilegível, recompilando: {e}")
+
+    registros = compile_iss_table(json.loads(conteudo))
+
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, registros)
+        os.replace(tmp_path, cache_path)
+        # Índices de versões anteriores da tabela
+        for antigo in Path(cache_dir).glob(f"{INDEX_PREFIX}*.npy"):
+            if antigo != cache_path:
+                antigo.unlink(missing_ok=True)
+        registros = np.load(cache_path, mmap_mode="r")
+    except OSError as e:
+        app_logger.warning(f"⚠️  Não foi possível gravar o índice ISS: {e}")
+        tmp_path.unlink(missing_ok=True)
+
+    app_logger.info(f"📦 Índice ISS compilado: {int(np.count_nonzero(registros['chave']))} regras")
+    return ISSIndex(registros)
+
+
+# =====================================================
+# ÍNDICE DO PROCESSO
+# =====================================================
+
+@carregar_uma_vez
+def get_iss_index() -> ISSIndex:
+    """Índice ISS do processo (carregado na primeira consulta)."""
+    return build_iss_index()
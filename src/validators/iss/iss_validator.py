@@ -0,0 +1,103 @@
+"""
+Validação do ISS da NFS-e/RPS contra a tabela municipal (município IBGE × item da LC 116).
+
+Confere os códigos do município e do item da lista de serviços, a alíquota
+declarada (a do município em que o ISS é devido e dentro dos limites da
+LC 116: mínimo de 2% e máximo de 5%), a retenção pelo tomador e o município
+de incidência informado.
+"""
+
+from logs.logger import app_logger
+from src.validators.iss.iss_index import (
+    INCIDENCIA_PRESTACAO,
+    INCIDENCIA_TOMADOR,
+    RegraISS,
+    codigo_item,
+    codigo_municipio,
+    get_iss_index,
+)
+
+# Limites da alíquota do ISS (LC 116, art. 8º, II e art. 8º-A)
+ALIQUOTA_MINIMA = 2.0
+ALIQUOTA_MAXIMA = 5.0
+
+# IssRetido da NFS-e (ABRASF): 1 = sim, 2 = não
+ISS_RETIDO = "1"
+
+LOCAIS_INCIDENCIA = {
+    INCIDENCIA_PRESTACAO: "local da prestação",
+    INCIDENCIA_TOMADOR: "domicílio do tomador",
+}
+
+
+def _conferir_regra(nf_data: dict, regra: RegraISS, aliquota: float, valor_iss: float, erros: list, avisos: list) -> None:
+    """Confere município de incidência, alíquota e retenção com a regra da tabela."""
+    local = LOCAIS_INCIDENCIA.get(regra.incidencia)
+    local = f", {local}" if local else ""
+    incidencia = str(nf_data.get("municipio_incidencia") or "").strip()
+    if incidencia and incidencia != regra.municipio:
+        avisos.append(
+            f"Município de incidência informado ({incidencia}) difere do devido pela tabela "
+            f"({regra.municipio}) para o item {regra.item}"
+        )
+    if aliquota > 0 and round(aliquota, 4) != regra.aliquota:
+        erros.append(
+            f"Alíquota de ISS declarada ({aliquota:.2f}%) difere da tabela do município {regra.municipio} "
+            f"para o item {regra.item} ({regra.aliquota:.2f}%{local})"
+        )
+
+    retido = str(nf_data.get("iss_retido") or "").strip() == ISS_RETIDO
+    tomador_pj = bool(str(nf_data.get("cliente_cnpj") or "").strip())
+    if regra.retencao and tomador_pj and not retido and valor_iss > 0:
+        erros.append(f"ISS do item {regra.item} deve ser retido pelo tomador no município {regra.municipio}")
+    elif retido and not regra.retencao:
+        avisos.append(f"ISS retido sem previsão de retenção para o item {regra.item} no município {regra.municipio}")
+
+
+def validar_iss(nf_data: dict) -> dict:
+    """
+    Valida o ISS de uma nota de serviço (RPS/NFS-e).
+
+    Args:
+        nf_data: Dados da nota (codigo_municipio, item_lista_servico, iss_retido e itens com aliq_iss/vISS)
+
+    Returns:
+        dict com "valido", "erros", "avisos" e "regra" (RegraISS aplicada, ou None)
+    """
+    erros = []
+    avisos = []
+    resultado = {"valido": True, "erros": erros, "avisos": avisos, "regra": None}
+
+    item_lista = str(nf_data.get("item_lista_servico") or "").strip()
+    municipio = str(nf_data.get("codigo_municipio") or "").strip()
+    if not codigo_item(item_lista):
+        erros.append(f"Item da lista de serviços (LC 116) '{item_lista}' inválido")
+    if not codigo_municipio(municipio):
+        erros.append(f"Código IBGE do município de prestação '{municipio}' inválido")
+    if erros:
+        resultado["valido"] = False
+        return resultado
+
+    regra = get_iss_index().resolver(
+        municipio, nf_data.get("municipio_prestador"), nf_data.get("municipio_tomador"), item_lista,
+    )
+    resultado["regra"] = regra
+    itens = nf_data.get("itens", []) or []
+    aliquota = max((float(it.get("aliq_iss") or 0) for it in itens), default=0.0)
+    valor_iss = sum(float(it.get("vISS") or 0) for it in itens)
+
+    if regra is None:
+        avisos.append(f"Município {municipio} sem alíquota de ISS na tabela para o item {item_lista}")
+    else:
+        _conferir_regra(nf_data, regra, aliquota, valor_iss, erros, avisos)
+
+    if aliquota > 0 and not ALIQUOTA_MINIMA <= aliquota <= ALIQUOTA_MAXIMA:
+        erros.append(
+            f"Alíquota de ISS {aliquota:.2f}% fora dos limites da LC 116 "
+            f"({ALIQUOTA_MINIMA:.0f}% a {ALIQUOTA_MAXIMA:.0f}%)"
+        )
+
+    if erros:
+        app_logger.warning(f"❌ NFS-e {nf_data.get('numero_nf')}: ISS inconsistente com a tabela municipal")
+        resultado["valido"] = False
+    return resultado
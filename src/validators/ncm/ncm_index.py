@@ -0,0 +1,233 @@
+"""
+Índice da nomenclatura NCM/TIPI em arrays ordenados (busca binária).
+
+A tabela vem de um JSON no formato exportado pelo Portal Único Siscomex
+({"Nomenclaturas": [{"Codigo", "Descricao", "Data_Inicio", "Data_Fim"}]}),
+opcionalmente com a alíquota de IPI da TIPI em "Aliquota_IPI" ("NT" = não
+tributado). A tabela não acompanha o pacote: sem NCM_TABLE_PATH não há
+índice e o NCM é conferido só no formato (ver validar_ncm).
+
+Os registros são compilados em um único array estruturado ordenado por
+(nível, código) e gravados em .npy, invalidado pelo SHA-256 da tabela.
+O arquivo é aberto com mmap: o carregamento é preguiçoso e as páginas são
+compartilhadas entre os processos do lote.
+"""
+
+import hashlib
+import json
+import math
+import os
+from bisect import bisect_left
+from datetime import date, datetime
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from config.configuration import DATA_PROCESSED_DIR, NCM_TABLE_PATH
+from logs.logger import app_logger
+from src.utils.lazy import carregar_uma_vez
+
+REGISTRO_DTYPE = np.dtype([
+    ("nivel", "u1"),     # quantidade de dígitos: 2 capítulo, 4 posição, 5/6 subposição, 8 item
+    ("codigo", "u4"),
+    ("inicio", "i4"),    # AAAAMMDD
+    ("fim", "i4"),       # AAAAMMDD
+    ("ipi", "f4"),       # alíquota TIPI (%), NaN = não informada / NT
+])
+
+NIVEL_CAPITULO = 2
+NIVEL_POSICAO = 4
+NIVEL_ITEM = 8
+
+# Incrementar quando o formato compilado mudar
+INDEX_VERSION = 1
+INDEX_PREFIX = "ncm_index-"
+
+
+class ConsultaNCM(NamedTuple):
+    """Resultado da consulta de um NCM de 8 dígitos."""
+    ncm: str
+    capitulo: bool              # capítulo existe
+    posicao: bool | None        # posição existe (None se a tabela não tem posições)
+    existe: bool | None         # código existe (None se a tabela não tem códigos de 8 dígitos)
+    vigente: bool | None        # vigente na data consultada (None sem data ou sem códigos de 8 dígitos)
+    aliquota_ipi: float | None
+
+
+def _data_int(valor) -> int | None:
+    """datetime/date/'AAAA-MM-DD...'/'DD/MM/AAAA' -> AAAAMMDD."""
+    if isinstance(valor, (datetime, date)):
+        return valor.year * 10000 + valor.month * 100 + valor.day
+    if not valor:
+        return None
+    texto = str(valor).strip()
+    try:
+        if "/" in texto:
+            dia, mes, ano = texto[:10].split("/")
+            return int(ano) * 10000 + int(mes) * 100 + int(dia)
+        return _data_int(date.fromisoformat(texto[:10]))
+    except ValueError:
+        return None
+
+
+def _aliquota(valor) -> float:
+    try:
+        return float(str(valor).replace(",", ".").replace("%", ""))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+# =====================================================
+# ÍNDICE
+# =====================================================
+
+class NCMIndex:
+    """Consultas O(log n) sobre o array de registros ordenado por (nível, código)."""
+
+    def __init__(self, registros: np.ndarray):
+        self.registros = registros
+        niveis = registros["nivel"]
+        # Por nível: fatia dos registros + códigos em lista (bisect sem overhead de escalares numpy)
+        self._niveis: dict[int, tuple[np.ndarray, list[int]]] = {}
+        for nivel in np.unique(niveis):
+            inicio, fim = np.searchsorted(niveis, [nivel, nivel + 1])
+            fatia = registros[inicio:fim]
+            self._niveis[int(nivel)] = (fatia, fatia["codigo"].tolist())
+        self.completo = bool(self._niveis.get(NIVEL_ITEM, ((), []))[1])
+
+    def _buscar(self, nivel: int, codigo: int) -> tuple | None:
+        """Registro (nivel, codigo, inicio, fim, ipi) do código no nível, ou None."""
+        if nivel not in self._niveis:
+            return None
+        fatia, codigos = self._niveis[nivel]
+        pos = bisect_left(codigos, codigo)
+        if pos < len(codigos) and codigos[pos] == codigo:
+            return fatia[pos].item()
+        return None
+
+    def existe_prefixo(self, prefixo: str) -> bool:
+        """Capítulo, posição ou subposição existe (na própria tabela ou como prefixo de um código)."""
+        if not prefixo.isdigit() or len(prefixo) > NIVEL_ITEM:
+            return False
+        if self._buscar(len(prefixo), int(prefixo)) is not None:
+            return True
+        if not self.completo:
+            return False
+        codigos = self._niveis[NIVEL_ITEM][1]
+        escala = 10 ** (NIVEL_ITEM - len(prefixo))
+        pos = bisect_left(codigos, int(prefixo) * escala)
+        return pos < len(codigos) and codigos[pos] < (int(prefixo) + 1) * escala
+
+    def consultar(self, ncm: str, data=None) -> ConsultaNCM:
+        """
+        Consulta um NCM de 8 dígitos numéricos.
+
+        Args:
+            ncm: Código NCM
+            data: Data de referência para a vigência (datetime, date ou texto)
+
+        Returns:
+            ConsultaNCM
+        """
+        data_ref = _data_int(data)
+        capitulo = self.existe_prefixo(ncm[:NIVEL_CAPITULO])
+        posicao = None
+        if self.completo or NIVEL_POSICAO in self._niveis:
+            posicao = self.existe_prefixo(ncm[:NIVEL_POSICAO])
+
+        existe = vigente = aliquota_ipi = None
+        if self.completo:
+            registro = self._buscar(NIVEL_ITEM, int(ncm))
+            existe = registro is not None
+        else:
+            registro = self._buscar(NIVEL_CAPITULO, int(ncm[:NIVEL_CAPITULO]))
+
+        if registro is not None:
+            _, _, inicio, fim, ipi = registro
+            # Vigência só do código de 8 dígitos: a data do capítulo é a da edição da tabela
+            if data_ref is not None and self.completo:
+                vigente = inicio <= data_ref <= fim
+            if not math.isnan(ipi):
+                aliquota_ipi = ipi
+
+        return ConsultaNCM(ncm, capitulo, posicao, existe, vigente, aliquota_ipi)
+
+
+# =====================================================
+# COMPILAÇÃO E CACHE
+# =====================================================
+
+def compile_ncm_table(tabela: dict) -> np.ndarray:
+    """Converte o JSON da nomenclatura em registros ordenados (REGISTRO_DTYPE)."""
+    linhas = []
+    for entrada in tabela.get("Nomenclaturas", []):
+        codigo = "".join(ch for ch in str(entrada.get("Codigo", "")) if ch.isdigit())
+        if not codigo or len(codigo) > NIVEL_ITEM:
+            continue
+        linhas.append((
+            len(codigo),
+            int(codigo),
+            _data_int(entrada.get("Data_Inicio")) or 0,
+            _data_int(entrada.get("Data_Fim")) or 99991231,
+            _aliquota(entrada.get("Aliquota_IPI")),
+        ))
+    registros = np.array(linhas, dtype=REGISTRO_DTYPE)
+    registros.sort(order=["nivel", "codigo"])
+    return registros
+
+
+def build_ncm_index(table_path: Path, cache_dir: Path = DATA_PROCESSED_DIR) -> NCMIndex:
+    """Abre o índice compilado (mmap) ou compila a tabela e grava o cache."""
+    with open(table_path, "rb") as f:
+        conteudo = f.read()
+    digest = hashlib.sha256(f"v{INDEX_VERSION}".encode() + conteudo).hexdigest()[:16]
+    cache_path = Path(cache_dir) / f"{INDEX_PREFIX}{digest}.npy"
+
+    try:
+        return NCMIndex(np.load(cache_path, mmap_mode="r"))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        app_logger.warning(f"⚠️  Índice NCM ilegível, recompilando: {e}")
+
+    registros = compile_ncm_table(json.loads(conteudo))
+
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, registros)
+        os.replace(tmp_path, cache_path)
+        # Índices de versões anteriores da tabela
+        for antigo in Path(cache_dir).glob(f"{INDEX_PREFIX}*.npy"):
+            if antigo != cache_path:
+                antigo.unlink(missing_ok=True)
+        registros = np.load(cache_path, mmap_mode="r")
+    except OSError as e:
+        app_logger.warning(f"⚠️  Não foi possível gravar o índice NCM: {e}")
+        tmp_path.unlink(missing_ok=True)
+
+    app_logger.info(f"📦 Índice NCM compilado: {len(registros)} registros")
+    return NCMIndex(registros)
+
+
+# =====================================================
+# ÍNDICE DO PROCESSO
+# =====================================================
+
+@carregar_uma_vez
+def get_ncm_index() -> NCMIndex | None:
+    """Índice NCM do processo (carregado na primeira consulta); None sem NCM_TABLE_PATH."""
+    if NCM_TABLE_PATH is None:
+        app_logger.info("ℹ️  NCM_TABLE_PATH não configurado: NCM validado só no formato")
+        return None
+    return build_ncm_index(NCM_TABLE_PATH)
+
+
+def aliquota_ipi(ncm: str) -> float | None:
+    """Alíquota de IPI (TIPI) do NCM, se a tabela carregada informar."""
+    ncm = str(ncm or "").strip()
+    indice = get_ncm_index()
+    if indice is None or len(ncm) != NIVEL_ITEM or not ncm.isdigit():
+        return None
+    return indice.consultar(ncm).aliquota_ipi
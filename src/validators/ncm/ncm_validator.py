@@ -1,19 +1,29 @@
+from src.validators.ncm.ncm_index import get_ncm_index
 from logs.logger import app_logger
 
-def validar_ncm(ncm: str) -> dict:
+# NCM informado em itens de serviço (não é validado contra a nomenclatura)
+NCM_SERVICO = frozenset({'00', '00000000'})
+
+def validar_ncm(ncm: str, data_emissao=None) -> dict:
     """
     Valida NCM contra tabela oficial.
     
+    Confere o formato e, com a tabela NCM configurada (NCM_TABLE_PATH),
+    capítulo e posição e, se ela tiver os códigos de 8 dígitos, a existência
+    do código e a vigência na data de emissão.
+    
     Args:
-        ncm: Código NCM ( dígitos)
+        ncm: Código NCM (8 dígitos)
+        data_emissao: Data de referência para a vigência (opcional)
     
     Returns:
-        dict com resultado da validação
+        dict com resultado da validação (inclui a alíquota de IPI da TIPI, se houver)
     """
 
     resultado = {
         "valido": False,
         "ncm": ncm,
+        "aliquota_ipi": None,
         "erros": []
     }
     
@@ -26,12 +36,42 @@ def validar_ncm(ncm: str) -> dict:
         resultado["erros"].append(f"NCM '{ncm}' deve conter apenas números")
         return resultado
     
+    indice = get_ncm_index()
+    if indice is None:
+        resultado["valido"] = True
+        return resultado
+    
+    consulta = indice.consultar(ncm, data_emissao)
+    if not consulta.capitulo:
+        resultado["erros"].append(f"NCM '{ncm}' com capítulo {ncm[:2]} inexistente na nomenclatura")
+        return resultado
+    
+    if consulta.posicao is False:
+        resultado["erros"].append(f"NCM '{ncm}' com posição {ncm[:4]} inexistente na nomenclatura")
+        return resultado
+    
+    if consulta.existe is False:
+        resultado["erros"].append(f"NCM '{ncm}' não encontrado na tabela NCM")
+        return resultado
+    
+    if consulta.vigente is False:
+        resultado["erros"].append(f"NCM '{ncm}' fora de vigência na data de emissão")
+        return resultado
+    
     # Tudo OK
+    resultado["aliquota_ipi"] = consulta.aliquota_ipi
     resultado["valido"] = True
     
     return resultado
 
 
+def ncm_do_item(item: dict) -> str:
+    """NCM do item normalizado para validação (vazio = não validar: ausente ou serviço)."""
+    ncm_item = item.get('ncm', '')
+    ncm_item = str(ncm_item).strip() if ncm_item is not None else ''
+    return '' if ncm_item in NCM_SERVICO else ncm_item
+
+
 def validar_ncm_itens(nf_data: dict) -> dict:
     """
     Valida todos os NCM's de uma nota fiscal.
@@ -47,10 +87,9 @@ def validar_ncm_itens(nf_data: dict) -> dict:
     
     # Validar NCM de cada item
     for idx, item in enumerate(nf_data.get('itens', []), 1):
-        ncm_item = item.get('ncm', '')
-        ncm_item = str(ncm_item).strip() if ncm_item is None else ''
+        ncm_item = ncm_do_item(item)
         if ncm_item:
-            resultado = validar_ncm(ncm_item)
+            resultado = validar_ncm(ncm_item, nf_data.get('data_emissao'))
             if not resultado["valido"]:
                 for erro in resultado["erros"]:
                     erros.append(f"Item {idx}: {erro}")
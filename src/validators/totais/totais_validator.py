@@ -0,0 +1,162 @@
+"""
+Conciliação dos totais da NFe (ICMSTot) com os itens.
+
+Os valores são acumulados em centavos (inteiros), em uma passada pelos itens,
+e comparados com os totais declarados no grupo ICMSTot com uma tolerância
+configurável (RECONCILIATION_TOLERANCE_CENTS). Os totais são lidos do texto
+do XML (nf_data["totais"]), sem passar por float.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import numpy as np
+
+from config.configuration import RECONCILIATION_TOLERANCE_CENTS
+from logs.logger import app_logger
+
+CENTAVO = Decimal("0.01")
+
+# (campo do item, total correspondente no ICMSTot)
+SOMAS_ITENS = (
+    ("valor_total", "vProd"),
+    ("vBC_icms", "vBC"),
+    ("vICMS", "vICMS"),
+    ("vIPI", "vIPI"),
+    ("vPIS", "vPIS"),
+    ("vCOFINS", "vCOFINS"),
+)
+
+# Composição do vNF (regra de validação 610 da SEFAZ): parcelas somadas e subtraídas
+VNF_SOMA = ("vProd", "vST", "vFCPST", "vFrete", "vSeg", "vOutro", "vII", "vIPI", "vIPIDevol")
+VNF_SUBTRAI = ("vDesc", "vICMSDeson")
+
+
+def centavos(valor) -> int:
+    """
+    Converte um valor monetário para centavos, sem erro de ponto flutuante.
+
+    Texto ("123.45") é lido como decimal exato; float vindo do parser
+    (já com 2 casas) é arredondado para o centavo mais próximo.
+    """
+    if valor is None or valor == "":
+        return 0
+    if isinstance(valor, int):
+        return valor * 100
+    if isinstance(valor, float):
+        return int(round(valor * 100))
+    try:
+        return int((Decimal(str(valor).strip()) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        return 0
+
+
+def _decimal(valor) -> Decimal:
+    """float/texto -> Decimal com os mesmos dígitos do XML (repr do float)."""
+    if isinstance(valor, float):
+        return Decimal(repr(valor))
+    try:
+        return Decimal(str(valor or 0).strip())
+    except InvalidOperation:
+        return Decimal(0)
+
+
+def reais(valor_centavos: int) -> str:
+    """Centavos -> 'R$ 1234,56'."""
+    sinal = "-" if valor_centavos < 0 else ""
+    inteiro, resto = divmod(abs(valor_centavos), 100)
+    return f"{sinal}R$ {inteiro},{resto:02d}"
+
+
+def diferenca_item(item: dict, tolerancia: int = RECONCILIATION_TOLERANCE_CENTS) -> int | None:
+    """
+    Diferença (centavos) entre vProd e quantidade × valor unitário do item.
+
+    Returns:
+        A diferença, se maior que a tolerância; senão None
+    """
+    quantidade = item.get("quantidade")
+    unitario = item.get("valor_unitario")
+    if not quantidade or not unitario:
+        return None
+    esperado = (_decimal(quantidade) * _decimal(unitario)).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    diferenca = centavos(item.get("valor_total")) - int(esperado * 100)
+    return diferenca if abs(diferenca) > tolerancia else None
+
+
+def _somas_itens(nf_data: dict, arrays: dict[str, np.ndarray] | None = None) -> list[int]:
+    """Soma dos itens (centavos) de cada campo de SOMAS_ITENS."""
+    campos = tuple(campo for campo, _ in SOMAS_ITENS)
+    if arrays is not None:
+        # Arrays da nota (float, NaN se ausente): centavos de cada item somados em inteiros
+        return [int(np.rint(np.nan_to_num(arrays[campo]) * 100).astype(np.int64).sum()) for campo in campos]
+
+    # Uma passada pelos itens, acumulando em centavos
+    somas = [0] * len(campos)
+    for item in nf_data.get("itens", []) or []:
+        get = item.get
+        for i, campo in enumerate(campos):
+            valor = get(campo)
+            # float é o caso comum (parser): evita a conversão genérica
+            somas[i] += round(valor * 100) if type(valor) is float else centavos(valor)
+    return somas
+
+
+def validar_totais(
+    nf_data: dict,
+    tolerancia: int = RECONCILIATION_TOLERANCE_CENTS,
+    arrays: dict[str, np.ndarray] | None = None,
+) -> dict:
+    """
+    Concilia os totais declarados (ICMSTot) com a soma dos itens e a composição do vNF.
+
+    Args:
+        nf_data: Dados da nota fiscal (com "totais" e "itens")
+        tolerancia: Diferença máxima aceita, em centavos
+        arrays: Arrays dos itens já montados (ver itens_para_arrays); sem eles,
+            os itens são percorridos
+
+    Returns:
+        dict com "valido", "erros", "avisos" e "diferencas" (total -> centavos)
+    """
+    erros = []
+    diferencas: dict[str, int] = {}
+    totais = nf_data.get("totais") or {}
+
+    if not totais:
+        # RPS e notas sem ICMSTot: nada a conciliar
+        return {"valido": True, "erros": erros, "avisos": [], "diferencas": diferencas}
+
+    somas = _somas_itens(nf_data, arrays)
+    for (_, total), soma in zip(SOMAS_ITENS, somas, strict=True):
+        if total not in totais:
+            continue
+        declarado = centavos(totais[total])
+        if abs(soma - declarado) > tolerancia:
+            diferencas[total] = declarado - soma
+            erros.append(
+                f"Total {total} ({reais(declarado)}) difere da soma dos itens ({reais(soma)}) "
+                f"em {reais(declarado - soma)}"
+            )
+
+    if "vNF" in totais:
+        declarado = centavos(totais["vNF"])
+        composto = (
+            sum(centavos(totais.get(campo)) for campo in VNF_SOMA)
+            - sum(centavos(totais.get(campo)) for campo in VNF_SUBTRAI)
+        )
+        if abs(composto - declarado) > tolerancia:
+            diferencas["vNF"] = declarado - composto
+            erros.append(
+                f"Total da nota vNF ({reais(declarado)}) difere da composição dos totais "
+                f"({reais(composto)}) em {reais(declarado - composto)}"
+            )
+
+    if erros:
+        app_logger.warning(f"❌ NF {nf_data.get('numero_nf')}: totais não conciliam ({', '.join(diferencas)})")
+
+    return {
+        "valido": len(erros) == 0,
+        "erros": erros,
+        "avisos": [],
+        "diferencas": diferencas
+    }
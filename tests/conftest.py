@@ -0,0 +1,36 @@
+"""Fixtures compartilhadas pelos testes."""
+
+from pathlib import Path
+
+import pytest
+
+from src.database import connection
+from src.parsers.xml_parser import XMLParser
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def nfe_path() -> Path:
+    """Caminho da NF-e de exemplo."""
+    return FIXTURES / "nfe.xml"
+
+
+@pytest.fixture
+def nfe() -> dict:
+    """NF-e de venda interna SP (2 itens, ICMS 18%, PIS/COFINS não cumulativos)."""
+    return XMLParser(FIXTURES / "nfe.xml").parse()
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Banco SQLite vazio em diretório temporário (tabelas criadas por init_db)."""
+    monkeypatch.setattr(connection, "DATABASE_PATH", tmp_path / "notas_fiscais.db")
+    connection.init_db()
+    return tmp_path / "notas_fiscais.db"
+
+
+@pytest.fixture
+def rps_path() -> Path:
+    """Caminho da NFS-e (ABRASF) de exemplo."""
+    return FIXTURES / "rps.xml"
@@ -0,0 +1,68 @@
+"""CLI de processamento em lote (batch.py): entrada, resumo por arquivo e métricas."""
+
+import pytest
+
+import batch
+
+
+def test_coletar_arquivos(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    for nome in ("a/1.xml", "a/b/2.XML", "a/b/lote.zip", "a/notas.txt"):
+        (tmp_path / nome).write_text("")
+
+    encontrados = batch.coletar_arquivos([
+        str(tmp_path / "a"), str(tmp_path / "a" / "1.xml"), str(tmp_path / "**" / "*.zip"),
+    ])
+
+    assert encontrados == sorted(str(tmp_path / n) for n in ("a/1.xml", "a/b/2.XML", "a/b/lote.zip"))
+
+
+@pytest.mark.parametrize("p, esperado", [(50, 5), (95, 10), (0, 1), (100, 10)])
+def test_percentil(p, esperado):
+    assert batch.percentil(list(range(1, 11)), p) == esperado
+
+
+def test_percentil_vazio():
+    assert batch.percentil([], 95) == 0.0
+
+
+class _AgenteFalso:
+    """Agente com resultados fixos (o workflow real é coberto pelos testes dos parsers)."""
+
+    def processar(self, path, forcar_reprocessamento=False):
+        if "quebrado" in path:
+            raise ValueError("XML malformado")
+        return {
+            "notas_processadas": [{"status": "Autorizado"}, {"status": "Reprovado"}],
+            "erros": ["[CST002] incoerente"],
+            "cache_hit": True,
+        }
+
+    def processar_zip(self, path, max_workers=None, forcar_reprocessamento=False):
+        return [self.processar("membro.xml"), self.processar("membro.xml")]
+
+
+@pytest.fixture
+def agente(monkeypatch):
+    monkeypatch.setattr(batch, "_agent", _AgenteFalso())
+
+
+def test_resumo_do_arquivo(agente):
+    resumo = batch._processar_arquivo("nota.xml")
+
+    assert {k: resumo[k] for k in ("notas", "autorizadas", "reaproveitados", "erros", "falha")} == {
+        "notas": 2, "autorizadas": 1, "reaproveitados": 1, "erros": ["[CST002] incoerente"], "falha": None,
+    }
+    assert resumo["latencia"] >= 0
+
+
+def test_resumo_do_zip_e_da_falha(agente):
+    assert batch._processar_arquivo("lote.ZIP")["notas"] == 4
+
+    falha = batch._processar_arquivo("quebrado.xml")
+    assert (falha["notas"], falha["falha"]) == (0, "XML malformado")
+
+
+def test_main_sem_arquivos(tmp_path, capsys):
+    assert batch.main([str(tmp_path / "*.xml")]) == 1
+    assert "Nenhum arquivo" in capsys.readouterr().out
@@ -0,0 +1,101 @@
+"""Validação colunar (validate_batch) x motor de regras nota a nota."""
+
+import copy
+
+import numpy as np
+import pytest
+
+from src.validators.engine import batch_validator
+from src.validators.engine.batch_validator import itens_para_frame, validate_batch, validate_notas
+from src.validators.engine.rule_engine import avaliar_nota, validar_nota
+
+
+def _variar(nfe: dict, crt: str = "3", **campos) -> dict:
+    """Cópia da nota com o CRT e os campos do primeiro item alterados."""
+    nota = copy.deepcopy(nfe)
+    nota["crt"] = crt
+    nota["itens"][0].update(campos)
+    return nota
+
+
+@pytest.fixture
+def notas(nfe) -> list[dict]:
+    return [
+        nfe,
+        _variar(nfe, crt="1", cst_csosn="102"),
+        _variar(nfe, crt="1", cst_csosn="00"),
+        _variar(nfe, cfop="51O2"),
+        _variar(nfe, cfop="9999"),
+        _variar(nfe, cfop=""),
+        _variar(nfe, cst_csosn="40", vICMS=5.0),
+        _variar(nfe, cst_csosn="00", vICMS=0.0, aliq_icms=0.0),
+        _variar(nfe, cst_ipi="99", vIPI=3.0),
+        _variar(nfe, cst_pis="99", cst_cofins="99"),
+        {**copy.deepcopy(nfe), "itens": []},
+    ]
+
+
+def _esperado(nf_data: dict) -> list[tuple]:
+    """Violações do motor nos grupos "cfop" (só CFOP002) e "cst", na ordem do motor."""
+    return [
+        (v.codigo, v.msg, v.campo, v.severity)
+        for v in avaliar_nota(nf_data, grupos=("cfop", "cst")) if v.codigo != "CFOP001"
+    ]
+
+
+def _por_nota(violacoes, nota_id) -> list[tuple]:
+    linhas = violacoes[violacoes["nota_id"] == nota_id]
+    return list(linhas[["codigo", "msg", "campo", "severity"]].itertuples(index=False, name=None))
+
+
+def test_paridade_com_motor(notas):
+    violacoes = validate_notas(notas)
+
+    for i, nf_data in enumerate(notas):
+        lote = _por_nota(violacoes, i)
+        assert lote == _esperado(nf_data), f"nota {i}"
+
+        cst = validar_nota(nf_data, grupos=("cst",))
+        assert sorted(v for v in lote if v[0] != "CFOP002") == sorted(
+            (v["codigo"], v["msg"], v["campo"], v["severity"]) for v in cst["erros"] + cst["avisos"]
+        ), f"nota {i}"
+    assert set(violacoes["codigo"]) >= {"CFOP002", "CST000", "CST001", "CST002", "CST003", "PIS001"}
+
+
+@pytest.mark.parametrize("crt", [1, 1.0, "1.0", " 1 "])
+def test_crt_numerico_e_simples(nfe, crt):
+    nota = _variar(nfe, crt="1", cst_csosn="00")
+    frame = itens_para_frame([nota])
+    frame["crt"] = [crt] * len(frame)
+
+    esperado = validate_notas([nota])
+    assert validate_batch(frame, nota_ids=[0]).equals(esperado)
+    assert "Regime SIMPLES_NACIONAL" in esperado["msg"].iloc[0]
+
+
+def test_crt_ausente_e_regime_normal(nfe):
+    frame = itens_para_frame([nfe, _variar(nfe, crt="1", cst_csosn="102")])
+    frame["crt"] = np.nan
+
+    violacoes = validate_batch(frame, nota_ids=[0, 1])
+    assert list(violacoes["codigo"]) == ["CST002"]
+    assert "Regime REGIME_NORMAL" in violacoes["msg"].iloc[0]
+
+
+def test_cfop002_lote_misto_com_todas_as_mensagens(nfe, monkeypatch):
+    def validar_cfop(cfop, cfop_data=None):
+        if cfop == "5102":
+            return {"valido": True, "erros": []}
+        return {"valido": False, "erros": [f"CFOP '{cfop}' erro A", f"CFOP '{cfop}' erro B"]}
+
+    monkeypatch.setattr(batch_validator, "validar_cfop", validar_cfop)
+    notas = [_variar(nfe, crt="1", cfop="9999", cst_csosn="102"), _variar(nfe, crt="3", cfop="9998")]
+
+    cfop002 = validate_notas(notas).query("codigo == 'CFOP002'")
+
+    assert list(cfop002["nota_id"]) == [0, 0, 1, 1]
+    assert list(cfop002["msg"]) == [
+        "Item 1: CFOP '9999' erro A", "Item 1: CFOP '9999' erro B",
+        "Item 1: CFOP '9998' erro A", "Item 1: CFOP '9998' erro B",
+    ]
+    assert set(cfop002["campo"]) == {"cfop_item_1"}
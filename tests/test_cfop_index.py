@@ -0,0 +1,126 @@
+"""Índice CFOP imutável carregado uma vez e carregamento preguiçoso (src/utils/lazy.py)."""
+
+import json
+import os
+import threading
+
+import pytest
+
+from src.utils import lazy
+from src.utils.lazy import LockProcesso, carregar_uma_vez
+from src.validators.cfops import cfop_validator
+from src.validators.cfops.cfop_validator import get_cfop_index, validar_cfop, validar_cfops
+
+
+@pytest.fixture
+def tabela(tmp_path, monkeypatch):
+    """Tabela CFOP temporária; o índice do processo é restaurado ao final."""
+    path = tmp_path / "cfop.json"
+    path.write_text(json.dumps({"5102": "Venda de mercadoria"}), encoding="utf-8")
+    monkeypatch.setattr(cfop_validator, "JSON_FILE_PATH", str(path))
+    monkeypatch.setattr(cfop_validator, "_cfop_index_mtime", cfop_validator._NAO_CARREGADO)
+    monkeypatch.setattr(cfop_validator, "_cfop_index", cfop_validator._cfop_index)
+    return path
+
+
+def test_indice_carregado_uma_vez(tabela, monkeypatch):
+    cargas = []
+    carregar = cfop_validator.load_cfop_data
+    monkeypatch.setattr(cfop_validator, "load_cfop_data", lambda p: cargas.append(p) or carregar(p))
+
+    indice = get_cfop_index()
+
+    assert get_cfop_index() is indice
+    assert len(cargas) == 1
+    with pytest.raises(TypeError):
+        indice["9999"] = "alterado"
+
+
+def test_indice_recarregado_quando_o_arquivo_muda(tabela):
+    assert "6102" not in get_cfop_index()
+
+    tabela.write_text(json.dumps({"5102": "Venda", "6102": "Venda interestadual"}), encoding="utf-8")
+    stat = tabela.stat()
+    os.utime(tabela, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert get_cfop_index()["6102"] == "Venda interestadual"
+
+
+@pytest.mark.parametrize("cfop, erro", [
+    ("5102", None),
+    ("510", "4 dígitos"),
+    ("51O2", "apenas números"),
+    ("9999", "não encontrado"),
+])
+def test_validar_cfop(tabela, cfop, erro):
+    resultado = validar_cfop(cfop)
+
+    assert resultado["valido"] is (erro is None)
+    if erro:
+        assert erro in resultado["erros"][0]
+    else:
+        assert resultado["descricao"] == "Venda de mercadoria"
+
+
+def test_validar_cfops_devolve_copias(tabela):
+    primeiro, segundo = validar_cfops(["9999", "9999"])
+
+    assert primeiro == segundo
+    primeiro["erros"].append("alterado")
+    assert segundo["erros"] != primeiro["erros"]
+
+
+# =====================================================
+# CARREGAMENTO PREGUIÇOSO
+# =====================================================
+
+def test_carregar_uma_vez_entre_threads():
+    chamadas = []
+    liberar = threading.Event()
+
+    @carregar_uma_vez
+    def carregar():
+        chamadas.append(1)
+        liberar.wait(5)
+        return object()
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(carregar())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert len(chamadas) == 1
+    assert all(r is resultados[0] for r in resultados)
+
+
+def test_carregar_uma_vez_tenta_de_novo_e_limpa():
+    tentativas = []
+
+    @carregar_uma_vez
+    def carregar():
+        tentativas.append(1)
+        if len(tentativas) == 1:
+            raise OSError("indisponível")
+        return len(tentativas)
+
+    with pytest.raises(OSError):
+        carregar()
+    assert carregar() == 2
+    assert carregar() == 2
+
+    carregar.limpar()
+    assert carregar() == 3
+
+
+def test_lock_recriado_apos_fork():
+    lock = LockProcesso()
+    lock.__enter__()
+
+    # Simula o filho de um fork feito com o lock travado por outra thread
+    lazy._recriar_locks_apos_fork()
+
+    with lock:
+        pass
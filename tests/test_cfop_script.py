@@ -0,0 +1,115 @@
+"""Geração incremental das regras por CFOP e formato compacto."""
+
+import json
+
+import pytest
+
+from src.validators.cfops import script
+from src.validators.csts.rule_bundle import compactar_regras_gerais, expandir_regras_gerais
+
+CFOPS = {
+    "5102": "Venda de mercadoria adquirida ou recebida de terceiros",
+    "5405": "Venda de mercadoria adquirida com substituição tributária",
+    "1102": "Compra para comercialização",
+}
+
+
+@pytest.fixture
+def gerador(tmp_path, monkeypatch):
+    """Script apontando para tabela, ajustes, manifesto e saída temporários."""
+    (tmp_path / "cfop_natop.json").write_text(json.dumps(CFOPS), encoding="utf-8")
+    for nome, path in {
+        "CFOP_PATH": "cfop_natop.json",
+        "OVERRIDES_PATH": "overrides.json",
+        "MANIFEST_PATH": "manifest.json",
+        "OUTPUT_GENERATED": "rules.json",
+    }.items():
+        monkeypatch.setattr(script, nome, tmp_path / path)
+    return tmp_path
+
+
+def _regras(tmp_path) -> dict:
+    return expandir_regras_gerais(json.loads((tmp_path / "rules.json").read_text(encoding="utf-8")))
+
+
+def test_primeira_geracao_e_sem_alteracoes(gerador):
+    assert script.generate() == ["5102", "5405", "1102"]
+    saida = (gerador / "rules.json").read_bytes()
+
+    assert script.generate() == []
+    assert (gerador / "rules.json").read_bytes() == saida
+    assert set(_regras(gerador)["per_cfop"]) == set(CFOPS)
+    assert set(_regras(gerador)["per_group"]) == {"5000", "1000"}
+
+
+def test_so_cfops_alterados_sao_regerados(gerador, monkeypatch):
+    # Trocada antes da primeira geração: o código da inferência entra no hash do gerador
+    inferidos = []
+    inferir = script.infer_from_description
+    monkeypatch.setattr(
+        script, "infer_from_description", lambda desc, code: inferidos.append(code) or inferir(desc, code)
+    )
+    script.generate()
+    anteriores = _regras(gerador)["per_cfop"]
+
+    (gerador / "cfop_natop.json").write_text(
+        json.dumps({**CFOPS, "5102": "Venda de produção do estabelecimento"}), encoding="utf-8"
+    )
+    inferidos.clear()
+
+    assert script.generate() == ["5102"]
+    assert inferidos == ["5102"]
+    assert _regras(gerador)["per_cfop"]["1102"] == anteriores["1102"]
+
+
+def test_ajuste_manual_mesclado(gerador):
+    script.generate()
+    ajuste = {"5405": {"REGIME_NORMAL": {"icms": {"esperado": False}}}}
+    (gerador / "overrides.json").write_text(json.dumps(ajuste), encoding="utf-8")
+
+    assert script.generate() == ["5405"]
+    regra = _regras(gerador)["per_cfop"]["5405"]["REGIME_NORMAL"]
+    assert regra["icms"]["esperado"] is False
+    assert regra["icms"]["cst_validos"]          # o resto da regra gerada é mantido
+
+
+def test_gerador_ou_saida_alterados_regeram_tudo(gerador, monkeypatch):
+    script.generate()
+
+    # Saída editada à mão: o hash não bate com o manifesto
+    with open(gerador / "rules.json", "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert script.generate() == list(CFOPS)
+
+    monkeypatch.setattr(script, "GENERATOR_VERSION", script.GENERATOR_VERSION + 1)
+    assert script.generate() == list(CFOPS)
+    assert script.generate(full=True) == list(CFOPS)
+
+
+def test_cfop_removido(gerador):
+    script.generate()
+    (gerador / "cfop_natop.json").write_text(
+        json.dumps({k: v for k, v in CFOPS.items() if k != "1102"}), encoding="utf-8"
+    )
+
+    assert script.generate() == []
+    assert set(_regras(gerador)["per_cfop"]) == {"5102", "5405"}
+    assert set(_regras(gerador)["per_group"]) == {"5000"}
+
+
+def test_formato_compacto_ida_e_volta(gerador):
+    script.generate()
+    regras = _regras(gerador)
+
+    compacto = compactar_regras_gerais(regras)
+    assert expandir_regras_gerais(compacto) == regras
+    # Regras iguais são guardadas uma única vez
+    assert len(compacto["entradas"]) <= len(regras["per_cfop"])
+    assert expandir_regras_gerais(regras) is regras
+
+
+def test_versao_compacta_desconhecida():
+    compacto = compactar_regras_gerais({"per_cfop": {}, "per_group": {}})
+
+    with pytest.raises(ValueError, match="não suportada"):
+        expandir_regras_gerais({**compacto, "versao": -1})
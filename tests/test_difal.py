@@ -0,0 +1,44 @@
+"""DIFAL e FCP de destino com as alíquotas da tabela por UF."""
+
+import numpy as np
+
+from src.validators.calculators.tax_calculator import calcular_difal_lote
+
+
+def _nota_difal(**item) -> dict:
+    return {
+        "uf_emitente": "SP",
+        "uf_destinatario": "BA",
+        "ind_final": "1",
+        "ind_ie_dest": "9",
+        "itens": [{
+            "tipo": "produto", "ncm": "84713012", "origem": "0", "cst_csosn": "00",
+            "valor_total": 100.0, "vBC_icms": 100.0, "vICMS": 7.0, **item,
+        }],
+    }
+
+
+def test_difal_consumidor_final_nao_contribuinte():
+    resultado = calcular_difal_lote([_nota_difal()])
+
+    assert resultado.aplicavel.tolist() == [True]
+    # SP -> BA: 7% interestadual, 20,5% interna na BA
+    assert resultado.aliquota_interestadual.tolist() == [70000]
+    assert resultado.aliquota_interna.tolist() == [205000]
+    assert resultado.difal.tolist() == [1350]
+
+
+def test_difal_importado_usa_aliquota_de_4_por_cento():
+    resultado = calcular_difal_lote([_nota_difal(origem="1", vICMS=4.0)])
+
+    assert resultado.aliquota_interestadual.tolist() == [40000]
+    assert resultado.difal.tolist() == [1650]
+
+
+def test_difal_nao_se_aplica_a_contribuinte():
+    nota = _nota_difal()
+    nota["ind_ie_dest"] = "1"
+    resultado = calcular_difal_lote([nota])
+
+    assert not resultado.aplicavel.any()
+    assert not np.any(resultado.difal)
@@ -0,0 +1,48 @@
+"""Tipo do documento fiscal pelo início do XML (sniffer) e pelo documento parseado."""
+
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from src.constants import DocumentType
+from src.parsers.document_sniffer import detect_document_type, sniff_document_type
+
+CTE = b'<cteProc xmlns="http://www.portalfiscal.inf.br/cte" versao="4.00"><CTe><infCte/></CTe></cteProc>'
+
+
+@pytest.fixture
+def nfce(nfe_path) -> bytes:
+    return nfe_path.read_bytes().replace(b"<mod>55</mod>", b"<mod>65</mod>")
+
+
+def test_tipos(nfe_path, rps_path, nfce):
+    assert sniff_document_type(nfe_path) == DocumentType.NFE
+    assert sniff_document_type(nfce) == DocumentType.NFC_E
+    assert sniff_document_type(rps_path) == DocumentType.RPS
+    assert sniff_document_type(CTE) == DocumentType.CT_E
+
+
+def test_le_apenas_o_inicio(nfe_path):
+    # Depois do ide/mod o conteúdo não é lido: o restante malformado não importa
+    conteudo = nfe_path.read_bytes()
+    inicio = conteudo[:conteudo.index(b"</ide>") + len(b"</ide>")]
+
+    assert sniff_document_type(inicio + b" " * 8192 + b"<<< lixo " * 100_000, max_bytes=16384) == DocumentType.NFE
+
+
+def test_inconclusivo_devolve_none(nfe_path):
+    # NF-e sem ide/mod nos primeiros bytes: NF-e ou NFC-e ainda é ambíguo
+    assert sniff_document_type(nfe_path, max_bytes=200) is None
+    assert sniff_document_type(b"<nfeProc><<") is None
+    assert sniff_document_type(b"<outro><a/></outro>") is None
+
+
+def test_documento_completo_sem_mod_e_nfe():
+    assert sniff_document_type(b'<NFe xmlns="http://www.portalfiscal.inf.br/nfe"><infNFe/></NFe>') == DocumentType.NFE
+
+
+def test_fallback_pelo_documento_parseado(nfe_path, rps_path, nfce):
+    assert detect_document_type(ET.parse(nfe_path).getroot()) == DocumentType.NFE
+    assert detect_document_type(ET.fromstring(nfce)) == DocumentType.NFC_E
+    assert detect_document_type(ET.parse(rps_path).getroot()) == DocumentType.RPS
+    assert detect_document_type(ET.fromstring(CTE)) == DocumentType.CT_E
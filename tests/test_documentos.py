@@ -0,0 +1,45 @@
+"""Dígitos verificadores de CPF/CNPJ (documento a documento e em lote)."""
+
+import pytest
+
+from src.validators.cpf_cnpj.document_validator import (
+    validar_cnpj,
+    validar_cpf,
+    validar_documento,
+    validate_documents,
+)
+
+
+@pytest.mark.parametrize("cpf, valido", [
+    ("52998224725", True),
+    ("52998224724", False),
+    ("11111111111", False),
+    ("5299822472", False),
+    ("5299822472A", False),
+])
+def test_cpf(cpf, valido):
+    assert validar_cpf(cpf)["valido"] is valido
+
+
+@pytest.mark.parametrize("cnpj, valido", [
+    ("11222333000181", True),
+    ("11444777000161", True),
+    ("11222333000182", False),
+    ("12ABC34501DE35", True),
+    ("12ABC34501DE36", False),
+    ("1122233300018", False),
+])
+def test_cnpj(cnpj, valido):
+    assert validar_cnpj(cnpj)["valido"] is valido
+
+
+def test_validar_documento_pelo_tamanho():
+    assert validar_documento("52998224725")["cpf"] == "52998224725"
+    assert validar_documento("11222333000181")["cnpj"] == "11222333000181"
+
+
+def test_lote_igual_ao_documento_a_documento():
+    documentos = ["52998224725", "52998224724", "11222333000181", "12ABC34501DE35", "12ABC34501DE36", None, ""]
+    esperado = [validar_documento(d)["valido"] if d else False for d in documentos]
+
+    assert validate_documents(documentos).tolist() == esperado
@@ -0,0 +1,144 @@
+"""Índice de duplicidade (DUP001/DUP002/DUP003) e lacunas de numeração."""
+
+import pytest
+
+from src.database import connection
+from src.database.duplicate_index import DuplicateIndex, SerieNumeracao
+
+
+def _nota(numero="123", chave_nfe="", **campos) -> dict:
+    nota = {
+        "fornecedor_cnpj": "11222333000181", "tipo_nf": "NFe", "serie": "1",
+        "numero_nf": numero, "chave_nfe": chave_nfe,
+    }
+    nota.update(campos)
+    return nota
+
+
+def _codigos(violacoes) -> list[str]:
+    return [v.codigo for v in violacoes]
+
+
+# =====================================================
+# NUMERAÇÃO POR SÉRIE
+# =====================================================
+
+def test_serie_divide_lacuna():
+    serie = SerieNumeracao()
+    for numero in (1, 10):
+        serie.adicionar(numero)
+
+    assert serie.lacunas() == [(2, 9)]
+    assert serie.faltantes == 8
+
+    serie.adicionar(5)
+    assert serie.lacunas() == [(2, 4), (6, 9)]
+    assert serie.faltantes == 7
+
+    serie.adicionar(2)
+    serie.adicionar(9)
+    assert serie.lacunas() == [(3, 4), (6, 8)]
+    assert serie.faltantes == 5
+
+
+def test_serie_extremos_e_repetidos():
+    serie = SerieNumeracao()
+    serie.adicionar(5)
+
+    assert serie.adicionar(1)
+    assert serie.adicionar(8)
+    assert not serie.adicionar(5)
+    assert serie.numeros == [1, 5, 8]
+    assert serie.lacunas() == [(2, 4), (6, 7)]
+    assert serie.faltantes == 5
+
+
+def test_serie_sem_lacunas():
+    serie = SerieNumeracao()
+    for numero in (3, 1, 2):
+        serie.adicionar(numero)
+
+    assert serie.lacunas() == []
+    assert serie.faltantes == 0
+
+
+# =====================================================
+# DUPLICIDADE
+# =====================================================
+
+@pytest.fixture
+def indice(banco) -> DuplicateIndex:
+    return DuplicateIndex()
+
+
+def test_duplicada_no_lote(indice):
+    with indice.lote():
+        assert indice.registrar(_nota(), "a.xml#0") == []
+        assert indice.registrar(_nota(), "a.xml#0") == []
+        assert _codigos(indice.registrar(_nota("000123"), "b.xml#0")) == ["DUP001"]
+
+
+def test_chave_de_acesso_repetida(indice):
+    chave = "35240111222333000181550010000001231000012345"
+    with indice.lote():
+        indice.registrar(_nota("1", chave), "a.xml#0")
+        assert _codigos(indice.registrar(_nota("2", chave), "a.xml#1")) == ["DUP002"]
+
+
+def test_reenvio_de_nota_nao_gravada(indice):
+    with indice.lote():
+        indice.registrar(_nota(), "nota.xml#0")
+
+    # A primeira cópia não foi gravada: o reenvio corrigido é inédito
+    with indice.lote():
+        assert indice.registrar(_nota(), "nota_corrigida.xml#0") == []
+
+
+def test_reenvio_de_nota_gravada(indice):
+    with indice.lote():
+        indice.registrar(_nota(), "nota.xml#0")
+        indice.confirmar_gravacao(_nota(), 7)
+
+    with indice.lote():
+        violacoes = indice.registrar(_nota(), "nota_corrigida.xml#0")
+
+    assert _codigos(violacoes) == ["DUP003"]
+    assert indice.ids_atualizaveis(_nota()) == (0, 7)
+
+
+def test_lote_aninhado(indice):
+    with indice.lote():
+        with indice.lote():
+            indice.registrar(_nota(), "zip/a.xml#0")
+        # Outro membro do mesmo ZIP
+        assert _codigos(indice.registrar(_nota(), "zip/b.xml#0")) == ["DUP001"]
+
+
+def test_historico_do_banco(banco):
+    conn = connection.get_connection()
+    connection.insert_nota_fiscal(
+        _nota("000123", data_emissao="2024-01-15", classificacao="Produto", cfop="5102",
+              natop="Venda", sct="", valor_total=10.0, cliente_cnpj="", cliente_cpf=""),
+        conn.cursor(),
+    )
+    conn.commit()
+    assert conn.execute("SELECT numero_nf FROM notas_fiscais").fetchone()[0] == "123"
+    conn.close()
+
+    indice = DuplicateIndex()
+    for _ in range(2):
+        # Reprocessamento não gravado mantém a nota no histórico
+        with indice.lote():
+            assert _codigos(indice.registrar(_nota("123"), "nota.xml#0")) == ["DUP003"]
+
+
+def test_lacunas_das_notas_gravadas(indice):
+    with indice.lote():
+        for id_, numero in enumerate(("1", "4", "2"), start=1):
+            indice.registrar(_nota(numero), f"lote.xml#{id_}")
+        indice.registrar(_nota("9"), "lote.xml#9")      # não gravada
+        for id_, numero in enumerate(("1", "4"), start=1):
+            indice.confirmar_gravacao(_nota(numero), id_)
+
+    assert indice.lacunas("11222333000181", "NFe", "1") == [(2, 3)]
+    assert indice.relatorio_lacunas()[0]["faltantes"] == 2
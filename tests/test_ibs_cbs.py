@@ -0,0 +1,132 @@
+"""IBS/CBS: leitura do grupo IBSCBS, tabela de vigência e conferência (IBSCBS001)."""
+
+import numpy as np
+import pytest
+
+from src.parsers.xml_parser import XMLParser
+from src.validators.aliquotas.ibs_cbs_table import TabelaIBSCBS, data_aaaammdd
+from src.validators.engine.rule_engine import validar_nota
+
+TABELA = {
+    "formato": 1,
+    "versao": "teste",
+    "periodos": [
+        {"inicio": "2027-01-01", "fim": "2027-12-31", "cbs": 8.8, "ibs_uf": 0.05, "ibs_mun": 0.05},
+        {"inicio": "2026-01-01", "fim": "2026-12-31", "cbs": 0.9, "ibs_uf": 0.1, "ibs_mun": 0.0},
+    ],
+    "cst": {
+        "000": {"efeito": "tributado"},
+        "200": {"efeito": "reduzido"},
+        "410": {"efeito": "sem_imposto"},
+    },
+    "classificacoes": {"200034": {"reducao": 60.0}},
+}
+
+
+def _ibs_cbs(cst, c_class_trib, base, cbs, ibs_uf, reducao=None) -> str:
+    red = f"<gRed><pRedAliq>{reducao:.4f}</pRedAliq></gRed>" if reducao else ""
+    return (
+        f"<IBSCBS><CST>{cst}</CST><cClassTrib>{c_class_trib}</cClassTrib><gIBSCBS><vBC>{base:.2f}</vBC>"
+        f"<gIBSUF><pIBSUF>0.1000</pIBSUF>{red}<vIBSUF>{ibs_uf:.2f}</vIBSUF></gIBSUF>"
+        f"<gIBSMun><pIBSMun>0.0000</pIBSMun><vIBSMun>0.00</vIBSMun></gIBSMun><vIBS>{ibs_uf:.2f}</vIBS>"
+        f"<gCBS><pCBS>0.9000</pCBS>{red}<vCBS>{cbs:.2f}</vCBS></gCBS></gIBSCBS></IBSCBS>"
+    )
+
+
+def _nota_2026(nfe_path, grupos) -> bytes:
+    """NF-e de exemplo emitida em 2026, com o grupo IBSCBS de cada item."""
+    xml = nfe_path.read_text(encoding="utf-8").replace("2024-01-15T10:30:00", "2026-03-10T10:30:00")
+    partes = xml.split("</COFINS></imposto>")
+    xml = "".join(parte + f"</COFINS>{grupo}</imposto>" for parte, grupo in zip(partes[:-1], grupos, strict=True)) + partes[-1]
+    return xml.encode("utf-8")
+
+
+@pytest.fixture
+def grupos() -> list[str]:
+    """Item 1 tributado integralmente (R$ 100) e item 2 com redução de 60% (R$ 200, cesta de alimentos)."""
+    return [
+        _ibs_cbs("000", "000001", 100, cbs=0.90, ibs_uf=0.10),
+        _ibs_cbs("200", "200034", 200, cbs=0.72, ibs_uf=0.08, reducao=60),
+    ]
+
+
+def _validar(nfe_path, grupos) -> list[str]:
+    nota = XMLParser(_nota_2026(nfe_path, grupos), name="nfe_2026.xml").parse()
+    return [e["msg"] for e in validar_nota(nota, grupos=("ibs_cbs",))["erros"]]
+
+
+# =====================================================
+# TABELA
+# =====================================================
+
+def test_aliquotas_por_vigencia():
+    tabela = TabelaIBSCBS(TABELA)
+    datas = [data_aaaammdd(d) for d in ("2026-03-10", "2027-12-31T23:59:59-03:00", "2025-12-31", "")]
+
+    aliquotas = tabela.aliquotas(datas)
+
+    np.testing.assert_allclose(aliquotas.cbs, [0.9, 8.8, np.nan, np.nan])
+    np.testing.assert_allclose(aliquotas.ibs_uf + aliquotas.ibs_mun, [0.1, 0.1, np.nan, np.nan])
+
+
+def test_efeitos_e_reducoes():
+    tabela = TabelaIBSCBS(TABELA)
+
+    assert list(tabela.efeitos(np.array(["000", "410", "000", "999", ""], dtype=object))) == [
+        "tributado", "sem_imposto", "tributado", "", "",
+    ]
+    np.testing.assert_allclose(tabela.reducoes(np.array(["200034", "200035"], dtype=object)), [60.0, np.nan])
+    assert tabela.classificacoes["200034"].cst == "200"
+
+
+@pytest.mark.parametrize("alteracao, erro", [
+    ({"formato": 99}, "Formato"),
+    ({"cst": {"000": {"efeito": "parcial"}}}, "Efeito desconhecido"),
+    ({"periodos": [
+        {"inicio": "2026-01-01", "fim": "2026-12-31", "cbs": 0.9, "ibs_uf": 0.1, "ibs_mun": 0.0},
+        {"inicio": "2026-06-01", "fim": "2027-12-31", "cbs": 8.8, "ibs_uf": 0.1, "ibs_mun": 0.0},
+    ]}, "sobrepostos"),
+])
+def test_tabela_invalida(alteracao, erro):
+    with pytest.raises(ValueError, match=erro):
+        TabelaIBSCBS({**TABELA, **alteracao})
+
+
+# =====================================================
+# LEITURA E CONFERÊNCIA
+# =====================================================
+
+def test_grupo_ibscbs_lido_do_item(nfe_path, grupos):
+    item = XMLParser(_nota_2026(nfe_path, grupos), name="nfe_2026.xml").parse()["itens"][1]
+
+    assert (item["cst_ibs_cbs"], item["c_class_trib"]) == ("200", "200034")
+    assert (item["vBC_ibs_cbs"], item["aliq_cbs"], item["aliq_red_cbs"]) == (200.0, 0.9, 60.0)
+    assert (item["vIBS"], item["vCBS"]) == (0.08, 0.72)
+
+
+def test_valores_conferem(nfe_path, grupos):
+    assert _validar(nfe_path, grupos) == []
+
+
+def test_cbs_divergente(nfe_path, grupos):
+    grupos[1] = _ibs_cbs("200", "200034", 200, cbs=1.80, ibs_uf=0.08, reducao=60)
+
+    erros = _validar(nfe_path, grupos)
+
+    assert len(erros) == 1
+    assert erros[0].startswith("Item 2: CBS declarado")
+    assert "0.3600%" in erros[0]
+
+
+@pytest.mark.parametrize("cst, c_class_trib, erro", [
+    ("999", "999001", "CST 999 de IBS/CBS inexistente"),
+    ("000", "200034", "cClassTrib 200034 não pertence ao CST 000"),
+])
+def test_cst_e_classificacao(nfe_path, grupos, cst, c_class_trib, erro):
+    grupos[0] = _ibs_cbs(cst, c_class_trib, 100, cbs=0.90, ibs_uf=0.10)
+
+    assert any(erro in msg for msg in _validar(nfe_path, grupos))
+
+
+def test_nota_sem_grupo_ibscbs(nfe):
+    assert validar_nota(nfe, grupos=("ibs_cbs",))["erros"] == []
@@ -0,0 +1,52 @@
+"""ICMS-ST: MVA da tabela, base e imposto retido."""
+
+from src.validators.calculators.icms_st import calcular_st_lote
+
+
+def _nota_st(uf_destinatario: str = "SP", **item) -> dict:
+    return {
+        "uf_emitente": "SP",
+        "uf_destinatario": uf_destinatario,
+        "crt": "3",
+        "itens": [{
+            "tipo": "produto", "ncm": "84213920", "cest": "0100100", "origem": "0", "cst_csosn": "10",
+            "mod_bc_st": "4", "valor_total": 99.99, "vBC_icms": 99.99, "vICMS": 18.0, **item,
+        }],
+    }
+
+
+def test_st_com_mva_da_tabela():
+    linha, = calcular_st_lote([_nota_st()]).por_item()
+
+    assert linha["calculavel"] and linha["mva_tabela"]
+    assert linha["mva"] == 71.78
+    # 99,99 × 1,7178 = 171,763 -> 171,76; ICMS-ST = 171,76 × 18% - 18,00
+    assert linha["valor_base"] == 171.76
+    assert linha["valor_st"] == 12.92
+
+
+def test_st_declarado_igual_ao_calculado():
+    nota = _nota_st(aliq_mva_st=71.78, vBC_st=171.76, aliq_icms_st=18.0, vICMS_st=12.92)
+    resultado = calcular_st_lote([nota])
+
+    assert resultado.informado.tolist() == [True]
+    assert resultado.base.tolist() == resultado.base_declarada.tolist() == [17176]
+    assert resultado.valor.tolist() == resultado.valor_declarado.tolist() == [1292]
+
+
+def test_st_regra_generica_usa_mva_declarada():
+    # Regra sem UFs de destino: a MVA declarada prevalece e a da tabela fica como referência
+    nota = _nota_st(aliq_mva_st=50.0, vBC_st=149.99, vICMS_st=9.0)
+    resultado = calcular_st_lote([nota])
+
+    assert resultado.mva_generica.tolist() == [True]
+    assert resultado.mva.tolist() == [500000]
+    assert resultado.mva_referencia.tolist() == [717800]
+    assert resultado.base.tolist() == [14999]
+
+
+def test_st_nao_exigido_sem_cst_de_st():
+    resultado = calcular_st_lote([_nota_st(cst_csosn="00")])
+
+    assert not resultado.exigido.any()
+    assert not resultado.base.any()
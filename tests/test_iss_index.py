@@ -0,0 +1,216 @@
+"""Índice do ISS (endereçamento aberto por município × item da LC 116) e validar_iss."""
+
+import json
+
+import numpy as np
+import pytest
+
+from src.parsers.rps_parser import RPSParser
+from src.validators.engine.rule_engine import validar_nota
+from src.validators.iss import iss_validator
+from src.validators.iss.iss_index import (
+    INCIDENCIA_PRESTACAO,
+    INCIDENCIA_PRESTADOR,
+    INCIDENCIA_TOMADOR,
+    ISSIndex,
+    build_iss_index,
+    codigo_item,
+    codigo_municipio,
+    compile_iss_table,
+)
+from src.validators.iss.iss_validator import validar_iss
+
+SAO_PAULO, RIO, CURITIBA = "3550308", "3304557", "4106902"
+
+TABELA = {
+    "formato": 1,
+    "incidencia": {"prestacao": ["07.02"], "tomador": ["15.01"]},
+    "municipios": {
+        SAO_PAULO: {
+            "padrao": {"aliquota": 5.0, "retencao": False},
+            "itens": {"01.07": {"aliquota": 2.9}, "07.02": {"aliquota": 2.0, "retencao": True}},
+        },
+        RIO: {
+            "padrao": {"aliquota": 5.0},
+            "itens": {"07.02": {"aliquota": 3.0, "retencao": True}, "08.01": {"aliquota": 2.0, "incidencia": "prestacao"}},
+        },
+    },
+}
+
+
+@pytest.fixture
+def tabela_path(tmp_path):
+    path = tmp_path / "iss.json"
+    path.write_text(json.dumps(TABELA), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def indice(tabela_path, tmp_path):
+    return build_iss_index(tabela_path, tmp_path)
+
+
+@pytest.mark.parametrize("item, codigo", [
+    ("1.07", 107), ("01.07", 107), ("0107", 107), ("107", 107), (" 14.01 ", 1401),
+    ("01.00", 0), ("7", 0), ("1.x", 0), ("", 0), (None, 0),
+])
+def test_codigo_item(item, codigo):
+    assert codigo_item(item) == codigo
+
+
+@pytest.mark.parametrize("municipio, codigo", [
+    ("3550308", 3550308), (" 3550308 ", 3550308), ("355030", 0), ("0550308", 0), ("35503O8", 0),
+])
+def test_codigo_municipio(municipio, codigo):
+    assert codigo_municipio(municipio) == codigo
+
+
+# =====================================================
+# ÍNDICE
+# =====================================================
+
+def test_regra_do_item_e_padrao(indice):
+    regra = indice.consultar(SAO_PAULO, "1.07")
+    assert (regra.item, regra.aliquota, regra.retencao, regra.especifica) == ("01.07", 2.9, False, True)
+
+    padrao = indice.consultar(SAO_PAULO, "14.01")
+    assert (padrao.aliquota, padrao.incidencia, padrao.especifica) == (5.0, INCIDENCIA_PRESTADOR, False)
+
+    assert indice.consultar(CURITIBA, "01.07") is None
+    assert indice.consultar("123", "01.07") is None
+
+
+def test_incidencia_do_item(indice):
+    # Incidência da LC 116 vale para todos os municípios; a do item sobrescreve
+    assert indice.consultar(SAO_PAULO, "15.01").incidencia == INCIDENCIA_TOMADOR
+    assert indice.consultar(RIO, "07.02").incidencia == INCIDENCIA_PRESTACAO
+    assert indice.consultar(RIO, "08.01").incidencia == INCIDENCIA_PRESTACAO
+    assert indice.consultar(SAO_PAULO, "08.01").incidencia == INCIDENCIA_PRESTADOR
+
+
+def test_enderecamento_aberto_com_colisoes():
+    municipios = {str(3500000 + i): {"padrao": {"aliquota": 2.0 + i % 4}} for i in range(1, 600)}
+    registros = compile_iss_table({"formato": 1, "municipios": municipios})
+
+    ocupadas = np.count_nonzero(registros["chave"])
+    assert ocupadas == len(municipios)
+    assert len(registros) & (len(registros) - 1) == 0       # potência de 2
+    assert ocupadas <= len(registros) // 2
+
+    indice = ISSIndex(registros)
+    for municipio in municipios:
+        assert indice.consultar(municipio, "01.01").aliquota == 2.0 + int(municipio[-3:]) % 4
+    assert indice.consultar("3500600", "01.01") is None
+
+
+def test_cache_npy_reaproveitado(tabela_path, tmp_path, indice):
+    caches = list(tmp_path.glob("iss_index-*.npy"))
+    assert len(caches) == 1
+    assert build_iss_index(tabela_path, tmp_path).registros.tobytes() == indice.registros.tobytes()
+
+    # Tabela alterada: novo cache e o antigo é removido
+    alterada = {**TABELA, "municipios": {SAO_PAULO: {"padrao": {"aliquota": 3.0}}}}
+    tabela_path.write_text(json.dumps(alterada), encoding="utf-8")
+    assert build_iss_index(tabela_path, tmp_path).consultar(SAO_PAULO, "01.07").aliquota == 3.0
+    assert list(tmp_path.glob("iss_index-*.npy")) != caches
+    assert len(list(tmp_path.glob("iss_index-*.npy"))) == 1
+
+
+@pytest.mark.parametrize("alteracao, erro", [
+    ({"formato": 2}, "Formato"),
+    ({"municipios": {"355": {"padrao": {"aliquota": 5.0}}}}, "município inválido"),
+    ({"municipios": {SAO_PAULO: {"itens": {"1": {"aliquota": 5.0}}}}}, "Item da LC 116 inválido"),
+])
+def test_tabela_invalida(alteracao, erro):
+    with pytest.raises(ValueError, match=erro):
+        compile_iss_table({**TABELA, **alteracao})
+
+
+# =====================================================
+# MUNICÍPIO EM QUE O ISS É DEVIDO
+# =====================================================
+
+@pytest.mark.parametrize("prestacao, prestador, tomador, item, devido, aliquota", [
+    (RIO, SAO_PAULO, "", "07.02", RIO, 3.0),             # local da prestação
+    (RIO, SAO_PAULO, "", "01.07", SAO_PAULO, 2.9),       # estabelecimento do prestador
+    (RIO, "", "", "01.07", RIO, 5.0),                    # prestador não informado
+    (SAO_PAULO, "", RIO, "15.01", RIO, 5.0),             # domicílio do tomador
+    (CURITIBA, SAO_PAULO, "", "01.07", SAO_PAULO, 2.9),  # prestação fora da tabela
+    (CURITIBA, SAO_PAULO, "", "07.02", None, None),      # ... mas o ISS é do local da prestação
+])
+def test_resolver(indice, prestacao, prestador, tomador, item, devido, aliquota):
+    regra = indice.resolver(prestacao, prestador, tomador, item)
+
+    if devido is None:
+        assert regra is None
+    else:
+        assert (regra.municipio, regra.aliquota) == (devido, aliquota)
+
+
+def test_resolver_lote_igual_a_resolver(indice):
+    consultas = [
+        (RIO, SAO_PAULO, "", "07.02"), (RIO, SAO_PAULO, "", "01.07"), (CURITIBA, "", "", "01.07"),
+        (RIO, SAO_PAULO, "", "07.02"), (SAO_PAULO, "", RIO, "15.01"),
+    ]
+    lote = indice.resolver_lote(*(np.array(coluna, dtype=object) for coluna in zip(*consultas, strict=True)))
+
+    for i, consulta in enumerate(consultas):
+        regra = indice.resolver(*consulta)
+        assert lote.municipio[i] == (regra.municipio if regra else "")
+        assert lote.incidencia[i] == (regra.incidencia if regra else 0)
+        if regra:
+            assert lote.aliquota[i] == pytest.approx(regra.aliquota)
+            assert lote.retencao[i] == regra.retencao
+        else:
+            assert np.isnan(lote.aliquota[i])
+
+
+# =====================================================
+# VALIDAÇÃO (ISS001)
+# =====================================================
+
+@pytest.fixture
+def rps(rps_path, indice, monkeypatch) -> dict:
+    """NFS-e de exemplo (São Paulo, item 01.07, 5%) validada contra a tabela de teste."""
+    monkeypatch.setattr(iss_validator, "get_iss_index", lambda: indice)
+    return RPSParser(rps_path).parse()
+
+
+def _com_item(nota: dict, **campos) -> dict:
+    return {**nota, "itens": [{**dict(nota["itens"][0]), **campos}]}
+
+
+def test_aliquota_difere_da_tabela(rps):
+    resultado = validar_iss(rps)
+
+    assert not resultado["valido"]
+    assert resultado["regra"].aliquota == 2.9
+    assert "difere da tabela do município 3550308 para o item 01.07 (2.90%)" in resultado["erros"][0]
+
+    erros = validar_nota(rps, grupos=("iss",))["erros"]
+    assert [(e["codigo"], e["campo"]) for e in erros] == [("ISS001", "iss")]
+
+
+def test_aliquota_conforme_tabela(rps):
+    assert validar_iss(_com_item(rps, aliq_iss=2.9, vISS=29.0)) == {
+        "valido": True, "erros": [], "avisos": [], "regra": validar_iss(rps)["regra"],
+    }
+
+
+def test_retencao(rps):
+    nota = _com_item({**rps, "item_lista_servico": "07.02"}, aliq_iss=2.0, vISS=20.0)
+    assert "deve ser retido pelo tomador" in validar_iss(nota)["erros"][0]
+    assert validar_iss({**nota, "iss_retido": "1"})["valido"]
+
+    retido_sem_previsao = _com_item({**rps, "iss_retido": "1"}, aliq_iss=2.9, vISS=29.0)
+    assert "sem previsão de retenção" in validar_iss(retido_sem_previsao)["avisos"][0]
+
+
+def test_limites_e_codigos_invalidos(rps):
+    fora = validar_iss(_com_item({**rps, "codigo_municipio": CURITIBA}, aliq_iss=1.5))
+    assert any("fora dos limites da LC 116" in e for e in fora["erros"])
+    assert "sem alíquota de ISS na tabela" in fora["avisos"][0]
+
+    invalida = validar_iss({**rps, "codigo_municipio": "123", "item_lista_servico": "99"})
+    assert len(invalida["erros"]) == 2
+    assert invalida["regra"] is None
@@ -0,0 +1,106 @@
+"""Memo das regras de item por assinatura (MemoAssinaturas / MEMO_ITENS)."""
+
+import copy
+
+import pytest
+
+from src.validators.engine import base, rule_engine
+from src.validators.engine.base import MemoAssinaturas
+from src.validators.engine.rule_engine import avaliar_nota, estatisticas_memo
+
+
+def _usar_memo(monkeypatch, memo: MemoAssinaturas) -> MemoAssinaturas:
+    monkeypatch.setattr(base, "MEMO_ITENS", memo)
+    monkeypatch.setattr(rule_engine, "MEMO_ITENS", memo)
+    return memo
+
+
+@pytest.fixture
+def memo(monkeypatch) -> MemoAssinaturas:
+    """Memo vazio no lugar do global do motor."""
+    return _usar_memo(monkeypatch, MemoAssinaturas())
+
+
+@pytest.fixture
+def nota_simples(nfe) -> dict:
+    """NF-e de exemplo no Simples Nacional: os dois itens (mesma assinatura) violam CST002."""
+    nota = copy.deepcopy(nfe)
+    nota["crt"] = "1"
+    return nota
+
+
+# =====================================================
+# LRU E DIGEST
+# =====================================================
+
+def test_lru_descarta_a_menos_usada():
+    memo = MemoAssinaturas(tamanho=2)
+    memo.entrada(("a",))["R1"] = ()
+    memo.entrada(("b",))
+    memo.entrada(("a",))            # "a" passa a ser a mais recente
+    memo.entrada(("c",))
+
+    assert memo.estatisticas()["assinaturas"] == 2
+    assert memo.entrada(("a",)) == {"R1": ()}
+    assert memo.entrada(("b",)) == {}
+
+
+def test_digest_novo_esvazia():
+    memo = MemoAssinaturas()
+    memo.sincronizar("v1")
+    memo.entrada(("a",))["R1"] = ()
+
+    memo.sincronizar("v1")
+    assert memo.estatisticas()["assinaturas"] == 1
+
+    memo.sincronizar("v2")
+    assert memo.estatisticas()["assinaturas"] == 0
+    assert memo.digest == "v2"
+
+
+def test_limpar_zera_contadores():
+    memo = MemoAssinaturas(tamanho=8)
+    memo.entrada(("a",))
+    memo.hits, memo.misses = 3, 1
+
+    memo.limpar()
+    assert memo.estatisticas() == {"hits": 0, "misses": 0, "assinaturas": 0, "capacidade": 8}
+
+
+# =====================================================
+# MOTOR
+# =====================================================
+
+def test_itens_iguais_reaproveitam_resultado(memo, nota_simples):
+    violacoes = [v for v in avaliar_nota(nota_simples, grupos=("cst",)) if v.codigo == "CST002"]
+
+    # Mesma mensagem, campo com o número de cada item
+    assert [v.campo for v in violacoes] == ["cst_csosn_item_1", "cst_csosn_item_2"]
+    assert violacoes[0].msg == violacoes[1].msg
+    assert "Regime SIMPLES_NACIONAL" in violacoes[0].msg
+
+    regras = sum(r.por_assinatura for r in rule_engine.listar_regras(("cst",)))
+    assert estatisticas_memo() == {
+        "hits": regras, "misses": regras, "assinaturas": 1, "capacidade": memo.tamanho,
+    }
+
+
+def test_regime_faz_parte_da_assinatura(memo, nfe, nota_simples):
+    avaliar_nota(nota_simples, grupos=("cst",))
+
+    assert not [v for v in avaliar_nota(nfe, grupos=("cst",)) if v.codigo == "CST002"]
+    assert estatisticas_memo()["assinaturas"] == 2
+
+
+def test_mesmo_resultado_com_e_sem_memo(monkeypatch, nfe, nota_simples):
+    notas = [nfe, nota_simples, {**nfe, "itens": [{**nfe["itens"][0], "cfop": "9999"}]}]
+
+    # Capacidade zero: nenhuma assinatura sobrevive de um item para o outro
+    _usar_memo(monkeypatch, MemoAssinaturas(tamanho=0))
+    sem_memo = [avaliar_nota(nota) for nota in notas]
+    assert estatisticas_memo()["hits"] == 0
+
+    _usar_memo(monkeypatch, MemoAssinaturas())
+    assert [avaliar_nota(nota) for nota in notas] == sem_memo
+    assert [avaliar_nota(nota) for nota in notas] == sem_memo
+    assert estatisticas_memo()["hits"] > 0
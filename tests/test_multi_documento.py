@@ -0,0 +1,68 @@
+"""Arquivos com várias notas (lotes/envelopes): todas são extraídas, na ordem."""
+
+import re
+
+import pytest
+
+from src.api.simulation_sefaz import SefazSimulator
+from src.parsers.rps_parser import RPSParser
+from src.parsers.xml_document import XMLDocument, iter_outermost
+from src.parsers.xml_parser import XMLParser
+
+
+def _sem_declaracao(path) -> str:
+    return path.read_text(encoding="utf-8").split("?>", 1)[1]
+
+
+@pytest.fixture
+def envi_nfe(nfe_path) -> bytes:
+    """enviNFe com duas NFe (sem protocolo), números e chaves diferentes."""
+    nfe = re.search(r"<NFe>.*</NFe>", _sem_declaracao(nfe_path), re.S).group(0)
+    segunda = nfe.replace("<nNF>1234</nNF>", "<nNF>1235</nNF>").replace("0000012341", "0000012351")
+    return (
+        '<enviNFe xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00"><idLote>1</idLote>'
+        + nfe + segunda + "</enviNFe>"
+    ).encode("utf-8")
+
+
+def test_envi_nfe_extrai_todas(envi_nfe):
+    notas = XMLParser(envi_nfe, streaming=False, name="envi.xml").parse_all()
+
+    assert [(n["numero_nf"], n["indice_documento"]) for n in notas] == [("1234", 0), ("1235", 1)]
+    assert all(len(n["itens"]) == 2 for n in notas)
+
+
+def test_chave_sefaz_da_nota_do_indice(envi_nfe):
+    documento = XMLDocument.from_bytes(envi_nfe, "envi.xml")
+    simulador = SefazSimulator()
+
+    chaves = [
+        simulador.simulate_submission(envi_nfe, document=documento, indice_documento=i)["chave_nfe"]
+        for i in range(2)
+    ]
+
+    assert chaves == [
+        "35240112345678000195550010000012341000012345",
+        "35240112345678000195550010000012351000012345",
+    ]
+
+
+def test_iter_outermost_nao_repete_nfe_do_nfeproc(nfe_path):
+    documento = XMLDocument.from_source(nfe_path)
+
+    nos = list(iter_outermost(documento.root, ("nfeProc", "NFe")))
+
+    assert nos == [documento.root]
+
+
+def test_lote_de_nfse(rps_path):
+    comp = re.search(r"<CompNfse>.*</CompNfse>", _sem_declaracao(rps_path), re.S).group(0)
+    lote = (
+        "<ConsultarLoteRpsResposta><ListaNfse>"
+        + comp + comp.replace("<Numero>987</Numero>", "<Numero>988</Numero>")
+        + "</ListaNfse></ConsultarLoteRpsResposta>"
+    ).encode("utf-8")
+
+    notas = list(RPSParser(lote, name="lote.xml").iter_notas())
+
+    assert [(n["numero_nf"], n["indice_documento"]) for n in notas] == [("987", 0), ("988", 1)]
@@ -0,0 +1,104 @@
+"""Índice NCM/TIPI (arrays ordenados) e validar_ncm."""
+
+import json
+
+import pytest
+
+from src.validators.ncm import ncm_index, ncm_validator
+from src.validators.ncm.ncm_index import build_ncm_index
+from src.validators.ncm.ncm_validator import validar_ncm
+
+TABELA = {
+    "Nomenclaturas": [
+        {"Codigo": "84", "Data_Inicio": "01/04/2022", "Data_Fim": "31/12/9999"},
+        {"Codigo": "84.71", "Data_Inicio": "01/04/2022", "Data_Fim": "31/12/9999"},
+        {"Codigo": "8471.30", "Data_Inicio": "01/04/2022", "Data_Fim": "31/12/9999"},
+        {"Codigo": "8471.30.12", "Data_Inicio": "01/04/2022", "Data_Fim": "31/12/9999", "Aliquota_IPI": "9,75"},
+        {"Codigo": "8471.30.19", "Data_Inicio": "01/04/2022", "Data_Fim": "30/06/2023", "Aliquota_IPI": "NT"},
+        {"Codigo": "22", "Data_Inicio": "01/04/2022", "Data_Fim": "31/12/9999"},
+        {"Codigo": "2203.00.00", "Data_Inicio": "2022-04-01", "Data_Fim": "9999-12-31", "Aliquota_IPI": "6%"},
+    ]
+}
+
+
+@pytest.fixture
+def tabela_path(tmp_path):
+    path = tmp_path / "ncm.json"
+    path.write_text(json.dumps(TABELA), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def indice(tabela_path, tmp_path):
+    return build_ncm_index(tabela_path, tmp_path)
+
+
+def test_consulta_codigo_existente(indice):
+    consulta = indice.consultar("84713012", "2024-01-15")
+
+    assert indice.completo
+    assert (consulta.capitulo, consulta.posicao, consulta.existe, consulta.vigente) == (True, True, True, True)
+    assert consulta.aliquota_ipi == pytest.approx(9.75)
+
+
+def test_vigencia_e_aliquota_nt(indice):
+    consulta = indice.consultar("84713019", "15/01/2024")
+
+    assert consulta.existe
+    assert consulta.vigente is False
+    assert consulta.aliquota_ipi is None
+    assert indice.consultar("84713019").vigente is None
+
+
+def test_prefixos(indice):
+    assert indice.existe_prefixo("84")
+    assert indice.existe_prefixo("2203")       # só como prefixo de código de 8 dígitos
+    assert not indice.existe_prefixo("8472")
+    assert not indice.existe_prefixo("85")
+
+    consulta = indice.consultar("84729999")
+    assert (consulta.capitulo, consulta.posicao, consulta.existe) == (True, False, False)
+
+
+def test_cache_npy_reaproveitado(tabela_path, tmp_path, indice):
+    caches = list(tmp_path.glob("ncm_index-*.npy"))
+    assert len(caches) == 1
+
+    reaberto = build_ncm_index(tabela_path, tmp_path)
+    assert reaberto.registros.tobytes() == indice.registros.tobytes()
+
+    # Tabela alterada: novo cache e o antigo é removido
+    tabela_path.write_text(json.dumps({"Nomenclaturas": TABELA["Nomenclaturas"][:3]}), encoding="utf-8")
+    assert not build_ncm_index(tabela_path, tmp_path).completo
+    assert list(tmp_path.glob("ncm_index-*.npy")) != caches
+    assert len(list(tmp_path.glob("ncm_index-*.npy"))) == 1
+
+
+@pytest.mark.parametrize("ncm, valido, erro", [
+    ("84713012", True, None),
+    ("8471301", False, "8 dígitos"),
+    ("8471301A", False, "apenas números"),
+    ("85171231", False, "capítulo 85"),
+    ("84729999", False, "posição 8472"),
+    ("84713099", False, "não encontrado"),
+    ("84713019", False, "fora de vigência"),
+])
+def test_validar_ncm_com_tabela(indice, monkeypatch, ncm, valido, erro):
+    monkeypatch.setattr(ncm_validator, "get_ncm_index", lambda: indice)
+    resultado = validar_ncm(ncm, "2024-01-15")
+
+    assert resultado["valido"] is valido
+    if erro:
+        assert erro in resultado["erros"][0]
+
+
+def test_sem_tabela_configurada_confere_so_formato(monkeypatch):
+    monkeypatch.setattr(ncm_index, "NCM_TABLE_PATH", None)
+    ncm_index.get_ncm_index.limpar()
+    try:
+        assert ncm_index.get_ncm_index() is None
+        assert validar_ncm("99999999")["valido"]
+        assert not validar_ncm("9999")["valido"]
+        assert ncm_index.aliquota_ipi("84713012") is None
+    finally:
+        ncm_index.get_ncm_index.limpar()
@@ -0,0 +1,72 @@
+"""Registros compactos (Nota/Item) com interface de dict."""
+
+import copy
+import json
+
+import pytest
+
+from src.parsers.records import Item, Nota, to_plain
+
+
+def test_item_como_dict():
+    item = Item({"cfop": "5102", "vICMS": 18.0}, descricao="Produto A")
+
+    assert item["cfop"] == "5102"
+    assert item.get("ncm") is None
+    assert item.get("ncm", "") == ""
+    assert "ncm" not in item and "cfop" in item
+    assert list(item) == ["descricao", "cfop", "vICMS"]
+    assert item == {"cfop": "5102", "vICMS": 18.0, "descricao": "Produto A"}
+    with pytest.raises(KeyError):
+        item["ncm"]
+
+
+def test_campos_extras_e_remocao():
+    item = Item(cfop="5102")
+    item["campo_novo"] = 1
+    item.update({"vIPI": 2.0})
+
+    assert item["campo_novo"] == 1
+    assert len(item) == 3
+
+    del item["campo_novo"]
+    del item["cfop"]
+    assert dict(item) == {"vIPI": 2.0}
+    with pytest.raises(KeyError):
+        del item["cfop"]
+    with pytest.raises(KeyError):
+        del item["inexistente"]
+
+
+def test_sem_dict_por_instancia():
+    item = Item(cfop="5102")
+
+    assert not hasattr(item, "__dict__")
+    assert item._extra is None
+
+
+def test_transiente_fora_da_serializacao():
+    nota = Nota(numero_nf="1", itens=[Item(cfop="5102")])
+    nota["resultado_impostos"] = object()
+
+    assert "resultado_impostos" in nota
+    assert "resultado_impostos" not in list(nota)
+    assert nota.to_dict() == {"numero_nf": "1", "itens": [{"cfop": "5102"}]}
+
+
+def test_to_plain_e_copia():
+    nota = Nota(numero_nf="1", itens=[Item(cfop="5102")], impostos=[{"tipo_imposto": "ICMS"}])
+    nota["extra"] = {"item": Item(cfop="6102")}
+
+    plano = to_plain(nota)
+    assert json.loads(json.dumps(plano)) == plano
+    assert plano["extra"] == {"item": {"cfop": "6102"}}
+
+    copia = copy.deepcopy(nota)
+    copia["itens"][0]["cfop"] = "6102"
+    assert nota["itens"][0]["cfop"] == "5102"
+
+
+def test_parser_entrega_registros(nfe):
+    assert isinstance(nfe, Nota)
+    assert all(isinstance(item, Item) for item in nfe["itens"])
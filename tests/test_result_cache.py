@@ -0,0 +1,66 @@
+"""Índice de conteúdo (SHA-256) dos resultados já processados."""
+
+from src.database.result_cache import ResultCache, content_hash
+
+
+def _resultado() -> dict:
+    return {
+        "tipo_documento": "nfe",
+        "notas_processadas": [{"numero_nf": "1234", "status": "Autorizado", "violacoes": []}],
+        "erros": [],
+        "status": "completo",
+        "llm_provider": "groq",
+        "llm_model": "modelo",
+        "arquivo_nome": "nfe.xml",
+    }
+
+
+def test_content_hash_igual_para_caminho_e_bytes(nfe_path):
+    assert content_hash(nfe_path) == content_hash(nfe_path.read_bytes())
+
+
+def test_get_devolve_o_resultado_gravado(banco):
+    cache = ResultCache()
+    cache.put("abc", "nfe.xml", _resultado())
+
+    cached = cache.get("abc")
+    assert cached["notas_processadas"] == _resultado()["notas_processadas"]
+    assert "arquivo_nome" not in cached
+    assert cache.get("outro") is None
+
+
+def test_alterar_o_resultado_nao_afeta_o_cache(banco):
+    cache = ResultCache()
+    cache.put("abc", "nfe.xml", _resultado())
+
+    cached = cache.get("abc")
+    cached["notas_processadas"][0]["violacoes"].append({"codigo": "X"})
+    cached["erros"].append("alterado")
+
+    novo = cache.get("abc")
+    assert novo["notas_processadas"][0]["violacoes"] == []
+    assert novo["erros"] == []
+
+
+def test_le_do_banco_fora_do_memo(banco):
+    ResultCache().put("abc", "nfe.xml", _resultado())
+
+    cache = ResultCache()
+    assert cache.get("abc")["status"] == "completo"
+    cache.get("abc")["status"] = "alterado"
+    assert cache.get("abc")["status"] == "completo"
+
+
+def test_memo_limitado(banco):
+    cache = ResultCache(memo_size=1)
+    cache.put("a", "a.xml", _resultado())
+    cache.put("b", "b.xml", _resultado())
+
+    assert list(cache._memo) == ["b"]
+    assert cache.get("a") is not None
+
+
+def test_desabilitado(banco):
+    cache = ResultCache(enabled=False)
+    cache.put("abc", "nfe.xml", _resultado())
+    assert cache.get("abc") is None
@@ -0,0 +1,50 @@
+"""Extração da NFS-e pelo mapa declarativo de campos (RPS_FIELD_MAP)."""
+
+import xml.etree.ElementTree as ET
+
+from src.parsers.rps_parser import RPSParser, compile_field_map
+
+MAPA = (
+    ("Numero", "numero", str),
+    ("Servico/Valores/ValorServicos", "valor_servicos", float),
+    ("Servico/Valores/ValorIss", "valor_iss", float),
+    ("Servico/ItemListaServico", "item", str),
+)
+
+
+def test_mapa_sem_namespace():
+    extrair = compile_field_map(MAPA)
+    inf_nfse = ET.fromstring(
+        "<InfNfse><Numero>12</Numero><Servico><Valores><ValorServicos>150.50</ValorServicos></Valores>"
+        "<ItemListaServico>01.07</ItemListaServico></Servico></InfNfse>"
+    )
+
+    assert extrair(inf_nfse) == {"numero": "12", "valor_servicos": 150.5, "valor_iss": 0.0, "item": "01.07"}
+
+
+def test_mapa_com_namespace_e_pai_ausente():
+    extrair = compile_field_map(MAPA)
+    inf_nfse = ET.fromstring(
+        '<InfNfse xmlns="http://www.abrasf.org.br/nfse.xsd"><Numero>7</Numero>'
+        "<Servico><ItemListaServico>07.02</ItemListaServico></Servico></InfNfse>"
+    )
+
+    # Sem Servico/Valores os campos do grupo ficam com o padrão do conversor
+    assert extrair(inf_nfse) == {"numero": "7", "valor_servicos": 0.0, "valor_iss": 0.0, "item": "07.02"}
+    # O mesmo extrator atende arquivos sem namespace depois
+    assert extrair(ET.fromstring("<InfNfse><Numero>8</Numero></InfNfse>"))["numero"] == "8"
+
+
+def test_rps_parser(rps_path):
+    nota = RPSParser(rps_path).parse()
+
+    assert (nota["numero_nf"], nota["serie"], nota["tipo_nf"]) == ("987", "A", "RPS")
+    assert (nota["fornecedor_cnpj"], nota["cliente_cnpj"]) == ("11222333000181", "11444777000161")
+    assert nota["natop"] == "Tributação no município"
+    assert nota["valor_total"] == 1000.0
+    assert nota["item_lista_servico"] == "01.07"
+    assert [(i["tipo_imposto"], i["valor_imposto"], i["aliquota"]) for i in nota["impostos"]] == [
+        ("ISS", 50.0, 5.0), ("PIS", 6.5, 0.65), ("COFINS", 30.0, 3.0),
+    ]
+    item, = nota["itens"]
+    assert (item["descricao"], item["valor_total"], item["vISS"]) == ("Suporte tecnico", 1000.0, 50.0)
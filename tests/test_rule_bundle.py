@@ -0,0 +1,100 @@
+"""Pacote compilado das regras CST/CSOSN: cache em JSON e recarga pelas origens."""
+
+import json
+import os
+
+import pytest
+
+from src.validators.csts import rule_bundle
+from src.validators.csts.rule_bundle import (
+    RuleBundle,
+    build_rule_bundle,
+    compactar_regras_gerais,
+    expandir_regras_gerais,
+)
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    caminho = tmp_path / "cst_rules.json"
+    monkeypatch.setattr(rule_bundle, "CST_RULES_BUNDLE_PATH", caminho)
+    return caminho
+
+
+def test_cache_em_json_igual_ao_compilado(cache_path):
+    compilado = build_rule_bundle()
+    assert cache_path.exists()
+    json.loads(cache_path.read_text(encoding="utf-8"))
+
+    do_cache = build_rule_bundle()
+    assert isinstance(do_cache, RuleBundle)
+    assert do_cache == compilado
+
+
+def test_cache_compartilha_conjuntos_e_regras(cache_path):
+    build_rule_bundle()
+    bundle = build_rule_bundle()
+
+    regras = list(bundle.per_cfop.values())
+    assert len({id(r) for r in regras}) == len(set(regras))
+    conjuntos = [r.pis_cofins_csts for r in regras]
+    assert len({id(c) for c in conjuntos}) == len(set(conjuntos))
+
+
+def test_cache_de_outras_origens_e_ignorado(cache_path):
+    compilado = build_rule_bundle()
+    dados = json.loads(cache_path.read_text(encoding="utf-8"))
+    dados["digest"] = "0" * 64
+    dados["per_cfop"] = []
+    cache_path.write_text(json.dumps(dados), encoding="utf-8")
+
+    assert build_rule_bundle() == compilado
+
+
+def test_cache_ilegivel_e_recompilado(cache_path):
+    compilado = build_rule_bundle()
+    cache_path.write_bytes(b"\x80\x04not json")
+
+    assert build_rule_bundle() == compilado
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["digest"] == compilado.digest
+
+
+def test_regra_do_grupo_quando_cfop_nao_tem_regra():
+    bundle = rule_bundle.compile_rules({
+        **{name: [] for name in rule_bundle.SOURCE_FILES},
+        "general_rules": {"per_cfop": {}, "per_group": {"5000": {"REGIME_NORMAL": {"icms": {"cst_validos": ["00"]}}}}},
+    })
+
+    assert bundle.regra("5999", "REGIME_NORMAL").icms_codigos == frozenset({"00"})
+    assert bundle.regra("6102", "REGIME_NORMAL") is None
+
+
+def test_formato_compacto_ida_e_volta():
+    regras = {
+        "per_cfop": {
+            "5102": {"REGIME_NORMAL": {"icms": {"cst_validos": ["00", "20"]}}, "observacoes": ["a"]},
+            "6102": {"REGIME_NORMAL": {"icms": {"cst_validos": ["00", "20"]}}, "observacoes": ["a"]},
+        },
+        "per_group": {},
+    }
+    compacto = compactar_regras_gerais(regras)
+
+    assert len(compacto["entradas"]) == 1
+    assert expandir_regras_gerais(compacto) == regras
+
+
+def test_get_rule_bundle_recarrega_quando_a_origem_muda(monkeypatch, cache_path):
+    primeiro = rule_bundle.get_rule_bundle()
+    assert rule_bundle.get_rule_bundle() is primeiro
+
+    # Mesmo conteúdo com outro mtime: recarrega (do cache em disco) e mantém o digest
+    origem = rule_bundle.SOURCE_FILES["origem"]
+    st = os.stat(origem)
+    try:
+        os.utime(origem, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        segundo = rule_bundle.get_rule_bundle()
+    finally:
+        os.utime(origem, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert segundo is not primeiro
+    assert segundo == primeiro
@@ -0,0 +1,75 @@
+"""Motor de regras fiscais: todas as regras em uma passada, com código por violação."""
+
+import copy
+
+import pytest
+
+from src.validators.csts.cst_validator import validar_cst_nfe
+from src.validators.engine.base import SEVERITY_ERROR, SEVERITY_WARN, regra_item
+from src.validators.engine.rule_engine import avaliar_nota, listar_regras, validar_nota
+
+
+@pytest.fixture
+def nota_com_problemas(nfe) -> dict:
+    nota = copy.deepcopy(nfe)
+    nota["cliente_cnpj"] = "11444777000100"
+    nota["itens"][0]["cfop"] = "9999"
+    nota["itens"][1]["cst_csosn"] = "40"
+    return nota
+
+
+def test_nota_valida(nfe):
+    assert validar_nota(nfe) == {"valido": True, "erros": [], "avisos": []}
+
+
+def test_todas_as_violacoes_na_ordem(nota_com_problemas):
+    violacoes = [(v.codigo, v.campo, v.severity) for v in avaliar_nota(nota_com_problemas)]
+
+    # Não para no primeiro validador reprovado: nota, depois item a item
+    assert violacoes == [
+        ("DEST001", "destinatario", SEVERITY_ERROR),
+        ("CFOP002", "cfop_item_1", SEVERITY_ERROR),
+        ("CST001", "cfop_item_1", SEVERITY_ERROR),
+        ("CST003", "icms_item_2", SEVERITY_WARN),
+    ]
+
+
+def test_validar_nota_separa_erros_e_avisos(nota_com_problemas):
+    resultado = validar_nota(nota_com_problemas)
+
+    assert not resultado["valido"]
+    assert [e["codigo"] for e in resultado["erros"]] == ["DEST001", "CFOP002", "CST001"]
+    assert [a["codigo"] for a in resultado["avisos"]] == ["CST003"]
+    assert set(resultado["erros"][0]) == {"codigo", "msg", "campo", "severity"}
+
+
+def test_grupos(nota_com_problemas):
+    assert [v.codigo for v in avaliar_nota(nota_com_problemas, grupos=("destinatario",))] == ["DEST001"]
+    assert [v.codigo for v in avaliar_nota(nota_com_problemas, grupos=("cfop", "cst"))] == [
+        "CFOP002", "CST001", "CST003",
+    ]
+    assert {r.grupo for r in listar_regras(("cst",))} == {"cst"}
+
+
+def test_validar_cst_nfe_usa_o_grupo_cst(nota_com_problemas):
+    resultado = validar_cst_nfe(nota_com_problemas)
+
+    assert not resultado["valido"]
+    assert resultado["erros"] == [
+        {"msg": "CFOP 9999 não tem regra definida.", "campo": "cfop_item_1", "severity": SEVERITY_ERROR},
+    ]
+    assert len(resultado["avisos"]) == 1
+
+
+def test_codigos_unicos():
+    codigos = [r.codigo for r in listar_regras()]
+    assert len(codigos) == len(set(codigos))
+
+    with pytest.raises(ValueError, match="duplicado"):
+        regra_item("CST002", grupo="cst")(lambda ctx, it: iter(()))
+
+
+def test_nota_sem_itens():
+    resultado = validar_nota({"crt": "3", "itens": []}, grupos=("cst",))
+
+    assert [e["codigo"] for e in resultado["erros"]] == ["CST000"]
@@ -0,0 +1,35 @@
+"""Calculadora vetorial: impostos declarados x calculados."""
+
+from src.constants import TaxType
+from src.validators.calculators.tax_calculator import (
+    IMPOSTOS,
+    TaxCalculator,
+    itens_para_arrays,
+)
+
+
+def _coluna(tipo: TaxType) -> int:
+    return IMPOSTOS.index(tipo)
+
+
+def test_calcular_nfe_conhecida_confere_com_declarado(nfe):
+    resultado = TaxCalculator.calcular(itens_para_arrays([nfe]))
+
+    assert resultado.item.tolist() == [1, 2]
+    for tipo in (TaxType.ICMS, TaxType.PIS, TaxType.COFINS):
+        assert resultado.informado[:, _coluna(tipo)].all()
+    assert not resultado.diferenca.any()
+
+    icms = _coluna(TaxType.ICMS)
+    assert resultado.base[:, icms].tolist() == [10000, 20000]
+    assert resultado.valor[:, icms].tolist() == [1800, 3600]
+
+
+def test_totais_por_nota(nfe):
+    resultado = TaxCalculator.calcular(itens_para_arrays([nfe]))
+    base, valor = resultado.totais(1)
+
+    assert base[0, _coluna(TaxType.ICMS)] == 30000
+    assert valor[0, _coluna(TaxType.ICMS)] == 5400
+    assert valor[0, _coluna(TaxType.PIS)] == 495
+    assert valor[0, _coluna(TaxType.COFINS)] == 2280
@@ -0,0 +1,66 @@
+"""Conciliação dos totais (ICMSTot) com os itens."""
+
+import copy
+
+import pytest
+
+from src.validators.calculators.tax_calculator import itens_para_arrays
+from src.validators.engine.base import CAMPOS_ARRAYS_NUMERICOS, CAMPOS_ARRAYS_TEXTO
+from src.validators.totais.totais_validator import centavos, validar_totais
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("123.45", 12345),
+    (0.1 + 0.2, 30),
+    (7, 700),
+    ("", 0),
+    (None, 0),
+    ("abc", 0),
+])
+def test_centavos(valor, esperado):
+    assert centavos(valor) == esperado
+
+
+def test_totais_conciliam(nfe):
+    resultado = validar_totais(nfe)
+
+    assert resultado["valido"]
+    assert resultado["erros"] == []
+    assert resultado["diferencas"] == {}
+
+
+def test_total_divergente(nfe):
+    nfe = copy.deepcopy(nfe)
+    nfe["totais"]["vICMS"] = "54.10"
+    resultado = validar_totais(nfe)
+
+    assert not resultado["valido"]
+    assert resultado["diferencas"] == {"vICMS": 10}
+
+
+def test_tolerancia(nfe):
+    nfe = copy.deepcopy(nfe)
+    nfe["totais"]["vICMS"] = "54.01"
+
+    assert not validar_totais(nfe, tolerancia=0)["valido"]
+    assert validar_totais(nfe, tolerancia=1)["valido"]
+
+
+def test_composicao_do_vnf(nfe):
+    nfe = copy.deepcopy(nfe)
+    nfe["totais"]["vNF"] = "310.00"
+    resultado = validar_totais(nfe)
+
+    assert resultado["diferencas"] == {"vNF": 1000}
+
+
+def test_arrays_e_itens_dao_o_mesmo_resultado(nfe):
+    nfe = copy.deepcopy(nfe)
+    nfe["totais"]["vProd"] = "299.00"
+    arrays = itens_para_arrays([nfe], CAMPOS_ARRAYS_NUMERICOS, CAMPOS_ARRAYS_TEXTO)
+
+    assert validar_totais(nfe, arrays=arrays) == validar_totais(nfe)
+
+
+def test_nota_sem_totais():
+    assert validar_totais({"itens": [{"valor_total": 10.0}]})["valido"]
@@ -0,0 +1,49 @@
+"""XML em memória (uploads): bytes e buffers lidos sem passar pelo disco."""
+
+import io
+
+from src.parsers.xml_document import XMLDocument, open_source, source_name, source_size
+from src.parsers.xml_parser import XMLParser
+
+
+class _Upload(io.BytesIO):
+    """Buffer com nome, como o UploadedFile do Streamlit."""
+
+    def __init__(self, conteudo: bytes, name: str):
+        super().__init__(conteudo)
+        self.name = name
+
+
+def test_open_source_rebobina_e_nao_fecha_buffer(nfe_path):
+    upload = _Upload(nfe_path.read_bytes(), "nota.xml")
+    upload.read(10)
+
+    with open_source(upload) as f:
+        assert f.read(5) == b"<?xml"
+    assert not upload.closed
+
+    with open_source(upload) as f:
+        assert f.read(5) == b"<?xml"
+
+
+def test_nome_e_tamanho_da_origem(nfe_path):
+    conteudo = nfe_path.read_bytes()
+    upload = _Upload(conteudo, "pasta/nota.xml")
+
+    assert source_name(nfe_path) == "nfe.xml"
+    assert source_name(upload) == "nota.xml"
+    assert source_name(conteudo) == "memoria.xml"
+    assert source_name(conteudo, "informado.xml") == "informado.xml"
+    assert source_size(nfe_path) == source_size(conteudo) == source_size(upload) == len(conteudo)
+
+
+def test_parser_le_bytes_e_buffer_como_arquivo(nfe_path):
+    esperado = XMLParser(nfe_path).parse()
+    conteudo = nfe_path.read_bytes()
+
+    upload = _Upload(conteudo, "nota.xml")
+    assert XMLParser(conteudo, name="nota.xml").parse() == esperado
+    assert XMLParser(upload).parse() == esperado
+    # O mesmo buffer pode ser lido de novo pelas etapas seguintes
+    assert XMLDocument.from_source(upload).root_tag == "nfeProc"
+    assert XMLParser(memoryview(conteudo)).parse() == esperado
@@ -0,0 +1,51 @@
+"""Documento XML parseado uma vez e compartilhado pelas etapas do workflow."""
+
+import pytest
+
+from src.api.simulation_sefaz import SefazSimulator
+from src.parsers import xml_document
+from src.parsers.xml_document import NFE_NODE_TAGS, XMLDocument
+from src.parsers.xml_parser import XMLParser
+
+
+@pytest.fixture
+def parses(monkeypatch) -> list:
+    """Conta as chamadas a ET.parse feitas pelo módulo do documento."""
+    chamadas = []
+    parse = xml_document.ET.parse
+
+    def contar(source, *args, **kwargs):
+        chamadas.append(source)
+        return parse(source, *args, **kwargs)
+
+    monkeypatch.setattr(xml_document.ET, "parse", contar)
+    return chamadas
+
+
+def test_documento_reaproveitado_pelo_parser_e_sefaz(nfe_path, parses):
+    documento = XMLDocument.from_source(nfe_path)
+
+    nota = XMLParser(nfe_path, document=documento).parse()
+    resposta = SefazSimulator().simulate_submission(nfe_path, document=documento)
+
+    assert len(parses) == 1
+    assert nota["numero_nf"] == "1234"
+    assert resposta["chave_nfe"] == "35240112345678000195550010000012341000012345"
+
+
+def test_parser_com_documento_nao_le_o_arquivo(nfe_path):
+    documento = XMLDocument.from_source(nfe_path)
+
+    # O caminho só dá nome aos logs: o conteúdo vem do documento
+    nota = XMLParser(nfe_path.with_name("inexistente.xml"), document=documento).parse()
+
+    assert nota == XMLParser(nfe_path).parse()
+
+
+def test_dict_e_nos_calculados_uma_vez(nfe_path):
+    documento = XMLDocument.from_source(nfe_path)
+
+    assert documento.root_tag == "nfeProc"
+    assert documento.as_dict() is documento.as_dict()
+    assert documento.nodes(NFE_NODE_TAGS) is documento.nodes(NFE_NODE_TAGS)
+    assert documento.nodes(NFE_NODE_TAGS) == [documento.root]
@@ -0,0 +1,44 @@
+"""Leitura incremental (iterparse) de arquivos com várias NF-e."""
+
+import pytest
+
+from src.parsers.xml_document import NFE_NODE_TAGS, local_tag
+from src.parsers.xml_parser import XMLParser
+
+
+@pytest.fixture
+def lote(nfe_path) -> bytes:
+    """Lote com três cópias da NF-e de exemplo (números 1234, 1235 e 1236)."""
+    nota = nfe_path.read_text(encoding="utf-8").split("?>", 1)[1]
+    notas = [nota.replace("<nNF>1234</nNF>", f"<nNF>{numero}</nNF>") for numero in (1234, 1235, 1236)]
+    return ("<lote>" + "".join(notas) + "</lote>").encode("utf-8")
+
+
+def test_streaming_igual_arvore_completa(lote):
+    completo = XMLParser(lote, streaming=False, name="lote.xml").parse_all()
+    streaming = XMLParser(lote, streaming=True, name="lote.xml").parse_all()
+
+    assert [n["numero_nf"] for n in streaming] == ["1234", "1235", "1236"]
+    assert [n["indice_documento"] for n in streaming] == [0, 1, 2]
+    assert streaming == completo
+
+
+def test_streaming_mantem_apenas_esqueleto(lote):
+    parser = XMLParser(lote, streaming=True, name="lote.xml")
+    parser.parse_all()
+
+    nodes = parser.document.nodes(NFE_NODE_TAGS)
+    tags = {local_tag(e.tag) for e in parser.document.root.iter()}
+
+    assert len(nodes) == 3
+    assert {"det", "total", "dest", "protNFe", "Signature"}.isdisjoint(tags)
+    assert [n.findtext(".//{*}ide/{*}nNF") for n in nodes] == ["1234", "1235", "1236"]
+    assert nodes[0].find(".//{*}infNFe").get("Id") == "NFe35240112345678000195550010000012341000012345"
+
+
+def test_streaming_nota_na_raiz(nfe_path):
+    parser = XMLParser(nfe_path, streaming=True)
+
+    assert parser.parse_all() == XMLParser(nfe_path, streaming=False).parse_all()
+    assert local_tag(parser.document.root.tag) == "nfeProc"
+    assert parser.document.root.find(".//{*}det") is None
@@ -0,0 +1,68 @@
+"""ZIP de XMLs lido membro a membro, sem extrair em disco."""
+
+import io
+import zipfile
+
+import pytest
+
+from src.agents.nf_agent import NFAgentIntelligent
+from src.database.duplicate_index import DuplicateIndex
+from src.parsers.zip_reader import is_zip, list_xml_members, open_zip, read_member
+
+
+@pytest.fixture
+def zip_bytes() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("notas/", "")
+        zf.writestr("notas/b.xml", b"<b/>")
+        zf.writestr("a.XML", b"<a/>")
+        zf.writestr("__MACOSX/notas/._b.xml", b"lixo")
+        zf.writestr("notas/.oculto.xml", b"<o/>")
+        zf.writestr("leia-me.txt", b"texto")
+        zf.writestr("quebrado.xml", b"<quebrado")
+    return buffer.getvalue()
+
+
+def test_is_zip(zip_bytes, tmp_path):
+    path = tmp_path / "lote.bin"
+    path.write_bytes(zip_bytes)
+
+    assert is_zip(zip_bytes)
+    assert is_zip(io.BytesIO(zip_bytes))
+    assert is_zip(path)
+    assert is_zip(b"", name="lote.ZIP")
+    assert not is_zip(b"<?xml version='1.0'?><a/>")
+
+
+def test_membros_xml(zip_bytes):
+    with open_zip(zip_bytes) as zf:
+        membros = list_xml_members(zf)
+        assert [m.filename for m in membros] == ["notas/b.xml", "a.XML", "quebrado.xml"]
+        assert read_member(zf, membros[0]) == b"<b/>"
+
+
+class _AgenteZip(NFAgentIntelligent):
+    """Agente sem grafo: processar devolve o nome e o conteúdo recebidos."""
+
+    def __init__(self):
+        self.duplicatas = DuplicateIndex(carregar_historico=False)
+
+    def processar(self, arquivo_path, llm_provider=None, api_key=None, nome_arquivo="", forcar_reprocessamento=False):
+        if arquivo_path.startswith(b"<quebrado"):
+            raise ValueError("XML malformado")
+        return {"arquivo_nome": nome_arquivo, "conteudo": arquivo_path, "notas_processadas": [], "erros": []}
+
+
+def test_processar_zip_na_ordem_do_arquivo(zip_bytes):
+    progresso = []
+    resultados = _AgenteZip().processar_zip(
+        zip_bytes, max_workers=2, progress_callback=lambda feitos, total, nome, _: progresso.append((total, nome)),
+    )
+
+    assert [(r["arquivo_nome"], r.get("conteudo")) for r in resultados] == [
+        ("notas/b.xml", b"<b/>"), ("a.XML", b"<a/>"), ("quebrado.xml", None),
+    ]
+    assert resultados[2]["status"] == "erro"
+    assert "XML malformado" in resultados[2]["erros"][0]
+    assert sorted(progresso) == [(3, "a.XML"), (3, "notas/b.xml"), (3, "quebrado.xml")]